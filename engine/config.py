@@ -36,7 +36,8 @@ FILES = {
     'SIMULACIONES': os.path.join(DATA_DIR, 'LOTO_SIMULACIONES.csv'),
     'GENOMA': os.path.join(DATA_DIR, 'loto_genome.json'),
     'BIOMETRICS': os.path.join(DATA_DIR, 'loto_biometrics.json'),
-    'DASHBOARD': os.path.join(PROJECT_ROOT, 'dashboard_data.json'),
+    'DASHBOARD_DIR': os.path.join(PROJECT_ROOT, 'dashboard'),
+    'AGREGADOS_DIR': os.path.join(PROJECT_ROOT, 'agregados'),
     'JUGADAS': os.path.join(DATA_DIR, 'LOTO_JUGADAS.csv'),
 }
 
@@ -15,15 +15,22 @@ import pandas as pd
 import numpy as np
 import json
 import os
+import shutil
+import tempfile
 from datetime import datetime, timedelta
 import logging
 
+from genoma_store import GenomaStore
+
 # Configuración
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, '..', '..', 'data')
 SIMULACIONES_FILE = os.path.join(DATA_DIR, "LOTO_SIMULACIONES.csv")
 GENOMA_FILE = os.path.join(DATA_DIR, "loto_genome.json")
-OPTIMIZER_LOG = os.path.join(DATA_DIR, "optimizer_history.json")
+OPTIMIZER_LOG = os.path.join(DATA_DIR, "optimizer_history.json")          # Formato anterior (solo migración)
+HISTORIAL_FILE = os.path.join(DATA_DIR, "optimizer_history.jsonl")       # Append-only
+ESTADO_FILE = os.path.join(DATA_DIR, "optimizer_state.json")
+IDS_FILE = os.path.join(DATA_DIR, "optimizer_state.ids.npy")             # Ids ya contabilizados y su veredicto
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -36,34 +43,292 @@ if not logger.handlers:
 # Umbrales de decisión
 UMBRAL_DEGRADACION = 0.3      # Si score < 30% del promedio, degradar
 UMBRAL_PROMOCION = 1.5        # Si score > 150% del promedio, promover
-UMBRAL_DRIFT = 2.0            # Z-score para detectar concept drift
-VENTANA_DRIFT = 50            # Últimas N predicciones para detectar drift
+VENTANA_DRIFT = 50            # Mínimo de veredictos de referencia para evaluar drift
 MIN_SAMPLES_DECISION = 20    # Mínimo de muestras para tomar decisiones
 
+# CUSUM bilateral sobre aciertos estandarizados (k: holgura, h: umbral de alarma).
+# Con k=0.5, h=8: ~19.000 veredictos entre falsas alarmas, ~18 para detectar un salto de 1σ
+CUSUM_K = 0.5
+CUSUM_H = 8.0
+
+COLUMNAS = ['id', 'juego', 'algoritmo', 'estado', 'aciertos', 'score_afinidad', 'hora_dia']
+CLAVES = ['juego', 'algoritmo', 'hora_dia']
+# Estadísticos suficientes por (juego, algoritmo, hora)
+SUMAS = ['n', 's', 's2', 'ss', 'ss2', 'n3']
+# Veredicto con que se contabilizó cada id (para rectificar re-auditorías)
+DTYPE_CONTABILIZADOS = np.dtype([('id', np.int64), ('aciertos', np.float64), ('score', np.float64)])
+
+# Eventos que se conservan por tipo; el log se compacta al duplicar el límite
+LIMITES_HISTORIAL = {"optimization": 200, "drift_alert": 200, "health_check": 100}
+
+
+def _estadisticos(df, signo=1):
+    """
+    Estadísticos suficientes de un bloque de veredictos. Con signo=-1
+    descuenta el bloque (el máximo no se puede descontar: queda como cota).
+    """
+    if df.empty:
+        return pd.DataFrame(columns=CLAVES + SUMAS + ['max'])
+    aciertos = df['aciertos'].astype(float)
+    score = df['score_afinidad'].astype(float)
+    base = pd.DataFrame({
+        'juego': df['juego'], 'algoritmo': df['algoritmo'],
+        'hora_dia': df['hora_dia'].fillna(-1).astype(int),
+        'n': signo, 's': signo * aciertos, 's2': signo * aciertos ** 2,
+        'ss': signo * score, 'ss2': signo * score ** 2,
+        'n3': signo * (aciertos >= 3).astype(int), 'max': aciertos if signo > 0 else np.nan,
+    })
+    agregado = {c: 'sum' for c in SUMAS}
+    agregado['max'] = 'max'
+    return base.groupby(CLAVES, as_index=False).agg(agregado)
+
+
+def _combinar(a, b):
+    """Suma de estadísticos suficientes (merge incremental)"""
+    if a.empty:
+        return b.reset_index(drop=True)
+    if b.empty:
+        return a.reset_index(drop=True)
+    agregado = {c: 'sum' for c in SUMAS}
+    agregado['max'] = 'max'
+    return pd.concat([a, b]).groupby(CLAVES, as_index=False).agg(agregado)
+
+
+def _desviacion(n, s, s2):
+    """Desviación estándar muestral (ddof=1) desde sumas"""
+    n = np.asarray(n, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = (np.asarray(s2, dtype=float) - np.asarray(s, dtype=float) ** 2 / n) / (n - 1)
+    return np.sqrt(np.clip(var, 0, None))
+
+
+def _cusum(z, s_pos, s_neg, k=CUSUM_K):
+    """
+    CUSUM bilateral vectorizado: S_t = max(0, S_{t-1} + x_t) equivale a
+    C_t - min(-S_0, min_{s<=t} C_s) con C la suma acumulada de x.
+
+    Returns:
+        (trayectoria S+, trayectoria S-)
+    """
+    def lindley(x, s0):
+        c = np.cumsum(x)
+        return c - np.minimum(np.minimum.accumulate(c), -s0)
+    return lindley(z - k, s_pos), lindley(-z - k, s_neg)
+
+
+def _escribir_json_atomico(path, data):
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', suffix='.json',
+                                         dir=os.path.dirname(path), delete=False) as tmp_file:
+            json.dump(data, tmp_file, ensure_ascii=False)
+            tmp_path = tmp_file.name
+        shutil.move(tmp_path, path)
+    except Exception:
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        raise
+
+
+def leer_historial(tipo=None, limite=None):
+    """
+    Eventos del historial append-only ("optimization", "drift_alert",
+    "health_check"), del más antiguo al más reciente.
+    """
+    _migrar_historial()
+    if not os.path.exists(HISTORIAL_FILE):
+        return []
+    eventos = []
+    with open(HISTORIAL_FILE, 'r', encoding='utf-8') as f:
+        for linea in f:
+            try:
+                evento = json.loads(linea)
+            except json.JSONDecodeError:
+                continue  # Línea final incompleta (escritura interrumpida)
+            if tipo is None or evento.get('evento') == tipo:
+                eventos.append(evento)
+    return eventos[-limite:] if limite else eventos
+
+
+def _migrar_historial():
+    """Convierte una sola vez el optimizer_history.json anterior al log append-only"""
+    if os.path.exists(HISTORIAL_FILE) or not os.path.exists(OPTIMIZER_LOG):
+        return
+    try:
+        with open(OPTIMIZER_LOG, 'r', encoding='utf-8') as f:
+            anterior = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        logger.warning(f"Historial anterior ilegible, no se migra: {e}")
+        return
+    eventos = []
+    for clave, tipo in (("optimizations", "optimization"), ("drift_alerts", "drift_alert"),
+                        ("health_checks", "health_check")):
+        eventos.extend({"evento": tipo, **e} for e in anterior.get(clave, []))
+    eventos.sort(key=lambda e: e.get("timestamp", ""))
+    _anexar_eventos(eventos)
+
+
+def _anexar_eventos(eventos):
+    if not eventos:
+        return
+    with open(HISTORIAL_FILE, 'a', encoding='utf-8') as f:
+        for evento in eventos:
+            f.write(json.dumps(evento, ensure_ascii=False, default=float) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _compactar_historial():
+    """
+    Deja los últimos LIMITES_HISTORIAL eventos de cada tipo cuando alguno
+    dobla su límite: el log sigue siendo append-only entre compactaciones.
+    """
+    eventos = leer_historial()
+    conteo = pd.Series([e.get('evento') for e in eventos], dtype=object).value_counts()
+    if not any(conteo.get(tipo, 0) > 2 * limite for tipo, limite in LIMITES_HISTORIAL.items()):
+        return
+    restantes = dict(LIMITES_HISTORIAL)
+    conservados = []
+    for evento in reversed(eventos):
+        tipo = evento.get('evento')
+        if tipo in restantes:
+            if restantes[tipo] == 0:
+                continue
+            restantes[tipo] -= 1
+        conservados.append(evento)
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', suffix='.jsonl',
+                                         dir=os.path.dirname(HISTORIAL_FILE), delete=False) as tmp_file:
+            for evento in reversed(conservados):
+                tmp_file.write(json.dumps(evento, ensure_ascii=False, default=float) + '\n')
+            tmp_path = tmp_file.name
+        shutil.move(tmp_path, HISTORIAL_FILE)
+    except Exception:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 
 class AutoOptimizer:
-    """Motor de auto-optimización del sistema de predicciones."""
+    """
+    Motor de auto-optimización del sistema de predicciones.
+
+    Mantiene en ESTADO_FILE los estadísticos suficientes (conteos, sumas y
+    sumas de cuadrados por juego/algoritmo/hora) y el estado CUSUM por
+    juego; cada ciclo solo procesa los veredictos nuevos y rectifica los
+    re-auditados (se descuenta el veredicto anterior y se suma el nuevo; el
+    CUSUM solo ve veredictos nuevos). El historial se anexa a
+    HISTORIAL_FILE (JSON Lines), acotado por LIMITES_HISTORIAL.
+    """
 
     def __init__(self):
         self.genoma = self._cargar_genoma()
-        self.historial = self._cargar_historial()
+        self.estado = self._cargar_estado()
+        self.contabilizados = self._cargar_ids()
+        self.eventos = []
         self.recomendaciones = []
 
     def _cargar_genoma(self):
-        if os.path.exists(GENOMA_FILE):
-            with open(GENOMA_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
-
-    def _cargar_historial(self):
-        if os.path.exists(OPTIMIZER_LOG):
-            with open(OPTIMIZER_LOG, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {"optimizations": [], "drift_alerts": [], "health_checks": []}
+        return GenomaStore(GENOMA_FILE).leer()
+
+    def _cargar_estado(self):
+        if os.path.exists(ESTADO_FILE):
+            try:
+                with open(ESTADO_FILE, 'r', encoding='utf-8') as f:
+                    estado = json.load(f)
+                estado["stats"] = pd.DataFrame(estado.get("stats", []), columns=CLAVES + SUMAS + ['max'])
+                return estado
+            except (json.JSONDecodeError, IOError) as e:
+                logger.warning(f"Estado del optimizador ilegible, se recalcula: {e}")
+        return {"version": 1, "juegos": {}, "stats": pd.DataFrame(columns=CLAVES + SUMAS + ['max'])}
+
+    def _cargar_ids(self):
+        ids = None
+        if os.path.exists(IDS_FILE):
+            try:
+                ids = np.load(IDS_FILE)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ids del optimizador ilegibles: {e}")
+        # Estado e ids deben corresponder (escritura interrumpida o formato
+        # anterior sin veredictos): si no, se recontabiliza todo
+        if ids is None or ids.dtype != DTYPE_CONTABILIZADOS or len(ids) != self.estado.get("contabilizados", 0):
+            if not self.estado["stats"].empty:
+                logger.warning("Estado del optimizador inconsistente, se recalcula desde cero")
+            self.estado = {"version": 1, "juegos": {},
+                           "stats": pd.DataFrame(columns=CLAVES + SUMAS + ['max'])}
+            return np.array([], dtype=DTYPE_CONTABILIZADOS)
+        return ids
+
+    def _guardar_estado(self):
+        estado = dict(self.estado)
+        estado["stats"] = self.estado["stats"].to_dict(orient='records')
+        estado["updated_at"] = datetime.now().isoformat()
+        estado["contabilizados"] = int(len(self.contabilizados))
+        _escribir_json_atomico(ESTADO_FILE, estado)
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(suffix='.npy', dir=os.path.dirname(IDS_FILE),
+                                             delete=False) as tmp_file:
+                np.save(tmp_file, self.contabilizados)
+                tmp_path = tmp_file.name
+            shutil.move(tmp_path, IDS_FILE)
+        except Exception:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
 
     def _guardar_historial(self):
-        with open(OPTIMIZER_LOG, 'w', encoding='utf-8') as f:
-            json.dump(self.historial, f, indent=2, ensure_ascii=False)
+        _migrar_historial()
+        _anexar_eventos(self.eventos)
+        _compactar_historial()
+        self.eventos = []
+
+    def _registrar(self, tipo, datos):
+        self.eventos.append({"evento": tipo, "timestamp": datetime.now().isoformat(), **datos})
+
+    def _veredictos_nuevos(self, df):
+        """
+        Filas AUDITADO cuyo id aún no fue contabilizado, y la rectificación
+        (estadísticos a sumar) de los ya contabilizados cuyo veredicto cambió.
+
+        Returns:
+            (nuevos, rectificacion)
+        """
+        auditados = df[df['estado'] == 'AUDITADO']
+        auditados = auditados[~auditados['id'].duplicated(keep='last')]
+        ids = auditados['id'].to_numpy(dtype=np.int64)
+        conocidos = self.contabilizados
+        pos = np.minimum(np.searchsorted(conocidos['id'], ids), max(len(conocidos) - 1, 0))
+        contado = (conocidos['id'][pos] == ids) if len(conocidos) else np.zeros(len(ids), dtype=bool)
+
+        # Re-auditados: fuera el veredicto anterior, dentro el actual
+        previos = conocidos[pos[contado]]
+        actuales = auditados[contado]
+        aciertos = actuales['aciertos'].to_numpy(dtype=float)
+        score = actuales['score_afinidad'].to_numpy(dtype=float)
+        cambiados = ~(np.isclose(aciertos, previos['aciertos'], equal_nan=True) &
+                      np.isclose(score, previos['score'], equal_nan=True))
+        anteriores = actuales[cambiados].assign(aciertos=previos['aciertos'][cambiados],
+                                                score_afinidad=previos['score'][cambiados])
+        rectificacion = _combinar(_estadisticos(actuales[cambiados]), _estadisticos(anteriores, signo=-1))
+        conocidos['aciertos'][pos[contado][cambiados]] = aciertos[cambiados]
+        conocidos['score'][pos[contado][cambiados]] = score[cambiados]
+        if cambiados.any():
+            logger.info(f"Veredictos re-auditados: {int(cambiados.sum())}")
+
+        nuevos = auditados[~contado]
+        agregados = np.empty(len(nuevos), dtype=DTYPE_CONTABILIZADOS)
+        agregados['id'] = nuevos['id'].to_numpy(dtype=np.int64)
+        agregados['aciertos'] = nuevos['aciertos'].to_numpy(dtype=float)
+        agregados['score'] = nuevos['score_afinidad'].to_numpy(dtype=float)
+        self.contabilizados = np.sort(np.concatenate([conocidos, agregados]), order='id')
+        for juego in nuevos['juego'].unique():
+            self.estado["juegos"].setdefault(juego, {"cusum_pos": 0.0, "cusum_neg": 0.0})
+        return nuevos.sort_values('id', kind='stable'), rectificacion
 
     def ejecutar_ciclo_completo(self, target_games=None):
         """Ejecuta un ciclo completo de optimización."""
@@ -75,156 +340,169 @@ class AutoOptimizer:
             print("   ❌ No existe archivo de simulaciones.")
             return
 
-        df = pd.read_csv(SIMULACIONES_FILE)
-        df_audit = df[df['estado'] == 'AUDITADO'].copy()
+        df = pd.read_csv(SIMULACIONES_FILE, usecols=lambda c: c in COLUMNAS)
+        if 'hora_dia' not in df.columns:
+            df['hora_dia'] = -1
+        df = df.dropna(subset=['id'])
 
         # Filtrar solo juegos objetivo si se especifican
         if target_games is not None:
             print(f"   🎯 Optimizando solo: {target_games}")
-            df_audit = df_audit[df_audit['juego'].isin(target_games)]
+            df = df[df['juego'].isin(target_games)]
+
+        # Referencia previa (para estandarizar el CUSUM) y actualización O(nuevos)
+        referencia = self.estado["stats"]
+        nuevos, rectificacion = self._veredictos_nuevos(df)
+        self.estado["stats"] = _combinar(_combinar(referencia, rectificacion), _estadisticos(nuevos))
 
-        if len(df_audit) < MIN_SAMPLES_DECISION:
-            print(f"   ⏳ Insuficientes muestras ({len(df_audit)} < {MIN_SAMPLES_DECISION}). Esperando más datos...")
+        stats = self.estado["stats"]
+        if target_games is not None:
+            stats = stats[stats['juego'].isin(target_games)]
+        total = int(stats['n'].sum()) if not stats.empty else 0
+        print(f"   📥 Veredictos nuevos: {len(nuevos)} (acumulados: {total})")
+
+        if total < MIN_SAMPLES_DECISION:
+            print(f"   ⏳ Insuficientes muestras ({total} < {MIN_SAMPLES_DECISION}). Esperando más datos...")
+            self._guardar_estado()
             return
 
         # 1. Análisis de rendimiento por algoritmo
-        self._analizar_rendimiento(df_audit)
+        self._analizar_rendimiento(stats)
 
         # 2. Detección de concept drift
-        self._detectar_concept_drift(df_audit)
+        self._detectar_concept_drift(nuevos, referencia)
 
         # 3. Análisis de salud del sistema
-        self._analisis_salud(df_audit)
+        self._analisis_salud(stats)
 
         # 4. Generar y aplicar recomendaciones
         self._aplicar_recomendaciones()
 
-        # 5. Guardar historial
+        # 5. Guardar historial y estado
         self._guardar_historial()
+        self._guardar_estado()
 
         print("\n✅ Ciclo de optimización completado.")
 
-    def _analizar_rendimiento(self, df):
+    def _analizar_rendimiento(self, stats):
         """Analiza el rendimiento de cada algoritmo y detecta outliers."""
         print("\n📊 ANÁLISIS DE RENDIMIENTO:")
 
-        for juego in df['juego'].unique():
-            df_juego = df[df['juego'] == juego]
-            if len(df_juego) < MIN_SAMPLES_DECISION:
-                continue
-
-            # Calcular métricas por algoritmo
-            stats = df_juego.groupby('algoritmo').agg({
-                'aciertos': ['mean', 'std', 'count'],
-                'score_afinidad': ['mean', 'std']
-            }).round(3)
+        por_algo = stats.groupby(['juego', 'algoritmo'], sort=True)[SUMAS].sum().reset_index()
+        por_algo['aciertos_mean'] = (por_algo['s'] / por_algo['n']).round(3)
+        por_algo['aciertos_std'] = np.round(_desviacion(por_algo['n'], por_algo['s'], por_algo['s2']), 3)
+        por_algo['score_mean'] = (por_algo['ss'] / por_algo['n']).round(3)
+        por_algo['score_std'] = np.round(_desviacion(por_algo['n'], por_algo['ss'], por_algo['ss2']), 3)
+        por_algo['count'] = por_algo['n']
 
-            stats.columns = ['aciertos_mean', 'aciertos_std', 'count',
-                           'score_mean', 'score_std']
+        for juego, tabla in por_algo.groupby('juego', sort=False):
+            if tabla['n'].sum() < MIN_SAMPLES_DECISION:
+                continue
 
             # Promedio global para comparar
-            promedio_global = stats['aciertos_mean'].mean()
+            promedio_global = tabla['aciertos_mean'].mean()
+            ratios = tabla['aciertos_mean'] / promedio_global if promedio_global > 0 else \
+                pd.Series(1.0, index=tabla.index)
+            suficientes = tabla['count'] >= MIN_SAMPLES_DECISION
+            bajos = (ratios < UMBRAL_DEGRADACION) & suficientes
+            altos = (ratios > UMBRAL_PROMOCION) & suficientes & ~bajos
 
             print(f"\n   🎮 {juego}:")
-            for algo, row in stats.iterrows():
-                ratio = row['aciertos_mean'] / promedio_global if promedio_global > 0 else 1.0
+            for i, row in tabla.iterrows():
+                ratio = ratios[i]
 
                 # Detectar algoritmos problemáticos
-                if ratio < UMBRAL_DEGRADACION and row['count'] >= MIN_SAMPLES_DECISION:
-                    self.recomendaciones.append({
-                        'tipo': 'DEGRADAR',
-                        'juego': juego,
-                        'algoritmo': algo,
-                        'razon': f"Rendimiento {ratio:.1%} del promedio",
-                        'metrica': row['aciertos_mean']
-                    })
-                    estado = "🔻 BAJO"
-                elif ratio > UMBRAL_PROMOCION and row['count'] >= MIN_SAMPLES_DECISION:
+                if bajos[i] or altos[i]:
                     self.recomendaciones.append({
-                        'tipo': 'PROMOVER',
+                        'tipo': 'DEGRADAR' if bajos[i] else 'PROMOVER',
                         'juego': juego,
-                        'algoritmo': algo,
+                        'algoritmo': row['algoritmo'],
                         'razon': f"Rendimiento {ratio:.1%} del promedio",
-                        'metrica': row['aciertos_mean']
+                        'metrica': float(row['aciertos_mean'])
                     })
-                    estado = "🔺 ALTO"
-                else:
-                    estado = "✓ NORMAL"
+                estado = "🔻 BAJO" if bajos[i] else ("🔺 ALTO" if altos[i] else "✓ NORMAL")
 
-                print(f"      {algo}: {row['aciertos_mean']:.2f} aciertos (n={int(row['count'])}) {estado}")
+                print(f"      {row['algoritmo']}: {row['aciertos_mean']:.2f} aciertos (n={int(row['count'])}) {estado}")
 
-    def _detectar_concept_drift(self, df):
-        """Detecta cambios en la distribución de resultados (concept drift)."""
+    def _detectar_concept_drift(self, nuevos, referencia):
+        """
+        Detecta cambios en la distribución de resultados (concept drift) con
+        un CUSUM bilateral sobre los aciertos de los veredictos nuevos,
+        estandarizados con la media/desviación acumuladas antes de este ciclo.
+        """
         print("\n🌊 DETECCIÓN DE CONCEPT DRIFT:")
-
-        for juego in df['juego'].unique():
-            df_juego = df[df['juego'] == juego].sort_values('id')
-
-            if len(df_juego) < VENTANA_DRIFT * 2:
+        if nuevos.empty:
+            print("   ✓ Sin veredictos nuevos.")
+
+        for juego, df_juego in nuevos.groupby('juego', sort=False):
+            ref = referencia[referencia['juego'] == juego]
+            n_ref = float(ref['n'].sum()) if not ref.empty else 0.0
+            x = df_juego['aciertos'].to_numpy(dtype=float)
+            if n_ref >= VENTANA_DRIFT:
+                media = float(ref['s'].sum()) / n_ref
+                desviacion = float(_desviacion(n_ref, ref['s'].sum(), ref['s2'].sum()))
+            elif n_ref == 0 and len(x) >= VENTANA_DRIFT * 2:
+                # Primer ciclo: últimas VENTANA_DRIFT contra la historia anterior
+                historicas, x = x[:-VENTANA_DRIFT], x[-VENTANA_DRIFT:]
+                media, desviacion = float(np.mean(historicas)), float(np.std(historicas, ddof=1))
+            else:
                 continue
+            desviacion = desviacion if desviacion > 0 else 1.0
 
-            # Comparar últimas N predicciones vs históricas
-            recientes = df_juego.tail(VENTANA_DRIFT)['aciertos'].values
-            historicas = df_juego.head(len(df_juego) - VENTANA_DRIFT)['aciertos'].values
+            marca = self.estado["juegos"][juego]
+            s_pos, s_neg = _cusum((x - media) / desviacion, marca["cusum_pos"], marca["cusum_neg"])
+            alarma_pos, alarma_neg = s_pos.max() > CUSUM_H, s_neg.max() > CUSUM_H
 
-            # T-test aproximado (z-score de la diferencia de medias)
-            mean_rec = np.mean(recientes)
-            mean_hist = np.mean(historicas)
-            std_hist = np.std(historicas) if np.std(historicas) > 0 else 1
-
-            z_score = (mean_rec - mean_hist) / (std_hist / np.sqrt(VENTANA_DRIFT))
-
-            if abs(z_score) > UMBRAL_DRIFT:
-                direccion = "mejorando" if z_score > 0 else "empeorando"
-                self.historial["drift_alerts"].append({
-                    "timestamp": datetime.now().isoformat(),
+            if alarma_pos or alarma_neg:
+                estadistico = float(s_pos.max()) if alarma_pos else -float(s_neg.max())
+                direccion = "mejorando" if alarma_pos else "empeorando"
+                self._registrar("drift_alert", {
                     "juego": juego,
-                    "z_score": round(z_score, 2),
-                    "mean_reciente": round(mean_rec, 3),
-                    "mean_historico": round(mean_hist, 3)
+                    "cusum": round(estadistico, 2),
+                    "mean_reciente": round(float(np.mean(x)), 3),
+                    "mean_historico": round(media, 3)
                 })
-                print(f"   ⚠️ {juego}: DRIFT DETECTADO (z={z_score:.2f}) - Sistema {direccion}")
+                print(f"   ⚠️ {juego}: DRIFT DETECTADO (CUSUM={estadistico:.2f}) - Sistema {direccion}")
 
                 self.recomendaciones.append({
                     'tipo': 'REENTRENAR',
                     'juego': juego,
                     'algoritmo': 'TODOS',
-                    'razon': f"Concept drift detectado (z={z_score:.2f})",
-                    'metrica': z_score
+                    'razon': f"Concept drift detectado (CUSUM={estadistico:.2f})",
+                    'metrica': estadistico
                 })
+                # Tras la alarma el detector se reinicia
+                marca["cusum_pos"], marca["cusum_neg"] = 0.0, 0.0
             else:
-                print(f"   ✓ {juego}: Sin drift significativo (z={z_score:.2f})")
+                marca["cusum_pos"], marca["cusum_neg"] = float(s_pos[-1]), float(s_neg[-1])
+                print(f"   ✓ {juego}: Sin drift significativo (CUSUM+={s_pos[-1]:.2f}, CUSUM-={s_neg[-1]:.2f})")
 
-    def _analisis_salud(self, df):
+    def _analisis_salud(self, stats):
         """Análisis general de salud del sistema."""
         print("\n🏥 ANÁLISIS DE SALUD DEL SISTEMA:")
 
         salud = {
-            "timestamp": datetime.now().isoformat(),
-            "total_predicciones": len(df),
-            "juegos_activos": list(df['juego'].unique()),
-            "algoritmos_activos": list(df['algoritmo'].unique()),
+            "total_predicciones": int(stats['n'].sum()),
+            "juegos_activos": list(stats['juego'].unique()),
+            "algoritmos_activos": list(stats['algoritmo'].unique()),
             "metricas": {}
         }
 
         # Métricas globales
-        for juego in df['juego'].unique():
-            df_juego = df[df['juego'] == juego]
+        por_juego = stats.groupby('juego', sort=False).agg(n=('n', 'sum'), s=('s', 'sum'),
+                                                           n3=('n3', 'sum'), max=('max', 'max'))
+        for juego, row in por_juego.iterrows():
             salud["metricas"][juego] = {
-                "promedio_aciertos": round(df_juego['aciertos'].mean(), 3),
-                "max_aciertos": int(df_juego['aciertos'].max()),
-                "tasa_exito_3plus": round((df_juego['aciertos'] >= 3).mean() * 100, 2),
-                "n_predicciones": len(df_juego)
+                "promedio_aciertos": round(row['s'] / row['n'], 3),
+                "max_aciertos": int(row['max']),
+                "tasa_exito_3plus": round(row['n3'] / row['n'] * 100, 2),
+                "n_predicciones": int(row['n'])
             }
             print(f"   {juego}: avg={salud['metricas'][juego]['promedio_aciertos']}, "
                   f"max={salud['metricas'][juego]['max_aciertos']}, "
                   f"tasa_3+={salud['metricas'][juego]['tasa_exito_3plus']}%")
 
-        self.historial["health_checks"].append(salud)
-
-        # Mantener solo los últimos 100 health checks
-        if len(self.historial["health_checks"]) > 100:
-            self.historial["health_checks"] = self.historial["health_checks"][-100:]
+        self._registrar("health_check", salud)
 
     def _aplicar_recomendaciones(self):
         """Aplica las recomendaciones automáticamente o las reporta."""
@@ -239,24 +517,18 @@ class AutoOptimizer:
             print(f"   {emoji} {rec['tipo']}: {rec['juego']}/{rec['algoritmo']} - {rec['razon']}")
 
             # Registrar en historial
-            self.historial["optimizations"].append({
-                "timestamp": datetime.now().isoformat(),
-                **rec
-            })
+            self._registrar("optimization", rec)
 
         # Aplicar ajustes automáticos al genoma
         self._ajustar_genoma()
 
-        # Mantener solo las últimas 200 optimizaciones
-        if len(self.historial["optimizations"]) > 200:
-            self.historial["optimizations"] = self.historial["optimizations"][-200:]
-
     def _ajustar_genoma(self):
         """Aplica ajustes automáticos al genoma basados en recomendaciones."""
         if not self.genoma.get("algo_ranking"):
             return
 
         cambios = 0
+        juegos_ajustados = set()
         for rec in self.recomendaciones:
             if rec['tipo'] == 'DEGRADAR' and rec['juego'] in self.genoma["algo_ranking"]:
                 ranking = self.genoma["algo_ranking"][rec['juego']]
@@ -265,6 +537,7 @@ class AutoOptimizer:
                     valor_actual = ranking[rec['algoritmo']]
                     ranking[rec['algoritmo']] = round(valor_actual * 0.8, 2)
                     cambios += 1
+                    juegos_ajustados.add(rec['juego'])
                     logger.info(f"Degradado {rec['algoritmo']} en {rec['juego']}: {valor_actual} → {ranking[rec['algoritmo']]}")
 
             elif rec['tipo'] == 'PROMOVER' and rec['juego'] in self.genoma["algo_ranking"]:
@@ -274,14 +547,19 @@ class AutoOptimizer:
                     valor_actual = ranking[rec['algoritmo']]
                     ranking[rec['algoritmo']] = round(valor_actual * 1.15, 2)
                     cambios += 1
+                    juegos_ajustados.add(rec['juego'])
                     logger.info(f"Promovido {rec['algoritmo']} en {rec['juego']}: {valor_actual} → {ranking[rec['algoritmo']]}")
 
         if cambios > 0:
             # Guardar genoma actualizado
+            self.genoma.setdefault("metadata", {})
             self.genoma["metadata"]["last_optimization"] = datetime.now().isoformat()
             self.genoma["metadata"]["optimization_changes"] = cambios
-            with open(GENOMA_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.genoma, f, indent=2, ensure_ascii=False)
+            # Escritura parcial: solo los pesos ajustados y la metadata de optimización
+            GenomaStore(GENOMA_FILE).actualizar({
+                "algo_ranking": {juego: self.genoma["algo_ranking"][juego] for juego in juegos_ajustados},
+                "metadata": {k: self.genoma["metadata"][k] for k in ("last_optimization", "optimization_changes")}
+            })
             print(f"\n   💾 Genoma actualizado con {cambios} ajustes automáticos.")
 
 
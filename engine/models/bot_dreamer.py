@@ -1,4 +1,3 @@
-import pandas as pd
 import glob
 import json
 import os
@@ -7,8 +6,10 @@ import time
 import sys
 import numpy as np
 import math
+import random
 import logging
-from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 
 # --- CONFIGURACIÓN DE LOGGING ---
 _BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -86,12 +87,13 @@ except ImportError:
     logger.warning("MetaLearner no disponible. Usando pesos lineales.")
 
 try:
-    from loto3_ultra import Loto3UltraEnsemble, ejecutar_loto3_ultra
+    from loto3_ultra import Loto3UltraEnsemble, ejecutar_loto3_ultra, especular_siguiente
     Loto3Ultra = Loto3UltraEnsemble
     logger.debug("Loto3Ultra importado correctamente")
 except ImportError:
     Loto3Ultra = None
     ejecutar_loto3_ultra = None
+    especular_siguiente = None
     logger.warning("Loto3Ultra no disponible. Usando sistema legacy para LOTO3.")
 
 try:
@@ -111,12 +113,10 @@ FILE_GENOME = os.path.join(DATA_DIR, "loto_genome.json")
 TZ_CHILE = pytz.timezone('America/Santiago')
 
 # --- REGLAS DE NEGOCIO (HORARIOS) ---
-HORARIOS = {
-    "LOTO":   {"dias": [1, 3, 6],       "horas": [21]},
-    "LOTO3":  {"dias": [0,1,2,3,4,5,6], "horas": [14, 18, 21]},
-    "LOTO4":  {"dias": [0,1,2,3,4,5,6], "horas": [14, 21]},
-    "RACHA":  {"dias": [0,1,2,3,4,5,6], "horas": [15, 22]}
-}
+# Centralizadas en calendario_sorteos (tabla semanal precalculada por juego)
+from calendario_sorteos import calcular_proximo_sorteo
+from genoma_store import GenomaStore
+from espacio_combinatorio import obtener_espacio, PRIMOS
 
 MULTIVERSO_CONFIG = {
     "LOTO":   {"csv": "LOTO_HISTORIAL_MAESTRO.csv", "algos_extra": True},
@@ -125,80 +125,32 @@ MULTIVERSO_CONFIG = {
     "RACHA":  {"csv": "RACHA_MAESTRO.csv",          "algos_extra": False}  
 }
 
+# Umbral de veto morfológico por juego
+# LOTO3 necesita rigor (umbral 8), LOTO puede ser más flexible (umbral 40)
+UMBRALES_VETO = {"LOTO3": 8, "LOTO4": 20, "RACHA": 30, "LOTO": 40}
+
+# Procesos para soñar los universos en paralelo (uno por juego como máximo)
+WORKERS = min(len(MULTIVERSO_CONFIG), os.cpu_count() or 1)
+
+def cpus_por_universo(workers):
+    """Parte del presupuesto de CPU que le toca a cada universo que corre en paralelo"""
+    return max(1, (os.cpu_count() or 1) // max(1, int(workers)))
+
 def calcular_proximo_sorteo_real(game_id, csv_name):
     """
     Algoritmo Crononauta:
-    1. Lee el último sorteo conocido del CSV (Ancla temporal).
-    2. Simula el paso del tiempo sorteo a sorteo según las reglas horarias.
-    3. Se detiene cuando encuentra el PRIMER sorteo que ocurre en el futuro respecto a 'ahora'.
+    1. Lee el último sorteo conocido del CSV (Ancla temporal), solo la cola del archivo.
+    2. Cuenta aritméticamente los slots del calendario semanal transcurridos desde el ancla.
+    3. Retorna el PRIMER sorteo que ocurre en el futuro respecto a 'ahora'.
     """
-    path = os.path.join(DATA_DIR, csv_name)
-    ahora = datetime.now(TZ_CHILE)
-    
-    # 1. Obtener Ancla (Último dato real disponible)
-    try:
-        if not os.path.exists(path): raise Exception("No CSV")
-        df = pd.read_csv(path)
-        if df.empty: raise Exception("CSV Vacío")
-        
-        last_row = df.iloc[-1]
-        last_id = int(last_row['sorteo'])
-        
-        # Parseo robusto de fecha (soporta ISO y formato local)
-        fecha_str = str(last_row['fecha']).replace('T', ' ').split('.')[0]
-        try:
-            last_date_naive = datetime.strptime(fecha_str, "%Y-%m-%d %H:%M:%S")
-        except:
-            last_date_naive = datetime.strptime(fecha_str, "%d-%m-%Y %H:%M:%S")
-            
-        # Localizar a Chile
-        cursor_tiempo = TZ_CHILE.localize(last_date_naive)
-        cursor_id = last_id
-        
-    except:
-        # Si no hay datos, asumimos sorteo #0 y empezamos a buscar desde ayer
-        cursor_tiempo = ahora - timedelta(days=1)
-        cursor_id = 0
-
-    # 2. Simulación hacia el Futuro (Bridging the Gap)
-    reglas = HORARIOS[game_id]
-    safety_break = 0
-    
-    # Avanzamos en el tiempo virtualmente hasta alcanzar el presente
-    while cursor_tiempo <= ahora and safety_break < 1000:
-        safety_break += 1
-        encontrado_siguiente = False
-        
-        # Revisamos los próximos 3 días buscando el siguiente slot de sorteo
-        for dias_extra in [0, 1, 2, 3]: 
-            check_date = cursor_tiempo.date() + timedelta(days=dias_extra)
-            dia_semana = check_date.weekday()
-            
-            if dia_semana not in reglas['dias']: continue
-            
-            for hora in sorted(reglas['horas']):
-                # Crear timestamp del slot candidato
-                candidato = TZ_CHILE.localize(datetime(check_date.year, check_date.month, check_date.day, hora, 0, 0))
-                
-                # Si este candidato es ESTRICTAMENTE posterior al cursor actual
-                if candidato > cursor_tiempo:
-                    cursor_tiempo = candidato
-                    cursor_id += 1
-                    encontrado_siguiente = True
-                    break 
-            
-            if encontrado_siguiente: break
-    
-    return cursor_id, cursor_tiempo
+    return calcular_proximo_sorteo(game_id, os.path.join(DATA_DIR, csv_name))
 
 def cargar_genoma():
     """Carga el archivo JSON del cerebro"""
-    if os.path.exists(FILE_GENOME):
-        try:
-            with open(FILE_GENOME, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"   Warning: Error cargando genoma: {e}")
+    try:
+        return GenomaStore(FILE_GENOME).leer()
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"   Warning: Error cargando genoma: {e}")
     return {}
 
 def obtener_pesos_del_lobulo(game_id, genoma, hora=None):
@@ -245,7 +197,7 @@ def validar_cognitivamente(numeros, genoma, game_id, factor_tolerancia=1.0):
         metricas = {
             "ideal_even_count": len([n for n in nums if n % 2 == 0]),
             "ideal_consecutivos": sum(1 for i in range(len(nums)-1) if nums[i+1] == nums[i] + 1),
-            "ideal_primos": len([n for n in nums if n in {2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41}])
+            "ideal_primos": len([n for n in nums if n in PRIMOS])
         }
 
         for clave, valor_real in metricas.items():
@@ -254,9 +206,7 @@ def validar_cognitivamente(numeros, genoma, game_id, factor_tolerancia=1.0):
                 desviacion_acumulada += abs(valor_real - ideal) * 5 # Peso alto a la morfología
 
         # --- 🟢 MEJORA: Umbral dinámico por juego ---
-        # LOTO3 necesita rigor (umbral 10), LOTO puede ser más flexible (umbral 40)
-        umbrales = {"LOTO3": 8, "LOTO4": 20, "RACHA": 30, "LOTO": 40}
-        umbral_base = umbrales.get(game_id, 30)
+        umbral_base = UMBRALES_VETO.get(game_id, 30)
         
         umbral_veto = umbral_base * factor_tolerancia
         pasa_filtro = desviacion_acumulada < umbral_veto
@@ -283,288 +233,289 @@ def calcular_nivel_confianza(bolsa_pesos, n_objetivo):
     confianza = (pesos_consenso_top / total_pesos_repartidos) * 100
     return round(confianza, 2)
 
-def soñar():
-    logger.info("=" * 60)
-    logger.info("INICIANDO BOT SOÑADOR: LÓBULOS ESPECIALIZADOS v12.4")
-    logger.info("=" * 60)
-
-    # --- NIVEL 4: Instanciar Meta-Learner ---
-    meta_cerebro = MetaLearner() if MetaLearner else None
-    logger.debug(f"MetaLearner activo: {meta_cerebro is not None}")
-
-    if LotoForense is None:
-        logger.error("CRÍTICO: No se pudo importar LotoForense. Abortando.")
-        return
-
-    ahora = datetime.now(TZ_CHILE)
+def soñar_universo(game_id, config, ahora, genoma, meta_cerebro, cpus=None):
+    """
+    Sueña un juego completo (curadores, oráculos y consenso).
+    No escribe en la cola: devuelve las filas sin 'id' para que soñar()
+    las publique en una sola escritura con IDs asignados centralmente.
+    `cpus` acota el entrenamiento de LOTO3 (por defecto, todas las CPUs).
+
+    Returns:
+        (filas, ids_reservados) - ids_reservados son los que LOTO3 ULTRA /
+        ESPECIALISTA ya usaron en su propia persistencia
+    """
     dia_semana = ahora.weekday()
     hora_actual = ahora.hour
-    base_id = int(time.time())
+    filas = []
+    ids_reservados = []
 
-    logger.info(f"Hora Chile: {ahora.strftime('%Y-%m-%d %H:%M:%S')} | Día: {dia_semana} | Hora: {hora_actual}")
+    logger.info("-" * 40)
+    logger.info(f"UNIVERSO: {game_id}")
 
-    nuevas_filas = []
-    genoma = cargar_genoma()
-
-    if genoma:
-        logger.info("Cortex cargado: Rankings y Morfología segmentados por juego.")
-        logger.debug(f"Juegos en genoma: {list(genoma.get('algo_ranking', {}).keys())}")
-
-    for game_id, config in MULTIVERSO_CONFIG.items():
-        logger.info("-" * 40)
-        logger.info(f"UNIVERSO: {game_id}")
-
-        # === LOTO3 ULTRA: Sistema de prediccion avanzado ===
-        if game_id == "LOTO3" and Loto3Ultra is not None:
-            logger.info("Activando LOTO3 ULTRA (Ensemble Avanzado)...")
-            try:
-                # Ejecutar sistema ultra (genera y guarda automaticamente)
-                # NOTA: Al llamar con guardar=True, ya se escribe en CSV y JSON.
-                # No necesitamos añadirlo a nuevas_filas para la queue,
-                # porque loto3_ultra maneja su propia persistencia.
-                resultados_ultra = ejecutar_loto3_ultra(guardar=True)
-
-                if resultados_ultra:
-                    logger.info(f"LOTO3 ULTRA: {len(resultados_ultra)} predicciones generadas y guardadas.")
-
-                    # === LOTO3 ESPECIALISTA: Predicciones PAR y TERMINACION ===
-                    if Loto3Especialista is not None:
-                        logger.info("Activando LOTO3 ESPECIALISTA (PAR & TERMINACION)...")
-                        try:
-                            resultados_esp = ejecutar_loto3_especialista(guardar=True)
-                            if resultados_esp:
-                                logger.info(f"LOTO3 ESPECIALISTA: {len(resultados_esp)} predicciones PAR/TERM guardadas.")
-                            else:
-                                logger.warning("LOTO3 ESPECIALISTA no genero resultados.")
-                        except Exception as e_esp:
-                            logger.error(f"Error en LOTO3 ESPECIALISTA: {e_esp}")
-
-                    continue  # Saltar el procesamiento legacy para LOTO3
-                else:
-                    logger.warning("LOTO3 ULTRA no genero resultados, usando sistema legacy...")
-            except Exception as e:
-                logger.error(f"Error en LOTO3 ULTRA: {e}. Usando sistema legacy...")
+    # === LOTO3 ULTRA: Sistema de prediccion avanzado ===
+    if game_id == "LOTO3" and Loto3Ultra is not None:
+        logger.info("Activando LOTO3 ULTRA (Ensemble Avanzado)...")
+        cpus = cpus or cpus_por_universo(1)
+        try:
+            # Ejecutar sistema ultra (genera y guarda automaticamente)
+            # NOTA: Al llamar con guardar=True, ya se escribe en CSV y JSON.
+            # No necesitamos añadirlo a las filas para la queue,
+            # porque loto3_ultra maneja su propia persistencia.
+            resultados_ultra = ejecutar_loto3_ultra(guardar=True, cpus=cpus)
+
+            if resultados_ultra:
+                logger.info(f"LOTO3 ULTRA: {len(resultados_ultra)} predicciones generadas y guardadas.")
+                ids_reservados.extend(j['id'] for j in resultados_ultra)
+
+                # === LOTO3 ESPECIALISTA: Predicciones PAR y TERMINACION ===
+                if Loto3Especialista is not None:
+                    logger.info("Activando LOTO3 ESPECIALISTA (PAR & TERMINACION)...")
+                    try:
+                        resultados_esp = ejecutar_loto3_especialista(guardar=True, cpus=cpus)
+                        if resultados_esp:
+                            logger.info(f"LOTO3 ESPECIALISTA: {len(resultados_esp)} predicciones PAR/TERM guardadas.")
+                            ids_reservados.extend(p['id'] for p in resultados_esp)
+                        else:
+                            logger.warning("LOTO3 ESPECIALISTA no genero resultados.")
+                    except Exception as e_esp:
+                        logger.error(f"Error en LOTO3 ESPECIALISTA: {e_esp}")
+
+                return filas, ids_reservados  # Saltar el procesamiento legacy para LOTO3
+            else:
+                logger.warning("LOTO3 ULTRA no genero resultados, usando sistema legacy...")
+        except Exception as e:
+            logger.error(f"Error en LOTO3 ULTRA: {e}. Usando sistema legacy...")
 
-        bolsa_pesos_consenso = {}
-        top_consenso = []
-        objetivo = None
+    bolsa_pesos_consenso = {}
+    top_consenso = []
+    objetivo = None
 
-        # A. Obtener pesos reales (Contextual Awareness: Sensibilidad Horaria)
-        pesos_voto = obtener_pesos_del_lobulo(game_id, genoma, hora=hora_actual)
-        logger.debug(f"Pesos de confianza: {pesos_voto}")
+    # A. Obtener pesos reales (Contextual Awareness: Sensibilidad Horaria)
+    pesos_voto = obtener_pesos_del_lobulo(game_id, genoma, hora=hora_actual)
+    logger.debug(f"Pesos de confianza: {pesos_voto}")
 
-        # B. Calcular Objetivo Crononauta (Lógica Completa)
-        objetivo, fecha_sorteo = calcular_proximo_sorteo_real(game_id, config['csv'])
-        logger.info(f"Objetivo Crononauta: #{objetivo} | Fecha: {fecha_sorteo.strftime('%d/%m/%Y %H:%M')}")
+    # B. Calcular Objetivo Crononauta (Lógica Completa)
+    objetivo, fecha_sorteo = calcular_proximo_sorteo_real(game_id, config['csv'])
+    logger.info(f"Objetivo Crononauta: #{objetivo} | Fecha: {fecha_sorteo.strftime('%d/%m/%Y %H:%M')}")
 
-        # C. Instanciar Algoritmos
+    # C. Instanciar Algoritmos
+    try:
+        forense = LotoForense(game_id=game_id, target_day=dia_semana, genoma=genoma)
+    except Exception as e:
+        logger.warning(f"Error instanciando Forense: {e}")
+        return filas, ids_reservados
+
+    # D. Usar los nuevos motores con Conciencia de ADN
+    mis_algoritmos = [('forense_biometrico', forense.predict_weighted)]
+    if config['algos_extra']:
+        mis_algoritmos.extend([
+            ('gaussiano_inteligente', forense.predict_smart_gaussian), # Nombre nuevo
+            ('delta_dna',             forense.predict_dna_delta),      # Nombre nuevo
+            ('markov_chain',          forense.predict_markov)
+        ])
+
+    for i, (nombre, funcion) in enumerate(mis_algoritmos):
         try:
-            forense = LotoForense(game_id=game_id, target_day=dia_semana, genoma=genoma)
+            # --- CURADOR DE ÉLITE (Algoritmos Tradicionales) ---
+            pool_alg = []
+            for _ in range(50): 
+                candidato = funcion()
+                pasa, score_adn, _ = validar_cognitivamente(candidato, genoma, game_id)
+                if pasa:
+                    pool_alg.append({'nums': candidato, 'score': score_adn})
+            
+            adn_info = ""
+            if pool_alg:
+                ganador_alg = sorted(pool_alg, key=lambda x: x['score'])[0]
+                pred = ganador_alg['nums']
+                # Guardamos el score para el log (opcional)
+                adn_info = f"[Score ADN: {ganador_alg['score']}]"
+            else:
+                # Si el algoritmo solo genera ruido, pasamos al siguiente
+                logger.warning(f"{nombre}: Ningún candidato superó el filtro. Saltando.")
+                continue
+            
+            # Registrar Predicción Individual
+            alg_name_trad = f"{nombre}_v1"
+            filas.append({
+                'fecha_generacion': ahora.strftime('%Y-%m-%d %H:%M:%S'),
+                'fecha_lanzamiento': fecha_sorteo.strftime('%d/%m/%Y %H:%M'),
+                'juego': game_id,
+                'numeros': list(pred), # Cambio: de str(pred) a list(pred)
+                'sorteo_objetivo': objetivo,
+                'estado': 'PENDIENTE',
+                'aciertos': 0, 'score_afinidad': 0.0,
+                'hora_dia': hora_actual,
+                'algoritmo': alg_name_trad,
+                'nota_especial': 'NORMAL' # Nueva línea: evita NaNs al consolidar
+            })
+            logger.info(f"  {nombre}: {pred} {adn_info}")
+            
+            # E. Voto para el Consenso (Ponderado por Ranking Local real)
+            peso = pesos_voto.get(alg_name_trad, 1.0)
+
+            # NIVEL 4: El Meta-Learner ajusta el peso si el modelo existe
+            if meta_cerebro:
+                # El Meta-Learner evalúa qué tan creíble es este algoritmo ahora
+                multiplicador = meta_cerebro.predecir_confianza_real(
+                    game_id, alg_name_trad, hora_actual, ganador_alg['score']
+                )
+                peso *= multiplicador
+            
+            # Simulamos N veces para robustecer el consenso
+            validas = 0; reintentos = 0
+            while validas < 5 and reintentos < 30:
+                sim = funcion()
+                ok_sim, _, _ = validar_cognitivamente(sim, genoma, game_id)
+                if ok_sim:
+                    for num in sim:
+                        bolsa_pesos_consenso[num] = bolsa_pesos_consenso.get(num, 0) + peso
+                    validas += 1
+                reintentos += 1
+                
         except Exception as e:
-            logger.warning(f"Error instanciando Forense: {e}")
-            continue
-
-        # D. Usar los nuevos motores con Conciencia de ADN
-        mis_algoritmos = [('forense_biometrico', forense.predict_weighted)]
-        if config['algos_extra']:
-            mis_algoritmos.extend([
-                ('gaussiano_inteligente', forense.predict_smart_gaussian), # Nombre nuevo
-                ('delta_dna',             forense.predict_dna_delta),      # Nombre nuevo
-                ('markov_chain',          forense.predict_markov)
-            ])
-
-        for i, (nombre, funcion) in enumerate(mis_algoritmos):
+            logger.error(f"Error en {nombre}: {e}")
+
+    # --- BLOQUE: ORÁCULO NEURAL (MACHINE LEARNING) CON RESCATE DE DISIDENCIA ---
+    if OraculoNeural:
+        for v in ["v3", "v4"]:
             try:
-                # --- CURADOR DE ÉLITE (Algoritmos Tradicionales) ---
-                pool_alg = []
-                for _ in range(50): 
-                    candidato = funcion()
-                    pasa, score_adn, _ = validar_cognitivamente(candidato, genoma, game_id)
-                    if pasa:
-                        pool_alg.append({'nums': candidato, 'score': score_adn})
+                oracle = OraculoNeural(game_id, version=v)
                 
-                adn_info = ""
-                if pool_alg:
-                    ganador_alg = sorted(pool_alg, key=lambda x: x['score'])[0]
-                    pred = ganador_alg['nums']
-                    # Guardamos el score para el log (opcional)
-                    adn_info = f"[Score ADN: {ganador_alg['score']}]"
-                else:
-                    # Si el algoritmo solo genera ruido, pasamos al siguiente
-                    logger.warning(f"{nombre}: Ningún candidato superó el filtro. Saltando.")
+                # ERR-002: Validación robusta del método predecir
+                if not hasattr(oracle, 'predecir'):
+                    logger.error(f"Clase OraculoNeural ({v}) malformada: falta método predecir")
                     continue
+
+                f_tol = 2.5 if v == "v4" else 1.0 
                 
-                # Registrar Predicción Individual
-                alg_name_trad = f"{nombre}_v1"
-                nuevas_filas.append({
-                    'id': base_id + i + (len(nuevas_filas)*100),
-                    'fecha_generacion': ahora.strftime('%Y-%m-%d %H:%M:%S'),
-                    'fecha_lanzamiento': fecha_sorteo.strftime('%d/%m/%Y %H:%M'),
-                    'juego': game_id,
-                    'numeros': list(pred), # Cambio: de str(pred) a list(pred)
-                    'sorteo_objetivo': objetivo,
-                    'estado': 'PENDIENTE',
-                    'aciertos': 0, 'score_afinidad': 0.0,
-                    'hora_dia': hora_actual,
-                    'algoritmo': alg_name_trad,
-                    'nota_especial': 'NORMAL' # Nueva línea: evita NaNs al consolidar
-                })
-                logger.info(f"  {nombre}: {pred} {adn_info}")
-                
-                # E. Voto para el Consenso (Ponderado por Ranking Local real)
-                peso = pesos_voto.get(alg_name_trad, 1.0)
-
-                # NIVEL 4: El Meta-Learner ajusta el peso si el modelo existe
-                if meta_cerebro:
-                    # El Meta-Learner evalúa qué tan creíble es este algoritmo ahora
-                    multiplicador = meta_cerebro.predecir_confianza_real(
-                        game_id, alg_name_trad, hora_actual, ganador_alg['score']
-                    )
-                    peso *= multiplicador
+                pool_ml = []
+                reproches = {} 
+                intentos_totales = 100
+
+                for _ in range(intentos_totales):
+                    candidato = oracle.predecir(fecha_objetivo=ahora, estocastico=True)
+                    if candidato and len(candidato) == forense.rules['n']:
+                        pasa, score_adn, motivo = validar_cognitivamente(candidato, genoma, game_id, factor_tolerancia=f_tol)
+                        
+                        # --- 🚀 MEJORA: DETECTOR DE DISIDENCIA (Solo para v4) ---
+                        es_disidente = False
+                        if not pasa and v == "v4" and meta_cerebro:
+                            # Consultamos al Meta-Learner si este modelo tiene "luz verde" por mérito real
+                            multiplicador_ml = meta_cerebro.predecir_confianza_real(
+                                game_id, f'oraculo_neural_{v}', hora_actual, score_adn
+                            )
+                            # Si la confianza es > 2.5, es un "Genio Incomprendido" (rompe reglas pero acierta)
+                            if multiplicador_ml > 2.5:
+                                es_disidente = True
+                        
+                        if pasa or es_disidente:
+                            pool_ml.append({
+                                'nums': candidato, 
+                                'score': score_adn,
+                                'estado_adn': "OK" if pasa else "DISIDENTE"
+                            })
+                        else:
+                            reproches[motivo] = reproches.get(motivo, 0) + 1
                 
-                # Simulamos N veces para robustecer el consenso
-                validas = 0; reintentos = 0
-                while validas < 5 and reintentos < 30:
-                    sim = funcion()
-                    ok_sim, _, _ = validar_cognitivamente(sim, genoma, game_id)
-                    if ok_sim:
-                        for num in sim:
-                            bolsa_pesos_consenso[num] = bolsa_pesos_consenso.get(num, 0) + peso
-                        validas += 1
-                    reintentos += 1
+                if pool_ml:
+                    # 1. Selección del mejor candidato del pool basado en ADN
+                    ganador_ml = sorted(pool_ml, key=lambda x: x['score'])[0]
+                    pred_ml = ganador_ml['nums']
+                    alg_name_ml = f'oraculo_neural_{v}'
                     
-            except Exception as e:
-                logger.error(f"Error en {nombre}: {e}")
-
-        # --- BLOQUE: ORÁCULO NEURAL (MACHINE LEARNING) CON RESCATE DE DISIDENCIA ---
-        if OraculoNeural:
-            for v in ["v3", "v4"]:
-                try:
-                    oracle = OraculoNeural(game_id, version=v)
+                    # 2. Cálculo de Confianza Real vía Meta-Learner
+                    # Obtenemos el multiplicador de esperanza de éxito histórico
+                    confianza_ml_individual = 1.0
+                    if meta_cerebro:
+                        confianza_ml_individual = meta_cerebro.predecir_confianza_real(
+                            game_id, alg_name_ml, hora_actual, ganador_ml['score']
+                        )
                     
-                    # ERR-002: Validación robusta del método predecir
-                    if not hasattr(oracle, 'predecir'):
-                        logger.error(f"Clase OraculoNeural ({v}) malformada: falta método predecir")
-                        continue
-
-                    f_tol = 2.5 if v == "v4" else 1.0 
+                    # 3. Clasificación para el Dashboard (Rescate de Disidencia)
+                    nota = "ALERTA_DISIDENCIA" if ganador_ml['estado_adn'] == "DISIDENTE" else "NORMAL"
                     
-                    pool_ml = []
-                    reproches = {} 
-                    intentos_totales = 100
-
-                    for _ in range(intentos_totales):
-                        candidato = oracle.predecir(fecha_objetivo=ahora, estocastico=True)
-                        if candidato and len(candidato) == forense.rules['n']:
-                            pasa, score_adn, motivo = validar_cognitivamente(candidato, genoma, game_id, factor_tolerancia=f_tol)
-                            
-                            # --- 🚀 MEJORA: DETECTOR DE DISIDENCIA (Solo para v4) ---
-                            es_disidente = False
-                            if not pasa and v == "v4" and meta_cerebro:
-                                # Consultamos al Meta-Learner si este modelo tiene "luz verde" por mérito real
-                                multiplicador_ml = meta_cerebro.predecir_confianza_real(
-                                    game_id, f'oraculo_neural_{v}', hora_actual, score_adn
-                                )
-                                # Si la confianza es > 2.5, es un "Genio Incomprendido" (rompe reglas pero acierta)
-                                if multiplicador_ml > 2.5:
-                                    es_disidente = True
-                            
-                            if pasa or es_disidente:
-                                pool_ml.append({
-                                    'nums': candidato, 
-                                    'score': score_adn,
-                                    'estado_adn': "OK" if pasa else "DISIDENTE"
-                                })
-                            else:
-                                reproches[motivo] = reproches.get(motivo, 0) + 1
+                    # 4. Inserción en la cola con Metadata enriquecida
+                    filas.append({
+                        'fecha_generacion': ahora.strftime('%Y-%m-%d %H:%M:%S'),
+                        'fecha_lanzamiento': fecha_sorteo.strftime('%d/%m/%Y %H:%M'),
+                        'juego': game_id,
+                        'numeros': list(pred_ml),
+                        'sorteo_objetivo': objetivo,
+                        'estado': 'PENDIENTE',
+                        'aciertos': 0,
+                        'score_afinidad': ganador_ml['score'],
+                        'hora_dia': hora_actual,
+                        'algoritmo': alg_name_ml,
+                        'nota_especial': nota
+                    })
                     
-                    if pool_ml:
-                        # 1. Selección del mejor candidato del pool basado en ADN
-                        ganador_ml = sorted(pool_ml, key=lambda x: x['score'])[0]
-                        pred_ml = ganador_ml['nums']
-                        alg_name_ml = f'oraculo_neural_{v}'
-                        
-                        # 2. Cálculo de Confianza Real vía Meta-Learner
-                        # Obtenemos el multiplicador de esperanza de éxito histórico
-                        confianza_ml_individual = 1.0
-                        if meta_cerebro:
-                            confianza_ml_individual = meta_cerebro.predecir_confianza_real(
-                                game_id, alg_name_ml, hora_actual, ganador_ml['score']
-                            )
-                        
-                        # 3. Clasificación para el Dashboard (Rescate de Disidencia)
-                        nota = "ALERTA_DISIDENCIA" if ganador_ml['estado_adn'] == "DISIDENTE" else "NORMAL"
-                        
-                        # 4. Inserción en la cola con Metadata enriquecida
-                        nuevas_filas.append({
-                            'id': base_id + 999 + (len(nuevas_filas)*10),
-                            'fecha_generacion': ahora.strftime('%Y-%m-%d %H:%M:%S'),
-                            'fecha_lanzamiento': fecha_sorteo.strftime('%d/%m/%Y %H:%M'),
-                            'juego': game_id,
-                            'numeros': list(pred_ml),
-                            'sorteo_objetivo': objetivo,
-                            'estado': 'PENDIENTE',
-                            'aciertos': 0,
-                            'score_afinidad': ganador_ml['score'],
-                            'hora_dia': hora_actual,
-                            'algoritmo': alg_name_ml,
-                            'nota_especial': nota
-                        })
-                        
-                        # 5. Voto Ponderado para el Consenso Meritocrático
-                        # El Meta-Learner decide cuánto peso real tiene esta opinión hoy
-                        peso_ia = pesos_voto.get(alg_name_ml, 1.0) 
-                        if meta_cerebro:
-                            peso_ia *= confianza_ml_individual
-                        
-                        # Las predicciones NORMAL tienen más peso; los disidentes menos
-                        multiplicador_voto = 8 if nota == "NORMAL" else 5
-                        
-                        for num in pred_ml:
-                            bolsa_pesos_consenso[num] = bolsa_pesos_consenso.get(num, 0) + (peso_ia * multiplicador_voto)
-                        
-                        label_status = f"[{ganador_ml['estado_adn']}]"
-                        logger.info(f"  {alg_name_ml} (Pool: {len(pool_ml)}): {pred_ml} {label_status} [Confianza: {round(confianza_ml_individual, 2)}x]")
+                    # 5. Voto Ponderado para el Consenso Meritocrático
+                    # El Meta-Learner decide cuánto peso real tiene esta opinión hoy
+                    peso_ia = pesos_voto.get(alg_name_ml, 1.0) 
+                    if meta_cerebro:
+                        peso_ia *= confianza_ml_individual
+                    
+                    # Las predicciones NORMAL tienen más peso; los disidentes menos
+                    multiplicador_voto = 8 if nota == "NORMAL" else 5
+                    
+                    for num in pred_ml:
+                        bolsa_pesos_consenso[num] = bolsa_pesos_consenso.get(num, 0) + (peso_ia * multiplicador_voto)
+                    
+                    label_status = f"[{ganador_ml['estado_adn']}]"
+                    logger.info(f"  {alg_name_ml} (Pool: {len(pool_ml)}): {pred_ml} {label_status} [Confianza: {round(confianza_ml_individual, 2)}x]")
 
-                    else:
-                        pred_ml = None
-                        logger.warning(f"{v} SILENCIADO. Motivos: {reproches}")
+                else:
+                    pred_ml = None
+                    logger.warning(f"{v} SILENCIADO. Motivos: {reproches}")
 
-                except Exception as e:
-                    logger.error(f"Fallo en ML {v}: {e}")
-        # -------------------------------------------------------
+            except Exception as e:
+                logger.error(f"Fallo en ML {v}: {e}")
+    # -------------------------------------------------------
 
-        # F. Generar Consenso Meritocrático con Filtro de Curación
-        try:
-            if bolsa_pesos_consenso:
-                n_balls = forense.rules['n']
-                
-                # Reiniciamos variables locales del consenso
-                ranking_bolas = sorted(bolsa_pesos_consenso, key=bolsa_pesos_consenso.get, reverse=True)
-                candidato_top = sorted(ranking_bolas[:n_balls])
-                
-                # Importante: top_consenso debe partir vacío o con el candidato actual
+    # F. Generar Consenso Meritocrático con Filtro de Curación
+    try:
+        if bolsa_pesos_consenso:
+            n_balls = forense.rules['n']
+            
+            # Reiniciamos variables locales del consenso
+            ranking_bolas = sorted(bolsa_pesos_consenso, key=bolsa_pesos_consenso.get, reverse=True)
+            candidato_top = sorted(ranking_bolas[:n_balls])
+            
+            # Importante: top_consenso debe partir vacío o con el candidato actual
+            top_consenso = candidato_top
+            objetivo_sorteo = objetivo
+            
+            # --- 🟢 ESTRATEGIA: SUEÑO CURADO ---
+            top_consenso = []
+            confianza_final = 0.0
+            es_valida = False
+            intentos_muestreo = 0
+            
+            # 1. Intento Determinista (Top N directo)
+            ranking_bolas = sorted(bolsa_pesos_consenso, key=bolsa_pesos_consenso.get, reverse=True)
+            candidato_top = sorted(ranking_bolas[:n_balls])
+            pasa, score_adn, _ = validar_cognitivamente(candidato_top, genoma, game_id)
+            
+            if pasa:
                 top_consenso = candidato_top
-                objetivo_sorteo = objetivo
-                
-                # --- 🟢 ESTRATEGIA: SUEÑO CURADO ---
-                top_consenso = []
-                confianza_final = 0.0
-                es_valida = False
-                intentos_muestreo = 0
-                
-                # 1. Intento Determinista (Top N directo)
-                ranking_bolas = sorted(bolsa_pesos_consenso, key=bolsa_pesos_consenso.get, reverse=True)
-                candidato_top = sorted(ranking_bolas[:n_balls])
-                pasa, score_adn, _ = validar_cognitivamente(candidato_top, genoma, game_id)
-                
-                if pasa:
-                    top_consenso = candidato_top
-                    es_valida = True
-                    logger.info(f"Consenso Determinista validado (Score ADN: {score_adn})")
+                es_valida = True
+                logger.info(f"Consenso Determinista validado (Score ADN: {score_adn})")
+            else:
+                espacio = obtener_espacio(game_id)
+                if espacio is not None:
+                    # 2. Búsqueda Exhaustiva: todo el espacio (LOTO4/RACHA) puntuado de una vez, sin rechazos
+                    desviaciones = espacio.desviacion(genoma.get('morphology', {}).get(game_id, {}) if genoma else {})
+                    validas = desviaciones < UMBRALES_VETO.get(game_id, 30)
+                    indice = espacio.mejor(espacio.score_consenso(bolsa_pesos_consenso), validas)
+                    if indice is not None:
+                        top_consenso = espacio.numeros(indice)
+                        es_valida = True
+                        logger.info(f"Consenso exhaustivo: mejor de {int(validas.sum())}/{len(espacio)} combinaciones válidas "
+                                    f"(Score ADN: {round(float(desviaciones[indice]), 2)})")
                 else:
                     logger.debug("Consenso Top-N rechazado por morfología. Iniciando Muestreo Estocástico...")
-                    
+                
                     # 2. Muestreo Estocástico: Elegimos números basados en su peso acumulado
                     # Preparamos probabilidades para np.random.choice
                     bolas_list = list(bolsa_pesos_consenso.keys())
@@ -583,7 +534,7 @@ def soñar():
                             try:
                                 muestreo = np.random.choice(bolas_list, size=n_balls, replace=False, p=probabilidades)
                                 muestreo = sorted([int(x) for x in muestreo])
-                                
+                            
                                 pasa_m, score_m, _ = validar_cognitivamente(muestreo, genoma, game_id)
                                 if pasa_m:
                                     top_consenso = muestreo
@@ -594,65 +545,130 @@ def soñar():
                                 # Captura error si probabilidades no suman 1 o tamaño inválido
                                 logger.error(f"Error muestreo estocástico: {ve}")
                                 break
-                                
+                            
                             intentos_muestreo += 1
 
-                if not es_valida:
-                    # Fallback al top si nada funcionó, pero marcamos como BAJA CONFIANZA
-                    top_consenso = candidato_top
-                    logger.warning("No se halló combinación ideal. Usando fallback.")
+            if not es_valida:
+                # Fallback al top si nada funcionó, pero marcamos como BAJA CONFIANZA
+                top_consenso = candidato_top
+                logger.warning("No se halló combinación ideal. Usando fallback.")
 
-                # Cálculo de confianza final
-                confianza_final = calcular_nivel_confianza(bolsa_pesos_consenso, n_balls)
-                alerta = "🔥 ALTA CONFIANZA" if (confianza_final > 25 and es_valida) else "⚠️ RUIDO DETECTADO"
-                
-                nuevas_filas.append({
-                    'id': base_id + 999 + (len(nuevas_filas)*10),
-                    'fecha_generacion': ahora.strftime('%Y-%m-%d %H:%M:%S'),
-                    'fecha_lanzamiento': fecha_sorteo.strftime('%d/%m/%Y %H:%M'),
-                    'juego': game_id,
-                    'numeros': top_consenso,
-                    'sorteo_objetivo': objetivo_sorteo,
-                    'estado': 'PENDIENTE',
-                    'aciertos': 0, 
-                    'score_afinidad': confianza_final,
-                    'hora_dia': hora_actual,
-                    'algoritmo': 'consenso_meritocratico_v2',
-                    'nota_especial': alerta
-                })
-                logger.info(f"TICKET FINAL: {top_consenso} | {alerta} ({confianza_final}%)")
-        except Exception as e:
-            logger.error(f"Error en fase de consenso: {e}")
+            # Cálculo de confianza final
+            confianza_final = calcular_nivel_confianza(bolsa_pesos_consenso, n_balls)
+            alerta = "🔥 ALTA CONFIANZA" if (confianza_final > 25 and es_valida) else "⚠️ RUIDO DETECTADO"
+            
+            filas.append({
+                'fecha_generacion': ahora.strftime('%Y-%m-%d %H:%M:%S'),
+                'fecha_lanzamiento': fecha_sorteo.strftime('%d/%m/%Y %H:%M'),
+                'juego': game_id,
+                'numeros': top_consenso,
+                'sorteo_objetivo': objetivo_sorteo,
+                'estado': 'PENDIENTE',
+                'aciertos': 0, 
+                'score_afinidad': confianza_final,
+                'hora_dia': hora_actual,
+                'algoritmo': 'consenso_meritocratico_v2',
+                'nota_especial': alerta
+            })
+            logger.info(f"TICKET FINAL: {top_consenso} | {alerta} ({confianza_final}%)")
+    except Exception as e:
+        logger.error(f"Error en fase de consenso: {e}")
+
+    return filas, ids_reservados
+
+# Contexto de solo lectura de los workers (heredado vía initializer)
+_CONTEXTO_WORKER = {}
+
+def _inicializar_worker(ahora, genoma, meta_cerebro, cpus):
+    global _CONTEXTO_WORKER
+    _CONTEXTO_WORKER = {'ahora': ahora, 'genoma': genoma, 'meta_cerebro': meta_cerebro, 'cpus': cpus}
+    # Los procesos hijos heredan el estado del RNG: cada universo necesita su propia semilla
+    np.random.seed()
+    random.seed()
 
-    # G. Guardado Asíncrono (QUEUE SYSTEM) con escritura atómica
-    import uuid
-    import tempfile
-    import shutil
+def _soñar_en_worker(game_id):
+    ctx = _CONTEXTO_WORKER
+    return (game_id, *soñar_universo(game_id, MULTIVERSO_CONFIG[game_id], ctx['ahora'], ctx['genoma'],
+                                     ctx['meta_cerebro'], cpus=ctx['cpus']))
+
+def asignar_ids(filas_por_juego, base_id, ids_reservados=()):
+    """
+    IDs consecutivos en el orden de MULTIVERSO_CONFIG, a partir de base_id
+    o por encima de los ya reservados por LOTO3 (que corre en paralelo):
+    únicos en la corrida sin importar qué worker terminó primero.
+    """
+    siguiente = max([base_id] + [int(i) + 1 for i in ids_reservados])
+    nuevas_filas = []
+    for game_id in MULTIVERSO_CONFIG:
+        for fila in filas_por_juego.get(game_id, []):
+            nuevas_filas.append({'id': siguiente + len(nuevas_filas), **fila})
+    return nuevas_filas
+
+def soñar(workers=WORKERS):
+    logger.info("=" * 60)
+    logger.info("INICIANDO BOT SOÑADOR: LÓBULOS ESPECIALIZADOS v12.4")
+    logger.info("=" * 60)
+
+    # --- NIVEL 4: Instanciar Meta-Learner ---
+    meta_cerebro = MetaLearner() if MetaLearner else None
+    logger.debug(f"MetaLearner activo: {meta_cerebro is not None}")
+    if meta_cerebro:
+        # La tabla de confianza se arma una vez y los workers la reciben lista
+        meta_cerebro.tabla_confianza()
+
+    if LotoForense is None:
+        logger.error("CRÍTICO: No se pudo importar LotoForense. Abortando.")
+        return
+
+    ahora = datetime.now(TZ_CHILE)
+    base_id = int(time.time())
+
+    logger.info(f"Hora Chile: {ahora.strftime('%Y-%m-%d %H:%M:%S')} | Día: {ahora.weekday()} | Hora: {ahora.hour}")
+
+    genoma = cargar_genoma()
+
+    if genoma:
+        logger.info("Cortex cargado: Rankings y Morfología segmentados por juego.")
+        logger.debug(f"Juegos en genoma: {list(genoma.get('algo_ranking', {}).keys())}")
+
+    # Los universos no comparten nada mutable: uno por proceso
+    filas_por_juego = {}
+    ids_reservados = []
+    inicio = time.time()
+    workers = max(1, min(int(workers), len(MULTIVERSO_CONFIG)))
+    if workers == 1:
+        for game_id, config in MULTIVERSO_CONFIG.items():
+            filas_por_juego[game_id], reservados = soñar_universo(game_id, config, ahora, genoma, meta_cerebro)
+            ids_reservados.extend(reservados)
+    else:
+        # Cada universo entrena con su parte de las CPUs: sin sobresuscripción dentro del pool
+        cpus = cpus_por_universo(workers)
+        logger.info(f"Soñando {len(MULTIVERSO_CONFIG)} universos en {workers} procesos ({cpus} CPU c/u)...")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker,
+                                 initargs=(ahora, genoma, meta_cerebro, cpus)) as pool:
+            futuros = {pool.submit(_soñar_en_worker, game_id): game_id for game_id in MULTIVERSO_CONFIG}
+            for futuro in as_completed(futuros):
+                try:
+                    game_id, filas, reservados = futuro.result()
+                    filas_por_juego[game_id] = filas
+                    ids_reservados.extend(reservados)
+                    logger.info(f"Universo {game_id} terminado: {len(filas)} predicciones ({time.time() - inicio:.1f}s)")
+                except Exception as e:
+                    logger.error(f"Universo {futuros[futuro]} falló: {e}")
+
+    nuevas_filas = asignar_ids(filas_por_juego, base_id, ids_reservados)
+    logger.info(f"Ciclo de sueño: {time.time() - inicio:.1f}s")
+
+    # G. Guardado Asíncrono (QUEUE SYSTEM): una sola escritura append-only por corrida
     QUEUE_DIR = os.path.join(DATA_DIR, 'queue')
-    os.makedirs(QUEUE_DIR, exist_ok=True)
 
     if nuevas_filas:
-        # 1. Guardar los tickets individuales en la queue con escritura atómica
-        for fila in nuevas_filas:
-            fila_limpia = clean_for_json(fila) # Sanitización final
-            file_id = str(uuid.uuid4())
-            filepath = os.path.join(QUEUE_DIR, f"prediccion_{file_id}.json")
-            tmp_path = None
-            try:
-                with tempfile.NamedTemporaryFile(
-                    mode='w', encoding='utf-8', suffix='.json',
-                    dir=QUEUE_DIR, delete=False
-                ) as tmp_file:
-                    json.dump(fila_limpia, tmp_file, ensure_ascii=False, indent=2)
-                    tmp_path = tmp_file.name
-                shutil.move(tmp_path, filepath)
-            except Exception as e:
-                logger.error(f"Error escribiendo predicción: {e}")
-                if tmp_path and os.path.exists(tmp_path):
-                    try:
-                        os.remove(tmp_path)
-                    except OSError:
-                        pass
+        # 1. Publicar todos los tickets en el segmento activo de la cola
+        try:
+            from cola_predicciones import ColaPredicciones
+            ColaPredicciones(QUEUE_DIR).publicar([clean_for_json(fila) for fila in nuevas_filas])
+        except Exception as e:
+            logger.error(f"Error escribiendo predicciones en la cola: {e}")
 
         # 2. ¡EL CIERRE DEL CÍRCULO!
         logger.info("Forzando sincronización del laboratorio...")
@@ -663,6 +679,12 @@ def soñar():
         except Exception as e:
             logger.error(f"Error fatal sincronizando dashboard: {e}")
 
+    # H. Con todo publicado: tabla especulativa LOTO3 para el próximo sorteo
+    if especular_siguiente is not None and "LOTO3" in MULTIVERSO_CONFIG:
+        inicio_especulacion = time.time()
+        especular_siguiente()
+        logger.info(f"Especulación LOTO3: {time.time() - inicio_especulacion:.1f}s")
+
     logger.info("=" * 60)
     logger.info("PROCESO DEL SOÑADOR TERMINADO")
     logger.info(f"Total predicciones generadas: {len(nuevas_filas)}")
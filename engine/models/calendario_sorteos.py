@@ -0,0 +1,265 @@
+"""
+CALENDARIO SORTEOS - Calendario semanal de sorteos en forma cerrada
+===================================================================
+Reemplaza la simulacion "sorteo a sorteo" de calcular_proximo_sorteo_real
+(bot_dreamer) y las tres variantes calcular_proximo_sorteo_loto3
+(loto3_ultra, loto3_especialista, loto3_tricore).
+
+- Lee solo la cola del CSV maestro (ultima fila) en lugar del archivo completo
+- Precalcula por juego la tabla de slots semanales (horas desde el lunes 00:00)
+- Proximo sorteo (ID + fecha) aritmetico: slots transcurridos = semanas
+  completas * slots_por_semana + busqueda binaria en la semana parcial,
+  rellenando los sorteos no registrados (caidas del scraper)
+- Mapeo vectorizado "ID de sorteo -> fecha programada" anclado en sorteos
+  conocidos (usado por el reconstructor temporal)
+
+Las fechas se manejan como hora local de Chile sin zona (igual que los CSV);
+solo el resultado de proximo_sorteo se localiza con TZ_CHILE.
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import csv
+import io
+import os
+import sys
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pytz
+
+# --- GESTIÓN DE RUTAS ---
+ENGINE_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+if ENGINE_DIR not in sys.path:
+    sys.path.append(ENGINE_DIR)
+
+# Reglas de negocio: fuente unica en config.HORARIOS
+from config import HORARIOS
+
+TZ_CHILE = pytz.timezone('America/Santiago')
+
+HORAS_SEMANA = 7 * 24
+FORMATOS_FECHA = ("%Y-%m-%d %H:%M:%S", "%d-%m-%Y %H:%M:%S")
+
+# Bytes leidos desde el final del CSV en cada intento (se duplica si no alcanza)
+BLOQUE_COLA = 4096
+
+
+# =============================================================================
+# LECTURA DE COLA
+# =============================================================================
+def parsear_fecha(valor) -> Optional[datetime]:
+    """Parseo robusto de fecha (soporta ISO con 'T'/milisegundos y formato local)"""
+    fecha_str = str(valor).replace('T', ' ').split('.')[0].strip()
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(fecha_str, formato)
+        except ValueError:
+            continue
+    return None
+
+
+def leer_ultima_fila(path: str) -> Optional[dict]:
+    """
+    Retorna la ultima fila del CSV como dict {columna: valor} leyendo
+    solo la cabecera y los ultimos bytes del archivo.
+    """
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'rb') as f:
+        cabecera = f.readline().decode('utf-8-sig')
+        inicio_datos = f.tell()
+        f.seek(0, os.SEEK_END)
+        fin = f.tell()
+        if fin <= inicio_datos:
+            return None
+
+        bloque = BLOQUE_COLA
+        while True:
+            desde = max(inicio_datos, fin - bloque)
+            f.seek(desde)
+            lineas = [l for l in f.read(fin - desde).decode('utf-8', errors='replace').splitlines() if l.strip()]
+            # Con 2+ lineas la ultima esta completa; si llegamos al inicio, tambien
+            if len(lineas) >= 2 or desde == inicio_datos:
+                break
+            bloque *= 2
+
+    if not lineas:
+        return None
+    columnas = next(csv.reader([cabecera]))
+    valores = next(csv.reader(io.StringIO(lineas[-1])))
+    return dict(zip(columnas, valores))
+
+
+def leer_ancla(path: str) -> Optional[Tuple[int, datetime]]:
+    """(ultimo sorteo, fecha naive) del CSV maestro, o None si no hay datos validos"""
+    try:
+        fila = leer_ultima_fila(path)
+        if not fila:
+            return None
+        fecha = parsear_fecha(fila.get('fecha'))
+        if fecha is None:
+            return None
+        return int(float(fila['sorteo'])), fecha
+    except (KeyError, ValueError, IOError, csv.Error):
+        return None
+
+
+# =============================================================================
+# CALENDARIO
+# =============================================================================
+class CalendarioSorteos:
+    """
+    Tabla de slots semanales de un juego.
+
+    Un "slot" es un horario programado de sorteo. Los slots se numeran
+    globalmente como semana * n_slots + indice_en_semana, con semana contada
+    desde el lunes 2000-01-03, de modo que la distancia en sorteos entre dos
+    fechas es una resta.
+    """
+
+    LUNES_BASE = datetime(2000, 1, 3)
+
+    def __init__(self, dias, horas):
+        self.slots = np.array(sorted(d * 24 + h for d in set(dias) for h in set(horas)), dtype=np.int64)
+        if self.slots.size == 0:
+            raise ValueError("Calendario sin horarios")
+        self.n_slots = len(self.slots)
+
+    # --- Conversión fecha <-> slot global ---
+    def _horas_desde_base(self, fecha: datetime) -> float:
+        return (fecha - self.LUNES_BASE).total_seconds() / 3600.0
+
+    def slot_global(self, fecha: datetime, lado: str = 'right') -> int:
+        """
+        Cantidad de slots con hora <= fecha (lado='right') o < fecha (lado='left'),
+        contados desde la base. El slot en curso/ultimo es este valor - 1.
+        """
+        horas = self._horas_desde_base(fecha)
+        semana = int(horas // HORAS_SEMANA)
+        offset = horas - semana * HORAS_SEMANA
+        return semana * self.n_slots + int(np.searchsorted(self.slots, offset, side=lado))
+
+    def slot_mas_cercano(self, fecha: datetime) -> int:
+        """Slot global mas cercano a la fecha (tolera horas registradas con desfase)"""
+        siguiente = self.slot_global(fecha, lado='left')
+        candidatos = [siguiente - 1, siguiente]
+        return min(candidatos, key=lambda s: abs((self.fecha_slot(s) - fecha).total_seconds()))
+
+    def fecha_slot(self, slot: int) -> datetime:
+        """Fecha naive (hora local) del slot global"""
+        semana, indice = divmod(int(slot), self.n_slots)
+        return self.LUNES_BASE + timedelta(weeks=semana, hours=int(self.slots[indice]))
+
+    def fechas_slots(self, slots) -> pd.DatetimeIndex:
+        """Version vectorizada de fecha_slot"""
+        slots = np.asarray(slots, dtype=np.int64)
+        semanas, indices = np.divmod(slots, self.n_slots)
+        horas = semanas * HORAS_SEMANA + self.slots[indices]
+        return pd.DatetimeIndex(np.datetime64(self.LUNES_BASE, 'h') + horas.astype('timedelta64[h]'))
+
+    # --- API principal ---
+    def proximo_sorteo(self, ultimo_id: int, ultima_fecha: datetime,
+                       ahora: datetime) -> Tuple[int, datetime]:
+        """
+        Primer sorteo programado estrictamente posterior a `ahora`.
+
+        El ID avanza un numero por cada slot transcurrido desde el ultimo
+        sorteo conocido (relleno de sorteos no registrados).
+
+        Args:
+            ultimo_id: ID del ultimo sorteo del CSV
+            ultima_fecha: Fecha naive (hora local) de ese sorteo
+            ahora: Fecha naive (hora local) actual
+        """
+        slot_ancla = self.slot_mas_cercano(ultima_fecha)
+        if self.fecha_slot(slot_ancla) > ahora:
+            return ultimo_id, self.fecha_slot(slot_ancla)
+
+        slot_objetivo = self.slot_global(ahora, lado='right')
+        return ultimo_id + (slot_objetivo - slot_ancla), self.fecha_slot(slot_objetivo)
+
+    def fechas_programadas(self, ids, ancla_ids, ancla_fechas) -> pd.DatetimeIndex:
+        """
+        Mapeo vectorizado ID de sorteo -> fecha programada.
+
+        Cada ID se ubica desde el sorteo conocido anterior mas cercano
+        (o el primero, si es anterior a todos), por lo que las caidas
+        solo afectan a los IDs dentro del hueco.
+
+        Args:
+            ids: IDs a convertir
+            ancla_ids: IDs con fecha conocida
+            ancla_fechas: Fechas naive de esos IDs
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        ancla_ids = np.asarray(ancla_ids, dtype=np.int64)
+        if ancla_ids.size == 0:
+            raise ValueError("Se requiere al menos un sorteo ancla")
+
+        orden = np.argsort(ancla_ids, kind='stable')
+        ancla_ids = ancla_ids[orden]
+        ancla_slots = np.array([self.slot_mas_cercano(f) for f in pd.to_datetime(pd.Index(ancla_fechas)[orden])],
+                               dtype=np.int64)
+
+        pos = np.clip(np.searchsorted(ancla_ids, ids, side='right') - 1, 0, len(ancla_ids) - 1)
+        return self.fechas_slots(ancla_slots[pos] + (ids - ancla_ids[pos]))
+
+
+@lru_cache(maxsize=None)
+def calendario(game_id: str) -> CalendarioSorteos:
+    """Calendario precalculado (cacheado) del juego"""
+    reglas = HORARIOS[game_id]
+    return CalendarioSorteos(reglas['dias'], reglas['horas'])
+
+
+# =============================================================================
+# FUNCIONES DE INTERFAZ
+# =============================================================================
+def calcular_proximo_sorteo(game_id: str, csv_path: str,
+                            ahora: Optional[datetime] = None) -> Tuple[int, datetime]:
+    """
+    Proximo sorteo (ID, fecha con TZ_CHILE) a partir de la cola del CSV maestro.
+
+    Sin datos se asume el sorteo #0 con ancla el dia anterior (mismo criterio
+    que la version previa), por lo que el ID resultante es relativo.
+    """
+    ahora = ahora or datetime.now(TZ_CHILE)
+    if ahora.tzinfo is not None:
+        ahora = ahora.astimezone(TZ_CHILE).replace(tzinfo=None)
+
+    ancla = leer_ancla(csv_path)
+    if ancla is None:
+        ancla = (0, ahora - timedelta(days=1))
+
+    sorteo_id, fecha = calendario(game_id).proximo_sorteo(ancla[0], ancla[1], ahora)
+    return sorteo_id, TZ_CHILE.localize(fecha)
+
+
+def fechas_sorteos(game_id: str, df: pd.DataFrame) -> pd.Series:
+    """
+    Fecha de cada fila de un CSV maestro indexada por sorteo.
+
+    Usa la fecha registrada cuando es parseable y la fecha programada del
+    calendario cuando falta o es invalida. Sorteos repetidos: primera fila.
+    """
+    if 'fecha' not in df.columns:
+        return pd.Series(pd.NaT, index=df['sorteo'].to_numpy())
+    # Mismos formatos que parsear_fecha, en orden (ISO primero): un formato
+    # inferido con dayfirst invierte dia y mes en fechas ISO con dia <= 12
+    texto = df['fecha'].astype(str).str.replace('T', ' ', regex=False).str.split('.').str[0].str.strip()
+    fechas = pd.to_datetime(texto, format=FORMATOS_FECHA[0], errors='coerce')
+    for formato in FORMATOS_FECHA[1:]:
+        fechas = fechas.fillna(pd.to_datetime(texto, format=formato, errors='coerce'))
+    ids = df['sorteo'].to_numpy()
+    validas = fechas.notna().to_numpy()
+    if validas.any() and not validas.all():
+        programadas = calendario(game_id).fechas_programadas(ids, ids[validas], fechas[validas])
+        fechas = fechas.where(validas, pd.Series(programadas, index=fechas.index))
+    serie = pd.Series(fechas.to_numpy(), index=ids)
+    return serie[~serie.index.duplicated(keep='first')]
@@ -0,0 +1,336 @@
+"""
+COLA PREDICCIONES - Log segmentado append-only para tickets del Soñador
+=======================================================================
+Reemplaza el esquema "un prediccion_<uuid>.json por ticket" de data/queue.
+
+- Los tickets se agregan como lineas JSON a segmentos `segmento_<n>.jsonl`
+- Una escritura por corrida del Soñador, con fsync cada `lote_fsync` tickets
+- Al superar `max_bytes_segmento` el segmento se cierra y su checksum
+  (CRC32 + bytes + registros) queda en `manifiesto.json`
+- Los consumidores (consolidar_cola) guardan su posicion en `offsets.json`
+  en lugar de borrar archivos: cada consolidacion solo lee lo nuevo
+- Una linea incompleta al final (escritura interrumpida) se ignora al leer
+  y se trunca en la siguiente publicacion
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import shutil
+import logging
+import tempfile
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# File locking: fcntl para Unix, msvcrt para Windows
+if sys.platform == 'win32':
+    import msvcrt
+    fcntl = None
+else:
+    import fcntl
+    msvcrt = None
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUEUE_DIR = os.path.normpath(os.path.join(BASE_DIR, '..', '..', 'data', 'queue'))
+
+PATRON_SEGMENTO = re.compile(r'^segmento_(\d+)\.jsonl$')
+MANIFIESTO = 'manifiesto.json'
+OFFSETS = 'offsets.json'
+LOCK = '.cola.lock'
+
+MAX_BYTES_SEGMENTO = 4 * 1024 * 1024
+LOTE_FSYNC = 256
+
+
+def _escribir_json_atomico(path: str, data):
+    """Escritura atomica (tempfile + move) de un JSON pequeño"""
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', suffix='.json',
+                                         dir=os.path.dirname(path), delete=False) as tmp_file:
+            json.dump(data, tmp_file, indent=2)
+            tmp_path = tmp_file.name
+        shutil.move(tmp_path, path)
+    except Exception:
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        raise
+
+
+def _leer_json(path: str, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        logger.warning(f"No se pudo leer {path}: {e}")
+        return default
+
+
+class BloqueoArchivo:
+    """Lock exclusivo basado en archivo (cola, dashboard y otros escritores unicos)"""
+
+    def __init__(self, path: str, timeout: float = 120):
+        self.path = path
+        self.timeout = timeout
+        self.fd = None
+
+    def __enter__(self):
+        inicio = time.time()
+        while True:
+            try:
+                self.fd = open(self.path, 'a')
+                if msvcrt:
+                    msvcrt.locking(self.fd.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(self.fd.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return self
+            except (IOError, OSError):
+                if self.fd:
+                    self.fd.close()
+                    self.fd = None
+                if time.time() - inicio > self.timeout:
+                    raise TimeoutError(f"Timeout adquiriendo lock {self.path} ({self.timeout}s)")
+                time.sleep(0.1)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.fd:
+            try:
+                if msvcrt:
+                    msvcrt.locking(self.fd.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(self.fd.fileno(), fcntl.LOCK_UN)
+            except (IOError, OSError):
+                pass
+            finally:
+                self.fd.close()
+                self.fd = None
+        return False
+
+
+class ColaPredicciones:
+    """
+    Cola append-only segmentada.
+
+    Posicion de un consumidor: {"segmento": n, "offset": bytes}; todo lo
+    anterior a esa posicion ya fue consumido.
+    """
+
+    def __init__(self, directorio: str = QUEUE_DIR,
+                 max_bytes_segmento: int = MAX_BYTES_SEGMENTO,
+                 lote_fsync: int = LOTE_FSYNC):
+        self.directorio = directorio
+        self.max_bytes_segmento = max_bytes_segmento
+        self.lote_fsync = max(1, int(lote_fsync))
+        os.makedirs(directorio, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Utilidades
+    # ------------------------------------------------------------------
+    def _ruta(self, nombre: str) -> str:
+        return os.path.join(self.directorio, nombre)
+
+    def _ruta_segmento(self, numero: int) -> str:
+        return self._ruta(f"segmento_{numero:010d}.jsonl")
+
+    def _bloqueo(self) -> BloqueoArchivo:
+        return BloqueoArchivo(self._ruta(LOCK))
+
+    def segmentos(self) -> List[int]:
+        """Numeros de segmento existentes, en orden"""
+        numeros = []
+        for nombre in os.listdir(self.directorio):
+            match = PATRON_SEGMENTO.match(nombre)
+            if match:
+                numeros.append(int(match.group(1)))
+        return sorted(numeros)
+
+    def manifiesto(self) -> Dict[str, dict]:
+        """Checksums de los segmentos cerrados: {numero: {bytes, registros, crc32}}"""
+        return _leer_json(self._ruta(MANIFIESTO), {})
+
+    def offsets(self) -> Dict[str, dict]:
+        return _leer_json(self._ruta(OFFSETS), {})
+
+    @staticmethod
+    def _crc_archivo(path: str) -> Tuple[int, int, int]:
+        """(crc32, bytes, lineas) de un archivo leido en bloques"""
+        crc, total, lineas = 0, 0, 0
+        with open(path, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                crc = zlib.crc32(bloque, crc)
+                total += len(bloque)
+                lineas += bloque.count(b'\n')
+        return crc, total, lineas
+
+    @staticmethod
+    def _reparar_cola(path: str):
+        """Trunca una linea final incompleta (escritura interrumpida)"""
+        tamano = os.path.getsize(path)
+        if tamano == 0:
+            return
+        with open(path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b'\n':
+                return
+            bloque = min(tamano, 1 << 16)
+            while True:
+                f.seek(tamano - bloque)
+                datos = f.read(bloque)
+                corte = datos.rfind(b'\n')
+                if corte >= 0 or bloque == tamano:
+                    nuevo = tamano - bloque + corte + 1 if corte >= 0 else 0
+                    break
+                bloque = min(tamano, bloque * 2)
+            f.truncate(nuevo)
+            logger.warning(f"Segmento {os.path.basename(path)} reparado: {tamano - nuevo} bytes incompletos descartados")
+
+    def _cerrar_segmento(self, numero: int):
+        crc, total, lineas = self._crc_archivo(self._ruta_segmento(numero))
+        manifiesto = self.manifiesto()
+        manifiesto[str(numero)] = {"bytes": total, "registros": lineas, "crc32": crc}
+        _escribir_json_atomico(self._ruta(MANIFIESTO), manifiesto)
+
+    # ------------------------------------------------------------------
+    # Productor
+    # ------------------------------------------------------------------
+    def publicar(self, registros: Iterable[dict]) -> int:
+        """
+        Agrega registros al segmento activo en una sola apertura de archivo.
+
+        Returns:
+            Cantidad de registros escritos
+        """
+        lineas = [json.dumps(r, ensure_ascii=False, separators=(',', ':')) + '\n' for r in registros]
+        if not lineas:
+            return 0
+
+        with self._bloqueo():
+            numeros = self.segmentos()
+            cerrados = self.manifiesto()
+            activo = numeros[-1] if numeros and str(numeros[-1]) not in cerrados else \
+                (numeros[-1] + 1 if numeros else 1)
+            path = self._ruta_segmento(activo)
+            if os.path.exists(path):
+                self._reparar_cola(path)
+
+            escritos = 0
+            f = open(path, 'ab')
+            try:
+                tamano = f.tell()
+                for i, linea in enumerate(lineas, 1):
+                    datos = linea.encode('utf-8')
+                    f.write(datos)
+                    tamano += len(datos)
+                    escritos += 1
+
+                    if i % self.lote_fsync == 0:
+                        f.flush()
+                        os.fsync(f.fileno())
+
+                    # Rotacion: el segmento lleno se cierra con su checksum
+                    if tamano >= self.max_bytes_segmento and i < len(lineas):
+                        f.flush()
+                        os.fsync(f.fileno())
+                        f.close()
+                        self._cerrar_segmento(activo)
+                        activo += 1
+                        path = self._ruta_segmento(activo)
+                        f = open(path, 'ab')
+                        tamano = 0
+
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                f.close()
+
+            if tamano >= self.max_bytes_segmento:
+                self._cerrar_segmento(activo)
+
+        logger.info(f"Cola: {escritos} registros publicados (segmento {activo})")
+        return escritos
+
+    # ------------------------------------------------------------------
+    # Consumidores
+    # ------------------------------------------------------------------
+    def _leer_segmento(self, numero: int, desde: int, info_cierre: Optional[dict]) -> Tuple[List[dict], int]:
+        path = self._ruta_segmento(numero)
+        if info_cierre is not None and desde == 0:
+            crc, total, _ = self._crc_archivo(path)
+            if crc != info_cierre.get('crc32') or total != info_cierre.get('bytes'):
+                logger.error(f"Checksum invalido en segmento {numero}; se leen solo lineas validas")
+
+        with open(path, 'rb') as f:
+            f.seek(desde)
+            datos = f.read()
+
+        fin_completo = datos.rfind(b'\n') + 1  # Ignora una linea final incompleta
+        registros = []
+        for linea in datos[:fin_completo].splitlines():
+            if not linea.strip():
+                continue
+            try:
+                registros.append(json.loads(linea))
+            except json.JSONDecodeError as e:
+                logger.warning(f"Linea corrupta en segmento {numero}: {e}")
+        return registros, desde + fin_completo
+
+    def leer_pendientes(self, consumidor: str) -> Tuple[List[dict], dict]:
+        """
+        Registros aun no confirmados por el consumidor (no mueve su offset).
+
+        Returns:
+            (registros, posicion) - pasar `posicion` a confirmar() tras procesarlos
+        """
+        with self._bloqueo():
+            posicion = self.offsets().get(consumidor, {"segmento": 0, "offset": 0})
+            cerrados = self.manifiesto()
+            registros = []
+            nueva = dict(posicion)
+            for numero in self.segmentos():
+                if numero < posicion["segmento"]:
+                    continue
+                desde = posicion["offset"] if numero == posicion["segmento"] else 0
+                nuevos, fin = self._leer_segmento(numero, desde, cerrados.get(str(numero)))
+                registros.extend(nuevos)
+                nueva = {"segmento": numero, "offset": fin}
+        return registros, nueva
+
+    def confirmar(self, consumidor: str, posicion: dict):
+        """Avanza el offset del consumidor hasta `posicion`"""
+        with self._bloqueo():
+            offsets = self.offsets()
+            offsets[consumidor] = {"segmento": int(posicion["segmento"]), "offset": int(posicion["offset"])}
+            _escribir_json_atomico(self._ruta(OFFSETS), offsets)
+
+    def purgar_consumidos(self) -> int:
+        """
+        Borra segmentos cerrados que todos los consumidores ya pasaron.
+        Opcional: la cola funciona sin purgar (los offsets evitan relecturas).
+        """
+        with self._bloqueo():
+            offsets = self.offsets()
+            if not offsets:
+                return 0
+            minimo = min(p["segmento"] for p in offsets.values())
+            manifiesto = self.manifiesto()
+            borrados = 0
+            for numero in self.segmentos():
+                if numero < minimo and str(numero) in manifiesto:
+                    os.remove(self._ruta_segmento(numero))
+                    del manifiesto[str(numero)]
+                    borrados += 1
+            if borrados:
+                _escribir_json_atomico(self._ruta(MANIFIESTO), manifiesto)
+        return borrados
@@ -5,10 +5,10 @@ import numpy as np
 import ast
 import sys
 import logging
-import tempfile
-import shutil
 from datetime import datetime, timedelta
 
+from genoma_store import GenomaStore, RANKING, RANKING_HORARIO, MORFOLOGIA, METADATA
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 if not logger.handlers:
@@ -121,18 +121,115 @@ def cargar_genoma():
     """Carga el estado actual de la inteligencia colectiva con manejo de excepciones."""
     if os.path.exists(GENOMA_FILE):
         try:
-            with open(GENOMA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # Validar estructura mínima
-                if "algo_ranking" not in data: data["algo_ranking"] = {}
-                if "morphology" not in data: data["morphology"] = {}
-                if "metadata" not in data: data["metadata"] = {}
-                return data
+            data = GenomaStore(GENOMA_FILE).leer()
+            # Validar estructura mínima
+            if "algo_ranking" not in data: data["algo_ranking"] = {}
+            if "morphology" not in data: data["morphology"] = {}
+            if "metadata" not in data: data["metadata"] = {}
+            return data
         except Exception as e:
             print(f"   ⚠️ Error leyendo genoma: {e}. Creando uno nuevo...")
     
     return {"algo_ranking": {}, "metadata": {}, "morphology": {}}
 
+def _parsear_numero_lista(texto):
+    """Convierte '[1, 2, 3]' en lista de enteros. Retorna None si es inválido."""
+    try:
+        nums = json.loads(texto)
+    except (TypeError, ValueError):
+        try:
+            nums = ast.literal_eval(texto)
+        except (ValueError, SyntaxError, TypeError):
+            return None
+    if not isinstance(nums, (list, tuple)) or len(nums) < 2:
+        return None
+    if not all(isinstance(n, (int, float)) and float(n).is_integer() for n in nums):
+        return None
+    return [int(n) for n in nums]
+
+def parsear_matriz_numeros(serie_numeros):
+    """
+    Parsea la columna 'numeros' UNA sola vez a una matriz entera ordenada por fila.
+
+    Returns:
+        (matriz, mascara, validos): matriz (n_validos x max_len) con relleno,
+        mascara booleana de celdas reales y array booleano de filas válidas
+        respecto a la serie original.
+    """
+    listas = [_parsear_numero_lista(t) for t in serie_numeros]
+    validos = np.array([l is not None for l in listas], dtype=bool)
+    listas = [l for l in listas if l is not None]
+
+    if not listas:
+        return np.zeros((0, 0), dtype=np.int64), np.zeros((0, 0), dtype=bool), validos
+
+    largos = np.array([len(l) for l in listas])
+    max_len = int(largos.max())
+    relleno = np.iinfo(np.int64).max  # Queda al final al ordenar
+
+    matriz = np.full((len(listas), max_len), relleno, dtype=np.int64)
+    for i, l in enumerate(listas):
+        matriz[i, :len(l)] = l
+    matriz.sort(axis=1)
+    mascara = np.arange(max_len)[None, :] < largos[:, None]
+    return matriz, mascara, validos
+
+def calcular_metricas_morfologicas(matriz, mascara, juego_id):
+    """
+    Métricas morfológicas por fila como operaciones de columna.
+    Misma definición que el estudio original fila a fila.
+    """
+    claves = ['sumas', 'pares', 'cons', 'bajos', 'terms', 'primos', 'mult3', 'deltas']
+    if matriz.size == 0:
+        return {clave: np.zeros(0) for clave in claves}
+
+    largos = mascara.sum(axis=1)
+    filas = np.arange(len(matriz))
+    valores = np.where(mascara, matriz, 0)
+
+    limit = 4 if juego_id == "LOTO3" else (10 if juego_id == "RACHA" else 21)
+
+    # Terminaciones distintas: presencia (fila x dígito 0-9)
+    terminaciones = np.zeros((len(matriz), 10), dtype=bool)
+    f_idx, c_idx = np.nonzero(mascara)
+    terminaciones[f_idx, matriz[f_idx, c_idx] % 10] = True
+
+    return {
+        'sumas': valores.sum(axis=1),
+        'pares': (mascara & (valores % 2 == 0)).sum(axis=1),
+        'cons': (mascara[:, 1:] & (valores[:, 1:] == valores[:, :-1] + 1)).sum(axis=1),
+        'bajos': (mascara & (valores <= limit)).sum(axis=1),
+        'terms': terminaciones.sum(axis=1),
+        'primos': (mascara & np.isin(valores, list(PRIMOS_SET))).sum(axis=1),
+        'mult3': (mascara & (valores % 3 == 0)).sum(axis=1),
+        # Promedio de diferencias de una fila ordenada = (último - primero) / (n - 1)
+        'deltas': (valores[filas, largos - 1] - valores[:, 0]) / (largos - 1),
+    }
+
+def percentil_ponderado(valores, pesos, qs):
+    """
+    Percentiles (interpolación lineal) equivalentes a np.percentile sobre la
+    muestra con cada valor repetido `peso` veces, sin materializar la réplica.
+    """
+    valores = np.asarray(valores, dtype=float)
+    pesos = np.asarray(pesos, dtype=float)
+    orden = np.argsort(valores, kind='stable')
+    valores, pesos = valores[orden], pesos[orden]
+    acumulado = np.cumsum(pesos)
+    total = acumulado[-1]
+
+    def valor_en(k):
+        return valores[np.searchsorted(acumulado, k, side='right')]
+
+    resultado = []
+    for q in np.atleast_1d(qs):
+        pos = (q / 100) * (total - 1)
+        bajo = np.floor(pos)
+        alto = min(np.ceil(pos), total - 1)
+        v_bajo, v_alto = valor_en(bajo), valor_en(alto)
+        resultado.append(v_bajo + (pos - bajo) * (v_alto - v_bajo))
+    return np.array(resultado)
+
 def analizar_adn_ganador():
     """
     Sincroniza el ranking de algoritmos y la morfología ideal basándose
@@ -239,59 +336,45 @@ def analizar_adn_ganador():
         if not df_juego.empty:
             memoria_morf = morph_global.get(juego_id, {})
             
-            def suavizar_metrica(clave, lista_valores, factor_novedad=0.1):
-                if not lista_valores: return
-                avg_lote = np.mean(lista_valores)
+            def suavizar_metrica(clave, valores, pesos, factor_novedad=0.1):
+                if len(valores) == 0 or pesos.sum() <= 0: return
+                avg_lote = np.average(valores, weights=pesos)
                 val_old = memoria_morf.get(clave, -1)
                 if val_old == -1:
                     memoria_morf[clave] = float(round(avg_lote, 2))
                 else:
                     memoria_morf[clave] = float(round((val_old * (1 - factor_novedad)) + (avg_lote * factor_novedad), 2))
 
-            # Contenedores de métricas CON PESOS por aciertos
-            pares, cons, bajos, terms, primos, mult3, deltas, sumas = [], [], [], [], [], [], [], []
-            pesos_samples = []  # AUDITORÍA v4: Ponderación por rendimiento
-
-            for _, row in df_juego.iterrows():
-                try:
-                    nums = sorted(ast.literal_eval(row['numeros']))
-                    aciertos = row.get('aciertos', 0)
-
-                    # Peso basado en aciertos: 0 aciertos = peso 1, 6 aciertos = peso 7
-                    peso = 1 + aciertos
-
-                    sumas.extend([sum(nums)] * peso)
-                    pares.extend([len([n for n in nums if n % 2 == 0])] * peso)
-                    cons.extend([sum(1 for i in range(len(nums)-1) if nums[i+1] == nums[i] + 1)] * peso)
-
-                    limit = 4 if juego_id == "LOTO3" else (10 if juego_id == "RACHA" else 21)
-                    bajos.extend([len([n for n in nums if n <= limit])] * peso)
-                    terms.extend([len(set([n % 10 for n in nums]))] * peso)
-                    primos.extend([len([n for n in nums if n in PRIMOS_SET])] * peso)
-                    mult3.extend([len([n for n in nums if n % 3 == 0])] * peso)
-                    # np.diff requiere al menos 2 elementos (siempre true para todos los juegos)
-                    deltas.extend([float(np.mean(np.diff(nums)))] * peso)
-                except (ValueError, SyntaxError, TypeError) as e:
-                    logger.debug(f"Error procesando fila para morfología: {e}")
-                    continue
+            # Matriz de predicciones (parseo único) y métricas por columna
+            matriz, mascara, validos = parsear_matriz_numeros(df_juego['numeros'])
+            if (~validos).any():
+                logger.debug(f"{int((~validos).sum())} filas con 'numeros' inválido excluidas de morfología")
+            metricas = calcular_metricas_morfologicas(matriz, mascara, juego_id)
+
+            # Peso basado en aciertos: 0 aciertos = peso 1, 6 aciertos = peso 7
+            if 'aciertos' in df_juego.columns:
+                aciertos = pd.to_numeric(df_juego['aciertos'], errors='coerce').fillna(0).to_numpy()[validos]
+            else:
+                aciertos = np.zeros(int(validos.sum()))
+            pesos = np.clip(1 + aciertos, 0, None)
 
             # Actualización del Genoma
-            if sumas:
+            if len(matriz) and pesos.sum() > 0:
                 # Rango de suma ideal (Percentiles 25-75 corregidos)
-                p25, p75 = np.percentile(sumas, [25, 75])
+                p25, p75 = percentil_ponderado(metricas['sumas'], pesos, [25, 75])
                 old_range = memoria_morf.get("ideal_sum_range", [20, 200])
                 memoria_morf["ideal_sum_range"] = [
                     int((old_range[0] * 0.9) + (p25 * 0.1)),
                     int((old_range[1] * 0.9) + (p75 * 0.1))
                 ]
 
-            suavizar_metrica("ideal_even_count", pares)
-            suavizar_metrica("ideal_consecutivos", cons)
-            suavizar_metrica("ideal_bajos_altos", bajos)
-            suavizar_metrica("ideal_terminaciones", terms)
-            suavizar_metrica("ideal_primos", primos)
-            suavizar_metrica("ideal_multiples_3", mult3)
-            suavizar_metrica("ideal_avg_delta", deltas)
+            suavizar_metrica("ideal_even_count", metricas['pares'], pesos)
+            suavizar_metrica("ideal_consecutivos", metricas['cons'], pesos)
+            suavizar_metrica("ideal_bajos_altos", metricas['bajos'], pesos)
+            suavizar_metrica("ideal_terminaciones", metricas['terms'], pesos)
+            suavizar_metrica("ideal_primos", metricas['primos'], pesos)
+            suavizar_metrica("ideal_multiples_3", metricas['mult3'], pesos)
+            suavizar_metrica("ideal_avg_delta", metricas['deltas'], pesos)
             
             morph_global[juego_id] = memoria_morf
             print(f"      🧬 ADN Sincronizado para {juego_id}.")
@@ -302,27 +385,14 @@ def analizar_adn_ganador():
     genoma["metadata"]["last_trained_id"] = max_id
     genoma["metadata"]["total_estudiados"] = genoma["metadata"].get("total_estudiados", 0) + len(df_nuevo)
 
-    # AUDITORÍA v4: Escritura atómica para prevenir corrupción
-    tmp_path = None
+    # AUDITORÍA v4: Escritura atómica y parcial (solo las secciones que aprende el entrenador)
+    secciones = {RANKING: genoma[RANKING], MORFOLOGIA: genoma[MORFOLOGIA], METADATA: genoma[METADATA]}
+    if RANKING_HORARIO in genoma:
+        secciones[RANKING_HORARIO] = genoma[RANKING_HORARIO]
     try:
-        dir_name = os.path.dirname(GENOMA_FILE)
-        with tempfile.NamedTemporaryFile(
-            mode='w',
-            encoding='utf-8',
-            suffix='.json',
-            dir=dir_name,
-            delete=False
-        ) as tmp_file:
-            json.dump(genoma, tmp_file, indent=2, ensure_ascii=False)
-            tmp_path = tmp_file.name
-        shutil.move(tmp_path, GENOMA_FILE)
+        GenomaStore(GENOMA_FILE).actualizar(secciones)
     except Exception as e:
         logger.error(f"Error guardando genoma: {e}")
-        if tmp_path and os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except OSError:
-                pass
         return
 
     logger.info(f"CEREBRO ACTUALIZADO (Checkpoint #{max_id})")
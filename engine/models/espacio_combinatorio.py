@@ -0,0 +1,184 @@
+"""
+ESPACIO COMBINATORIO - Todas las combinaciones de LOTO4 y RACHA en memoria
+==========================================================================
+LOTO4 (C(23,4) = 8.855) y RACHA (C(20,10) = 184.756) caben completos en
+memoria, asi que el consenso del soñador no necesita muestrear y rechazar
+con validar_cognitivamente: se puntua TODO el espacio de una vez.
+
+- Combinaciones como matriz uint8 (ordenadas, orden lexicografico) y
+  mascara de bits uint64 (mascaras_sorteo: bit k = numero k)
+- Rasgos morfologicos estaticos (suma, pares, consecutivos, primos)
+  calculados una vez y cacheados en disco (.npz)
+- Desviacion morfologica vectorizada frente al genoma (mismos criterios
+  que bot_dreamer.validar_cognitivamente)
+- Score de consenso = suma de los pesos de los numeros de la combinacion:
+  mejor combinacion valida exacta o muestreo ponderado entre validas
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import os
+import shutil
+import logging
+import tempfile
+import numpy as np
+from itertools import combinations
+from math import comb
+from typing import Dict, Optional
+
+from mascaras_sorteo import PRIMOS, mascaras
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(BASE_DIR, '..', '..', 'data'))
+
+# juego -> (min, max, n)
+ESPACIOS = {
+    "LOTO4": (1, 23, 4),
+    "RACHA": (1, 20, 10),
+}
+
+# Version del formato de cache (subir si cambian los rasgos)
+VERSION_CACHE = 2
+
+# juego -> EspacioCombinatorio ya cargado en este proceso
+_ESPACIOS_CARGADOS: Dict[str, 'EspacioCombinatorio'] = {}
+
+
+def _ruta_cache(juego: str) -> str:
+    return os.path.join(DATA_DIR, f"combinatoria_{juego.lower()}.npz")
+
+
+def generar_combinaciones(minimo: int, maximo: int, n: int) -> np.ndarray:
+    """Matriz uint8 (C(rango, n) x n) con todas las combinaciones ordenadas"""
+    total = comb(maximo - minimo + 1, n)
+    plano = np.fromiter((x for c in combinations(range(minimo, maximo + 1), n) for x in c),
+                        dtype=np.uint8, count=total * n)
+    return plano.reshape(total, n)
+
+
+def calcular_rasgos(combinaciones: np.ndarray) -> Dict[str, np.ndarray]:
+    """Rasgos morfologicos estaticos de cada combinacion (filas ordenadas)"""
+    valores = combinaciones.astype(np.int16)
+    es_primo = np.isin(valores, list(PRIMOS))
+    return {
+        'mascaras': mascaras(valores),
+        'suma': valores.sum(axis=1).astype(np.uint16),
+        'pares': (valores % 2 == 0).sum(axis=1).astype(np.uint8),
+        'consecutivos': (np.diff(valores, axis=1) == 1).sum(axis=1).astype(np.uint8),
+        'primos': es_primo.sum(axis=1).astype(np.uint8),
+    }
+
+
+class EspacioCombinatorio:
+    """Espacio completo de un juego sin reemplazo con sus rasgos cacheados"""
+
+    def __init__(self, juego: str, ruta_cache: Optional[str] = None):
+        self.juego = juego
+        self.minimo, self.maximo, self.n = ESPACIOS[juego]
+        self.ruta_cache = ruta_cache or _ruta_cache(juego)
+        self._cargar()
+
+    def _cargar(self):
+        if os.path.exists(self.ruta_cache):
+            try:
+                with np.load(self.ruta_cache) as cache:
+                    if int(cache['version']) == VERSION_CACHE and \
+                            tuple(cache['parametros']) == (self.minimo, self.maximo, self.n):
+                        self.combinaciones = cache['combinaciones']
+                        self.rasgos = {k: cache[k] for k in ['mascaras', 'suma', 'pares', 'consecutivos', 'primos']}
+                        return
+            except Exception as e:
+                logger.warning(f"Cache combinatoria ilegible ({self.juego}), se regenera: {e}")
+
+        self.combinaciones = generar_combinaciones(self.minimo, self.maximo, self.n)
+        self.rasgos = calcular_rasgos(self.combinaciones)
+        self._guardar()
+
+    def _guardar(self):
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(suffix='.npz', dir=os.path.dirname(self.ruta_cache),
+                                             delete=False) as tmp_file:
+                np.savez(tmp_file, version=VERSION_CACHE,
+                         parametros=np.array([self.minimo, self.maximo, self.n]),
+                         combinaciones=self.combinaciones, **self.rasgos)
+                tmp_path = tmp_file.name
+            shutil.move(tmp_path, self.ruta_cache)
+        except Exception as e:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            logger.warning(f"No se pudo cachear el espacio {self.juego}: {e}")
+
+    def __len__(self):
+        return len(self.combinaciones)
+
+    def desviacion(self, morph: Dict) -> np.ndarray:
+        """
+        Desviacion morfologica de cada combinacion frente al genoma
+        (vectorizacion de bot_dreamer.validar_cognitivamente).
+        """
+        if not morph:
+            return np.zeros(len(self))
+
+        rango_suma = morph.get('ideal_sum_range', [0, 999])
+        suma = self.rasgos['suma'].astype(float)
+        desviacion = np.maximum(rango_suma[0] - suma, 0) * 3 + np.maximum(suma - rango_suma[1], 0) * 3
+
+        for clave, rasgo in [("ideal_even_count", 'pares'), ("ideal_consecutivos", 'consecutivos'),
+                             ("ideal_primos", 'primos')]:
+            ideal = morph.get(clave, -1)
+            if ideal != -1:
+                desviacion += np.abs(self.rasgos[rasgo].astype(float) - ideal) * 5
+        return desviacion
+
+    def _vector_pesos(self, bolsa_pesos: Dict[int, float]) -> np.ndarray:
+        """Pesos por numero (indice = numero - min); sin voto = 0"""
+        pesos = np.zeros(self.maximo - self.minimo + 1)
+        for numero, peso in bolsa_pesos.items():
+            if self.minimo <= int(numero) <= self.maximo:
+                pesos[int(numero) - self.minimo] = peso
+        return pesos
+
+    def score_consenso(self, bolsa_pesos: Dict[int, float]) -> np.ndarray:
+        """Suma de los pesos de consenso de los numeros de cada combinacion"""
+        pesos = self._vector_pesos(bolsa_pesos)
+        return pesos[self.combinaciones.astype(np.intp) - self.minimo].sum(axis=1)
+
+    def mejor(self, score: np.ndarray, validas: np.ndarray) -> Optional[int]:
+        """Indice de la combinacion valida de mayor score (None si no hay validas)"""
+        if not validas.any():
+            return None
+        return int(np.argmax(np.where(validas, score, -np.inf)))
+
+    def muestrear(self, bolsa_pesos: Dict[int, float], validas: np.ndarray, k: int = 1,
+                  rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """
+        k combinaciones validas distintas, con probabilidad proporcional al
+        producto de las probabilidades de sus numeros (sin rechazo).
+        """
+        indices = np.flatnonzero(validas)
+        if len(indices) == 0:
+            return indices
+        rng = rng if rng is not None else np.random.default_rng()
+        pesos = self._vector_pesos(bolsa_pesos)
+        with np.errstate(divide='ignore'):
+            log_p = np.log(pesos / pesos.sum()) if pesos.sum() > 0 else np.zeros_like(pesos)
+        log_prob = log_p[self.combinaciones[indices].astype(np.intp) - self.minimo].sum(axis=1)
+        # Gumbel-top-k: k muestras sin reemplazo de softmax(log_prob)
+        claves = log_prob + rng.gumbel(size=len(indices))
+        return indices[np.argsort(-claves, kind='stable')[:min(k, len(indices))]]
+
+    def numeros(self, indice: int) -> list:
+        return [int(x) for x in self.combinaciones[indice]]
+
+
+def obtener_espacio(juego: str) -> Optional[EspacioCombinatorio]:
+    """Espacio del juego (cacheado en el proceso), o None si no es enumerable"""
+    if juego not in ESPACIOS:
+        return None
+    if juego not in _ESPACIOS_CARGADOS:
+        _ESPACIOS_CARGADOS[juego] = EspacioCombinatorio(juego)
+    return _ESPACIOS_CARGADOS[juego]
@@ -0,0 +1,395 @@
+"""
+ESPECULACION LOTO3 - Prediccion siguiente precalculada para cada resultado
+==========================================================================
+LOTO3 sortea 3 veces al dia y la prediccion del sorteo siguiente quedaba
+en el camino critico despues de scrapear el resultado (cargar datos,
+features completos, Markov, modelos por franja). Pero el proximo
+resultado es solo uno de 1000 valores.
+
+Entre sorteos se precalcula (loto3_ultra.especular_siguiente, que
+bot_dreamer llama despues de publicar y consolidar), para los
+resultados posibles del sorteo pendiente (los 1000 o los COBERTURA mas
+probables segun el ensemble actual), la prediccion que hara el ensemble
+Ultra cuando ese resultado se agregue al historial:
+
+- Fila de features incremental: las columnas que dependen del resultado
+  (rolling por posicion, rasgos de la combinacion) se calculan para los
+  10 digitos de cada posicion con las mismas operaciones de pandas sobre
+  la serie completa; el resto es constante. Se valida contra
+  FeatureEngineer completo en RESULTADOS_CONTROL antes de usarla
+- Markov, ventana adaptativa, frecuencias y patrones por digito/resultado
+- Modelo de la franja siguiente: un predict_proba por posicion para todo
+  el lote (ModeloFranjaHoraria.predecir_lote)
+- Tabla resultado -> candidatos en RUTA_MODELOS/especulacion.pkl, atada
+  a la huella del CSV base y de los modelos
+
+Cuando llega el resultado real, servir() verifica que el CSV sea el base
++ exactamente el sorteo esperado y responde desde la tabla en
+milisegundos. Cualquier diferencia (otro sorteo, modelos reentrenados,
+resultado fuera de cobertura) es un fallo y se usa el calculo normal.
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import os
+import io
+import re
+import csv
+import time
+import shutil
+import pickle
+import hashlib
+import logging
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import loto3_exacto
+import loto3_ultra
+from loto3_ultra import FRANJAS, PRIMOS_0_9, FeatureEngineer
+from calendario_sorteos import calendario, parsear_fecha
+
+logger = logging.getLogger(__name__)
+
+VERSION_TABLA = 1
+ARCHIVO_TABLA = "especulacion.pkl"
+COBERTURA = 1000      # Resultados precalculados (los mas probables primero)
+N_CANDIDATOS = 10     # Candidatos guardados por resultado
+
+POSICIONES = ['n1', 'n2', 'n3']
+# Referencia + controles contra FeatureEngineer completo (escalera, dobles pares, todos impares)
+RESULTADOS_CONTROL = (123, 886, 975)
+TOLERANCIA_CONTROL = 1e-9
+
+ARCHIVOS_MODELO = ('markov.pkl', 'franja_DIA.pkl', 'franja_TARDE.pkl', 'franja_NOCHE.pkl', 'feature_cols.json')
+_PATRON_ROLLING = re.compile(r'^(n[123])_rolling_(mean|std)_(\d+)$')
+
+# Digitos de cada resultado: _DIGITOS[indice] = [n1, n2, n3]
+_DIGITOS = np.stack(np.unravel_index(np.arange(1000), (10, 10, 10)), axis=1)
+
+
+def _rasgos_combinacion() -> Dict[str, np.ndarray]:
+    """Columnas de FeatureEngineer.generar_features_patrones para los 1000 resultados"""
+    ordenados = np.sort(_DIGITOS, axis=1)
+    return {
+        'tiene_repetido': loto3_exacto.REPETIDO.ravel().astype(int),
+        'es_escalera': loto3_exacto.ESCALERA.ravel().astype(int),
+        'todos_pares': (_DIGITOS % 2 == 0).all(axis=1).astype(int),
+        'todos_impares': (_DIGITOS % 2 == 1).all(axis=1).astype(int),
+        'suma_digitos': loto3_exacto.SUMA.ravel(),
+        'cant_primos': np.isin(_DIGITOS, list(PRIMOS_0_9)).sum(axis=1),
+        'rango_digitos': ordenados[:, 2] - ordenados[:, 0],
+    }
+
+
+RASGOS = _rasgos_combinacion()
+
+
+def _huella(datos: bytes) -> str:
+    return hashlib.sha256(datos).hexdigest()
+
+
+def huella_modelos(ruta_modelos: Optional[str] = None) -> Tuple:
+    """(archivo, tamano, mtime) de los modelos persistidos del ensemble"""
+    ruta_modelos = ruta_modelos or loto3_ultra.RUTA_MODELOS
+    huella = []
+    for nombre in ARCHIVOS_MODELO:
+        ruta = os.path.join(ruta_modelos, nombre)
+        if os.path.exists(ruta):
+            info = os.stat(ruta)
+            huella.append((nombre, info.st_size, info.st_mtime_ns))
+    return tuple(huella)
+
+
+def _sorteo_siguiente(sorteo: int, fecha: datetime) -> Tuple[int, datetime]:
+    """Sorteo programado inmediatamente despues de (sorteo, fecha)"""
+    return calendario('LOTO3').proximo_sorteo(sorteo, fecha, fecha)
+
+
+def _fila_hipotetica(columnas: List[str], sorteo: int, fecha: datetime, indice: int) -> Dict:
+    """Fila del CSV maestro tal como la escribiria el scraper (solo columnas usadas)"""
+    fila = {'sorteo': sorteo, 'fecha': fecha.strftime('%Y-%m-%d %H:%M:%S')}
+    if 'hora' in columnas:
+        fila['hora'] = fecha.hour
+    fila.update(zip(POSICIONES, (int(d) for d in _DIGITOS[indice])))
+    return fila
+
+
+class _Contexto:
+    """Historial base (sin el sorteo pendiente) y piezas por digito derivadas de el"""
+
+    def __init__(self, ensemble, previo: pd.DataFrame, fila_referencia: np.ndarray):
+        self.ensemble = ensemble
+        self.previo = previo
+        self.fila_referencia = fila_referencia
+        self.series = {pos: previo[pos].to_numpy() for pos in POSICIONES}
+        self._cache = {}
+
+    def serie(self, pos: str, digito: int) -> pd.Series:
+        """Serie de la posicion con el digito agregado (misma serie que veria FeatureEngineer)"""
+        clave = (pos, digito)
+        if clave not in self._cache:
+            self._cache[clave] = pd.Series(np.append(self.series[pos], digito))
+        return self._cache[clave]
+
+    def filas(self, indices: np.ndarray) -> np.ndarray:
+        """Filas de features (ultimo sorteo) para cada resultado hipotetico"""
+        filas = np.tile(self.fila_referencia, (len(indices), 1))
+        for j, col in enumerate(self.ensemble.feature_cols):
+            m = _PATRON_ROLLING.match(col)
+            if m:
+                pos, estadistico, ventana = m.group(1), m.group(2), int(m.group(3))
+                por_digito = np.array([getattr(self.serie(pos, d).rolling(ventana), estadistico)().iloc[-1]
+                                       for d in range(10)])
+                filas[:, j] = por_digito[_DIGITOS[indices, POSICIONES.index(pos)]]
+            elif col in RASGOS:
+                filas[:, j] = RASGOS[col][indices]
+        return filas
+
+    def markov(self) -> Dict[str, List[np.ndarray]]:
+        """Vector Markov de cada posicion para cada digito agregado"""
+        return {pos: [self.ensemble.markov.predecir_vector(pos, self.previo[pos].tail(9).tolist() + [d])
+                      for d in range(10)]
+                for pos in POSICIONES}
+
+    def volatilidades(self) -> Dict[str, List[float]]:
+        ventana = self.ensemble.ventana_adaptativa
+        return {pos: [ventana.calcular_volatilidad(self.serie(pos, d)) for d in range(10)] for pos in POSICIONES}
+
+    def frecuencias(self, digitos, window: int) -> np.ndarray:
+        """Matriz 3x10 de Loto3UltraEnsemble._calcular_frecuencias_recientes con el resultado agregado"""
+        matriz = np.empty((3, 10))
+        for i, pos in enumerate(POSICIONES):
+            ultimos = np.append(self.series[pos], digitos[i])[-window:]
+            matriz[i] = (np.bincount(ultimos, minlength=10) + 1) / (len(ultimos) + 10)
+        return matriz
+
+    def patrones(self, indice: int) -> Dict[str, float]:
+        """Loto3UltraEnsemble._analizar_patron_actual con el resultado agregado"""
+        previos = self.previo.tail(19)
+        n = len(previos) + 1
+        return {
+            'prob_repetido': (previos['tiene_repetido'].sum() + RASGOS['tiene_repetido'][indice]) / n,
+            'prob_escalera': (previos['es_escalera'].sum() + RASGOS['es_escalera'][indice]) / n,
+            'suma_promedio': (previos['suma_digitos'].sum() + RASGOS['suma_digitos'][indice]) / n,
+            'rango_promedio': (previos['rango_digitos'].sum() + RASGOS['rango_digitos'][indice]) / n,
+        }
+
+
+def construir_tabla(ensemble, ruta_csv: Optional[str] = None, cobertura: int = COBERTURA,
+                    n_candidatos: int = N_CANDIDATOS) -> Optional[Dict]:
+    """
+    Tabla resultado del sorteo pendiente -> candidatos del sorteo siguiente.
+
+    Returns:
+        Dict con la tabla y sus huellas, o None si no se puede especular
+        (modelos ausentes, historial corto o la fila incremental no
+        coincide con FeatureEngineer).
+    """
+    inicio = time.perf_counter()
+    ruta_csv = ruta_csv or loto3_ultra.RUTA_CSV
+    if not os.path.exists(ruta_csv):
+        return None
+    if not ensemble.trained:
+        ensemble._cargar_modelos()
+    if not ensemble.feature_cols:
+        logger.info("Especulacion LOTO3: ensemble sin modelos entrenados")
+        return None
+
+    with open(ruta_csv, 'rb') as f:
+        datos = f.read()
+    df = pd.read_csv(io.BytesIO(datos))
+    if len(df) < 50:
+        return None
+
+    # Sorteo pendiente (siguiente al ultimo registrado) y el que se predecira despues
+    fechas = pd.to_datetime(df['fecha'], errors='coerce')
+    ultimo = fechas.idxmax()
+    sorteo, fecha = _sorteo_siguiente(int(df.loc[ultimo, 'sorteo']), fechas[ultimo].to_pydatetime())
+    _, fecha_objetivo = _sorteo_siguiente(sorteo, fecha)
+    franja_actual = FRANJAS.get(fecha.hour, 'DIA')
+    franja_objetivo = FRANJAS.get(fecha_objetivo.hour, 'DIA')
+
+    # FeatureEngineer completo solo para los resultados de control
+    columnas = list(df.columns)
+    referencias = {}
+    for indice in RESULTADOS_CONTROL:
+        fila = _fila_hipotetica(columnas, sorteo, fecha, indice)
+        completo = FeatureEngineer(pd.concat([df, pd.DataFrame([fila])], ignore_index=True)).generar_todos_features()
+        if int(completo['sorteo'].iloc[-1]) != sorteo:
+            logger.warning("Especulacion LOTO3: el sorteo hipotetico no queda al final del historial")
+            return None
+        referencias[indice] = completo
+
+    completo = referencias[RESULTADOS_CONTROL[0]]
+    previo = completo.iloc[:-1]
+    contexto = _Contexto(ensemble, previo, completo[ensemble.feature_cols].iloc[-1].to_numpy(dtype=float))
+
+    controles = np.array(RESULTADOS_CONTROL)
+    esperadas = np.vstack([referencias[i][ensemble.feature_cols].iloc[-1].to_numpy(dtype=float) for i in controles])
+    if not np.allclose(contexto.filas(controles), esperadas, rtol=0, atol=TOLERANCIA_CONTROL, equal_nan=True):
+        logger.warning("Especulacion LOTO3: fila incremental distinta de FeatureEngineer. Se omite.")
+        return None
+
+    # Orden de cobertura: probabilidad del resultado segun el ensemble actual
+    respaldo = ensemble.df_procesado
+    try:
+        ensemble.df_procesado = previo
+        _, vectores_actuales, _ = ensemble._preparar_prediccion(franja_actual)
+    finally:
+        ensemble.df_procesado = respaldo
+    probabilidad = loto3_exacto.tensor_probabilidad(ensemble.matriz_ensemble(vectores_actuales)).ravel()
+    orden = np.lexsort((np.arange(1000), -probabilidad))[:max(1, min(int(cobertura), 1000))]
+
+    # Componentes por resultado
+    filas = contexto.filas(orden)
+    modelo_franja = ensemble.modelos_franja[franja_objetivo]
+    franja_entrenada = modelo_franja.trained
+    matrices_franja = modelo_franja.predecir_lote(filas) if franja_entrenada else np.full((len(orden), 3, 10), 0.1)
+    markov = contexto.markov()
+    volatilidades = contexto.volatilidades()
+
+    candidatos = {}
+    for k, indice in enumerate(orden):
+        digitos = _DIGITOS[indice]
+        window = ensemble.ventana_adaptativa.ventana_para(
+            np.mean([volatilidades[pos][d] for pos, d in zip(POSICIONES, digitos)]))
+        vectores = {
+            'franja': matrices_franja[k],
+            'franja_entrenada': franja_entrenada,
+            'markov': np.vstack([markov[pos][d] for pos, d in zip(POSICIONES, digitos)]),
+            'frecuencia': contexto.frecuencias(digitos, window),
+        }
+        candidatos[int(indice)] = ensemble.candidatos_ordenados(vectores, contexto.patrones(indice), n_candidatos)
+
+    segundos = time.perf_counter() - inicio
+    logger.info(f"Especulacion LOTO3: sorteo #{sorteo} ({fecha:%d/%m %H:%M}) -> {len(candidatos)} resultados "
+                f"precalculados ({probabilidad[orden].sum() * 100:.1f}% de probabilidad) en {segundos:.1f}s")
+    return {
+        'version': VERSION_TABLA,
+        'bytes_csv': len(datos),
+        'huella_csv': _huella(datos),
+        'huella_modelos': huella_modelos(),
+        'pesos': dict(ensemble.pesos),
+        'sorteo': sorteo,
+        'fecha': fecha,
+        'columnas_fijas': {c: v for c, v in _fila_hipotetica(columnas, sorteo, fecha, 0).items()
+                           if c in ensemble.feature_cols and c not in POSICIONES},
+        'franja_objetivo': franja_objetivo,
+        'n_candidatos': n_candidatos,
+        'candidatos': candidatos,
+        'probabilidad_cubierta': float(probabilidad[orden].sum()),
+        'segundos': round(segundos, 2),
+    }
+
+
+def cargar_tabla(ruta_tabla: Optional[str] = None) -> Optional[Dict]:
+    ruta_tabla = ruta_tabla or os.path.join(loto3_ultra.RUTA_MODELOS, ARCHIVO_TABLA)
+    if not os.path.exists(ruta_tabla):
+        return None
+    try:
+        with open(ruta_tabla, 'rb') as f:
+            tabla = pickle.load(f)
+        return tabla if isinstance(tabla, dict) and tabla.get('version') == VERSION_TABLA else None
+    except Exception as e:
+        logger.warning(f"Tabla especulativa ilegible: {e}")
+        return None
+
+
+def guardar_tabla(tabla: Dict, ruta_tabla: Optional[str] = None):
+    """
+    Escritura atomica de la tabla (tempfile + move). pickle directo y no
+    joblib: la tabla son solo dicts y el unpickler en C la carga ~10x mas
+    rapido, que es justamente lo que se mide en el camino critico.
+    """
+    ruta_tabla = ruta_tabla or os.path.join(loto3_ultra.RUTA_MODELOS, ARCHIVO_TABLA)
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(suffix='.pkl', dir=os.path.dirname(os.path.abspath(ruta_tabla)),
+                                         delete=False) as tmp_file:
+            tmp_path = tmp_file.name
+            pickle.dump(tabla, tmp_file, protocol=pickle.HIGHEST_PROTOCOL)
+        shutil.move(tmp_path, ruta_tabla)
+    except Exception as e:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        logger.error(f"Error guardando tabla especulativa: {e}")
+
+
+def especular(ensemble, ruta_csv: Optional[str] = None, ruta_tabla: Optional[str] = None,
+              cobertura: int = COBERTURA) -> Optional[Dict]:
+    """Construye y guarda la tabla si la vigente no corresponde al CSV y modelos actuales"""
+    ruta_csv = ruta_csv or loto3_ultra.RUTA_CSV
+    if not os.path.exists(ruta_csv):
+        return None
+    with open(ruta_csv, 'rb') as f:
+        huella = _huella(f.read())
+
+    vigente = cargar_tabla(ruta_tabla)
+    if (vigente and vigente['huella_csv'] == huella and vigente['huella_modelos'] == huella_modelos()
+            and len(vigente['candidatos']) >= min(int(cobertura), 1000)):
+        return vigente
+
+    tabla = construir_tabla(ensemble, ruta_csv, cobertura=cobertura)
+    if tabla is not None:
+        guardar_tabla(tabla, ruta_tabla)
+    return tabla
+
+
+def _fallo(motivo: str) -> None:
+    logger.info(f"Especulacion LOTO3: sin acierto ({motivo}). Calculo normal.")
+    return None
+
+
+def servir(ensemble, franja: str, n_candidatos: int = N_CANDIDATOS, ruta_csv: Optional[str] = None,
+           ruta_tabla: Optional[str] = None) -> Optional[List[Dict]]:
+    """
+    Prediccion desde la tabla si el CSV es exactamente el base + el sorteo
+    especulado. None ante cualquier diferencia (el llamador calcula normal).
+    """
+    inicio = time.perf_counter()
+    tabla = cargar_tabla(ruta_tabla)
+    if tabla is None:
+        return None
+    if franja != tabla['franja_objetivo'] or n_candidatos > tabla['n_candidatos']:
+        return _fallo("franja o cantidad distinta")
+    if tabla['pesos'] != dict(ensemble.pesos) or tabla['huella_modelos'] != huella_modelos():
+        return _fallo("modelos cambiaron")
+
+    ruta_csv = ruta_csv or loto3_ultra.RUTA_CSV
+    if not os.path.exists(ruta_csv):
+        return None
+    with open(ruta_csv, 'rb') as f:
+        datos = f.read()
+    base = tabla['bytes_csv']
+    if len(datos) <= base or _huella(datos[:base]) != tabla['huella_csv']:
+        return _fallo("historial base distinto")
+
+    nuevas = [l for l in datos[base:].decode('utf-8', errors='replace').splitlines() if l.strip()]
+    if len(nuevas) != 1:
+        return _fallo(f"{len(nuevas)} sorteos nuevos")
+    columnas = next(csv.reader([datos.split(b'\n', 1)[0].decode('utf-8-sig').strip()]))
+    fila = dict(zip(columnas, next(csv.reader([nuevas[0]]))))
+
+    try:
+        if int(float(fila['sorteo'])) != tabla['sorteo'] or parsear_fecha(fila['fecha']) != tabla['fecha']:
+            return _fallo(f"sorteo #{fila.get('sorteo')} no es el especulado")
+        if any(float(fila[c]) != float(v) for c, v in tabla['columnas_fijas'].items()):
+            return _fallo("columnas del sorteo distintas")
+        digitos = [int(float(fila[pos])) for pos in POSICIONES]
+    except (KeyError, ValueError, TypeError):
+        return _fallo("fila nueva ilegible")
+    if not all(0 <= d <= 9 for d in digitos):
+        return _fallo("digitos fuera de rango")
+
+    candidatos = tabla['candidatos'].get(digitos[0] * 100 + digitos[1] * 10 + digitos[2])
+    if candidatos is None:
+        return _fallo(f"resultado {''.join(map(str, digitos))} fuera de cobertura")
+
+    logger.info(f"Especulacion LOTO3: acierto para {''.join(map(str, digitos))} "
+                f"({(time.perf_counter() - inicio) * 1000:.1f} ms)")
+    return [dict(c) for c in candidatos[:n_candidatos]]
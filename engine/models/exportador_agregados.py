@@ -0,0 +1,461 @@
+"""
+EXPORTADOR AGREGADOS - Productos de datos precalculados para el front
+=====================================================================
+laboratorio.js descargaba los seis CSV crudos (con ?t=Date.now(), sin
+cache posible) y los separaba línea a línea; index.js parseaba con Papa
+todo el historial LOTO y LOTO_SIMULACIONES.csv.
+
+Esta etapa (después de la consolidación) genera en agregados/:
+    index.json                      -> producto -> archivo con hash (no-store)
+    <producto>.<hash>.json          -> contenido inmutable (cacheable)
+
+Productos:
+- maestro_<JUEGO>:  ventana de sorteos referenciados por simulaciones/jugadas
+                    (números, fecha, comodín, mapas de premios y ganadores)
+- simulaciones:     tickets en columnas ya tipadas (sin regex en el browser)
+- jugadas:          jugadas reales marcadas como jugadas
+- estadisticas:     aciertos por juego/algoritmo y evolución de afinidad
+- historial_loto(_reciente): columnas del historial LOTO que usa index.js
+                    (últimos sorteos al inicio, completo bajo demanda)
+- combinaciones_loto / mecanica_loto: combinaciones pasadas y heatmap
+                    posición x número
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import os
+import re
+import glob
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.normpath(os.path.join(BASE_DIR, '..', '..'))
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
+AGREGADOS_DIR = os.path.join(PROJECT_ROOT, 'agregados')
+
+INDICE = 'index.json'
+PATRON_PRODUCTO = re.compile(r'^(?P<nombre>[a-z0-9_]+)\.(?P<hash>[0-9a-f]{16})\.json$')
+
+ARCHIVOS_MAESTROS = {
+    'LOTO': 'LOTO_HISTORIAL_MAESTRO.csv',
+    'LOTO3': 'LOTO3_MAESTRO.csv',
+    'LOTO4': 'LOTO4_MAESTRO.csv',
+    'RACHA': 'RACHA_MAESTRO.csv',
+}
+ARCHIVO_SIMULACIONES = 'LOTO_SIMULACIONES.csv'
+ARCHIVO_JUGADAS = 'LOTO_JUGADAS.csv'
+
+# Sorteos exportados por juego cuando ninguna simulación lo referencia
+VENTANA_SORTEOS = 200
+# Filas del historial usadas por el peso mecánico de index.js (allData.slice(0, 100))
+VENTANA_MECANICA = 100
+MAX_NUMERO_LOTO = 41
+
+# Mismas columnas que leía processMaster() en laboratorio.js
+COLUMNAS_NUMEROS = {
+    'LOTO': [f'LOTO_n{i}' for i in range(1, 7)],
+    'LOTO3': ['n1', 'n2', 'n3'],
+    'LOTO4': ['n1', 'n2', 'n3', 'n4'],
+    'RACHA': [f'n{i}' for i in range(1, 11)],
+}
+COLUMNAS_COMODIN = {'LOTO': 'LOTO_comodin'}
+COLUMNAS_PREMIOS = {
+    'LOTO': {
+        'LOTO': 'LOTO_MONTO',
+        'SQUINA': 'SUPER_QUINA_5_ACIERTOS_COMODIN_MONTO',
+        'QUINA': 'QUINA_5_ACIERTOS_MONTO',
+        'SCUATERNA': 'SUPER_CUATERNA_4_ACIERTOS_COMODIN_MONTO',
+        'CUATERNA': 'CUATERNA_4_ACIERTOS_MONTO',
+        'STERNA': 'SUPER_TERNA_3_ACIERTOS_COMODIN_MONTO',
+        'TERNA': 'TERNA_3_ACIERTOS_MONTO',
+        'SDUPLA': 'SUPER_DUPLA_2_ACIERTOS_COMODIN_MONTO',
+        'POZO_REAL': 'LOTO_POZO_REAL',
+    },
+    'LOTO4': {'4P': '4_PUNTOS_MONTO', '3P': '3_PUNTOS_MONTO', '2P': '2_PUNTOS_MONTO'},
+    'LOTO3': {k: k for k in ('EXACTA_MONTO', 'TRIO_PAR_MONTO', 'TRIO_AZAR_MONTO',
+                             'PAR_MONTO', 'TERMINACION_MONTO')},
+}
+COLUMNAS_GANADORES = {
+    'LOTO': {
+        'LOTO': 'LOTO_GANADORES',
+        'SQUINA': 'SUPER_QUINA_5_ACIERTOS_COMODIN_GANADORES',
+        'QUINA': 'QUINA_5_ACIERTOS_GANADORES',
+        'SCUATERNA': 'SUPER_CUATERNA_4_ACIERTOS_COMODIN_GANADORES',
+        'CUATERNA': 'CUATERNA_4_ACIERTOS_GANADORES',
+        'STERNA': 'SUPER_TERNA_3_ACIERTOS_COMODIN_GANADORES',
+        'TERNA': 'TERNA_3_ACIERTOS_GANADORES',
+        'SDUPLA': 'SUPER_DUPLA_2_ACIERTOS_COMODIN_GANADORES',
+    },
+    'LOTO4': {'4P': '4_PUNTOS_GANADORES', '3P': '3_PUNTOS_GANADORES', '2P': '2_PUNTOS_GANADORES'},
+    'LOTO3': {k: f'{k}_GANADORES' for k in ('EXACTA', 'TRIO_PAR', 'TRIO_AZAR', 'PAR', 'TERMINACION')},
+}
+
+# Columnas del historial LOTO que usa index.js (bolitas, premios y pozos;
+# las posiciones físicas ya van resumidas en mecanica_loto)
+PATRON_COLUMNAS_HISTORIAL = re.compile(
+    r'^(sorteo|fecha'
+    r'|(LOTO|RECARGADO|REVANCHA|DESQUITE|AHORA_SI_QUE_SI)_n\d+'
+    r'|.*_(comodin|GANADORES|MONTO|POZO_ACUMULADO|ACUMULADO|POZO_REAL))$'
+)
+# Últimos sorteos que index.js carga al inicio (tabla de historial); el
+# historial completo solo se descarga al buscar o filtrar ganadores
+VENTANA_HISTORIAL = 100
+
+# Categorías de algoritmo del gráfico evolutivo (updateEvolutionChart)
+CATEGORIAS_ALGORITMO = ('forense', 'gauss', 'delta', 'markov', 'consenso')
+
+
+# =============================================================================
+# UTILIDADES
+# =============================================================================
+def _leer_csv_texto(path: str) -> Optional[pd.DataFrame]:
+    """CSV como texto crudo (mismos valores que veía el browser)"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_csv(path, dtype=str, keep_default_na=False)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, IOError) as e:
+        logger.warning(f"No se pudo leer {path}: {e}")
+        return None
+
+
+def _enteros(serie: pd.Series, defecto=None) -> list:
+    """parseInt de JS: trunca y deja `defecto` para vacíos/inválidos"""
+    valores = pd.to_numeric(serie, errors='coerce').to_numpy(dtype=float)
+    return [defecto if np.isnan(v) else int(v) for v in valores]
+
+
+def _reales(serie: pd.Series, defecto=0.0) -> list:
+    valores = pd.to_numeric(serie, errors='coerce').to_numpy(dtype=float)
+    return [defecto if np.isnan(v) else (int(v) if v.is_integer() else float(v)) for v in valores]
+
+
+def _celda(valor: str):
+    """Texto de CSV -> número JSON si es numérico, null si está vacío"""
+    if valor == '':
+        return None
+    try:
+        numero = float(valor)
+    except ValueError:
+        return valor
+    if not np.isfinite(numero):
+        return valor
+    return int(numero) if numero.is_integer() and '.' not in valor else numero
+
+
+def _diccionario(valores: list) -> dict:
+    """Columna de baja cardinalidad como {valores, codigos}"""
+    codigos, unicos = pd.factorize(pd.Series(valores, dtype=object), use_na_sentinel=False)
+    return {"valores": list(unicos), "codigos": codigos.tolist()}
+
+
+def _serializar(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode('utf-8')
+
+
+def _escribir_atomico(path: str, contenido: bytes):
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(mode='wb', suffix='.tmp', dir=os.path.dirname(path),
+                                         delete=False) as tmp_file:
+            tmp_file.write(contenido)
+            tmp_path = tmp_file.name
+        shutil.move(tmp_path, path)
+    except Exception:
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        raise
+
+
+# =============================================================================
+# PRODUCTOS
+# =============================================================================
+def producto_simulaciones(df: Optional[pd.DataFrame]) -> dict:
+    """
+    Tickets en columnas (equivalente a RAW_SIMULATIONS antes de invertir).
+    Las columnas repetitivas van como diccionario {valores, codigos}.
+    """
+    if df is None or df.empty:
+        return {"filas": 0}
+    vacio = pd.Series('', index=df.index)
+    col = lambda nombre: df[nombre] if nombre in df.columns else vacio
+    juego = col('juego') if 'juego' in df.columns else pd.Series('LOTO', index=df.index)
+    return {
+        "filas": len(df),
+        "id": [_celda(v) for v in col('id')],
+        "fecha": _diccionario(col('fecha_generacion').tolist()),
+        "juego": _diccionario(juego.tolist()),
+        "numeros": col('numeros').str.replace('"', '', regex=False).tolist(),
+        "objetivo": _diccionario(col('sorteo_objetivo').tolist()),
+        "estado": _diccionario(col('estado').tolist()),
+        "aciertos": _enteros(col('aciertos'), 0),
+        "score": _reales(col('score_afinidad'), 0),
+        "hora": _enteros(col('hora_dia')),
+        "algoritmo": _diccionario(col('algoritmo').str.replace('\r', '', regex=False)
+                                  .replace('', 'unknown').tolist()),
+        "fecha_lanzamiento": _diccionario(col('fecha_lanzamiento').str.strip().tolist()),
+        "modalidad": _diccionario(col('modalidad').str.strip().tolist()),
+    }
+
+
+def _decodificar(columna) -> list:
+    """Inversa de _diccionario (acepta también listas planas)"""
+    if isinstance(columna, dict):
+        return [columna["valores"][c] for c in columna["codigos"]]
+    return list(columna)
+
+
+def producto_jugadas(df: Optional[pd.DataFrame]) -> list:
+    """Jugadas reales con jugado_realmente == 'SI' (processPlays)"""
+    if df is None or df.empty or 'jugado_realmente' not in df.columns:
+        return []
+    jugadas = df[df['jugado_realmente'] == 'SI']
+    col = lambda nombre: jugadas[nombre] if nombre in jugadas.columns else pd.Series('', index=jugadas.index)
+    return [
+        {"numeros": n.replace('"', ''), "objetivo": o, "juego": j or 'LOTO'}
+        for n, o, j in zip(col('numeros'), col('sorteo_objetivo'), col('juego'))
+    ]
+
+
+def _objetivos_referenciados(simulaciones: dict, jugadas: list) -> Dict[str, int]:
+    """Menor sorteo objetivo referenciado por juego"""
+    minimos = {}
+    pares = []
+    if simulaciones.get('filas'):
+        pares = list(zip(_decodificar(simulaciones['juego']), _decodificar(simulaciones['objetivo'])))
+    pares += [(j['juego'], j['objetivo']) for j in jugadas]
+    for juego, objetivo in pares:
+        try:
+            valor = int(float(objetivo))
+        except (TypeError, ValueError):
+            continue
+        if juego not in minimos or valor < minimos[juego]:
+            minimos[juego] = valor
+    return minimos
+
+
+def producto_maestro(juego: str, df: pd.DataFrame, desde: Optional[int] = None) -> dict:
+    """
+    Mapas de processMaster() en columnas, solo para la ventana de sorteos
+    que el laboratorio puede consultar (>= `desde`, o los últimos
+    VENTANA_SORTEOS si ningún ticket apunta a este juego).
+    """
+    if 'sorteo' not in df.columns:
+        return {"juego": juego, "sorteos": []}
+    df = df[df['sorteo'] != '']
+    if desde is not None:
+        df = df[pd.to_numeric(df['sorteo'], errors='coerce') >= desde]
+    else:
+        df = df.tail(VENTANA_SORTEOS)
+
+    columnas = [c for c in COLUMNAS_NUMEROS[juego] if c in df.columns]
+    numeros = np.column_stack([_enteros(df[c]) for c in columnas]).tolist() if columnas and len(df) else [[] for _ in range(len(df))]
+    fechas = df['fecha'].str.split(' ').str[0].tolist() if 'fecha' in df.columns else None
+
+    producto = {
+        "juego": juego,
+        "sorteos": df['sorteo'].tolist(),
+        "numeros": numeros,
+        "premios": {clave: _reales(df[c]) if c in df.columns else [0] * len(df)
+                    for clave, c in COLUMNAS_PREMIOS.get(juego, {}).items()},
+        "ganadores": {clave: _enteros(df[c], 0) if c in df.columns else [0] * len(df)
+                      for clave, c in COLUMNAS_GANADORES.get(juego, {}).items()},
+    }
+    if fechas is not None:
+        producto["fechas"] = fechas
+    comodin = COLUMNAS_COMODIN.get(juego)
+    if comodin and comodin in df.columns:
+        producto["comodin"] = _enteros(df[comodin])
+    return producto
+
+
+def _categoria_algoritmo(algoritmo: str) -> str:
+    if algoritmo in ('oraculo_neural_v3', 'oraculo_neural_v4'):
+        return algoritmo
+    for categoria in CATEGORIAS_ALGORITMO:
+        if categoria in algoritmo:
+            return categoria
+    return 'unknown'
+
+
+def producto_estadisticas(simulaciones: dict) -> dict:
+    """
+    Aciertos por juego y algoritmo sobre tickets AUDITADOS, más la curva
+    de afinidad promedio por sorteo objetivo de cada categoría de algoritmo.
+    """
+    juegos = {}
+    evolucion = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+    total = 0
+    if not simulaciones.get('filas'):
+        return {"total_auditados": 0, "juegos": {}}
+    columnas = ('estado', 'juego', 'algoritmo', 'objetivo', 'aciertos', 'score')
+    filas = zip(*(_decodificar(simulaciones[c]) for c in columnas))
+    for estado, juego, algoritmo, objetivo, aciertos, score in filas:
+        if estado != 'AUDITADO':
+            continue
+        total += 1
+
+        info = juegos.setdefault(juego, {"auditados": 0, "histograma_aciertos": {}, "algoritmos": {}})
+        info["auditados"] += 1
+        info["histograma_aciertos"][str(aciertos)] = info["histograma_aciertos"].get(str(aciertos), 0) + 1
+
+        algo = info["algoritmos"].setdefault(algoritmo, {"auditados": 0, "suma_aciertos": 0,
+                                                         "max_aciertos": 0, "suma_score": 0.0})
+        algo["auditados"] += 1
+        algo["suma_aciertos"] += aciertos
+        algo["max_aciertos"] = max(algo["max_aciertos"], aciertos)
+        algo["suma_score"] += score
+
+        try:
+            objetivo = int(float(objetivo))
+        except (TypeError, ValueError):
+            continue
+        evolucion[juego][_categoria_algoritmo(algoritmo)][objetivo].append(score)
+
+    for juego, info in juegos.items():
+        for algo in info["algoritmos"].values():
+            algo["aciertos_promedio"] = round(algo["suma_aciertos"] / algo["auditados"], 4)
+            algo["score_promedio"] = round(algo.pop("suma_score") / algo["auditados"], 4)
+        info["evolucion"] = {
+            categoria: [[t, sum(s) / len(s)] for t, s in sorted(por_sorteo.items())]
+            for categoria, por_sorteo in evolucion[juego].items()
+        }
+    return {"total_auditados": total, "juegos": juegos}
+
+
+def producto_historial_loto(df: pd.DataFrame, ultimos: Optional[int] = None) -> dict:
+    """
+    Historial LOTO (solo columnas usadas por index.js) en orden del CSV.
+    Celdas numéricas como números y vacías como null; index.js las
+    vuelve a texto para conservar la semántica de Papa.parse.
+    """
+    columnas = [c for c in df.columns if PATRON_COLUMNAS_HISTORIAL.match(c)]
+    df = df[df['sorteo'] != ''] if 'sorteo' in df.columns else df
+    if ultimos is not None:
+        df = df.tail(ultimos)
+    filas = [[_celda(v) for v in fila] for fila in df[columnas].itertuples(index=False, name=None)]
+    return {"columnas": columnas, "total": len(filas), "filas": filas}
+
+
+def producto_combinaciones_loto(df: pd.DataFrame) -> list:
+    """Combinaciones LOTO ya sorteadas como 'a-b-c-d-e-f' (ordenadas)"""
+    columnas = COLUMNAS_NUMEROS['LOTO']
+    if not set(columnas) <= set(df.columns):
+        return []
+    validas = df[(df['LOTO_n1'] != '') & (df['LOTO_n6'] != '')]
+    numeros = np.column_stack([_enteros(validas[c], -1) for c in columnas]) if len(validas) else np.empty((0, 6), int)
+    numeros.sort(axis=1)
+    return sorted({'-'.join(map(str, fila)) for fila in numeros.tolist()})
+
+
+def producto_mecanica_loto(df: pd.DataFrame) -> dict:
+    """
+    Heatmap posición x número sobre las filas que recorría
+    getMechanicalWeight(): conteos[pos-1][numero-1].
+    """
+    filas = df.head(VENTANA_MECANICA)
+    conteos = np.zeros((6, MAX_NUMERO_LOTO), dtype=np.int64)
+    for pos in range(1, 7):
+        fisico = _enteros(filas.get(f'LOTO_pos{pos}', pd.Series('', index=filas.index)), 0)
+        ordenado = _enteros(filas.get(f'LOTO_n{pos}', pd.Series('', index=filas.index)), 0)
+        valores = np.array([p or n for p, n in zip(fisico, ordenado)], dtype=np.int64)
+        validos = valores[(valores >= 1) & (valores <= MAX_NUMERO_LOTO)]
+        conteos[pos - 1] = np.bincount(validos - 1, minlength=MAX_NUMERO_LOTO)
+    sorteos = int((filas['LOTO_n1'] != '').sum()) if 'LOTO_n1' in filas.columns else 0
+    return {"ventana": VENTANA_MECANICA, "sorteos": sorteos, "conteos": conteos.tolist()}
+
+
+# =============================================================================
+# EXPORTACIÓN
+# =============================================================================
+def generar_productos(data_dir: str = DATA_DIR) -> Dict[str, object]:
+    df_sims = _leer_csv_texto(os.path.join(data_dir, ARCHIVO_SIMULACIONES))
+    simulaciones = producto_simulaciones(df_sims)
+    jugadas = producto_jugadas(_leer_csv_texto(os.path.join(data_dir, ARCHIVO_JUGADAS)))
+    productos = {
+        "simulaciones": simulaciones,
+        "jugadas": jugadas,
+        "estadisticas": producto_estadisticas(simulaciones),
+    }
+
+    minimos = _objetivos_referenciados(simulaciones, jugadas)
+    for juego, archivo in ARCHIVOS_MAESTROS.items():
+        df = _leer_csv_texto(os.path.join(data_dir, archivo))
+        if df is None:
+            continue
+        productos[f"maestro_{juego.lower()}"] = producto_maestro(juego, df, minimos.get(juego))
+        if juego == 'LOTO':
+            productos["historial_loto"] = producto_historial_loto(df)
+            productos["historial_loto_reciente"] = producto_historial_loto(df, VENTANA_HISTORIAL)
+            productos["combinaciones_loto"] = producto_combinaciones_loto(df)
+            productos["mecanica_loto"] = producto_mecanica_loto(df)
+    return productos
+
+
+def exportar(data_dir: str = DATA_DIR, destino: str = AGREGADOS_DIR) -> dict:
+    """
+    Escribe cada producto como <nombre>.<hash>.json (solo si cambió) y
+    luego index.json. Se conservan los archivos del índice anterior para
+    que un cliente que ya lo descargó pueda terminar de cargar.
+
+    Returns:
+        El índice escrito
+    """
+    os.makedirs(destino, exist_ok=True)
+    ruta_indice = os.path.join(destino, INDICE)
+    anterior = {}
+    if os.path.exists(ruta_indice):
+        try:
+            with open(ruta_indice, 'r', encoding='utf-8') as f:
+                anterior = json.load(f).get("productos", {})
+        except (json.JSONDecodeError, IOError):
+            anterior = {}
+
+    indice = {"version": 1, "generado": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "productos": {}}
+    for nombre, data in generar_productos(data_dir).items():
+        contenido = _serializar(data)
+        digest = hashlib.sha256(contenido).hexdigest()[:16]
+        archivo = f"{nombre}.{digest}.json"
+        if not os.path.exists(os.path.join(destino, archivo)):
+            _escribir_atomico(os.path.join(destino, archivo), contenido)
+        indice["productos"][nombre] = {"archivo": archivo, "bytes": len(contenido)}
+
+    _escribir_atomico(ruta_indice, json.dumps(indice, ensure_ascii=False, indent=2).encode('utf-8'))
+
+    # Limpieza: todo lo que no referencian ni el índice nuevo ni el anterior
+    vigentes = {p["archivo"] for p in indice["productos"].values()}
+    vigentes |= {p.get("archivo") for p in anterior.values()}
+    for path in glob.glob(os.path.join(destino, '*.json')):
+        nombre = os.path.basename(path)
+        if PATRON_PRODUCTO.match(nombre) and nombre not in vigentes:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"No se pudo borrar {nombre}: {e}")
+
+    total = sum(p["bytes"] for p in indice["productos"].values())
+    logger.info(f"Agregados exportados: {len(indice['productos'])} productos, {total / 1024:.1f} KB")
+    return indice
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    indice = exportar()
+    for nombre, info in indice["productos"].items():
+        print(f"  {info['archivo']:<45} {info['bytes'] / 1024:8.1f} KB")
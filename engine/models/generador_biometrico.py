@@ -1,7 +1,12 @@
 import pandas as pd
+import numpy as np
 import json
 import os
 import re
+import sys
+import tempfile
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # --- CONFIGURACIÓN ---
@@ -34,11 +39,56 @@ RANGOS_JUEGO = {
 # Suavizado Laplace: añade 1 a todos los conteos para evitar prob 0
 LAPLACE_SMOOTHING = 1
 
+# Estado incremental: se guarda junto a cada juego para retomar desde el último sorteo
+ESTADO_KEY = "state"
+
 def safe_int(x):
     try: return int(x)
     except: return None
 
-def generar_biometria():
+def _a_enteros(serie):
+    """Convierte una columna a floats truncados (int(float(x))). NaN = inválido."""
+    valores = pd.to_numeric(serie, errors='coerce').to_numpy(dtype=float, copy=True)
+    valores[~np.isfinite(valores)] = np.nan
+    return np.trunc(valores)
+
+def _firma_fila(df, idx):
+    """Identifica la fila idx (para detectar si el CSV fue reescrito)."""
+    if idx < 0 or idx >= len(df):
+        return None
+    if 'sorteo' in df.columns:
+        return str(df['sorteo'].iloc[idx])
+    return str(idx)
+
+def _estado_previo(previo, df, positions_dict):
+    """
+    Retorna el estado incremental reutilizable de un juego o None.
+    Se descarta si cambió el mapeo de columnas o si el CSV ya no contiene
+    la misma fila en la posición donde se detuvo el cálculo anterior.
+    """
+    if not previo or ESTADO_KEY not in previo:
+        return None
+    estado = previo[ESTADO_KEY]
+    filas = estado.get("rows", 0)
+    if filas > len(df) or filas <= 0:
+        return None
+    if estado.get("anchor") != _firma_fila(df, filas - 1):
+        return None
+    columnas = {str(pos): col for pos, col in positions_dict.items()}
+    if estado.get("columns") != columnas:
+        return None
+    return estado
+
+def generar_biometria(pretty=False, incremental=True, max_workers=None):
+    """
+    Genera loto_biometrics.json.
+
+    Args:
+        pretty: Escribe el JSON indentado (legible). Por defecto compacto.
+        incremental: Reutiliza los conteos del JSON anterior y solo procesa
+                     los sorteos agregados desde entonces.
+        max_workers: Hilos para procesar sub-juegos en paralelo.
+    """
     print("🧬 INICIANDO GENERADOR BIOMÉTRICO...")
     
     biometrics = {
@@ -49,7 +99,17 @@ def generar_biometria():
         "games": {}
     }
 
+    previos = {}
+    if incremental and os.path.exists(OUTPUT_FILE):
+        try:
+            with open(OUTPUT_FILE, 'r', encoding='utf-8') as f:
+                previos = json.load(f).get("games", {})
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"   ⚠️ Biometría previa ilegible ({e}). Recalculando completo.")
+            previos = {}
+
     total_sorteos = 0
+    tareas = []  # (df, game_name, positions_dict)
 
     for nombre_universo, config in UNIVERSOS.items():
         csv_path = os.path.join(DATA_DIR, config['file'])
@@ -74,9 +134,9 @@ def generar_biometria():
                         if game_subname not in games_found: games_found[game_subname] = {}
                         games_found[game_subname][pos] = col
                 
-                # Procesar cada sub-juego encontrado
+                # Cada sub-juego encontrado se procesa como tarea independiente
                 for game, positions in games_found.items():
-                    _procesar_juego(df, game, positions, biometrics)
+                    tareas.append((df, game, positions))
 
             # --- MODO 2: SIMPLE (Para Loto3, 4, Racha que tienen n1, n2...) ---
             elif config['mode'] == 'simple':
@@ -87,21 +147,55 @@ def generar_biometria():
                         positions[i] = col_name
                 
                 if positions:
-                    _procesar_juego(df, nombre_universo, positions, biometrics)
+                    tareas.append((df, nombre_universo, positions))
 
         except Exception as e:
             print(f"   ❌ Error en {nombre_universo}: {e}")
 
+    # Sub-juegos en paralelo (NumPy libera el GIL en bincount/aritmética)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = [
+            executor.submit(_calcular_juego, df, game, positions, previos.get(game))
+            for df, game, positions in tareas
+        ]
+        # Se asigna en orden de envío para mantener estable el orden de "games"
+        for (_, game, _), futuro in zip(tareas, futuros):
+            try:
+                biometrics["games"][game] = futuro.result()
+            except Exception as e:
+                print(f"   ❌ Error en {game}: {e}")
+
     # Guardar Metadata Global
     biometrics["metadata"]["total_sorteos_analizados"] = total_sorteos
 
-    # Escribir JSON
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(biometrics, f, indent=2)
+    # Escribir JSON (compacto salvo modo pretty) con escritura atómica
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            mode='w',
+            encoding='utf-8',
+            suffix='.json',
+            dir=os.path.dirname(OUTPUT_FILE),
+            delete=False
+        ) as tmp_file:
+            if pretty:
+                json.dump(biometrics, tmp_file, indent=2)
+            else:
+                json.dump(biometrics, tmp_file, separators=(',', ':'))
+            tmp_path = tmp_file.name
+        shutil.move(tmp_path, OUTPUT_FILE)
+    except Exception as e:
+        print(f"   ❌ Error guardando biometría: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return
     
     print(f"\n✅ CEREBRO SINCRONIZADO. Archivo guardado en: {OUTPUT_FILE}")
 
-def _procesar_juego(df, game_name, positions_dict, biometrics_dict):
+def _calcular_juego(df, game_name, positions_dict, previo=None):
     """
     Auxiliar para calcular frecuencias con suavizado Laplace.
 
@@ -109,6 +203,11 @@ def _procesar_juego(df, game_name, positions_dict, biometrics_dict):
     - Suavizado Laplace: +1 a todos los números para evitar prob 0
     - Normalización a pesos (probabilidades)
     - Incluye rango completo del juego
+
+    MEJORAS v2.2:
+    - Conteos con np.bincount y correlaciones con histogramas 2-D
+    - Incremental: si `previo` (entrada del JSON anterior) es válido, solo
+      se procesan las filas nuevas y se suman a sus conteos crudos
     """
     game_data = {
         "source_type": "MECHANICAL",
@@ -118,40 +217,50 @@ def _procesar_juego(df, game_name, positions_dict, biometrics_dict):
     # Determinar rango de números para este juego
     rango = RANGOS_JUEGO.get(game_name, (1, 41))
     min_num, max_num = rango
+    size = max_num - min_num + 1
+
+    estado = _estado_previo(previo, df, positions_dict)
+    inicio = estado["rows"] if estado else 0
+    nuevas = df.iloc[inicio:]
+    if estado:
+        print(f"      ♻️ {game_name}: incremental desde fila {inicio} ({len(nuevas)} sorteos nuevos)")
 
     sorted_pos = sorted(positions_dict.keys())
+    valores = {pos: _a_enteros(nuevas[positions_dict[pos]]) for pos in sorted_pos}
+
     for pos in sorted_pos:
         col = positions_dict[pos]
 
-        # Calcular frecuencias observadas con conversión segura
-        def safe_convert(x):
-            try:
-                val = int(float(x))
-                return val if val >= min_num else None
-            except (ValueError, TypeError):
-                return None
-        counts_raw = df[col].dropna().apply(safe_convert).dropna().value_counts().to_dict()
+        # Frecuencias observadas (solo valores del rango del juego)
+        vals = valores[pos]
+        en_rango = vals[(vals >= min_num) & (vals <= max_num)].astype(np.int64)
+        counts_raw = np.bincount(en_rango - min_num, minlength=size)
+
+        if estado:
+            previos_pos = previo["positions"].get(str(pos), {}).get("counts", {})
+            counts_raw = counts_raw + np.array(
+                [previos_pos.get(str(num), LAPLACE_SMOOTHING) - LAPLACE_SMOOTHING
+                 for num in range(min_num, max_num + 1)], dtype=np.int64)
 
         # SUAVIZADO LAPLACE: añadir +1 a TODOS los números del rango
-        counts_smooth = {}
-        total_con_laplace = 0
-        for num in range(min_num, max_num + 1):
-            count = counts_raw.get(num, 0) + LAPLACE_SMOOTHING
-            counts_smooth[num] = count
-            total_con_laplace += count
-
-        # NORMALIZACIÓN: convertir a pesos (probabilidades)
-        weights = {}
-        for num, count in counts_smooth.items():
-            weights[str(num)] = round(count / total_con_laplace, 6)
+        counts_smooth = counts_raw + LAPLACE_SMOOTHING
+        total_con_laplace = int(counts_smooth.sum())
 
         game_data["positions"][str(pos)] = {
             "col_name": col,
-            "counts": {str(k): v for k, v in counts_smooth.items()},
-            "weights": weights  # NUEVO: pesos normalizados listos para usar
+            "counts": {str(num): int(c) for num, c in zip(range(min_num, max_num + 1), counts_smooth)},
+            # Pesos normalizados listos para usar
+            "weights": {str(num): round(int(c) / total_con_laplace, 6)
+                        for num, c in zip(range(min_num, max_num + 1), counts_smooth)}
         }
 
-    biometrics_dict["games"][game_name] = game_data
+    estado_nuevo = {
+        "rows": len(df),
+        "anchor": _firma_fila(df, len(df) - 1),
+        "columns": {str(pos): col for pos, col in positions_dict.items()},
+        "parity_counts": {},
+        "ending_counts": {}
+    }
 
     # --- [IMP-FEAT-003] ANÁLISIS DE CORRELACIÓN POSICIONAL ---
     # Analizamos si el valor de una bola influye en la siguiente (Paridad y Terminación)
@@ -164,67 +273,54 @@ def _procesar_juego(df, game_name, positions_dict, biometrics_dict):
         for i in range(len(sorted_pos) - 1):
             pos_current = sorted_pos[i]
             pos_next = sorted_pos[i+1]
-            
-            col_curr_name = positions_dict[pos_current]
-            col_next_name = positions_dict[pos_next]
-            
-            # Extraemos pares válidos
-            pairs = df[[col_curr_name, col_next_name]].dropna()
-            
-            # 1. Correlación de Paridad (0=Par, 1=Impar)
-            # Nota: Asumimos 0 es par (aunque en lotería no hay 0, excepto LOTO3)
+            clave = f"{pos_current}->{pos_next}"
+
+            # Extraemos pares válidos (ambas bolas presentes)
+            val_c = valores[pos_current]
+            val_n = valores[pos_next]
+            validos = ~np.isnan(val_c) & ~np.isnan(val_n)
+            val_c = val_c[validos].astype(np.int64)
+            val_n = val_n[validos].astype(np.int64)
+
+            # 1. Correlación de Paridad: índice 0=even_even, 1=even_odd, 2=odd_even, 3=odd_odd
             # En LOTO3 (0-9), 0 es par.
-            parity_counts = {"even_even": 0, "even_odd": 0, "odd_even": 0, "odd_odd": 0}
-            
-            for _, row in pairs.iterrows():
-                try:
-                    val_c = int(row[col_curr_name])
-                    val_n = int(row[col_next_name])
-                    
-                    is_c_even = (val_c % 2 == 0)
-                    is_n_even = (val_n % 2 == 0)
-                    
-                    if is_c_even and is_n_even: parity_counts["even_even"] += 1
-                    elif is_c_even and not is_n_even: parity_counts["even_odd"] += 1
-                    elif not is_c_even and is_n_even: parity_counts["odd_even"] += 1
-                    else: parity_counts["odd_odd"] += 1
-                except: continue
+            parity_raw = np.bincount((val_c % 2) * 2 + (val_n % 2), minlength=4)
+
+            # 2. Correlación de Terminación (0-9): histograma 2-D dígito actual x siguiente
+            ending_raw = np.bincount((val_c % 10) * 10 + (val_n % 10), minlength=100).reshape(10, 10)
+
+            if estado:
+                parity_raw = parity_raw + np.array(estado["parity_counts"].get(clave, [0] * 4), dtype=np.int64)
+                ending_raw = ending_raw + np.array(estado["ending_counts"].get(clave, [[0] * 10] * 10), dtype=np.int64)
+
+            estado_nuevo["parity_counts"][clave] = parity_raw.tolist()
+            estado_nuevo["ending_counts"][clave] = ending_raw.tolist()
 
             # Normalizamos Paridad
-            total_pairs = sum(parity_counts.values())
+            total_pairs = int(parity_raw.sum())
             if total_pairs > 0:
-                correlations["parity"][f"{pos_current}->{pos_next}"] = {
-                    k: round(v/total_pairs, 4) for k, v in parity_counts.items()
+                correlations["parity"][clave] = {
+                    k: round(int(v) / total_pairs, 4)
+                    for k, v in zip(["even_even", "even_odd", "odd_even", "odd_odd"], parity_raw)
                 }
 
-            # 2. Correlación de Terminación (0-9)
-            ending_counts = {str(d): {str(k): 0 for k in range(10)} for d in range(10)}
-            
-            for _, row in pairs.iterrows():
-                try:
-                    val_c = int(row[col_curr_name])
-                    val_n = int(row[col_next_name])
-                    
-                    digit_c = val_c % 10
-                    digit_n = val_n % 10
-                    
-                    ending_counts[str(digit_c)][str(digit_n)] += 1
-                except: continue
-
             # Normalizamos (Probabilidad de Y dado X)
-            correlations["ending"][f"{pos_current}->{pos_next}"] = {}
-            for start_digit, target_dict in ending_counts.items():
-                total_starts = sum(target_dict.values())
+            correlations["ending"][clave] = {}
+            for start_digit in range(10):
+                fila = ending_raw[start_digit]
+                total_starts = int(fila.sum())
                 if total_starts > 0:
                     # Guardamos solo si hay datos para este dígito inicial
-                    correlations["ending"][f"{pos_current}->{pos_next}"][start_digit] = {
-                        k: round(v/total_starts, 4) for k, v in target_dict.items() if v > 0
+                    correlations["ending"][clave][str(start_digit)] = {
+                        str(k): round(int(v) / total_starts, 4) for k, v in enumerate(fila) if v > 0
                     }
 
         game_data["correlations"] = correlations
         print(f"      🔗 Correlaciones calculadas para {game_name}")
 
+    game_data[ESTADO_KEY] = estado_nuevo
     print(f"      🔹 {game_name}: {len(sorted_pos)} posiciones con suavizado Laplace.")
+    return game_data
 
 if __name__ == "__main__":
-    generar_biometria()
\ No newline at end of file
+    generar_biometria(pretty='--pretty' in sys.argv, incremental='--completo' not in sys.argv)
@@ -0,0 +1,204 @@
+"""
+GENOMA STORE - Acceso único a loto_genome.json
+==============================================
+Reemplaza las lecturas/reescrituras completas del genoma repartidas entre
+entrenador_cognitivo, auto_optimizer, reconstructor_temporal y bot_dreamer.
+
+- Caché en proceso: el JSON solo se vuelve a parsear si cambió en disco
+  (mtime/tamaño)
+- Actualizaciones parciales: actualizar() fusiona solo las secciones/claves
+  indicadas sobre la versión más reciente en disco, bajo lock y con
+  escritura atómica (tempfile + move)
+- Secciones tipadas: algo_ranking, algo_ranking_hourly, morphology,
+  last_processed (checkpoints), metadata
+- Checkpoints por lotes: RegistroCheckpoints acumula los hitos procesados y
+  los escribe cada `cada` sorteos (y siempre al salir, incluso con error)
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import os
+import copy
+import json
+import shutil
+import logging
+import tempfile
+from typing import Dict, Optional
+
+from cola_predicciones import BloqueoArchivo
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GENOMA_FILE = os.path.normpath(os.path.join(BASE_DIR, '..', '..', 'data', 'loto_genome.json'))
+
+# Secciones tipadas del genoma
+RANKING = "algo_ranking"
+RANKING_HORARIO = "algo_ranking_hourly"
+MORFOLOGIA = "morphology"
+CHECKPOINTS = "last_processed"
+METADATA = "metadata"
+
+# Sorteos entre escrituras de checkpoints durante una reconstrucción
+CHECKPOINT_CADA = 25
+
+# path -> ((mtime_ns, tamaño), genoma)
+_CACHE: Dict[str, tuple] = {}
+
+
+def _firma(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _fusionar(base: dict, cambios: dict) -> dict:
+    """Fusión recursiva: los dicts se combinan clave a clave, el resto se reemplaza"""
+    for clave, valor in cambios.items():
+        if isinstance(valor, dict) and isinstance(base.get(clave), dict):
+            _fusionar(base[clave], valor)
+        else:
+            base[clave] = copy.deepcopy(valor)
+    return base
+
+
+class GenomaStore:
+    """API de lectura y escritura del genoma"""
+
+    def __init__(self, path: str = GENOMA_FILE):
+        self.path = path
+
+    def _leer_disco(self) -> dict:
+        """Genoma vigente (caché si el archivo no cambió). Propaga errores de lectura."""
+        firma = _firma(self.path)
+        if firma is None:
+            return {}
+        en_cache = _CACHE.get(self.path)
+        if en_cache is not None and en_cache[0] == firma:
+            return en_cache[1]
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        _CACHE[self.path] = (firma, data)
+        return data
+
+    def leer(self) -> dict:
+        """
+        Copia del genoma completo ({} si no existe).
+
+        Raises:
+            json.JSONDecodeError, IOError: si el archivo está corrupto o ilegible
+        """
+        return copy.deepcopy(self._leer_disco())
+
+    # ------------------------------------------------------------------
+    # Secciones
+    # ------------------------------------------------------------------
+    def _seccion(self, nombre: str, juego: str) -> dict:
+        try:
+            return copy.deepcopy(self._leer_disco().get(nombre, {}).get(juego, {}))
+        except (json.JSONDecodeError, IOError):
+            return {}
+
+    def ranking(self, juego: str) -> dict:
+        return self._seccion(RANKING, juego)
+
+    def ranking_horario(self, juego: str) -> dict:
+        return self._seccion(RANKING_HORARIO, juego)
+
+    def morfologia(self, juego: str) -> dict:
+        return self._seccion(MORFOLOGIA, juego)
+
+    def checkpoint(self, juego: str) -> int:
+        """Último sorteo procesado por la reconstrucción temporal (0 si ninguno)"""
+        try:
+            return int(self._leer_disco().get(CHECKPOINTS, {}).get(juego, 0))
+        except (json.JSONDecodeError, IOError, TypeError, ValueError):
+            return 0
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def _escribir(self, data: dict):
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', suffix='.json',
+                                             dir=os.path.dirname(self.path), delete=False) as tmp_file:
+                json.dump(data, tmp_file, indent=2, ensure_ascii=False)
+                tmp_path = tmp_file.name
+            shutil.move(tmp_path, self.path)
+        except Exception:
+            if tmp_path and os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            raise
+        _CACHE[self.path] = (_firma(self.path), data)
+
+    def actualizar(self, cambios: dict) -> dict:
+        """
+        Fusiona `cambios` sobre el genoma en disco y lo escribe atómicamente.
+        Solo se tocan las claves presentes en `cambios`; lo que otros
+        procesos escribieron en otras secciones se conserva.
+
+        Returns:
+            Copia del genoma resultante
+        """
+        bloqueo = os.path.join(os.path.dirname(self.path), f".{os.path.basename(self.path)}.lock")
+        with BloqueoArchivo(bloqueo):
+            try:
+                actual = copy.deepcopy(self._leer_disco())
+            except (json.JSONDecodeError, IOError) as e:
+                logger.warning(f"Genoma ilegible, se reescribe desde los cambios: {e}")
+                actual = {}
+            self._escribir(_fusionar(actual, cambios))
+        return copy.deepcopy(_CACHE[self.path][1])
+
+    def checkpoints(self, cada: int = CHECKPOINT_CADA) -> 'RegistroCheckpoints':
+        return RegistroCheckpoints(self, cada)
+
+
+class RegistroCheckpoints:
+    """
+    Checkpoints de reconstrucción por lotes.
+
+    Uso:
+        with store.checkpoints() as registro:
+            for sorteo in nuevos:
+                ...
+                registro.marcar(juego, sorteo)
+
+    Solo se marcan sorteos terminados; ante una caída se pierden como
+    máximo `cada - 1` hitos, que se reprocesan al reanudar.
+    """
+
+    def __init__(self, store: GenomaStore, cada: int = CHECKPOINT_CADA):
+        self.store = store
+        self.cada = max(1, int(cada))
+        self.pendientes: Dict[str, int] = {}
+        self.sin_escribir = 0
+
+    def ultimo(self, juego: str) -> int:
+        return self.pendientes.get(juego, self.store.checkpoint(juego))
+
+    def marcar(self, juego: str, sorteo_id):
+        self.pendientes[juego] = int(sorteo_id)
+        self.sin_escribir += 1
+        if self.sin_escribir >= self.cada:
+            self.flush()
+
+    def flush(self):
+        if self.pendientes:
+            self.store.actualizar({CHECKPOINTS: dict(self.pendientes)})
+            self.pendientes = {}
+        self.sin_escribir = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+        return False
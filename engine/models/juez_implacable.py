@@ -5,12 +5,18 @@ import os
 import json
 import shutil
 
+from mascaras_sorteo import a_mascara, aciertos as contar_aciertos, aciertos_digitos, contiene
+
+try:
+    from materializador_dashboard import MaterializadorDashboard, existe_dashboard, DASHBOARD_DIR
+except ImportError:
+    MaterializadorDashboard = None
+
 # --- CONFIGURACIÓN DE RUTAS ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, '..', '..', 'data')
 
 FILE_SIMULACIONES = os.path.join(DATA_DIR, "LOTO_SIMULACIONES.csv")
-FILE_DASHBOARD = os.path.join(BASE_DIR, '..', '..', 'dashboard_data.json')
 
 # Mapeo de archivos maestros (Añadimos referencia al Comodín para LOTO)
 MAESTROS_CONFIG = {
@@ -53,10 +59,12 @@ def cargar_maestros():
                         # Determinar si ordenamos o no
                         lista_final = numeros if config.get("orden_importa") else sorted(numeros)
                         
-                        # Ahora guardamos un diccionario con números y comodín
+                        # Ahora guardamos un diccionario con números, comodín y
+                        # la máscara de bits del sorteo (aciertos = popcount)
                         mapa_sorteos[sorteo_id] = {
                             "numeros": lista_final,
-                            "comodin": comodin
+                            "comodin": comodin,
+                            "mascara": a_mascara(numeros)
                         }
                 except (ValueError, TypeError, KeyError):
                     # Fila con datos malformados, saltar
@@ -85,6 +93,9 @@ def calcular_afinidad(prediccion, realidad_obj, juego, modalidad=None):
     # Extraemos los datos del objeto realidad
     realidad = realidad_obj["numeros"]
     comodin_real = realidad_obj.get("comodin")
+    mascara_real = realidad_obj.get("mascara")
+    if mascara_real is None:
+        mascara_real = a_mascara(realidad)
 
     # === MODALIDADES ESPECIALES LOTO3 ===
     if modalidad == 'PAR_INICIAL' and juego == 'LOTO3':
@@ -110,7 +121,7 @@ def calcular_afinidad(prediccion, realidad_obj, juego, modalidad=None):
     
     # --- REGLAS RACHA (Curva Monótona de Afinidad) ---
     if juego == "RACHA":
-        aciertos = len(set(prediccion) & set(realidad))
+        aciertos = contar_aciertos(a_mascara(prediccion), mascara_real)
         
         # FIX [IMP-AUD-001]: Eliminamos la "V invertida". 
         # La IA debe aprender a acertar, no a fallar intencionalmente.
@@ -160,13 +171,8 @@ def calcular_afinidad(prediccion, realidad_obj, juego, modalidad=None):
         if prediccion[1] == realidad[1]: score_residual += 3.0
         
         # Aciertos numéricos fuera de posición (muy débiles)
-        # Calculamos intersección simple
-        r_temp = list(realidad)
-        matches_num = 0
-        for n in prediccion:
-            if n in r_temp:
-                matches_num += 1
-                r_temp.remove(n)
+        # Intersección como multiconjunto (respeta dígitos repetidos)
+        matches_num = aciertos_digitos(prediccion, realidad)
         
         score_residual += matches_num * 1.0
         
@@ -175,7 +181,8 @@ def calcular_afinidad(prediccion, realidad_obj, juego, modalidad=None):
 
     # --- REGLAS LOTO / LOTO 4 (Escala de Mérito Normalizada) ---
     else: 
-        aciertos = len(set(prediccion) & set(realidad))
+        mascara_pred = a_mascara(prediccion)
+        aciertos = contar_aciertos(mascara_pred, mascara_real)
         
         # CASO ESPECIAL LOTO 4 (Normalizado a 100)
         if juego == "LOTO4":
@@ -185,7 +192,7 @@ def calcular_afinidad(prediccion, realidad_obj, juego, modalidad=None):
             return 0.0
 
         # --- NUEVA ESCALA LOTO 41 (Basada en Categorías Reales) ---
-        tiene_comodin = (comodin_real is not None) and (comodin_real in prediccion)
+        tiene_comodin = contiene(mascara_pred, comodin_real)
         
         if aciertos == 6: return 100.0                    # Loto (Jackpot)
         if aciertos == 5 and tiene_comodin: return 85.0     # Súper Quina
@@ -216,22 +223,8 @@ def juzgar(target_games=None):
         df_sim['juego'] = 'LOTO'
     
     cambios = 0
-    cambios_dashboard = 0
-
-    # 2.1 Cargar Dashboard para Sincronización
-    dashboard_data = []
-    dashboard_map = {}
-    if os.path.exists(FILE_DASHBOARD):
-        try:
-            with open(FILE_DASHBOARD, 'r', encoding='utf-8') as f:
-                dashboard_data = json.load(f)
-                # Crear mapa para acceso rápido por ID
-                for item in dashboard_data:
-                    if 'id' in item:
-                        dashboard_map[int(item['id'])] = item
-            print(f"📊 Dashboard cargado: {len(dashboard_data)} registros.")
-        except Exception as e:
-            print(f"⚠️ Error cargando dashboard: {e}")
+    # 2.1 Veredictos para sincronizar con el Dashboard (deltas al materializador)
+    veredictos = []
     
     # 3. Iterar y Juzgar
     for index, row in df_sim.iterrows():
@@ -292,14 +285,9 @@ def juzgar(target_games=None):
                 # Para terminacion: 1 si acierta, 0 si no
                 aciertos_display = 0  # Se actualizara con el score
             elif juego == "LOTO3":
-                 aciertos_display = 0
-                 r_cp = list(nums_real)
-                 for n in nums_pred:
-                     if n in r_cp:
-                         aciertos_display +=1
-                         r_cp.remove(n)
+                aciertos_display = aciertos_digitos(nums_pred, nums_real)
             else:
-                aciertos_display = len(set(nums_pred) & set(nums_real))
+                aciertos_display = contar_aciertos(a_mascara(nums_pred), realidad_obj["mascara"])
 
             # Score interno (NUEVA ESCALA con soporte de modalidad)
             score_final = calcular_afinidad(nums_pred, realidad_obj, juego, modalidad=modalidad)
@@ -318,23 +306,7 @@ def juzgar(target_games=None):
                 cambios += 1
                 
                 # Sincronizar con Dashboard
-                try:
-                    if 'id' in row and not pd.isna(row['id']):
-                        sim_id = int(row['id'])
-                        if sim_id in dashboard_map:
-                            dash_item = dashboard_map[sim_id]
-                            
-                            dash_score = float(dash_item.get('score_afinidad', 0))
-                            
-                            if (dash_item.get('estado') != 'AUDITADO' or 
-                                abs(dash_score - score_final) > 0.01):
-                                
-                                dash_item['aciertos'] = int(aciertos_display)
-                                dash_item['score_afinidad'] = round(score_final, 2)
-                                dash_item['estado'] = 'AUDITADO'
-                                cambios_dashboard += 1
-                except Exception:
-                    pass
+                veredictos.append(df_sim.loc[index].to_dict())
 
                 if cambios % 10 == 0:
                     print(f"    🔨 Sentencia dictada para {juego} #{target_id}. Score: {score_final:.1f}%")
@@ -352,12 +324,11 @@ def juzgar(target_games=None):
     else:
         print("💤 La corte no encontró casos nuevos para juzgar.")
 
-    # 6. Guardar Dashboard si hubo cambios
-    if cambios_dashboard > 0:
+    # 6. Aplicar veredictos al Dashboard (solo shards afectados)
+    if veredictos and MaterializadorDashboard and existe_dashboard(DASHBOARD_DIR):
         try:
-            with open(FILE_DASHBOARD, 'w', encoding='utf-8') as f:
-                json.dump(dashboard_data, f, indent=2, ensure_ascii=False)
-            print(f"✅ Dashboard sincronizado: {cambios_dashboard} registros actualizados.")
+            aplicados = MaterializadorDashboard(DASHBOARD_DIR).aplicar(veredictos)
+            print(f"✅ Dashboard sincronizado: {aplicados} registros actualizados.")
         except Exception as e:
             print(f"❌ Error guardando dashboard: {e}")
 
@@ -26,14 +26,18 @@ import shutil
 import pytz
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from collections import defaultdict, Counter
+from datetime import datetime
 from typing import List, Dict, Tuple, Optional
 
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 import joblib
 
+from markov_tensor import MarkovTensor
+from recencia import recencia_valor
+from orquestador_loto3 import ajustar_tareas, CPUS
+from calendario_sorteos import HORARIOS, calcular_proximo_sorteo
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 if not logger.handlers:
@@ -50,7 +54,6 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(CURRENT_DIR))
 DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 
 RUTA_CSV = os.path.join(DATA_DIR, "LOTO3_MAESTRO.csv")
-RUTA_DASHBOARD = os.path.join(PROJECT_ROOT, "dashboard_data.json")
 RUTA_SIMULACIONES = os.path.join(DATA_DIR, "LOTO_SIMULACIONES.csv")
 RUTA_MODELOS = os.path.join(DATA_DIR, "loto3_especialista_models")
 
@@ -58,10 +61,31 @@ RUTA_MODELOS = os.path.join(DATA_DIR, "loto3_especialista_models")
 os.makedirs(RUTA_MODELOS, exist_ok=True)
 
 TZ_CHILE = pytz.timezone('America/Santiago')
-HORARIOS_LOTO3 = [14, 18, 21]
+HORARIOS_LOTO3 = HORARIOS['LOTO3']['horas']
 FRANJAS = {14: 'DIA', 18: 'TARDE', 21: 'NOCHE'}
 
 
+def codificar_historial(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Columnas enteras del historial, calculadas una sola vez:
+    par_inicial = n1*10 + n2, par_final = n2*10 + n3, terminacion = n3
+    (y franja, si existe).
+    """
+    n1 = df['n1'].astype(int).to_numpy()
+    n2 = df['n2'].astype(int).to_numpy()
+    n3 = df['n3'].astype(int).to_numpy()
+    codigos = {'n1': n1, 'n2': n2, 'par_inicial': n1 * 10 + n2, 'par_final': n2 * 10 + n3, 'terminacion': n3}
+    if 'franja' in df.columns:
+        codigos['franja'] = df['franja'].to_numpy()
+    return codigos
+
+
+def frecuencias_suavizadas(codigos: np.ndarray, n_clases: int, window: int) -> np.ndarray:
+    """(conteo + 1) / (total + n_clases) de los ultimos `window` codigos (bincount)"""
+    conteo = np.bincount(codigos[-window:], minlength=n_clases) if window > 0 else np.zeros(n_clases)
+    return (conteo + 1) / (conteo.sum() + n_clases)
+
+
 # =============================================================================
 # 1. MARKOV PARES - Especializado en pares 00-99
 # =============================================================================
@@ -78,54 +102,44 @@ class MarkovPares:
 
     def __init__(self, orden_max: int = 3):
         self.orden_max = orden_max
-        # Transiciones separadas para par_inicial y par_final
-        self.transiciones_inicial = {
-            orden: defaultdict(Counter) for orden in range(1, orden_max + 1)
-        }
-        self.transiciones_final = {
-            orden: defaultdict(Counter) for orden in range(1, orden_max + 1)
-        }
         self.pesos_orden = {1: 0.20, 2: 0.35, 3: 0.45}
+        # Tensores separados para par_inicial y par_final (estado = par 0-99)
+        self.tensores = {
+            tipo: MarkovTensor(100, orden_max=orden_max, pesos=self.pesos_orden)
+            for tipo in ['inicial', 'final']
+        }
         self.trained = False
 
-    def _extraer_pares(self, df: pd.DataFrame) -> Tuple[List[str], List[str]]:
-        """Extrae secuencias de pares inicial y final del historial"""
-        pares_iniciales = []
-        pares_finales = []
-
-        for _, row in df.iterrows():
-            n1, n2, n3 = int(row['n1']), int(row['n2']), int(row['n3'])
-            par_ini = f"{n1}{n2}"
-            par_fin = f"{n2}{n3}"
-            pares_iniciales.append(par_ini)
-            pares_finales.append(par_fin)
-
-        return pares_iniciales, pares_finales
+    def _extraer_pares(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """Extrae secuencias de pares inicial y final como codigos 0-99"""
+        codigos = codificar_historial(df)
+        return codigos['par_inicial'], codigos['par_final']
 
     def entrenar(self, df: pd.DataFrame):
         """Entrena las matrices de transicion para ambos tipos de pares"""
         logger.info(f"MarkovPares: Entrenando con orden 1-{self.orden_max}...")
 
         pares_iniciales, pares_finales = self._extraer_pares(df)
-
-        # Entrenar para par_inicial
-        for orden in range(1, self.orden_max + 1):
-            for i in range(orden, len(pares_iniciales)):
-                estado = tuple(pares_iniciales[i-orden:i])
-                siguiente = pares_iniciales[i]
-                self.transiciones_inicial[orden][estado][siguiente] += 1
-
-        # Entrenar para par_final
-        for orden in range(1, self.orden_max + 1):
-            for i in range(orden, len(pares_finales)):
-                estado = tuple(pares_finales[i-orden:i])
-                siguiente = pares_finales[i]
-                self.transiciones_final[orden][estado][siguiente] += 1
+        self.tensores['inicial'].entrenar(pares_iniciales)
+        self.tensores['final'].entrenar(pares_finales)
 
         self.trained = True
         logger.info(f"MarkovPares: Entrenamiento completo. "
-                   f"Inicial: {len(self.transiciones_inicial[1])} estados O1. "
-                   f"Final: {len(self.transiciones_final[1])} estados O1.")
+                   f"Inicial: {self.tensores['inicial'].estados_observados(1)} estados O1. "
+                   f"Final: {self.tensores['final'].estados_observados(1)} estados O1.")
+
+    def actualizar(self, n1: int, n2: int, n3: int):
+        """Incorpora un sorteo nuevo sin reentrenar"""
+        self.tensores['inicial'].actualizar(n1 * 10 + n2)
+        self.tensores['final'].actualizar(n2 * 10 + n3)
+        self.trained = True
+
+    def predecir_vector(self, tipo: str, historia: List[str]) -> np.ndarray:
+        """Probabilidades de los pares 00-99 como array (indice = par)"""
+        if not self.trained:
+            return np.full(100, 0.01)
+        tensor = self.tensores['inicial'] if tipo == 'inicial' else self.tensores['final']
+        return tensor.probabilidades([int(par) for par in historia])
 
     def predecir_probabilidades(self, tipo: str, historia: List[str]) -> Dict[str, float]:
         """
@@ -135,31 +149,8 @@ class MarkovPares:
             tipo: 'inicial' o 'final'
             historia: Lista de pares recientes
         """
-        if not self.trained:
-            return {f"{i:02d}": 0.01 for i in range(100)}
-
-        transiciones = self.transiciones_inicial if tipo == 'inicial' else self.transiciones_final
-        probs_combined = defaultdict(float)
-
-        for orden in range(1, self.orden_max + 1):
-            if len(historia) >= orden:
-                estado = tuple(historia[-orden:])
-                trans = transiciones[orden].get(estado, Counter())
-                total = sum(trans.values())
-
-                if total > 0:
-                    # Suavizado Laplace
-                    for par_idx in range(100):
-                        par = f"{par_idx:02d}"
-                        prob = (trans.get(par, 0) + 1) / (total + 100)
-                        probs_combined[par] += prob * self.pesos_orden[orden]
-
-        # Normalizar
-        total_prob = sum(probs_combined.values())
-        if total_prob > 0:
-            return {k: v / total_prob for k, v in probs_combined.items()}
-
-        return {f"{i:02d}": 0.01 for i in range(100)}
+        probs = self.predecir_vector(tipo, historia)
+        return {f"{i:02d}": float(p) for i, p in enumerate(probs)}
 
     def predecir_top_pares(self, tipo: str, historia: List[str], n_top: int = 5) -> List[Dict]:
         """
@@ -194,24 +185,24 @@ class MarkovTerminacion:
 
     def __init__(self, orden_max: int = 3):
         self.orden_max = orden_max
+        self.pesos_orden = {1: 0.20, 2: 0.35, 3: 0.45}
 
         # Transiciones Markov por franja
-        self.transiciones_por_franja = {
-            franja: {orden: defaultdict(Counter) for orden in range(1, orden_max + 1)}
+        self.tensores_por_franja = {
+            franja: MarkovTensor(10, orden_max=orden_max, pesos=self.pesos_orden)
             for franja in ['DIA', 'TARDE', 'NOCHE']
         }
 
-        # Correlaciones condicionales
-        self.correlacion_n3_dado_n1 = defaultdict(Counter)  # P(n3|n1)
-        self.correlacion_n3_dado_n2 = defaultdict(Counter)  # P(n3|n2)
-        self.correlacion_n3_dado_n1n2 = defaultdict(Counter)  # P(n3|n1,n2)
+        # Correlaciones condicionales (fila = condicion, columna = n3)
+        self.correlacion_n3_dado_n1 = np.zeros((10, 10), dtype=np.int64)  # P(n3|n1)
+        self.correlacion_n3_dado_n2 = np.zeros((10, 10), dtype=np.int64)  # P(n3|n2)
+        self.correlacion_n3_dado_n1n2 = np.zeros((100, 10), dtype=np.int64)  # P(n3|n1,n2)
 
         # Frecuencias por franja
         self.frecuencia_por_franja = {
-            franja: Counter() for franja in ['DIA', 'TARDE', 'NOCHE']
+            franja: np.zeros(10, dtype=np.int64) for franja in ['DIA', 'TARDE', 'NOCHE']
         }
 
-        self.pesos_orden = {1: 0.20, 2: 0.35, 3: 0.45}
         self.trained = False
 
     def entrenar(self, df: pd.DataFrame):
@@ -227,40 +218,46 @@ class MarkovTerminacion:
             df['franja'] = df['hora'].map(lambda h: FRANJAS.get(h, 'DIA'))
 
         # 1. Entrenar correlaciones globales
-        for _, row in df.iterrows():
-            n1, n2, n3 = int(row['n1']), int(row['n2']), int(row['n3'])
+        n1 = df['n1'].astype(int).to_numpy()
+        n2 = df['n2'].astype(int).to_numpy()
+        n3 = df['n3'].astype(int).to_numpy()
 
-            self.correlacion_n3_dado_n1[n1][n3] += 1
-            self.correlacion_n3_dado_n2[n2][n3] += 1
-            self.correlacion_n3_dado_n1n2[(n1, n2)][n3] += 1
+        np.add.at(self.correlacion_n3_dado_n1, (n1, n3), 1)
+        np.add.at(self.correlacion_n3_dado_n2, (n2, n3), 1)
+        np.add.at(self.correlacion_n3_dado_n1n2, (n1 * 10 + n2, n3), 1)
 
         # 2. Entrenar Markov y frecuencias por franja
         for franja in ['DIA', 'TARDE', 'NOCHE']:
-            df_franja = df[df['franja'] == franja].copy()
-            if len(df_franja) < 50:
-                logger.warning(f"MarkovTerminacion: Franja {franja} con pocos datos ({len(df_franja)})")
+            mascara = (df['franja'] == franja).to_numpy()
+            if mascara.sum() < 50:
+                logger.warning(f"MarkovTerminacion: Franja {franja} con pocos datos ({int(mascara.sum())})")
                 continue
 
-            secuencia_n3 = df_franja['n3'].astype(int).tolist()
+            secuencia_n3 = n3[mascara]
 
             # Frecuencias
-            for n3 in secuencia_n3:
-                self.frecuencia_por_franja[franja][n3] += 1
+            self.frecuencia_por_franja[franja] += np.bincount(secuencia_n3, minlength=10)
 
             # Markov por franja
-            for orden in range(1, self.orden_max + 1):
-                for i in range(orden, len(secuencia_n3)):
-                    estado = tuple(secuencia_n3[i-orden:i])
-                    siguiente = secuencia_n3[i]
-                    self.transiciones_por_franja[franja][orden][estado][siguiente] += 1
+            self.tensores_por_franja[franja].entrenar(secuencia_n3)
 
         self.trained = True
         logger.info("MarkovTerminacion: Entrenamiento completo.")
 
-    def predecir_probabilidades(self, franja: str, historia_n3: List[int],
-                                n1_actual: int = None, n2_actual: int = None) -> Dict[int, float]:
+    def actualizar(self, franja: str, n1: int, n2: int, n3: int):
+        """Incorpora un sorteo nuevo sin reentrenar"""
+        self.correlacion_n3_dado_n1[n1, n3] += 1
+        self.correlacion_n3_dado_n2[n2, n3] += 1
+        self.correlacion_n3_dado_n1n2[n1 * 10 + n2, n3] += 1
+        if franja in self.tensores_por_franja:
+            self.frecuencia_por_franja[franja][n3] += 1
+            self.tensores_por_franja[franja].actualizar(n3)
+        self.trained = True
+
+    def predecir_vector(self, franja: str, historia_n3: List[int],
+                        n1_actual: int = None, n2_actual: int = None) -> np.ndarray:
         """
-        Predice probabilidades para cada digito 0-9 como terminacion.
+        Predice probabilidades para cada digito 0-9 como terminacion (array).
 
         Combina:
         - Markov secuencial (40%)
@@ -268,66 +265,54 @@ class MarkovTerminacion:
         - Frecuencia por franja (25%)
         """
         if not self.trained:
-            return {i: 0.1 for i in range(10)}
+            return np.full(10, 0.1)
 
-        probs = defaultdict(float)
+        probs = np.zeros(10, dtype=np.float64)
 
         # 1. MARKOV SECUENCIAL (40%)
-        markov_probs = defaultdict(float)
-        for orden in range(1, self.orden_max + 1):
-            if len(historia_n3) >= orden:
-                estado = tuple(historia_n3[-orden:])
-                trans = self.transiciones_por_franja[franja][orden].get(estado, Counter())
-                total = sum(trans.values())
-
-                if total > 0:
-                    for digito in range(10):
-                        prob = (trans.get(digito, 0) + 1) / (total + 10)
-                        markov_probs[digito] += prob * self.pesos_orden[orden]
-
-        # Normalizar markov
-        total_markov = sum(markov_probs.values())
+        markov_probs = self.tensores_por_franja[franja].mezcla_ordenes(historia_n3)
+        total_markov = markov_probs.sum()
         if total_markov > 0:
-            for d in range(10):
-                probs[d] += (markov_probs[d] / total_markov) * 0.40
+            probs += (markov_probs / total_markov) * 0.40
 
         # 2. CORRELACIONES CONDICIONALES (35%)
         if n1_actual is not None and n2_actual is not None:
             # P(n3|n1,n2) es la mas especifica
-            trans_n1n2 = self.correlacion_n3_dado_n1n2.get((n1_actual, n2_actual), Counter())
-            total_n1n2 = sum(trans_n1n2.values())
+            trans_n1n2 = self.correlacion_n3_dado_n1n2[int(n1_actual) * 10 + int(n2_actual)]
+            total_n1n2 = trans_n1n2.sum()
 
             if total_n1n2 > 5:  # Solo si hay suficiente evidencia
-                for digito in range(10):
-                    prob = (trans_n1n2.get(digito, 0) + 1) / (total_n1n2 + 10)
-                    probs[digito] += prob * 0.35
+                probs += (trans_n1n2 + 1) / (total_n1n2 + 10) * 0.35
             else:
                 # Fallback a correlaciones individuales
-                trans_n1 = self.correlacion_n3_dado_n1.get(n1_actual, Counter())
-                trans_n2 = self.correlacion_n3_dado_n2.get(n2_actual, Counter())
-                total_n1 = sum(trans_n1.values())
-                total_n2 = sum(trans_n2.values())
+                trans_n1 = self.correlacion_n3_dado_n1[int(n1_actual)]
+                trans_n2 = self.correlacion_n3_dado_n2[int(n2_actual)]
+                total_n1 = trans_n1.sum()
+                total_n2 = trans_n2.sum()
 
-                for digito in range(10):
-                    p_n1 = (trans_n1.get(digito, 0) + 1) / (total_n1 + 10) if total_n1 > 0 else 0.1
-                    p_n2 = (trans_n2.get(digito, 0) + 1) / (total_n2 + 10) if total_n2 > 0 else 0.1
-                    probs[digito] += (p_n1 * 0.5 + p_n2 * 0.5) * 0.35
+                p_n1 = (trans_n1 + 1) / (total_n1 + 10) if total_n1 > 0 else np.full(10, 0.1)
+                p_n2 = (trans_n2 + 1) / (total_n2 + 10) if total_n2 > 0 else np.full(10, 0.1)
+                probs += (p_n1 * 0.5 + p_n2 * 0.5) * 0.35
 
         # 3. FRECUENCIA POR FRANJA (25%)
         freq_franja = self.frecuencia_por_franja[franja]
-        total_freq = sum(freq_franja.values())
+        total_freq = freq_franja.sum()
 
         if total_freq > 0:
-            for digito in range(10):
-                prob = (freq_franja.get(digito, 0) + 1) / (total_freq + 10)
-                probs[digito] += prob * 0.25
+            probs += (freq_franja + 1) / (total_freq + 10) * 0.25
 
         # Normalizar resultado final
-        total_prob = sum(probs.values())
+        total_prob = probs.sum()
         if total_prob > 0:
-            return {k: v / total_prob for k, v in probs.items()}
+            return probs / total_prob
 
-        return {i: 0.1 for i in range(10)}
+        return np.full(10, 0.1)
+
+    def predecir_probabilidades(self, franja: str, historia_n3: List[int],
+                                n1_actual: int = None, n2_actual: int = None) -> Dict[int, float]:
+        """Predice probabilidades para cada digito 0-9 como terminacion"""
+        probs = self.predecir_vector(franja, historia_n3, n1_actual, n2_actual)
+        return {i: float(p) for i, p in enumerate(probs)}
 
     def predecir_top_terminaciones(self, franja: str, historia_n3: List[int],
                                     n1_actual: int = None, n2_actual: int = None,
@@ -393,31 +378,14 @@ class RFPares:
         df['par_es_repetido'] = ((df['target_par'] // 10) == (df['target_par'] % 10)).astype(int)
         df['par_es_consecutivo'] = (abs((df['target_par'] // 10) - (df['target_par'] % 10)) == 1).astype(int)
 
-        # Recencia del par actual
-        def calcular_recencia(serie, window=100):
-            """Sorteos desde la ultima aparicion de cada valor"""
-            recencias = []
-            for i in range(len(serie)):
-                if i < 1:
-                    recencias.append(window)
-                    continue
-                val = serie.iloc[i]
-                found = False
-                for j in range(1, min(i+1, window)):
-                    if serie.iloc[i-j] == val:
-                        recencias.append(j)
-                        found = True
-                        break
-                if not found:
-                    recencias.append(window)
-            return recencias
-
-        df['par_recencia'] = calcular_recencia(df['target_par'])
+        # Recencia del par actual (sorteos desde su aparicion previa, tope 100)
+        df['par_recencia'] = recencia_valor(df['target_par'].to_numpy(),
+                                            sin_aparicion=100, tope=100).astype(int)
 
         return df
 
-    def entrenar(self, df: pd.DataFrame) -> bool:
-        """Entrena el modelo RF para prediccion de pares"""
+    def tareas_entrenamiento(self, df: pd.DataFrame) -> List[Tuple]:
+        """Prepara el ajuste del RF como tarea (clave, modelo, X, y) para orquestador_loto3"""
         logger.info(f"RFPares ({self.tipo}): Generando features...")
 
         df_features = self._generar_features(df)
@@ -437,7 +405,7 @@ class RFPares:
 
         if len(df_clean) < 100:
             logger.warning(f"RFPares ({self.tipo}): Datos insuficientes ({len(df_clean)})")
-            return False
+            return []
 
         X = df_clean[self.feature_cols].values
         y = df_clean['target_par'].astype(int).values
@@ -449,11 +417,11 @@ class RFPares:
 
         # Escalar
         X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
+        self._evaluacion = (self.scaler.transform(X_test), y_test)
 
-        # Entrenar RF
+        # RF (n_jobs lo fija el orquestador segun el presupuesto de CPU)
         logger.info(f"RFPares ({self.tipo}): Entrenando RF con {len(X_train)} muestras...")
-        self.modelo = RandomForestClassifier(
+        modelo = RandomForestClassifier(
             n_estimators=100,
             max_depth=10,
             min_samples_leaf=5,
@@ -461,30 +429,47 @@ class RFPares:
             n_jobs=-1,
             random_state=42
         )
-        self.modelo.fit(X_train_scaled, y_train)
+        return [(('rf_pares', self.tipo), modelo, X_train_scaled, y_train)]
+
+    def completar_entrenamiento(self, ajustados: Dict) -> bool:
+        """Recoge el RF ajustado por el orquestador y lo evalua"""
+        evaluacion, self._evaluacion = getattr(self, '_evaluacion', None), None
+        modelo = ajustados.get(('rf_pares', self.tipo))
+        if evaluacion is None or modelo is None:
+            return False
+        self.modelo = modelo
 
         # Evaluar
-        score = self.modelo.score(X_test_scaled, y_test)
+        score = self.modelo.score(*evaluacion)
         logger.info(f"RFPares ({self.tipo}): Test accuracy = {score:.4f}")
 
         self.trained = True
         return True
 
-    def predecir_probabilidades(self, features: np.ndarray) -> Dict[int, float]:
-        """Retorna probabilidades para cada par 0-99"""
+    def entrenar(self, df: pd.DataFrame, cpus: int = CPUS) -> bool:
+        """Entrena el modelo RF para prediccion de pares"""
+        tareas = self.tareas_entrenamiento(df)
+        if not tareas:
+            return False
+        ajustados, _ = ajustar_tareas(tareas, cpus=cpus)
+        return self.completar_entrenamiento(ajustados)
+
+    def predecir_vector(self, features: np.ndarray) -> np.ndarray:
+        """Probabilidades de los pares 0-99 como array (indice = par)"""
         if not self.trained or self.modelo is None:
-            return {i: 0.01 for i in range(100)}
+            return np.full(100, 0.01)
 
         X_scaled = self.scaler.transform(features.reshape(1, -1))
         probs = self.modelo.predict_proba(X_scaled)[0]
-        clases = self.modelo.classes_
-
-        result = {i: 0.001 for i in range(100)}  # Base muy baja
-        for clase, prob in zip(clases, probs):
-            result[int(clase)] = prob
 
+        result = np.full(100, 0.001)  # Base muy baja
+        result[self.modelo.classes_.astype(int)] = probs
         return result
 
+    def predecir_probabilidades(self, features: np.ndarray) -> Dict[int, float]:
+        """Retorna probabilidades para cada par 0-99"""
+        return {i: float(p) for i, p in enumerate(self.predecir_vector(features))}
+
 
 # =============================================================================
 # 4. LOTO3 ESPECIALISTA - ENSEMBLE PRINCIPAL
@@ -504,13 +489,16 @@ class Loto3Especialista:
     - Top 3 terminaciones
     """
 
-    def __init__(self):
+    def __init__(self, cpus: int = CPUS):
+        # Presupuesto de CPU del entrenamiento (ver orquestador_loto3)
+        self.cpus = cpus
         self.markov_pares = MarkovPares(orden_max=3)
         self.markov_terminacion = MarkovTerminacion(orden_max=3)
         self.rf_par_inicial = RFPares(tipo='inicial')
         self.rf_par_final = RFPares(tipo='final')
 
         self.df = None
+        self._codigos_df = None  # (df, codificar_historial(df))
         self.trained = False
 
         # Pesos del ensemble
@@ -546,8 +534,11 @@ class Loto3Especialista:
         logger.info(f"Datos cargados: {len(df)} sorteos")
         return df
 
-    def entrenar(self):
-        """Entrena todos los modelos del ensemble"""
+    def tareas_entrenamiento(self) -> List[Tuple]:
+        """
+        Carga datos, entrena los Markov (baratos) y devuelve los ajustes
+        pendientes de los 2 RFPares (ver orquestador_loto3).
+        """
         logger.info("=" * 60)
         logger.info("LOTO3 ESPECIALISTA: ENTRENAMIENTO")
         logger.info("=" * 60)
@@ -560,16 +551,22 @@ class Loto3Especialista:
         # 2. Entrenar Markov de terminacion
         self.markov_terminacion.entrenar(self.df)
 
-        # 3. Entrenar RF de pares (opcional, puede fallar con pocos datos)
-        try:
-            self.rf_par_inicial.entrenar(self.df)
-        except Exception as e:
-            logger.warning(f"RF par_inicial no entrenado: {e}")
-
-        try:
-            self.rf_par_final.entrenar(self.df)
-        except Exception as e:
-            logger.warning(f"RF par_final no entrenado: {e}")
+        # 3. Tareas de RF de pares (opcional, puede fallar con pocos datos)
+        tareas = []
+        for rf in [self.rf_par_inicial, self.rf_par_final]:
+            try:
+                tareas.extend(rf.tareas_entrenamiento(self.df))
+            except Exception as e:
+                logger.warning(f"RF par_{rf.tipo} no entrenado: {e}")
+        return tareas
+
+    def completar_entrenamiento(self, ajustados: Dict):
+        """Recoge los RF ajustados y guarda el ensemble"""
+        for rf in [self.rf_par_inicial, self.rf_par_final]:
+            try:
+                rf.completar_entrenamiento(ajustados)
+            except Exception as e:
+                logger.warning(f"RF par_{rf.tipo} no entrenado: {e}")
 
         self.trained = True
         logger.info("ENTRENAMIENTO COMPLETO")
@@ -577,6 +574,11 @@ class Loto3Especialista:
         # Guardar modelos
         self._guardar_modelos()
 
+    def entrenar(self, cpus: Optional[int] = None):
+        """Entrena todos los modelos del ensemble (los 2 RF en paralelo)"""
+        ajustados, _ = ajustar_tareas(self.tareas_entrenamiento(), cpus=self.cpus if cpus is None else cpus)
+        self.completar_entrenamiento(ajustados)
+
     def _guardar_modelos(self):
         """Guarda los modelos entrenados"""
         try:
@@ -599,9 +601,16 @@ class Loto3Especialista:
             path_markov_term = os.path.join(RUTA_MODELOS, 'markov_terminacion.pkl')
 
             if os.path.exists(path_markov_pares):
-                self.markov_pares = joblib.load(path_markov_pares)
+                markov_pares = joblib.load(path_markov_pares)
+                # Pickles previos a MarkovTensor guardaban defaultdict(Counter)
+                if not hasattr(markov_pares, 'tensores'):
+                    raise ValueError("markov_pares.pkl con formato antiguo, se reentrenara")
+                self.markov_pares = markov_pares
             if os.path.exists(path_markov_term):
-                self.markov_terminacion = joblib.load(path_markov_term)
+                markov_terminacion = joblib.load(path_markov_term)
+                if not hasattr(markov_terminacion, 'tensores_por_franja'):
+                    raise ValueError("markov_terminacion.pkl con formato antiguo, se reentrenara")
+                self.markov_terminacion = markov_terminacion
 
             # RF son opcionales
             path_rf_ini = os.path.join(RUTA_MODELOS, 'rf_par_inicial.pkl')
@@ -618,42 +627,28 @@ class Loto3Especialista:
             logger.warning(f"No se pudieron cargar modelos: {e}")
             return False
 
-    def _calcular_frecuencias_pares(self, window: int = 50) -> Tuple[Dict, Dict]:
-        """Calcula frecuencias recientes de pares"""
-        if self.df is None:
-            return {}, {}
-
-        ultimos = self.df.tail(window)
+    def _codigos(self) -> Dict[str, np.ndarray]:
+        """codificar_historial(self.df), recalculado solo si cambia el df"""
+        if self._codigos_df is None or self._codigos_df[0] is not self.df:
+            self._codigos_df = (self.df, codificar_historial(self.df))
+        return self._codigos_df[1]
 
-        freq_inicial = Counter()
-        freq_final = Counter()
-
-        for _, row in ultimos.iterrows():
-            n1, n2, n3 = int(row['n1']), int(row['n2']), int(row['n3'])
-            freq_inicial[f"{n1}{n2}"] += 1
-            freq_final[f"{n2}{n3}"] += 1
-
-        # Normalizar a probabilidades
-        total_ini = sum(freq_inicial.values())
-        total_fin = sum(freq_final.values())
-
-        prob_inicial = {f"{i:02d}": (freq_inicial.get(f"{i:02d}", 0) + 1) / (total_ini + 100)
-                       for i in range(100)}
-        prob_final = {f"{i:02d}": (freq_final.get(f"{i:02d}", 0) + 1) / (total_fin + 100)
-                     for i in range(100)}
+    def _calcular_frecuencias_pares(self, window: int = 50) -> Tuple[np.ndarray, np.ndarray]:
+        """Frecuencias recientes (suavizadas) de pares inicial y final, indice = par"""
+        if self.df is None:
+            return np.zeros(100), np.zeros(100)
 
-        return prob_inicial, prob_final
+        codigos = self._codigos()
+        return (frecuencias_suavizadas(codigos['par_inicial'], 100, window),
+                frecuencias_suavizadas(codigos['par_final'], 100, window))
 
-    def _calcular_frecuencias_terminacion(self, franja: str, window: int = 50) -> Dict[int, float]:
-        """Calcula frecuencias recientes de terminacion por franja"""
+    def _calcular_frecuencias_terminacion(self, franja: str, window: int = 50) -> np.ndarray:
+        """Frecuencias recientes (suavizadas) de terminacion por franja, indice = digito"""
         if self.df is None:
-            return {i: 0.1 for i in range(10)}
+            return np.full(10, 0.1)
 
-        df_franja = self.df[self.df['franja'] == franja].tail(window)
-        freq = Counter(df_franja['n3'].astype(int))
-        total = sum(freq.values())
-
-        return {i: (freq.get(i, 0) + 1) / (total + 10) for i in range(10)}
+        codigos = self._codigos()
+        return frecuencias_suavizadas(codigos['terminacion'][codigos['franja'] == franja], 10, window)
 
     def predecir(self, franja: str = None, n_pares: int = 5, n_terminaciones: int = 3) -> Dict:
         """
@@ -689,102 +684,57 @@ class Loto3Especialista:
 
         logger.info(f"Generando predicciones para franja: {franja}")
 
-        # Obtener historias recientes
-        ultimos = self.df.tail(20)
-        historia_par_inicial = [f"{int(r['n1'])}{int(r['n2'])}" for _, r in ultimos.iterrows()]
-        historia_par_final = [f"{int(r['n2'])}{int(r['n3'])}" for _, r in ultimos.iterrows()]
-        historia_n3 = ultimos['n3'].astype(int).tolist()
+        # Historias recientes (codigos enteros, sin recorrer filas)
+        codigos = self._codigos()
+        historia_par_inicial = codigos['par_inicial'][-20:].tolist()
+        historia_par_final = codigos['par_final'][-20:].tolist()
+        historia_n3 = codigos['terminacion'][-20:].tolist()
 
         # Ultimos n1, n2 conocidos (para correlaciones de terminacion)
-        ultimo_n1 = int(self.df['n1'].iloc[-1])
-        ultimo_n2 = int(self.df['n2'].iloc[-1])
+        ultimo_n1 = int(codigos['n1'][-1])
+        ultimo_n2 = int(codigos['n2'][-1])
 
-        # =====================================================================
-        # PREDICCION DE PARES INICIALES
-        # =====================================================================
-        probs_par_inicial = defaultdict(float)
-
-        # 1. Markov (40%)
-        markov_probs_ini = self.markov_pares.predecir_probabilidades('inicial', historia_par_inicial)
-        for par, prob in markov_probs_ini.items():
-            probs_par_inicial[par] += prob * self.pesos['markov']
-
-        # 2. RF (35%)
-        if self.rf_par_inicial.trained:
-            df_features = self.rf_par_inicial._generar_features(self.df)
-            ultima_fila = df_features[self.rf_par_inicial.feature_cols].iloc[-1].values
-            rf_probs_ini = self.rf_par_inicial.predecir_probabilidades(ultima_fila)
-            for par_int, prob in rf_probs_ini.items():
-                probs_par_inicial[f"{par_int:02d}"] += prob * self.pesos['rf']
-
-        # 3. Frecuencia (25%)
         freq_ini, freq_fin = self._calcular_frecuencias_pares()
-        for par, prob in freq_ini.items():
-            probs_par_inicial[par] += prob * self.pesos['frecuencia']
-
-        # Ranking pares iniciales
-        ranking_ini = sorted(probs_par_inicial.items(), key=lambda x: x[1], reverse=True)
-        pares_inicial = [
-            {'par': par, 'score': round(prob * 100, 2)}
-            for par, prob in ranking_ini[:n_pares]
-        ]
+
+        def ranking(probs, n, clave, formato):
+            # Empates en orden de indice (mismo orden que el ranking por dict)
+            orden = np.lexsort((np.arange(len(probs)), -probs))[:n]
+            return [{clave: formato(i), 'score': round(float(probs[i]) * 100, 2)} for i in orden]
 
         # =====================================================================
-        # PREDICCION DE PARES FINALES
+        # PREDICCION DE PARES (Markov 40% + RF 35% + Frecuencia 25%)
         # =====================================================================
-        probs_par_final = defaultdict(float)
+        rankings = {}
+        for tipo, historia, rf, freq in [('inicial', historia_par_inicial, self.rf_par_inicial, freq_ini),
+                                         ('final', historia_par_final, self.rf_par_final, freq_fin)]:
+            probs = self.markov_pares.predecir_vector(tipo, historia) * self.pesos['markov']
 
-        # 1. Markov (40%)
-        markov_probs_fin = self.markov_pares.predecir_probabilidades('final', historia_par_final)
-        for par, prob in markov_probs_fin.items():
-            probs_par_final[par] += prob * self.pesos['markov']
-
-        # 2. RF (35%)
-        if self.rf_par_final.trained:
-            df_features = self.rf_par_final._generar_features(self.df)
-            ultima_fila = df_features[self.rf_par_final.feature_cols].iloc[-1].values
-            rf_probs_fin = self.rf_par_final.predecir_probabilidades(ultima_fila)
-            for par_int, prob in rf_probs_fin.items():
-                probs_par_final[f"{par_int:02d}"] += prob * self.pesos['rf']
-
-        # 3. Frecuencia (25%)
-        for par, prob in freq_fin.items():
-            probs_par_final[par] += prob * self.pesos['frecuencia']
-
-        # Ranking pares finales
-        ranking_fin = sorted(probs_par_final.items(), key=lambda x: x[1], reverse=True)
-        pares_final = [
-            {'par': par, 'score': round(prob * 100, 2)}
-            for par, prob in ranking_fin[:n_pares]
-        ]
+            if rf.trained:
+                df_features = rf._generar_features(self.df)
+                ultima_fila = df_features[rf.feature_cols].iloc[-1].values
+                probs = probs + rf.predecir_vector(ultima_fila) * self.pesos['rf']
+
+            probs = probs + freq * self.pesos['frecuencia']
+            rankings[tipo] = ranking(probs, n_pares, 'par', lambda i: f"{i:02d}")
+
+        pares_inicial, pares_final = rankings['inicial'], rankings['final']
 
         # =====================================================================
         # PREDICCION DE TERMINACIONES
         # =====================================================================
-        probs_terminacion = defaultdict(float)
-
         # 1. Markov (40%)
-        markov_probs_term = self.markov_terminacion.predecir_probabilidades(
+        probs_terminacion = self.markov_terminacion.predecir_vector(
             franja, historia_n3, ultimo_n1, ultimo_n2
-        )
-        for digito, prob in markov_probs_term.items():
-            probs_terminacion[digito] += prob * self.pesos['markov']
+        ) * self.pesos['markov']
 
         # 2. Correlaciones (ya incluidas en markov_terminacion, pero agregamos RF weight)
         # RF no aplica directamente a terminacion, usamos las correlaciones como proxy
         # El peso de RF se redistribuye a frecuencia
 
         # 3. Frecuencia (25% + 35% de RF = 60% para terminacion)
-        freq_term = self._calcular_frecuencias_terminacion(franja)
-        for digito, prob in freq_term.items():
-            probs_terminacion[digito] += prob * 0.60  # markov + frecuencia boosted
-
-        # Ranking terminaciones
-        ranking_term = sorted(probs_terminacion.items(), key=lambda x: x[1], reverse=True)
-        terminaciones = [
-            {'digito': digito, 'score': round(prob * 100, 2)}
-            for digito, prob in ranking_term[:n_terminaciones]
-        ]
+        probs_terminacion = probs_terminacion + self._calcular_frecuencias_terminacion(franja) * 0.60
+
+        terminaciones = ranking(probs_terminacion, n_terminaciones, 'digito', int)
 
         return {
             'franja': franja,
@@ -799,33 +749,8 @@ class Loto3Especialista:
 # 5. FUNCIONES DE PERSISTENCIA
 # =============================================================================
 def calcular_proximo_sorteo_loto3() -> Tuple[int, datetime]:
-    """Calcula el proximo sorteo de LOTO3"""
-    ahora = datetime.now(TZ_CHILE)
-
-    ultimo_sorteo = 0
-    if os.path.exists(RUTA_CSV):
-        try:
-            df = pd.read_csv(RUTA_CSV)
-            if not df.empty:
-                ultimo_sorteo = int(df['sorteo'].iloc[-1])
-        except:
-            pass
-
-    # Buscar proximo horario
-    for dias_extra in range(2):
-        fecha_check = ahora + timedelta(days=dias_extra)
-        for hora in sorted(HORARIOS_LOTO3):
-            candidato = TZ_CHILE.localize(datetime(
-                fecha_check.year, fecha_check.month, fecha_check.day, hora, 0, 0
-            ))
-            if candidato > ahora:
-                return ultimo_sorteo + 1, candidato
-
-    # Fallback
-    manana = ahora + timedelta(days=1)
-    return ultimo_sorteo + 1, TZ_CHILE.localize(
-        datetime(manana.year, manana.month, manana.day, 14, 0, 0)
-    )
+    """Calcula el proximo sorteo de LOTO3 (ID con relleno de huecos y fecha)"""
+    return calcular_proximo_sorteo('LOTO3', RUTA_CSV)
 
 
 def guardar_en_simulaciones(predicciones: List[Dict]):
@@ -892,10 +817,14 @@ def guardar_en_simulaciones(predicciones: List[Dict]):
     logger.info(f"Guardadas {len(nuevas_filas)} predicciones especializadas en LOTO_SIMULACIONES.csv")
 
 
-def ejecutar_loto3_especialista(guardar: bool = True) -> List[Dict]:
+def ejecutar_loto3_especialista(guardar: bool = True, cpus: int = CPUS) -> List[Dict]:
     """
     Funcion principal: Ejecuta el sistema LOTO3 Especialista.
 
+    Args:
+        guardar: Si True, guarda las predicciones en LOTO_SIMULACIONES.csv
+        cpus: CPUs disponibles si hay que entrenar (dentro de un pool, solo su parte)
+
     Returns:
         Lista de predicciones generadas (PAR_INICIAL, PAR_FINAL, TERMINACION)
     """
@@ -915,7 +844,7 @@ def ejecutar_loto3_especialista(guardar: bool = True) -> List[Dict]:
     franja = FRANJAS.get(hora_sorteo, 'DIA')
 
     # Crear y ejecutar especialista
-    especialista = Loto3Especialista()
+    especialista = Loto3Especialista(cpus=cpus)
 
     try:
         resultados = especialista.predecir(franja=franja, n_pares=5, n_terminaciones=3)
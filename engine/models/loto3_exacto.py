@@ -0,0 +1,114 @@
+"""
+LOTO3 EXACTO - Busqueda exhaustiva sobre los 1000 resultados posibles
+=====================================================================
+LOTO3 solo tiene 1000 combinaciones (000-999), asi que en vez de muestrear
+candidatos con ruido y deduplicar se puntuan TODAS de una vez:
+
+- Tensor conjunto 10x10x10 a partir de las probabilidades por posicion
+  (matriz 3x10) del ensemble
+- Bonos morfologicos (rango de suma, digitos repetidos, escaleras) como
+  tensores constantes precalculados
+- Top-K determinista (argsort sobre 1000 valores) u opcionalmente
+  muestreo con temperatura desde la distribucion exacta
+- Marginales PAR_INICIAL (n1n2), PAR_FINAL (n2n3) y TERMINACION (n3)
+  como reducciones del tensor
+
+Usado por loto3_ultra.Loto3UltraEnsemble.predecir y loto3_tricore.
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import numpy as np
+from typing import Dict, List, Optional
+
+# Rango de suma preferido (mismo criterio que el score del ensemble)
+SUMA_MIN, SUMA_MAX = 7, 20
+BONO_SUMA = 5
+BONO_REPETIDO = 3
+BONO_ESCALERA = 5
+# Tendencias recientes a partir de las cuales se premia el patron
+UMBRAL_REPETIDO = 0.3
+UMBRAL_ESCALERA = 0.1
+
+# Digitos de cada celda del tensor: _D[i][a, b, c] = digito i de la combinacion abc
+_D = np.indices((10, 10, 10))
+SUMA = _D.sum(axis=0)
+_ORDENADOS = np.sort(_D.reshape(3, -1), axis=0)
+REPETIDO = ((_ORDENADOS[0] == _ORDENADOS[1]) | (_ORDENADOS[1] == _ORDENADOS[2])).reshape(10, 10, 10)
+ESCALERA = ((_ORDENADOS[1] == _ORDENADOS[0] + 1) & (_ORDENADOS[2] == _ORDENADOS[1] + 1)).reshape(10, 10, 10)
+
+
+def _normalizar(matriz: np.ndarray) -> np.ndarray:
+    matriz = np.asarray(matriz, dtype=float)
+    totales = matriz.sum(axis=1, keepdims=True)
+    return np.divide(matriz, totales, out=np.full_like(matriz, 0.1), where=totales > 0)
+
+
+def tensor_probabilidad(matriz: np.ndarray) -> np.ndarray:
+    """P(n1, n2, n3) = P1(n1) * P2(n2) * P3(n3) a partir de una matriz 3x10"""
+    p = _normalizar(matriz)
+    return p[0][:, None, None] * p[1][None, :, None] * p[2][None, None, :]
+
+
+def bonos_morfologicos(patrones: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """Tensor 10x10x10 de ajustes por suma y patrones (segun tendencia reciente)"""
+    patrones = patrones or {}
+    bonos = np.where((SUMA >= SUMA_MIN) & (SUMA <= SUMA_MAX), BONO_SUMA, -BONO_SUMA).astype(float)
+    if patrones.get('prob_repetido', 0) > UMBRAL_REPETIDO:
+        bonos += BONO_REPETIDO * REPETIDO
+    if patrones.get('prob_escalera', 0) > UMBRAL_ESCALERA:
+        bonos += BONO_ESCALERA * ESCALERA
+    return bonos
+
+
+def tensor_score(matriz: np.ndarray, patrones: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """
+    Score de cada combinacion: 100 * probabilidad media por posicion de sus
+    digitos + bonos morfologicos (la misma escala que el score de los
+    candidatos del ensemble).
+    """
+    p = _normalizar(matriz)
+    confianza = (p[0][:, None, None] + p[1][None, :, None] + p[2][None, None, :]) / 3
+    return confianza * 100 + bonos_morfologicos(patrones)
+
+
+def distribucion(score: np.ndarray, temperatura: float) -> np.ndarray:
+    """Distribucion exacta softmax(score / temperatura) sobre las 1000 combinaciones"""
+    z = score / max(float(temperatura), 1e-9)
+    pesos = np.exp(z - z.max())
+    return pesos / pesos.sum()
+
+
+def top_k(score: np.ndarray, k: int, temperatura: Optional[float] = None,
+          rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Indices planos (0-999, = n1*100 + n2*10 + n3) de K combinaciones distintas.
+
+    Sin temperatura: las K de mayor score (empates por indice, determinista).
+    Con temperatura: K muestras sin reemplazo de softmax(score / temperatura)
+    (truco Gumbel-top-k: top-K de score / T + ruido Gumbel).
+    """
+    plano = score.ravel()
+    k = max(0, min(int(k), plano.size))
+    if temperatura is not None:
+        rng = rng if rng is not None else np.random.default_rng()
+        plano = plano / max(float(temperatura), 1e-9) + rng.gumbel(size=plano.size)
+    return np.lexsort((np.arange(plano.size), -plano))[:k]
+
+
+def combinacion(indice: int) -> List[int]:
+    """Indice plano -> [n1, n2, n3]"""
+    return [int(d) for d in np.unravel_index(int(indice), (10, 10, 10))]
+
+
+def marginales(tensor: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Reducciones de un tensor de probabilidad 10x10x10:
+    par_inicial[n1*10 + n2], par_final[n2*10 + n3] y terminacion[n3].
+    """
+    return {
+        'par_inicial': tensor.sum(axis=2).ravel(),
+        'par_final': tensor.sum(axis=0).ravel(),
+        'terminacion': tensor.sum(axis=(0, 1)),
+    }
@@ -1,13 +1,15 @@
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
-import json
 import os
 import logging
-import tempfile
-import shutil
 import pytz
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from calendario_sorteos import HORARIOS, calcular_proximo_sorteo
+import loto3_exacto
+from orquestador_loto3 import ajustar_tareas, CPUS
+from materializador_dashboard import MaterializadorDashboard, DASHBOARD_DIR
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -25,13 +27,13 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(CURRENT_DIR))
 
 RUTA_DATA = os.path.join(PROJECT_ROOT, "data", "LOTO3_MAESTRO.csv")
 RUTA_SIMULACIONES = os.path.join(PROJECT_ROOT, "data", "LOTO_SIMULACIONES.csv")
-RUTA_DASHBOARD = os.path.join(PROJECT_ROOT, "dashboard_data.json")
+RUTA_DASHBOARD = DASHBOARD_DIR
 
 # Timezone Chile
 TZ_CHILE = pytz.timezone('America/Santiago')
 
 # Horarios de sorteo LOTO3: todos los días a las 14:00, 18:00 y 21:00
-HORARIOS_LOTO3 = [14, 18, 21]
+HORARIOS_LOTO3 = HORARIOS['LOTO3']['horas']
 
 
 def calcular_proximo_sorteo_loto3():
@@ -39,21 +41,7 @@ def calcular_proximo_sorteo_loto3():
     Calcula la fecha y hora del próximo sorteo de LOTO3.
     LOTO3 tiene sorteos todos los días a las 14:00, 18:00 y 21:00.
     """
-    ahora = datetime.now(TZ_CHILE)
-
-    # Buscar el próximo horario de hoy o mañana
-    for dias_extra in range(2):  # hoy y mañana
-        fecha_check = ahora + timedelta(days=dias_extra)
-        for hora in sorted(HORARIOS_LOTO3):
-            candidato = TZ_CHILE.localize(datetime(
-                fecha_check.year, fecha_check.month, fecha_check.day, hora, 0, 0
-            ))
-            if candidato > ahora:
-                return candidato
-
-    # Fallback: mañana a las 14:00
-    manana = ahora + timedelta(days=1)
-    return TZ_CHILE.localize(datetime(manana.year, manana.month, manana.day, 14, 0, 0))
+    return calcular_proximo_sorteo('LOTO3', RUTA_DATA)[1]
 
 # ==========================================
 # LÓGICA TRI-CORE (CORREGIDA PARA TUS HEADERS)
@@ -100,7 +88,8 @@ class CerebroPosicional:
             
         return df.dropna(), col_name
 
-    def entrenar(self, df):
+    def tarea_entrenamiento(self, df):
+        """Ajuste pendiente (clave, modelo, X, y) para orquestador_loto3"""
         df_proc, target_col = self.preparar_features(df)
         
         features = [c for c in df_proc.columns if 'lag_' in c or 'dia_' in c or 'rolling' in c]
@@ -108,24 +97,27 @@ class CerebroPosicional:
         X = df_proc[features]
         y = df_proc[target_col].astype(int)
         
-        self.model.fit(X, y)
         self.last_X = X.iloc[[-1]] 
+        self._entrenamiento = (X, y)
+        return (('tricore', self.pos_id), self.model, X, y)
+
+    def completar_entrenamiento(self, modelo):
+        X, y = self._entrenamiento
+        self._entrenamiento = None
+        self.model = modelo
         return self.model.score(X, y)
 
-    def predecir(self):
-        probs = self.model.predict_proba(self.last_X)[0]
-        
-        # ESTRATEGIA: Selección ponderada de los top 3 para mantener varianza
-        top_indices = np.argsort(probs)[-3:] 
-        top_probs = probs[top_indices]
-        top_probs = top_probs / top_probs.sum()
-        
-        prediccion = np.random.choice(top_indices, p=top_probs)
-        confianza = probs[prediccion]
-        
-        return int(prediccion), confianza
+    def entrenar(self, df):
+        clave, modelo, X, y = self.tarea_entrenamiento(df)
+        return self.completar_entrenamiento(modelo.fit(X, y))
 
-def ejecutar_sistema_tricore():
+    def predecir_vector(self):
+        """Probabilidad de cada digito 0-9 para esta posicion"""
+        vector = np.zeros(10)
+        vector[self.model.classes_.astype(int)] = self.model.predict_proba(self.last_X)[0]
+        return vector
+
+def ejecutar_sistema_tricore(cpus=CPUS):
     print("🚀 Iniciando Protocolo Tri-Core para LOTO 3...")
     print(f"📂 Raíz del proyecto detectada: {PROJECT_ROOT}")
     
@@ -144,25 +136,39 @@ def ejecutar_sistema_tricore():
         print(f"❌ Error cargando CSV: {e}")
         return
 
-    prediccion_final = []
-    confianza_total = 0
-    
-    # 2. Bucle de Entrenamiento
+    # 2. Entrenamiento: los 3 núcleos son independientes, se ajustan en paralelo
+    cerebros, tareas = {}, []
     for i in range(1, 4):
         print(f"  ⚙️ Entrenando Núcleo Posicional #{i}...")
         try:
             cerebro = CerebroPosicional(i)
-            acc = cerebro.entrenar(df)
-            num, conf = cerebro.predecir()
-            prediccion_final.append(num)
-            confianza_total += conf
-            print(f"     ✅ Núcleo {i} predice: {num} (Confianza: {conf:.2f})")
+            tareas.append(cerebro.tarea_entrenamiento(df))
+            cerebros[i] = cerebro
         except Exception as e:
             print(f"     ❌ Fallo en Núcleo {i}: {e}")
-            prediccion_final.append(0) # Fallback
+    ajustados, _ = ajustar_tareas(tareas, cpus=cpus)
 
-    # 3. Consolidar Resultado
-    score_final = int((confianza_total / 3) * 100)
+    # Una fila de probabilidades por posición
+    matriz = np.zeros((3, 10))
+    fallidos = []
+    for i in range(1, 4):
+        try:
+            cerebro = cerebros[i]
+            acc = cerebro.completar_entrenamiento(ajustados[('tricore', i)])
+            matriz[i - 1] = cerebro.predecir_vector()
+            print(f"     ✅ Núcleo {i} favorito: {int(matriz[i - 1].argmax())} (Confianza: {matriz[i - 1].max():.2f})")
+        except Exception as e:
+            if i in cerebros:
+                print(f"     ❌ Fallo en Núcleo {i}: {e!r}")
+            matriz[i - 1, 0] = 1.0  # Fallback: 0
+            fallidos.append(i - 1)
+
+    # 3. Consolidar Resultado: mejor combinación exacta entre las 1000 posibles
+    score = loto3_exacto.tensor_score(matriz)
+    prediccion_final = loto3_exacto.combinacion(loto3_exacto.top_k(score, 1)[0])
+    confianzas = matriz[np.arange(3), prediccion_final]
+    confianzas[fallidos] = 0.0
+    score_final = int(confianzas.mean() * 100)
 
     # Calcular sorteo objetivo
     ultimo_sorteo = 0
@@ -226,50 +232,14 @@ def guardar_en_simulaciones(jugada):
 
 def guardar_en_dashboard(jugada):
     """
-    Guarda jugada en dashboard con ESCRITURA ATÓMICA.
-    AUDITORÍA v4: Previene corrupción de JSON si el proceso muere durante escritura.
+    Aplica la jugada al dashboard via el materializador (único escritor,
+    escritura atómica por shard).
     """
-    data = []
-    if os.path.exists(RUTA_DASHBOARD):
-        try:
-            with open(RUTA_DASHBOARD, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except json.JSONDecodeError as e:
-            logger.warning(f"Dashboard corrupto o vacío ({e}), creando uno nuevo.")
-            data = []
-        except IOError as e:
-            logger.error(f"Error leyendo dashboard: {e}")
-            data = []
-
-    # Insertar al principio
-    data.insert(0, jugada)
-    data = data[:200]  # Buffer de memoria
-
-    # ESCRITURA ATÓMICA: write-temp-rename pattern
-    tmp_path = None
     try:
-        dir_name = os.path.dirname(RUTA_DASHBOARD)
-        with tempfile.NamedTemporaryFile(
-            mode='w',
-            encoding='utf-8',
-            suffix='.json',
-            dir=dir_name,
-            delete=False
-        ) as tmp_file:
-            json.dump(data, tmp_file, indent=4, ensure_ascii=False)
-            tmp_path = tmp_file.name
-
-        # Rename atómico (en mismo filesystem)
-        shutil.move(tmp_path, RUTA_DASHBOARD)
+        MaterializadorDashboard(RUTA_DASHBOARD).aplicar([jugada])
         logger.info(f"Predicción Tri-Core {jugada['numeros']} guardada exitosamente")
     except Exception as e:
-        logger.error(f"Error escribiendo JSON: {e}")
-        # Intentar limpiar archivo temporal si existe
-        if tmp_path and os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except OSError:
-                pass
+        logger.error(f"Error escribiendo dashboard: {e}")
 
 if __name__ == "__main__":
     ejecutar_sistema_tricore()
\ No newline at end of file
@@ -21,11 +21,8 @@ import numpy as np
 import os
 import json
 import logging
-import tempfile
-import shutil
 import pytz
-from datetime import datetime, timedelta
-from collections import defaultdict, Counter
+from datetime import datetime
 from typing import List, Dict, Tuple, Optional
 
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
@@ -34,6 +31,13 @@ from sklearn.model_selection import TimeSeriesSplit
 from sklearn.preprocessing import StandardScaler
 import joblib
 
+from markov_tensor import MarkovTensor
+from orquestador_loto3 import ajustar_tareas, CPUS
+import loto3_exacto
+from recencia import recencia, one_hot_serie
+from calendario_sorteos import HORARIOS, calcular_proximo_sorteo
+from materializador_dashboard import MaterializadorDashboard, DASHBOARD_DIR
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 if not logger.handlers:
@@ -50,7 +54,7 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(CURRENT_DIR))
 DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 
 RUTA_CSV = os.path.join(DATA_DIR, "LOTO3_MAESTRO.csv")
-RUTA_DASHBOARD = os.path.join(PROJECT_ROOT, "dashboard_data.json")
+RUTA_DASHBOARD = DASHBOARD_DIR
 RUTA_SIMULACIONES = os.path.join(DATA_DIR, "LOTO_SIMULACIONES.csv")
 RUTA_MODELOS = os.path.join(DATA_DIR, "loto3_ultra_models")
 
@@ -58,12 +62,15 @@ RUTA_MODELOS = os.path.join(DATA_DIR, "loto3_ultra_models")
 os.makedirs(RUTA_MODELOS, exist_ok=True)
 
 TZ_CHILE = pytz.timezone('America/Santiago')
-HORARIOS_LOTO3 = [14, 18, 21]
+HORARIOS_LOTO3 = HORARIOS['LOTO3']['horas']
 FRANJAS = {14: 'DIA', 18: 'TARDE', 21: 'NOCHE'}
 
 # Primos del 0-9
 PRIMOS_0_9 = {2, 3, 5, 7}
 
+# Precalcular entre sorteos la prediccion siguiente (ver especulacion_loto3)
+ESPECULAR = True
+
 
 # =============================================================================
 # 1. FEATURE ENGINEERING AVANZADO
@@ -194,21 +201,10 @@ class FeatureEngineer:
         nuevas_cols = {}
 
         for pos in ['n1', 'n2', 'n3']:
+            # Fila i = sorteos desde la ultima aparicion previa (100 si nunca)
+            distancias = recencia(one_hot_serie(df[pos].to_numpy(), 10), sin_aparicion=100)[:-1]
             for digito in range(10):
-                col_name = f'{pos}_dist_{digito}'
-                distances = []
-                last_seen = -1
-
-                for idx, val in enumerate(df[pos]):
-                    if last_seen == -1:
-                        distances.append(100)  # Valor alto inicial
-                    else:
-                        distances.append(idx - last_seen)
-
-                    if val == digito:
-                        last_seen = idx
-
-                nuevas_cols[col_name] = distances
+                nuevas_cols[f'{pos}_dist_{digito}'] = distancias[:, digito]
 
         # Agregar todas las columnas de una vez
         df = pd.concat([df, pd.DataFrame(nuevas_cols)], axis=1)
@@ -231,9 +227,10 @@ class MarkovLoto3:
 
     def __init__(self, orden_max: int = 3):
         self.orden_max = orden_max
-        self.transiciones = {pos: {orden: defaultdict(Counter)
-                                   for orden in range(1, orden_max + 1)}
-                            for pos in ['n1', 'n2', 'n3']}
+        self.pesos = {1: 0.2, 2: 0.35, 3: 0.45}  # Mayor peso a ordenes superiores
+        # Un tensor de conteos 10^orden x 10 por posicion
+        self.tensores = {pos: MarkovTensor(10, orden_max=orden_max, pesos=self.pesos)
+                         for pos in ['n1', 'n2', 'n3']}
         self.trained = False
 
     def entrenar(self, df: pd.DataFrame):
@@ -241,42 +238,32 @@ class MarkovLoto3:
         logger.info(f"Entrenando Markov orden 1-{self.orden_max}...")
 
         for pos in ['n1', 'n2', 'n3']:
-            valores = df[pos].values
-
-            for orden in range(1, self.orden_max + 1):
-                for i in range(orden, len(valores)):
-                    # Estado anterior (tupla de 'orden' valores)
-                    estado = tuple(valores[i-orden:i])
-                    siguiente = valores[i]
-                    self.transiciones[pos][orden][estado][siguiente] += 1
+            self.tensores[pos].entrenar(df[pos].astype(int).to_numpy())
 
         self.trained = True
         logger.info("Markov entrenado correctamente")
 
-    def predecir_probabilidades(self, pos: str, historia: List[int]) -> Dict[int, float]:
-        """Retorna probabilidades para cada digito 0-9 usando ensemble de ordenes"""
-        if not self.trained:
-            return {i: 0.1 for i in range(10)}  # Uniforme
-
-        probs_combined = defaultdict(float)
-        pesos = {1: 0.2, 2: 0.35, 3: 0.45}  # Mayor peso a ordenes superiores
+    def actualizar(self, numeros: List[int]):
+        """Incorpora un sorteo nuevo [n1, n2, n3] sin reentrenar"""
+        for pos, valor in zip(['n1', 'n2', 'n3'], numeros):
+            self.tensores[pos].actualizar(valor)
+        self.trained = True
 
-        for orden in range(1, self.orden_max + 1):
-            if len(historia) >= orden:
-                estado = tuple(historia[-orden:])
-                transiciones = self.transiciones[pos][orden].get(estado, Counter())
-                total = sum(transiciones.values())
+    def predecir_vector(self, pos: str, historia: List[int]) -> np.ndarray:
+        """Probabilidades de los digitos 0-9 como array (ensemble de ordenes)"""
+        if not self.trained:
+            return np.full(10, 0.1)  # Uniforme
+        return self.tensores[pos].probabilidades(historia)
 
-                if total > 0:
-                    for digito in range(10):
-                        prob = (transiciones.get(digito, 0) + 1) / (total + 10)  # Laplace
-                        probs_combined[digito] += prob * pesos[orden]
+    def predecir_matriz(self, historias: List[List[int]]) -> np.ndarray:
+        """Matriz 3x10: probabilidades de cada digito para n1, n2 y n3"""
+        return np.vstack([self.predecir_vector(pos, historia)
+                          for pos, historia in zip(['n1', 'n2', 'n3'], historias)])
 
-        # Normalizar
-        total_prob = sum(probs_combined.values())
-        if total_prob > 0:
-            return {k: v / total_prob for k, v in probs_combined.items()}
-        return {i: 0.1 for i in range(10)}
+    def predecir_probabilidades(self, pos: str, historia: List[int]) -> Dict[int, float]:
+        """Retorna probabilidades para cada digito 0-9 usando ensemble de ordenes"""
+        probs = self.predecir_vector(pos, historia)
+        return {i: float(p) for i, p in enumerate(probs)}
 
     def predecir(self, historia_n1: List[int], historia_n2: List[int],
                  historia_n3: List[int]) -> Tuple[List[int], float]:
@@ -285,15 +272,12 @@ class MarkovLoto3:
         confianza_total = 0
 
         for pos, historia in [('n1', historia_n1), ('n2', historia_n2), ('n3', historia_n3)]:
-            probs = self.predecir_probabilidades(pos, historia)
+            probs = self.predecir_vector(pos, historia)
 
             # Muestreo ponderado
-            digitos = list(probs.keys())
-            probabilidades = list(probs.values())
-
-            elegido = np.random.choice(digitos, p=probabilidades)
-            prediccion.append(int(elegido))
-            confianza_total += probs[elegido]
+            elegido = int(np.random.choice(10, p=probs))
+            prediccion.append(elegido)
+            confianza_total += float(probs[elegido])
 
         return prediccion, confianza_total / 3
 
@@ -322,14 +306,18 @@ class ModeloFranjaHoraria:
 
         return [c for c in df.columns if c not in exclude and df[c].dtype in ['int64', 'float64']]
 
-    def entrenar(self, df: pd.DataFrame):
-        """Entrena modelos para esta franja horaria"""
+    def tareas_entrenamiento(self, df: pd.DataFrame) -> List[Tuple]:
+        """
+        Prepara los 3 ajustes de la franja como tareas (clave, modelo, X, y)
+        para orquestador_loto3. Una sola matriz de features escalada y un
+        scaler compartido por las 3 posiciones (mismas X de entrada).
+        """
         # Filtrar por franja
         df_franja = df[df['franja'] == self.franja].copy()
 
         if len(df_franja) < 100:
             logger.warning(f"Franja {self.franja}: datos insuficientes ({len(df_franja)})")
-            return False
+            return []
 
         logger.info(f"Entrenando franja {self.franja} con {len(df_franja)} registros...")
 
@@ -339,7 +327,7 @@ class ModeloFranjaHoraria:
 
         if len(df_clean) < 50:
             logger.warning(f"Franja {self.franja}: muy pocos datos limpios")
-            return False
+            return []
 
         X = df_clean[self.feature_cols].values
 
@@ -347,23 +335,25 @@ class ModeloFranjaHoraria:
         split_idx = int(len(X) * 0.8)
         X_train, X_test = X[:split_idx], X[split_idx:]
 
+        # Scaler (compartido: las 3 posiciones usan las mismas X)
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
+
+        tareas = []
+        self._evaluacion = {}
         for pos in ['n1', 'n2', 'n3']:
             y = df_clean[pos].values
-            y_train, y_test = y[:split_idx], y[split_idx:]
-
-            # Scaler
-            scaler = StandardScaler()
-            X_train_scaled = scaler.fit_transform(X_train)
-            X_test_scaled = scaler.transform(X_test)
             self.scalers[pos] = scaler
+            self._evaluacion[pos] = (X_test_scaled, y[split_idx:])
 
-            # Modelo base
+            # Modelo base (n_jobs lo fija el orquestador segun el presupuesto de CPU)
             base_model = RandomForestClassifier(
                 n_estimators=150,
                 max_depth=12,
                 min_samples_leaf=5,
                 max_features='sqrt',
-                n_jobs=None, # [FIX-2026] Delegado al contexto paralelo
+                n_jobs=None,
                 random_state=42
             )
 
@@ -373,17 +363,50 @@ class ModeloFranjaHoraria:
             else:
                 model = base_model
 
-            # [FIX-2026] Uso explícito de backend para evitar warnings de sklearn
-            with joblib.parallel_backend('loky', n_jobs=-1):
-                model.fit(X_train_scaled, y_train)
+            tareas.append((('franja', self.franja, pos), model, X_train_scaled, y[:split_idx]))
+        return tareas
+
+    def completar_entrenamiento(self, ajustados: Dict) -> bool:
+        """Recoge los modelos ajustados por el orquestador y los evalua"""
+        evaluacion = getattr(self, '_evaluacion', None) or {}
+        self._evaluacion = None
+        for pos, (X_test_scaled, y_test) in evaluacion.items():
+            model = ajustados.get(('franja', self.franja, pos))
+            if model is None:
+                return False
             self.modelos[pos] = model
 
             # Evaluar
             score = model.score(X_test_scaled, y_test)
-            logger.info(f"  {pos}: Test accuracy = {score:.4f}")
+            logger.info(f"  {self.franja} {pos}: Test accuracy = {score:.4f}")
 
-        self.trained = True
-        return True
+        self.trained = bool(evaluacion)
+        return self.trained
+
+    def entrenar(self, df: pd.DataFrame, cpus: int = CPUS):
+        """Entrena modelos para esta franja horaria (3 posiciones en paralelo)"""
+        tareas = self.tareas_entrenamiento(df)
+        if not tareas:
+            return False
+        ajustados, _ = ajustar_tareas(tareas, cpus=cpus)
+        return self.completar_entrenamiento(ajustados)
+
+    def predecir_lote(self, features: np.ndarray) -> np.ndarray:
+        """
+        Matrices (n x 3 x 10) de probabilidades por posicion para n filas
+        de features (digitos sin clase = 0). Un transform + predict_proba
+        por posicion para todo el lote.
+        """
+        features = np.atleast_2d(features)
+        matrices = np.zeros((len(features), 3, 10))
+        for i, pos in enumerate(['n1', 'n2', 'n3']):
+            X_scaled = self.scalers[pos].transform(features)
+            matrices[:, i, self.modelos[pos].classes_.astype(int)] = self.modelos[pos].predict_proba(X_scaled)
+        return matrices
+
+    def predecir_matriz(self, features: np.ndarray) -> np.ndarray:
+        """Matriz 3x10 de probabilidades por posicion para una fila de features"""
+        return self.predecir_lote(features.reshape(1, -1))[0]
 
     def predecir(self, features: np.ndarray) -> Tuple[List[int], float]:
         """Predice usando los 3 modelos"""
@@ -436,8 +459,10 @@ class VentanaAdaptativa:
             vol = self.calcular_volatilidad(df[pos])
             volatilidades.append(vol)
 
-        vol_promedio = np.mean(volatilidades)
+        return self.ventana_para(np.mean(volatilidades))
 
+    def ventana_para(self, vol_promedio: float) -> int:
+        """Tamano de ventana para una volatilidad promedio dada"""
         # Alta volatilidad -> ventana corta (reactiva)
         # Baja volatilidad -> ventana larga (estable)
         if vol_promedio > 0.8:
@@ -456,7 +481,9 @@ class VentanaAdaptativa:
 class Loto3UltraEnsemble:
     """Ensemble que combina todos los modelos"""
 
-    def __init__(self):
+    def __init__(self, cpus: int = CPUS):
+        # Presupuesto de CPU del entrenamiento (ver orquestador_loto3)
+        self.cpus = cpus
         self.feature_engineer = None
         self.markov = MarkovLoto3(orden_max=3)
         self.modelos_franja = {
@@ -487,8 +514,12 @@ class Loto3UltraEnsemble:
         logger.info(f"Datos cargados: {len(df)} registros")
         return df
 
-    def entrenar(self):
-        """Entrena todos los componentes del ensemble"""
+    def tareas_entrenamiento(self) -> List[Tuple]:
+        """
+        Carga datos, construye features (una vez, compartidos por las 3
+        franjas), entrena Markov y devuelve los 9 ajustes pendientes de
+        los modelos por franja (ver orquestador_loto3).
+        """
         logger.info("=" * 60)
         logger.info("LOTO3 ULTRA: INICIANDO ENTRENAMIENTO COMPLETO")
         logger.info("=" * 60)
@@ -501,9 +532,14 @@ class Loto3UltraEnsemble:
         # 2. Entrenar Markov
         self.markov.entrenar(self.df_procesado)
 
-        # 3. Entrenar modelos por franja
+        # 3. Tareas de los modelos por franja
+        return [tarea for modelo in self.modelos_franja.values()
+                for tarea in modelo.tareas_entrenamiento(self.df_procesado)]
+
+    def completar_entrenamiento(self, ajustados: Dict):
+        """Recoge los modelos por franja ajustados y guarda el ensemble"""
         for franja, modelo in self.modelos_franja.items():
-            modelo.entrenar(self.df_procesado)
+            modelo.completar_entrenamiento(ajustados)
 
         # 4. Guardar feature columns
         exclude = ['n1', 'n2', 'n3', 'fecha', 'sorteo', 'combinacion', 'franja',
@@ -520,6 +556,11 @@ class Loto3UltraEnsemble:
         # Guardar modelos
         self._guardar_modelos()
 
+    def entrenar(self, cpus: Optional[int] = None):
+        """Entrena todos los componentes del ensemble (franjas y posiciones en paralelo)"""
+        ajustados, _ = ajustar_tareas(self.tareas_entrenamiento(), cpus=self.cpus if cpus is None else cpus)
+        self.completar_entrenamiento(ajustados)
+
     def _guardar_modelos(self):
         """Guarda los modelos entrenados"""
         try:
@@ -544,7 +585,11 @@ class Loto3UltraEnsemble:
         try:
             markov_path = os.path.join(RUTA_MODELOS, 'markov.pkl')
             if os.path.exists(markov_path):
-                self.markov = joblib.load(markov_path)
+                markov = joblib.load(markov_path)
+                # Pickles previos a MarkovTensor guardaban defaultdict(Counter)
+                if not hasattr(markov, 'tensores'):
+                    raise ValueError("markov.pkl con formato antiguo, se reentrenara")
+                self.markov = markov
 
             for franja in ['DIA', 'TARDE', 'NOCHE']:
                 franja_path = os.path.join(RUTA_MODELOS, f'franja_{franja}.pkl')
@@ -590,11 +635,50 @@ class Loto3UltraEnsemble:
             'rango_promedio': ultimos_20['rango_digitos'].mean()
         }
 
-    def predecir(self, franja: str = None, n_candidatos: int = 10) -> List[Dict]:
+    def vectores_componentes(self, franja: str, historias: List[List[int]],
+                             ultima_fila: np.ndarray, frecuencias: Dict[str, Dict[int, float]]) -> Dict:
         """
-        Genera predicciones usando el ensemble completo.
-        Retorna lista de candidatos ordenados por score.
+        Matrices 3x10 (posicion x digito) de cada componente para el
+        estado actual. Son constantes durante una solicitud de prediccion.
         """
+        modelo_franja = self.modelos_franja[franja]
+        franja_entrenada = modelo_franja.trained
+        return {
+            'franja': modelo_franja.predecir_matriz(ultima_fila) if franja_entrenada else np.full((3, 10), 0.1),
+            'franja_entrenada': franja_entrenada,
+            'markov': self.markov.predecir_matriz(historias),
+            'frecuencia': np.array([[frecuencias[pos][d] for d in range(10)] for pos in ['n1', 'n2', 'n3']]),
+        }
+
+    def matriz_ensemble(self, vectores: Dict) -> np.ndarray:
+        """Probabilidad 3x10 por posicion: mezcla ponderada de los componentes"""
+        matriz = sum(self.pesos[c] * vectores[c] for c in ['franja', 'markov', 'frecuencia'])
+        return matriz / matriz.sum(axis=1, keepdims=True)
+
+    def _candidatos_exactos(self, vectores: Dict, n: int, patrones: Dict[str, float],
+                            temperatura: Optional[float] = None) -> List[Dict]:
+        """Top-n (o muestreo con temperatura) sobre las 1000 combinaciones puntuadas"""
+        score = loto3_exacto.tensor_score(self.matriz_ensemble(vectores), patrones)
+        posiciones = np.arange(3)
+        candidatos = []
+        for indice in loto3_exacto.top_k(score, n, temperatura=temperatura):
+            numeros = loto3_exacto.combinacion(indice)
+            digitos = np.array(numeros)
+            conf_franja = 0.33 if not vectores['franja_entrenada'] else vectores['franja'][posiciones, digitos].mean()
+            candidatos.append({
+                'numeros': numeros,
+                'score': round(min(float(score.flat[indice]), 99), 2),
+                'confianza_franja': round(float(conf_franja) * 100, 2),
+                'confianza_markov': round(float(vectores['markov'][posiciones, digitos].mean()) * 100, 2),
+                'suma': int(loto3_exacto.SUMA.flat[indice]),
+                'tiene_repetido': bool(loto3_exacto.REPETIDO.flat[indice]),
+                'es_escalera': bool(loto3_exacto.ESCALERA.flat[indice]),
+                'metodo': 'ultra_ensemble'
+            })
+        return candidatos
+
+    def _preparar_prediccion(self, franja: Optional[str]) -> Tuple[str, Dict, Dict[str, float]]:
+        """Carga modelos/datos y evalua cada componente una vez: (franja, vectores, patrones)"""
         if not self.trained:
             if not self._cargar_modelos():
                 logger.info("Modelos no encontrados, entrenando...")
@@ -623,172 +707,72 @@ class Loto3UltraEnsemble:
         window = self.ventana_adaptativa.obtener_ventana(self.df_procesado)
         logger.info(f"Ventana adaptativa: {window}")
 
-        # Obtener historias recientes para Markov
-        historia_n1 = self.df_procesado['n1'].tail(10).tolist()
-        historia_n2 = self.df_procesado['n2'].tail(10).tolist()
-        historia_n3 = self.df_procesado['n3'].tail(10).tolist()
-
-        # Obtener features para modelo de franja
+        # Historias recientes para Markov y features para el modelo de franja
+        historias = [self.df_procesado[pos].tail(10).tolist() for pos in ['n1', 'n2', 'n3']]
         ultima_fila = self.df_procesado[self.feature_cols].iloc[-1].values
 
         # Obtener frecuencias y patrones
         frecuencias = self._calcular_frecuencias_recientes(window)
         patrones = self._analizar_patron_actual()
 
-        # Generar candidatos
-        candidatos = []
+        return franja, self.vectores_componentes(franja, historias, ultima_fila, frecuencias), patrones
 
-        for _ in range(n_candidatos * 5):  # Generar mas y filtrar
-            # 1. Prediccion del modelo de franja
-            if self.modelos_franja[franja].trained:
-                pred_franja, conf_franja = self.modelos_franja[franja].predecir(ultima_fila)
-            else:
-                pred_franja = [np.random.randint(0, 10) for _ in range(3)]
-                conf_franja = 0.33
-
-            # 2. Prediccion de Markov
-            pred_markov, conf_markov = self.markov.predecir(historia_n1, historia_n2, historia_n3)
-
-            # 3. Prediccion por frecuencia
-            pred_freq = []
-            conf_freq = 0
-            for pos in ['n1', 'n2', 'n3']:
-                probs = list(frecuencias[pos].values())
-                elegido = np.random.choice(range(10), p=np.array(probs)/sum(probs))
-                pred_freq.append(elegido)
-                conf_freq += frecuencias[pos][elegido]
-            conf_freq /= 3
-
-            # 4. Combinar predicciones con votacion ponderada
-            votos = defaultdict(lambda: defaultdict(float))
-
-            for i, pos in enumerate(['n1', 'n2', 'n3']):
-                votos[pos][pred_franja[i]] += self.pesos['franja'] * conf_franja
-                votos[pos][pred_markov[i]] += self.pesos['markov'] * conf_markov
-                votos[pos][pred_freq[i]] += self.pesos['frecuencia'] * conf_freq
-
-            # Seleccionar ganador por posicion
-            prediccion_final = []
-            confianza_final = 0
-
-            for pos in ['n1', 'n2', 'n3']:
-                # Agregar ruido para diversidad
-                for digito in range(10):
-                    votos[pos][digito] += np.random.uniform(0, 0.05)
-
-                ganador = max(votos[pos], key=votos[pos].get)
-                prediccion_final.append(ganador)
-                confianza_final += votos[pos][ganador]
-
-            confianza_final /= 3
-
-            # Calcular score morfologico
-            suma = sum(prediccion_final)
-            tiene_repetido = len(set(prediccion_final)) < 3
-            es_escalera = sorted(prediccion_final) == list(range(min(prediccion_final), min(prediccion_final) + 3))
-
-            # Penalizaciones/bonificaciones
-            score = confianza_final * 100
-
-            # Ajuste por suma (preferir rango 7-20)
-            if 7 <= suma <= 20:
-                score += 5
-            else:
-                score -= 5
+    def predecir(self, franja: str = None, n_candidatos: int = 10,
+                 temperatura: Optional[float] = None) -> List[Dict]:
+        """
+        Genera predicciones usando el ensemble completo.
+        Retorna lista de candidatos ordenados por score.
 
-            # Ajuste por patrones (segun tendencia reciente)
-            if tiene_repetido and patrones.get('prob_repetido', 0) > 0.3:
-                score += 3
-            if es_escalera and patrones.get('prob_escalera', 0) > 0.1:
-                score += 5
+        Puntua exhaustivamente las 1000 combinaciones: sin temperatura
+        devuelve el top-K exacto; con temperatura, K combinaciones distintas
+        muestreadas de softmax(score / temperatura).
+        """
+        franja, vectores, patrones = self._preparar_prediccion(franja)
+        return self.candidatos_ordenados(vectores, patrones, n_candidatos, temperatura)
 
-            candidatos.append({
-                'numeros': prediccion_final,
-                'score': round(min(score, 99), 2),
-                'confianza_franja': round(conf_franja * 100, 2),
-                'confianza_markov': round(conf_markov * 100, 2),
-                'suma': suma,
-                'tiene_repetido': tiene_repetido,
-                'es_escalera': es_escalera,
-                'metodo': 'ultra_ensemble'
-            })
+    def candidatos_ordenados(self, vectores: Dict, patrones: Dict[str, float], n_candidatos: int,
+                             temperatura: Optional[float] = None) -> List[Dict]:
+        """Candidatos de unos vectores de componentes, ordenados por score (ver predecir)"""
+        candidatos = self._candidatos_exactos(vectores, n_candidatos, patrones, temperatura)
+        return sorted(candidatos, key=lambda x: x['score'], reverse=True)
 
-        # Ordenar por score y eliminar duplicados
-        vistos = set()
-        unicos = []
-        for c in sorted(candidatos, key=lambda x: x['score'], reverse=True):
-            key = tuple(c['numeros'])
-            if key not in vistos:
-                vistos.add(key)
-                unicos.append(c)
-            if len(unicos) >= n_candidatos:
-                break
+    def predecir_marginales(self, franja: str = None, n_pares: int = 5, n_terminaciones: int = 3) -> Dict:
+        """
+        Rankings PAR_INICIAL / PAR_FINAL / TERMINACION como reducciones del
+        tensor de probabilidad conjunta del ensemble (mismo formato que
+        Loto3Especialista.predecir).
+        """
+        franja, vectores, _ = self._preparar_prediccion(franja)
+        reducciones = loto3_exacto.marginales(loto3_exacto.tensor_probabilidad(self.matriz_ensemble(vectores)))
 
-        return unicos
+        def ranking(probs, n, clave, formato):
+            orden = np.lexsort((np.arange(len(probs)), -probs))[:n]
+            return [{clave: formato(i), 'score': round(float(probs[i]) * 100, 2)} for i in orden]
+
+        return {
+            'franja': franja,
+            'pares_inicial': ranking(reducciones['par_inicial'], n_pares, 'par', lambda i: f"{i:02d}"),
+            'pares_final': ranking(reducciones['par_final'], n_pares, 'par', lambda i: f"{i:02d}"),
+            'terminaciones': ranking(reducciones['terminacion'], n_terminaciones, 'digito', int),
+            'timestamp': datetime.now(TZ_CHILE).strftime("%Y-%m-%d %H:%M:%S")
+        }
 
 
 # =============================================================================
 # 6. FUNCIONES DE INTERFAZ
 # =============================================================================
 def calcular_proximo_sorteo_loto3() -> Tuple[int, datetime]:
-    """Calcula el proximo sorteo de LOTO3"""
-    ahora = datetime.now(TZ_CHILE)
-
-    # Cargar ultimo sorteo del CSV
-    ultimo_sorteo = 0
-    if os.path.exists(RUTA_CSV):
-        try:
-            df = pd.read_csv(RUTA_CSV)
-            if not df.empty:
-                ultimo_sorteo = int(df['sorteo'].iloc[-1])
-        except:
-            pass
-
-    # Buscar proximo horario
-    for dias_extra in range(2):
-        fecha_check = ahora + timedelta(days=dias_extra)
-        for hora in sorted(HORARIOS_LOTO3):
-            candidato = TZ_CHILE.localize(datetime(
-                fecha_check.year, fecha_check.month, fecha_check.day, hora, 0, 0
-            ))
-            if candidato > ahora:
-                return ultimo_sorteo + 1, candidato
-
-    # Fallback
-    manana = ahora + timedelta(days=1)
-    return ultimo_sorteo + 1, TZ_CHILE.localize(
-        datetime(manana.year, manana.month, manana.day, 14, 0, 0)
-    )
+    """Calcula el proximo sorteo de LOTO3 (ID con relleno de huecos y fecha)"""
+    return calcular_proximo_sorteo('LOTO3', RUTA_CSV)
 
 
 def guardar_en_dashboard(jugadas: List[Dict]):
-    """Guarda las predicciones en el dashboard JSON"""
-    data = []
-    if os.path.exists(RUTA_DASHBOARD):
-        try:
-            with open(RUTA_DASHBOARD, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except:
-            data = []
-
-    # Insertar al principio
-    data = jugadas + data
-    data = data[:200]  # Limite
-
-    # Escritura atomica
-    tmp_path = None
+    """Aplica las predicciones al dashboard (deltas via el materializador)"""
     try:
-        dir_name = os.path.dirname(RUTA_DASHBOARD)
-        with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8',
-                                         suffix='.json', dir=dir_name, delete=False) as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-            tmp_path = f.name
-        shutil.move(tmp_path, RUTA_DASHBOARD)
-        logger.info(f"Guardadas {len(jugadas)} predicciones en dashboard")
+        aplicados = MaterializadorDashboard(RUTA_DASHBOARD).aplicar(jugadas)
+        logger.info(f"Guardadas {aplicados} predicciones en dashboard")
     except Exception as e:
         logger.error(f"Error guardando: {e}")
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
 
 
 def guardar_en_simulaciones(jugadas: List[Dict]):
@@ -826,12 +810,13 @@ def guardar_en_simulaciones(jugadas: List[Dict]):
     logger.info(f"Guardadas {len(jugadas)} predicciones en LOTO_SIMULACIONES.csv")
 
 
-def ejecutar_loto3_ultra(guardar: bool = True) -> List[Dict]:
+def ejecutar_loto3_ultra(guardar: bool = True, cpus: int = CPUS) -> List[Dict]:
     """
     Funcion principal: Ejecuta el sistema LOTO3 Ultra completo.
 
     Args:
         guardar: Si True, guarda las predicciones en el dashboard
+        cpus: CPUs disponibles si hay que entrenar (dentro de un pool, solo su parte)
 
     Returns:
         Lista de predicciones generadas
@@ -852,13 +837,20 @@ def ejecutar_loto3_ultra(guardar: bool = True) -> List[Dict]:
     franja = FRANJAS.get(hora_sorteo, 'DIA')
 
     # Crear y ejecutar ensemble
-    ensemble = Loto3UltraEnsemble()
+    ensemble = Loto3UltraEnsemble(cpus=cpus)
 
-    try:
-        predicciones = ensemble.predecir(franja=franja, n_candidatos=10)
-    except Exception as e:
-        logger.error(f"Error en prediccion: {e}")
-        return []
+    # Tabla especulativa precalculada antes del sorteo (milisegundos si acierta)
+    predicciones = None
+    if ESPECULAR:
+        import especulacion_loto3
+        predicciones = especulacion_loto3.servir(ensemble, franja, n_candidatos=10)
+
+    if predicciones is None:
+        try:
+            predicciones = ensemble.predecir(franja=franja, n_candidatos=10)
+        except Exception as e:
+            logger.error(f"Error en prediccion: {e}")
+            return []
 
     # Formatear para dashboard
     jugadas = []
@@ -887,6 +879,22 @@ def ejecutar_loto3_ultra(guardar: bool = True) -> List[Dict]:
     return jugadas
 
 
+def especular_siguiente(cpus: int = CPUS) -> Optional[Dict]:
+    """
+    Reconstruye la tabla especulativa (prediccion siguiente para cada
+    resultado posible). Paso aparte: se llama despues de publicar las
+    predicciones, no dentro de ejecutar_loto3_ultra.
+    """
+    if not ESPECULAR:
+        return None
+    import especulacion_loto3
+    try:
+        return especulacion_loto3.especular(Loto3UltraEnsemble(cpus=cpus))
+    except Exception as e:
+        logger.warning(f"Especulacion LOTO3 omitida: {e}")
+        return None
+
+
 # =============================================================================
 # MAIN
 # =============================================================================
@@ -900,6 +908,7 @@ if __name__ == "__main__":
     else:
         # Modo prediccion normal
         resultados = ejecutar_loto3_ultra(guardar=True)
+        especular_siguiente()
 
         if resultados:
             print("\n" + "=" * 40)
@@ -0,0 +1,219 @@
+"""
+MARKOV TENSOR - Motor Markov compacto compartido
+=================================================
+Almacena los conteos de transicion de orden 1..N como tensores NumPy
+en lugar de defaultdict(Counter) con tuplas como llave.
+
+- Estados codificados en base `n_estados` (historia [a, b] -> a*n + b)
+- Ordenes pequenos: matriz densa (n^orden x n)
+- Ordenes grandes (ej: pares 100^2 x 100): filas dispersas {estado: vector}
+- Entrenamiento vectorizado desde arrays de columna (sin iterrows)
+- Actualizacion incremental O(orden_max) al llegar un sorteo nuevo
+- Probabilidades interpoladas (ensemble de ordenes) o backoff como arrays
+
+Usado por MarkovLoto3 (loto3_ultra), MarkovPares y MarkovTerminacion
+(loto3_especialista).
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import logging
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Pesos por orden usados historicamente por los modelos LOTO3
+PESOS_ORDEN_DEFAULT = {1: 0.20, 2: 0.35, 3: 0.45}
+
+# Sobre este numero de celdas (filas x columnas) el orden se guarda disperso.
+# 10x10, 100x10, 1000x10 y 100x100 quedan densos; 100^2 x 100 queda disperso.
+LIMITE_DENSO = 250_000
+
+
+class MarkovTensor:
+    """
+    Conteos de transicion de orden 1..orden_max sobre un alfabeto 0..n_estados-1.
+
+    Los conteos son acumulativos: llamar `entrenar` dos veces suma ambas
+    secuencias (igual que los Counter originales).
+    """
+
+    def __init__(self, n_estados: int, orden_max: int = 3,
+                 pesos: Optional[Dict[int, float]] = None,
+                 limite_denso: int = LIMITE_DENSO):
+        self.n_estados = int(n_estados)
+        self.orden_max = int(orden_max)
+        self.pesos = dict(pesos) if pesos else dict(PESOS_ORDEN_DEFAULT)
+        self.conteos = {}
+        for orden in range(1, self.orden_max + 1):
+            filas = self.n_estados ** orden
+            if filas * self.n_estados <= limite_denso:
+                self.conteos[orden] = np.zeros((filas, self.n_estados), dtype=np.int64)
+            else:
+                self.conteos[orden] = {}  # {codigo_estado: np.ndarray(n_estados)}
+        # Ultimos valores observados (permite actualizar sin pasar historia)
+        self.historia_reciente: List[int] = []
+        self.n_observaciones = 0
+
+    # ------------------------------------------------------------------
+    # Utilidades internas
+    # ------------------------------------------------------------------
+    def es_denso(self, orden: int) -> bool:
+        return isinstance(self.conteos[orden], np.ndarray)
+
+    def _codificar(self, historia: Sequence[int], orden: int) -> Optional[int]:
+        """Codifica los ultimos `orden` valores de la historia como entero"""
+        if len(historia) < orden:
+            return None
+        codigo = 0
+        for valor in list(historia)[-orden:]:
+            valor = int(valor)
+            if not 0 <= valor < self.n_estados:
+                return None
+            codigo = codigo * self.n_estados + valor
+        return codigo
+
+    def _validar(self, secuencia) -> np.ndarray:
+        seq = np.asarray(secuencia, dtype=np.int64).ravel()
+        if seq.size and (seq.min() < 0 or seq.max() >= self.n_estados):
+            raise ValueError(f"Valores fuera de rango 0..{self.n_estados - 1}")
+        return seq
+
+    # ------------------------------------------------------------------
+    # Entrenamiento
+    # ------------------------------------------------------------------
+    def entrenar(self, secuencia) -> 'MarkovTensor':
+        """Acumula las transiciones de una secuencia completa (vectorizado)"""
+        seq = self._validar(secuencia)
+        n = self.n_estados
+
+        for orden in range(1, self.orden_max + 1):
+            m = len(seq) - orden
+            if m <= 0:
+                continue
+
+            estados = np.zeros(m, dtype=np.int64)
+            for k in range(orden):
+                estados = estados * n + seq[k:k + m]
+            siguientes = seq[orden:]
+
+            tabla = self.conteos[orden]
+            if self.es_denso(orden):
+                planos = np.bincount(estados * n + siguientes, minlength=tabla.size)
+                tabla += planos.reshape(tabla.shape)
+            else:
+                codigos, cuentas = np.unique(estados * n + siguientes, return_counts=True)
+                for estado, siguiente, cuenta in zip(codigos // n, codigos % n, cuentas):
+                    fila = tabla.get(int(estado))
+                    if fila is None:
+                        fila = np.zeros(n, dtype=np.int64)
+                        tabla[int(estado)] = fila
+                    fila[siguiente] += cuenta
+
+        self.n_observaciones += len(seq)
+        if len(seq):
+            self.historia_reciente = (self.historia_reciente + seq.tolist())[-self.orden_max:]
+        return self
+
+    def actualizar(self, siguiente: int, historia: Optional[Sequence[int]] = None):
+        """
+        Registra un valor nuevo en O(orden_max).
+
+        Si no se pasa historia se usan los ultimos valores vistos por el tensor.
+        """
+        siguiente = int(siguiente)
+        if not 0 <= siguiente < self.n_estados:
+            raise ValueError(f"Valor fuera de rango 0..{self.n_estados - 1}: {siguiente}")
+
+        contexto = self.historia_reciente if historia is None else list(historia)
+        for orden in range(1, self.orden_max + 1):
+            estado = self._codificar(contexto, orden)
+            if estado is None:
+                continue
+            tabla = self.conteos[orden]
+            if self.es_denso(orden):
+                tabla[estado, siguiente] += 1
+            else:
+                fila = tabla.get(estado)
+                if fila is None:
+                    fila = np.zeros(self.n_estados, dtype=np.int64)
+                    tabla[estado] = fila
+                fila[siguiente] += 1
+
+        self.n_observaciones += 1
+        self.historia_reciente = (list(contexto) + [siguiente])[-self.orden_max:]
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def conteos_estado(self, orden: int, historia: Sequence[int]) -> Optional[np.ndarray]:
+        """Vector de conteos del estado formado por los ultimos `orden` valores"""
+        if orden not in self.conteos:
+            return None
+        estado = self._codificar(historia, orden)
+        if estado is None:
+            return None
+        tabla = self.conteos[orden]
+        if self.es_denso(orden):
+            return tabla[estado]
+        return tabla.get(estado)
+
+    def estados_observados(self, orden: int) -> int:
+        """Cantidad de estados con al menos una transicion registrada"""
+        tabla = self.conteos[orden]
+        if self.es_denso(orden):
+            return int(np.count_nonzero(tabla.sum(axis=1)))
+        return len(tabla)
+
+    def mezcla_ordenes(self, historia: Sequence[int], suavizado: float = 1.0) -> np.ndarray:
+        """
+        Suma ponderada (sin normalizar) de las probabilidades Laplace de cada
+        orden con evidencia. Retorna ceros si ningun orden tiene evidencia.
+        """
+        mezcla = np.zeros(self.n_estados, dtype=np.float64)
+        for orden in range(1, self.orden_max + 1):
+            fila = self.conteos_estado(orden, historia)
+            if fila is None:
+                continue
+            total = fila.sum()
+            if total > 0:
+                mezcla += (fila + suavizado) / (total + suavizado * self.n_estados) * self.pesos[orden]
+        return mezcla
+
+    def probabilidades(self, historia: Sequence[int], modo: str = 'interpolado',
+                       suavizado: float = 1.0) -> np.ndarray:
+        """
+        Distribucion sobre los n_estados siguientes.
+
+        Args:
+            historia: Valores recientes (el ultimo es el mas reciente)
+            modo: 'interpolado' (ensemble ponderado de ordenes) o
+                  'backoff' (orden mas alto con evidencia)
+            suavizado: Constante de Laplace
+        """
+        uniforme = np.full(self.n_estados, 1.0 / self.n_estados)
+
+        if modo == 'backoff':
+            for orden in range(self.orden_max, 0, -1):
+                fila = self.conteos_estado(orden, historia)
+                if fila is None:
+                    continue
+                total = fila.sum()
+                if total > 0:
+                    return (fila + suavizado) / (total + suavizado * self.n_estados)
+            return uniforme
+
+        mezcla = self.mezcla_ordenes(historia, suavizado)
+        total = mezcla.sum()
+        if total > 0:
+            return mezcla / total
+        return uniforme
+
+    def probabilidades_lote(self, historias: Sequence[Sequence[int]],
+                            modo: str = 'interpolado') -> np.ndarray:
+        """Matriz (len(historias) x n_estados) con una distribucion por fila"""
+        if len(historias) == 0:
+            return np.zeros((0, self.n_estados))
+        return np.vstack([self.probabilidades(h, modo=modo) for h in historias])
@@ -0,0 +1,106 @@
+"""
+MASCARAS SORTEO - Sorteos y jugadas como mascaras de bits
+=========================================================
+Ningun juego pasa de 41 numeros, asi que cualquier sorteo o jugada cabe
+en un solo uint64 (bit k = numero k). Contar aciertos pasa a ser
+popcount(prediccion & realidad) en vez de len(set(a) & set(b)):
+
+- a_mascara / mascaras: lista -> int, matriz (n x bolas) -> array uint64
+- aciertos: popcount de la interseccion (escalar o vectorizado)
+- contiene: chequeo de comodin / pertenencia de un numero
+- a_presencia: mascaras -> matriz booleana (para recencia.conteo_ventana)
+- aciertos_digitos: LOTO3, donde se repiten digitos (multiconjunto)
+
+Usado por juez_implacable (memoria de maestros y conteo de aciertos,
+incluido LOTO3), oraculo_neural (historial RACHA para recencia y
+frecuencias) y espacio_combinatorio.
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import numpy as np
+from typing import Iterable, List
+
+BITS = 64
+
+PRIMOS = {2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41}
+
+
+def a_mascara(numeros: Iterable) -> int:
+    """Lista de numeros -> mascara (int). Valores no enteros o fuera de [0, 63] se ignoran."""
+    mascara = 0
+    for n in numeros:
+        try:
+            n = int(n)
+        except (ValueError, TypeError):
+            continue
+        if 0 <= n < BITS:
+            mascara |= 1 << n
+    return mascara
+
+
+def mascaras(matriz) -> np.ndarray:
+    """
+    Matriz (n x bolas) -> array uint64 con una mascara por fila.
+    NaN y valores fuera de [0, 63] se ignoran.
+    """
+    valores = np.asarray(matriz, dtype=float)
+    if valores.ndim == 1:
+        valores = valores.reshape(1, -1)
+    if valores.size == 0:
+        return np.zeros(valores.shape[0], dtype=np.uint64)
+    validos = np.isfinite(valores) & (valores >= 0) & (valores < BITS)
+    bits = np.where(validos, valores, 0).astype(np.uint64)
+    return np.bitwise_or.reduce(np.where(validos, np.left_shift(np.uint64(1), bits), np.uint64(0)), axis=1)
+
+
+def popcount(mascara):
+    """Cantidad de bits en 1 (int o array uint64)"""
+    if isinstance(mascara, int):
+        return mascara.bit_count()
+    return np.bitwise_count(np.asarray(mascara, dtype=np.uint64))
+
+
+def aciertos(prediccion, realidad):
+    """Numeros en comun entre mascaras (escalares int o arrays uint64 con broadcasting)"""
+    if isinstance(prediccion, int) and isinstance(realidad, int):
+        return (prediccion & realidad).bit_count()
+    return popcount(np.asarray(prediccion, dtype=np.uint64) & np.asarray(realidad, dtype=np.uint64))
+
+
+def contiene(mascara, numero) -> bool:
+    """True si el numero esta en la mascara (comodin, pertenencia); vectorizado sobre arrays"""
+    if numero is None or not 0 <= int(numero) < BITS:
+        return False if isinstance(mascara, int) else np.zeros(np.shape(mascara), dtype=bool)
+    if isinstance(mascara, int):
+        return bool((mascara >> int(numero)) & 1)
+    return (np.asarray(mascara, dtype=np.uint64) >> np.uint64(int(numero))) & np.uint64(1) == 1
+
+
+def decodificar(mascara) -> List[int]:
+    """Mascara -> lista ordenada de numeros"""
+    mascara = int(mascara)
+    return [k for k in range(BITS) if (mascara >> k) & 1]
+
+
+def a_presencia(mascaras_sorteos, minimo: int, maximo: int) -> np.ndarray:
+    """Mascaras -> matriz booleana (n x rango), misma forma que recencia.matriz_presencia"""
+    m = np.asarray(mascaras_sorteos, dtype=np.uint64).reshape(-1, 1)
+    numeros = np.arange(minimo, maximo + 1, dtype=np.uint64)
+    return ((m >> numeros) & np.uint64(1)).astype(bool)
+
+
+# --- LOTO3: digitos con repeticion ---
+
+def aciertos_digitos(prediccion, realidad) -> np.ndarray:
+    """
+    Digitos en comun sin importar posicion, respetando repeticiones
+    (multiconjunto: [1, 1, 2] vs [1, 3, 1] = 2).
+    """
+    pred = np.atleast_2d(np.asarray(prediccion, dtype=np.intp))
+    real = np.atleast_2d(np.asarray(realidad, dtype=np.intp))
+    conteo_pred = (pred[..., None] == np.arange(10)).sum(axis=-2)
+    conteo_real = (real[..., None] == np.arange(10)).sum(axis=-2)
+    resultado = np.minimum(conteo_pred, conteo_real).sum(axis=-1)
+    return resultado if np.ndim(prediccion) > 1 or np.ndim(realidad) > 1 else int(resultado[0])
@@ -0,0 +1,293 @@
+"""
+MATERIALIZADOR DASHBOARD - Único escritor de los datos del dashboard
+=====================================================================
+Reemplaza el dashboard_data.json monolítico (reconstruido completo desde
+LOTO_SIMULACIONES.csv en cada corrida y reescrito por separado por el Juez,
+loto3_ultra y loto3_tricore).
+
+Estructura en dashboard/:
+    manifest.json            -> juegos, shards, último sorteo por juego
+    <JUEGO>/<AAAA-MM>.json   -> tickets del juego generados ese mes
+
+- Deltas: aplicar() hace upsert por id de tickets nuevos o veredictos
+  (filas completas) y solo reescribe los shards afectados
+- Retención: se conservan los últimos RETENCION_MESES meses por juego
+- Un solo escritor: todas las escrituras pasan por este módulo bajo lock
+- reconstruir() regenera todo desde el CSV (leído por bloques)
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import os
+import re
+import json
+import math
+import shutil
+import logging
+import tempfile
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from cola_predicciones import BloqueoArchivo
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.normpath(os.path.join(BASE_DIR, '..', '..'))
+DASHBOARD_DIR = os.path.join(PROJECT_ROOT, 'dashboard')
+
+MANIFEST = 'manifest.json'
+LOCK = '.dashboard.lock'
+SHARD_SIN_FECHA = 'sin_fecha'
+
+# Política de retención: meses de tickets visibles por juego
+RETENCION_MESES = 3
+# Estados que se muestran en el dashboard (mismo filtro que el laboratorio)
+ESTADOS_VISIBLES = ('PENDIENTE', 'AUDITADO')
+CHUNK_SIZE = 50_000
+
+
+def _limpiar(valor):
+    """NaN/inf -> None y tipos numpy -> nativos (JSON válido)"""
+    if isinstance(valor, dict):
+        return {k: _limpiar(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_limpiar(v) for v in valor]
+    if isinstance(valor, np.ndarray):
+        return _limpiar(valor.tolist())
+    if isinstance(valor, (np.bool_, bool)):
+        return bool(valor)
+    if isinstance(valor, np.integer):
+        return int(valor)
+    if isinstance(valor, (float, np.floating)):
+        return None if math.isnan(valor) or math.isinf(valor) else float(valor)
+    if valor is pd.NaT:
+        return None
+    return valor
+
+
+def _clave_juego(juego) -> str:
+    return re.sub(r'[^A-Z0-9_]', '_', str(juego).strip().upper()) or 'DESCONOCIDO'
+
+
+def _clave_mes(fecha_generacion) -> str:
+    try:
+        return datetime.strptime(str(fecha_generacion)[:7], "%Y-%m").strftime("%Y-%m")
+    except ValueError:
+        return SHARD_SIN_FECHA
+
+
+def _mes_minimo(mes_reciente: str, retencion: int) -> str:
+    anio, mes = map(int, mes_reciente.split('-'))
+    total = anio * 12 + (mes - 1) - (retencion - 1)
+    return f"{total // 12:04d}-{total % 12 + 1:02d}"
+
+
+def existe_dashboard(directorio: str = DASHBOARD_DIR) -> bool:
+    """True si el dashboard ya fue materializado (hay manifest)"""
+    return os.path.exists(os.path.join(directorio, MANIFEST))
+
+
+class MaterializadorDashboard:
+    """Mantiene los shards por juego/mes y el manifest del dashboard"""
+
+    def __init__(self, directorio: str = DASHBOARD_DIR, retencion_meses: int = RETENCION_MESES):
+        self.directorio = directorio
+        self.retencion_meses = max(1, int(retencion_meses))
+        os.makedirs(directorio, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Archivos
+    # ------------------------------------------------------------------
+    def _ruta(self, *partes) -> str:
+        return os.path.join(self.directorio, *partes)
+
+    def _escribir_json(self, path: str, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', suffix='.json',
+                                             dir=os.path.dirname(path), delete=False) as tmp_file:
+                json.dump(data, tmp_file, ensure_ascii=False, separators=(',', ':'))
+                tmp_path = tmp_file.name
+            shutil.move(tmp_path, path)
+        except Exception:
+            if tmp_path and os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            raise
+
+    def manifest(self) -> dict:
+        path = self._ruta(MANIFEST)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                logger.warning(f"Manifest del dashboard ilegible: {e}")
+        return {"version": 1, "juegos": {}}
+
+    def leer_shard(self, juego: str, mes: str) -> List[dict]:
+        path = self._ruta(juego, f"{mes}.json")
+        if not os.path.exists(path):
+            return []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Shard {juego}/{mes} ilegible, se regenera: {e}")
+            return []
+
+    def registros(self, juego: Optional[str] = None) -> List[dict]:
+        """Todos los tickets materializados (de un juego o de todos)"""
+        salida = []
+        for clave, info in self.manifest()["juegos"].items():
+            if juego is not None and clave != _clave_juego(juego):
+                continue
+            for mes in info["shards"]:
+                salida.extend(self.leer_shard(clave, mes))
+        return salida
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def _escribir_shards(self, cambios: Dict[tuple, Dict[str, dict]], manifest: dict,
+                         reemplazar: bool = False):
+        """Upsert de {(juego, mes): {id: ticket}} + retención + manifest"""
+        juegos_tocados = set()
+        for (juego, mes), tickets in cambios.items():
+            if reemplazar:
+                actuales = {}
+            else:
+                actuales = {str(t.get('id')): t for t in self.leer_shard(juego, mes)}
+            actuales.update(tickets)
+
+            ordenados = sorted(actuales.values(), key=lambda t: str(t.get('id')))
+            self._escribir_json(self._ruta(juego, f"{mes}.json"), ordenados)
+
+            info = manifest["juegos"].setdefault(juego, {"shards": {}})
+            objetivos = [t.get('sorteo_objetivo') for t in ordenados
+                         if isinstance(t.get('sorteo_objetivo'), (int, float))]
+            info["shards"][mes] = {
+                "archivo": f"{juego}/{mes}.json",
+                "registros": len(ordenados),
+                "sorteo_max": int(max(objetivos)) if objetivos else None,
+            }
+            juegos_tocados.add(juego)
+
+        for juego in juegos_tocados:
+            self._aplicar_retencion(juego, manifest)
+            shards = manifest["juegos"][juego]["shards"]
+            maximos = [s["sorteo_max"] for s in shards.values() if s["sorteo_max"] is not None]
+            manifest["juegos"][juego]["ultimo_sorteo"] = max(maximos) if maximos else None
+
+        manifest["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        manifest["retencion_meses"] = self.retencion_meses
+        self._escribir_json(self._ruta(MANIFEST), manifest)
+
+    def _aplicar_retencion(self, juego: str, manifest: dict):
+        shards = manifest["juegos"][juego]["shards"]
+        meses = sorted(m for m in shards if m != SHARD_SIN_FECHA)
+        if not meses:
+            return
+        minimo = _mes_minimo(meses[-1], self.retencion_meses)
+        for mes in meses:
+            if mes < minimo:
+                try:
+                    os.remove(self._ruta(juego, f"{mes}.json"))
+                except OSError:
+                    pass
+                del shards[mes]
+
+    @staticmethod
+    def _agrupar(registros: Iterable[dict]) -> Dict[tuple, Dict[str, dict]]:
+        cambios = {}
+        for registro in registros:
+            ticket = _limpiar(dict(registro))
+            if ticket.get('id') is None or ticket.get('estado') not in ESTADOS_VISIBLES:
+                continue
+            if isinstance(ticket['id'], float) and ticket['id'].is_integer():
+                ticket['id'] = int(ticket['id'])
+            clave = (_clave_juego(ticket.get('juego', 'LOTO')), _clave_mes(ticket.get('fecha_generacion')))
+            cambios.setdefault(clave, {})[str(ticket['id'])] = ticket
+        return cambios
+
+    def aplicar(self, registros: Iterable[dict]) -> int:
+        """
+        Aplica deltas: tickets nuevos o veredictos (filas completas con
+        estado/aciertos/score actualizados). Upsert por id; solo se
+        reescriben los shards afectados.
+
+        Returns:
+            Cantidad de tickets aplicados
+        """
+        cambios = self._agrupar(registros)
+        if not cambios:
+            return 0
+        with BloqueoArchivo(self._ruta(LOCK)):
+            manifest = self.manifest()
+            # Deltas fuera de la ventana de retención no reviven shards borrados
+            for (juego, mes) in list(cambios):
+                shards = manifest["juegos"].get(juego, {}).get("shards", {})
+                meses = sorted(m for m in shards if m != SHARD_SIN_FECHA)
+                if mes != SHARD_SIN_FECHA and meses and \
+                        mes < _mes_minimo(meses[-1], self.retencion_meses):
+                    del cambios[(juego, mes)]
+            self._escribir_shards(cambios, manifest)
+        return sum(len(t) for t in cambios.values())
+
+    def reconstruir(self, csv_file: str, extra: Iterable[dict] = ()) -> int:
+        """
+        Regenera el dashboard completo desde el CSV de simulaciones (por
+        bloques; solo se retienen filas dentro de la ventana de retención)
+        más `extra` (ej: tickets aún en cola).
+        """
+        extra = list(extra)
+        recientes = {}
+        if os.path.exists(csv_file):
+            # Pasada 1: mes más reciente por juego (solo 2 columnas)
+            for chunk in pd.read_csv(csv_file, usecols=lambda c: c in ('juego', 'fecha_generacion'),
+                                     chunksize=CHUNK_SIZE):
+                for juego, mes in zip(chunk.get('juego', pd.Series('LOTO', index=chunk.index)),
+                                      chunk.get('fecha_generacion', pd.Series(None, index=chunk.index))):
+                    clave, mes = _clave_juego(juego), _clave_mes(mes)
+                    if mes != SHARD_SIN_FECHA and mes > recientes.get(clave, ''):
+                        recientes[clave] = mes
+        for t in extra:
+            clave, mes = _clave_juego(t.get('juego', 'LOTO')), _clave_mes(t.get('fecha_generacion'))
+            if mes != SHARD_SIN_FECHA and mes > recientes.get(clave, ''):
+                recientes[clave] = mes
+        minimos = {j: _mes_minimo(m, self.retencion_meses) for j, m in recientes.items()}
+
+        def en_ventana(clave):
+            juego, mes = clave
+            return mes == SHARD_SIN_FECHA or mes >= minimos.get(juego, '')
+
+        # Pasada 2: filas dentro de la ventana
+        cambios = {}
+        if os.path.exists(csv_file):
+            for chunk in pd.read_csv(csv_file, chunksize=CHUNK_SIZE):
+                if 'juego' not in chunk.columns:
+                    chunk['juego'] = 'LOTO'
+                if 'estado' in chunk.columns:
+                    chunk = chunk[chunk['estado'].isin(ESTADOS_VISIBLES)]
+                for clave, tickets in self._agrupar(chunk.to_dict(orient='records')).items():
+                    if en_ventana(clave):
+                        cambios.setdefault(clave, {}).update(tickets)
+        for clave, tickets in self._agrupar(extra).items():
+            if en_ventana(clave):
+                cambios.setdefault(clave, {}).update(tickets)
+
+        with BloqueoArchivo(self._ruta(LOCK)):
+            # Limpieza de los shards registrados en el manifest anterior
+            for juego in self.manifest()["juegos"]:
+                shutil.rmtree(self._ruta(juego), ignore_errors=True)
+            manifest = {"version": 1, "juegos": {}}
+            self._escribir_shards(cambios, manifest, reemplazar=True)
+        return sum(len(t) for t in cambios.values())
@@ -3,7 +3,6 @@ import numpy as np
 import joblib
 import os
 import json
-import math
 from sklearn.ensemble import RandomForestRegressor
 
 # Configuración
@@ -12,10 +11,38 @@ MODEL_FILE = os.path.join(DATA_DIR, 'meta_learner_model.pkl')
 MAPS_FILE = os.path.join(DATA_DIR, 'meta_learner_maps.json') # NUEVO: Para persistir IDs
 SIMULACIONES_FILE = os.path.join(DATA_DIR, 'LOTO_SIMULACIONES.csv')
 
+FEATURES = ['juego_id', 'alg_id', 'hora_dia', 'score_afinidad']
+COLUMNAS_ENTRENAMIENTO = ['estado', 'juego', 'algoritmo', 'hora_dia', 'score_afinidad', 'aciertos']
+
+# Entrenamiento incremental
+N_ARBOLES = 150
+ARBOLES_POR_ACTUALIZACION = 30
+MIN_NUEVAS_MUESTRAS = 100
+VENTANA_ENTRENAMIENTO = 20000
+# Máximo de aciertos por juego para normalizar
+MAX_ACIERTOS = {'LOTO': 6, 'LOTO3': 3, 'LOTO4': 4, 'RACHA': 10}
+HORAS_DIA = 24
+# Sobre este número de umbrales de score la tabla usa una grilla + interpolación
+MAX_PUNTOS_SCORE = 512
+
+
+def _multiplicador(esperanza_aciertos, max_juego):
+    """
+    ESCALADO SIGMOIDE (vectorizado): evita divergencia, siempre entre 0.5 y 3.0
+    sigmoide(x) = 1 / (1 + e^(-k*x)) donde k controla la pendiente
+    """
+    esperanza_normalizada = np.asarray(esperanza_aciertos, dtype=float) / max_juego
+    k = 4.0  # Factor de pendiente (ajustable)
+    sigmoide = 1.0 / (1.0 + np.exp(-k * (esperanza_normalizada - 0.3)))
+    # Mapear sigmoide [0,1] a multiplicador [0.5, 3.0]
+    return 0.5 + (sigmoide * 2.5)
+
+
 class MetaLearner:
     def __init__(self):
         self.model = self.cargar_modelo()
         self.maps = self.cargar_mapas()
+        self._tabla = None
 
     def cargar_modelo(self):
         if os.path.exists(MODEL_FILE):
@@ -27,68 +54,193 @@ class MetaLearner:
             with open(MAPS_FILE, 'r') as f: return json.load(f)
         return {"algos": {}, "juegos": {}}
 
-    def entrenar(self):
-        if not os.path.exists(SIMULACIONES_FILE): return
-        
-        df = pd.read_csv(SIMULACIONES_FILE)
-        df_audit = df[df['estado'] == 'AUDITADO'].copy()
-        if len(df_audit) < 300: return 
-
-        # 1. Ingeniería de Características Pro
-        # Creamos mapeos reales y los persistimos
-        df_audit['alg_id'], alg_map = pd.factorize(df_audit['algoritmo'])
-        df_audit['juego_id'], juego_map = pd.factorize(df_audit['juego'])
-        
-        self.maps['algos'] = {name: i for i, name in enumerate(alg_map)}
-        self.maps['juegos'] = {name: i for i, name in enumerate(juego_map)}
-        
-        # Guardamos los mapas para que la predicción use las mismas IDs
-        with open(MAPS_FILE, 'w') as f: json.dump(self.maps, f)
+    def _actualizar_mapas(self, df_audit):
+        """Mapas estables: los nombres nuevos se agregan al final, nunca se renumera"""
+        for clave, columna in (('algos', 'algoritmo'), ('juegos', 'juego')):
+            mapa = self.maps.setdefault(clave, {})
+            for nombre in pd.unique(df_audit[columna].dropna()):
+                if nombre not in mapa:
+                    mapa[nombre] = max(mapa.values(), default=-1) + 1
 
-        # X = [ID Juego, ID Algo, Hora, Score ADN]
-        X = df_audit[['juego_id', 'alg_id', 'hora_dia', 'score_afinidad']]
-        y = df_audit['aciertos'] 
+    def entrenar(self, completo=False):
+        """
+        Actualiza el bosque con los veredictos nuevos.
+
+        - Menos de MIN_NUEVAS_MUESTRAS auditadas desde el último entrenamiento: no hace nada
+        - Incremental (warm start): agrega ARBOLES_POR_ACTUALIZACION árboles entrenados
+          sobre la ventana de las últimas VENTANA_ENTRENAMIENTO auditadas y descarta los
+          más antiguos (el bosque se mantiene en N_ARBOLES)
+        - Completo: sin modelo, con `completo=True`, con mapas sin contador de muestras
+          o si el CSV perdió filas auditadas
+
+        Returns:
+            True si el modelo fue actualizado
+        """
+        if not os.path.exists(SIMULACIONES_FILE): return False
+
+        df = pd.read_csv(SIMULACIONES_FILE, usecols=lambda c: c in COLUMNAS_ENTRENAMIENTO)
+        df_audit = df[df['estado'] == 'AUDITADO']
+        if len(df_audit) < 300: return False
+
+        # Mapas de versiones anteriores no registran muestras: primer entrenamiento completo
+        previas = self.maps.get('muestras_entrenadas')
+        nuevas = len(df_audit) - (previas or 0)
+        incremental = (not completo and previas is not None and nuevas >= 0
+                       and isinstance(self.model, RandomForestRegressor) and bool(self.maps.get('algos')))
+        if incremental and nuevas < MIN_NUEVAS_MUESTRAS:
+            print(f"🧠 META-LEARNER: {nuevas} experiencias nuevas (< {MIN_NUEVAS_MUESTRAS}), sin reentrenar.")
+            return False
+
+        # 1. Ingeniería de Características Pro (IDs persistidos y estables)
+        self._actualizar_mapas(df_audit)
+
+        # X = [ID Juego, ID Algo, Hora, Score ADN] sobre la ventana reciente
+        ventana = df_audit.tail(VENTANA_ENTRENAMIENTO)
+        X = pd.DataFrame({
+            'juego_id': ventana['juego'].map(self.maps['juegos']),
+            'alg_id': ventana['algoritmo'].map(self.maps['algos']),
+            'hora_dia': ventana['hora_dia'],
+            'score_afinidad': ventana['score_afinidad'],
+        }, columns=FEATURES)
+        y = ventana['aciertos']
 
         # 2. Entrenamiento con regularización (para no sobreajustar al azar)
-        model = RandomForestRegressor(n_estimators=150, max_depth=7, random_state=42)
-        model.fit(X, y)
-        
+        if incremental:
+            model = self.model
+            model.set_params(warm_start=True,
+                             n_estimators=len(model.estimators_) + ARBOLES_POR_ACTUALIZACION,
+                             random_state=len(df_audit))
+            model.fit(X, y)
+            # Los árboles más antiguos salen del bosque
+            model.estimators_ = model.estimators_[-N_ARBOLES:]
+            model.set_params(n_estimators=len(model.estimators_), warm_start=False)
+        else:
+            model = RandomForestRegressor(n_estimators=N_ARBOLES, max_depth=7, random_state=42)
+            model.fit(X, y)
+
         joblib.dump(model, MODEL_FILE)
+        # Guardamos los mapas para que la predicción use las mismas IDs
+        self.maps['muestras_entrenadas'] = len(df_audit)
+        with open(MAPS_FILE, 'w') as f: json.dump(self.maps, f)
+
         self.model = model
-        print(f"🧠 META-LEARNER: Cerebro de nivel 2 actualizado con {len(df_audit)} experiencias.")
+        self._tabla = None
+        modo = "incremental" if incremental else "completo"
+        print(f"🧠 META-LEARNER: Cerebro de nivel 2 actualizado ({modo}) con {len(ventana)} experiencias "
+              f"({max(nuevas, 0)} nuevas).")
+        return True
+
+    # ------------------------------------------------------------------
+    # Predicción
+    # ------------------------------------------------------------------
+    def _predecir(self, X):
+        """predict() del bosque con los nombres de columnas del entrenamiento"""
+        if getattr(self.model, 'feature_names_in_', None) is not None:
+            X = pd.DataFrame(X, columns=list(self.model.feature_names_in_))
+        return self.model.predict(X)
+
+    def predecir_confianza_lote(self, consultas):
+        """
+        Multiplicadores para muchas consultas (juego, algoritmo, hora, score_adn)
+        con una sola llamada a predict(). Consultas con juego/algoritmo
+        desconocido (o sin modelo) devuelven 1.0.
+        """
+        consultas = list(consultas)
+        resultado = np.ones(len(consultas))
+        if not consultas or not self.model or not self.maps['algos']:
+            return resultado
+
+        filas, posiciones, maximos = [], [], []
+        for i, (juego, algoritmo, hora, score_adn) in enumerate(consultas):
+            j_id = self.maps['juegos'].get(juego, -1)
+            a_id = self.maps['algos'].get(algoritmo, -1)
+            if j_id == -1 or a_id == -1:
+                continue
+            filas.append([j_id, a_id, hora, score_adn])
+            posiciones.append(i)
+            maximos.append(MAX_ACIERTOS.get(juego, 6))
+
+        if filas:
+            try:
+                esperanza = self._predecir(np.array(filas, dtype=float))
+                resultado[posiciones] = _multiplicador(esperanza, np.array(maximos, dtype=float))
+            except Exception:
+                pass
+        return resultado
+
+    def _umbrales_score(self):
+        """Umbrales de corte sobre score_afinidad en todos los árboles"""
+        indice = FEATURES.index('score_afinidad')
+        umbrales = [e.tree_.threshold[e.tree_.feature == indice] for e in self.model.estimators_]
+        return np.unique(np.concatenate(umbrales)) if umbrales else np.array([])
+
+    def tabla_confianza(self):
+        """
+        Tabla precalculada de multiplicadores [juego, algoritmo, hora, tramo de score].
+
+        Con juego, algoritmo y hora fijos el bosque es constante a trozos en
+        el score: cambia solo en los umbrales de sus nodos. Se evalúa un
+        punto por tramo, así el lookup es exacto. Si hay más de
+        MAX_PUNTOS_SCORE umbrales se usa una grilla por cuantiles y se
+        interpola linealmente en el score.
+        """
+        if self._tabla is not None:
+            return self._tabla
+
+        umbrales = self._umbrales_score()
+        exacta = len(umbrales) <= MAX_PUNTOS_SCORE
+        if exacta:
+            # Un representante por tramo (-inf, u0], (u0, u1], ..., (un, inf)
+            if len(umbrales):
+                puntos = np.concatenate([[umbrales[0] - 1.0], (umbrales[:-1] + umbrales[1:]) / 2,
+                                         [umbrales[-1] + 1.0]])
+            else:
+                puntos = np.array([0.0])
+        else:
+            puntos = np.quantile(umbrales, np.linspace(0, 1, MAX_PUNTOS_SCORE))
+
+        juegos = self.maps['juegos']
+        n_j = max(juegos.values()) + 1
+        n_a = max(self.maps['algos'].values()) + 1
+        j, a, h, k = np.meshgrid(np.arange(n_j), np.arange(n_a), np.arange(HORAS_DIA),
+                                 np.arange(len(puntos)), indexing='ij')
+        X = np.column_stack([j.ravel(), a.ravel(), h.ravel(), puntos[k.ravel()]]).astype(float)
+        esperanza = self._predecir(X).reshape(n_j, n_a, HORAS_DIA, len(puntos))
+
+        maximos = np.full(n_j, 6.0)
+        for juego, j_id in juegos.items():
+            maximos[j_id] = MAX_ACIERTOS.get(juego, 6)
+        valores = _multiplicador(esperanza, maximos[:, None, None, None])
+
+        self._tabla = {"exacta": exacta, "umbrales": umbrales, "puntos": puntos, "valores": valores}
+        return self._tabla
 
     def predecir_confianza_real(self, juego, algoritmo, hora, score_adn):
         """
         Devuelve el multiplicador de peso basado en la probabilidad de éxito real.
         Usa escalado SIGMOIDE para evitar divergencia a infinito.
         Rango de salida: [0.5, 3.0] - nunca diverge.
+
+        Consulta la tabla precalculada (sin llamar a predict por candidato).
         """
         if not self.model or not self.maps['algos']: return 1.0
 
-        # Máximo de aciertos por juego para normalizar
-        MAX_ACIERTOS = {'LOTO': 6, 'LOTO3': 3, 'LOTO4': 4, 'RACHA': 10}
-
         try:
             j_id = self.maps['juegos'].get(juego, -1)
             a_id = self.maps['algos'].get(algoritmo, -1)
 
             if j_id == -1 or a_id == -1: return 1.0
 
-            input_data = np.array([[j_id, a_id, hora, score_adn]])
-            esperanza_aciertos = self.model.predict(input_data)[0]
-
-            # Normalizar por el máximo del juego
-            max_juego = MAX_ACIERTOS.get(juego, 6)
-            esperanza_normalizada = esperanza_aciertos / max_juego
-
-            # ESCALADO SIGMOIDE: evita divergencia, siempre entre 0.5 y 3.0
-            # sigmoide(x) = 1 / (1 + e^(-k*x)) donde k controla la pendiente
-            k = 4.0  # Factor de pendiente (ajustable)
-            sigmoide = 1.0 / (1.0 + math.exp(-k * (esperanza_normalizada - 0.3)))
-
-            # Mapear sigmoide [0,1] a multiplicador [0.5, 3.0]
-            multiplicador = 0.5 + (sigmoide * 2.5)
-
-            return multiplicador
+            hora_int = int(hora)
+            if hora_int != hora or not 0 <= hora_int < HORAS_DIA:
+                return float(self.predecir_confianza_lote([(juego, algoritmo, hora, score_adn)])[0])
+
+            tabla = self.tabla_confianza()
+            fila = tabla["valores"][j_id, a_id, hora_int]
+            if tabla["exacta"]:
+                # El árbol compara en float32: x <= umbral -> izquierda
+                tramo = np.searchsorted(tabla["umbrales"], float(np.float32(score_adn)), side='left')
+                return float(fila[tramo])
+            return float(np.interp(score_adn, tabla["puntos"], fila))
         except Exception as e:
-            return 1.0
\ No newline at end of file
+            return 1.0
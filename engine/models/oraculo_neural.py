@@ -11,6 +11,9 @@ from datetime import datetime
 import logging
 import warnings
 
+from recencia import matriz_presencia, recencia, indices_ultima_aparicion, conteo_ventana
+from mascaras_sorteo import mascaras, a_presencia
+
 # [IMP-ML-002] Intento de importación de XGBoost
 try:
     from xgboost import XGBClassifier
@@ -51,10 +54,18 @@ GAME_CONFIG = {
 }
 
 class OraculoNeural:
-    def __init__(self, game_id="LOTO", version="v3"):
+    def __init__(self, game_id="LOTO", version="v3", historial=None, persistir=True):
+        """
+        Args:
+            historial: DataFrame del maestro ya cargado (ej: compartido entre procesos
+                del reparador); si es None se lee el CSV en cada entrenamiento/predicción
+            persistir: False para no escribir el .pkl (réplicas paralelas de solo lectura)
+        """
         self.game_id = game_id
         self.version = version
         self.config = GAME_CONFIG.get(game_id, GAME_CONFIG["LOTO"])
+        self.historial = historial
+        self.persistir = persistir
         
         # Archivos de modelo separados para evitar contaminación cruzada
         self.model_file = os.path.join(DATA_DIR, f'{game_id.lower()}_rf_{version}.pkl')
@@ -99,6 +110,20 @@ class OraculoNeural:
         fname = mapa.get(self.game_id, f'{self.game_id}_MAESTRO.csv')
         self.maestro_file = os.path.join(DATA_DIR, fname)
 
+    def _leer_maestro(self, sorteo_limite=None):
+        """
+        Historial del juego (hasta `sorteo_limite` inclusive): el DataFrame
+        inyectado o el CSV maestro. El inyectado se entrega como vista
+        (copy-on-write), sin duplicar el historial compartido.
+        """
+        df = self.historial.copy(deep=False) if self.historial is not None else pd.read_csv(self.maestro_file)
+        if sorteo_limite is None or 'sorteo' not in df.columns:
+            return df
+        if df['sorteo'].is_monotonic_increasing:
+            # Corte por posición: sigue siendo una vista del historial
+            return df.iloc[:int(np.searchsorted(df['sorteo'].to_numpy(), int(sorteo_limite), side='right'))]
+        return df[df['sorteo'] <= int(sorteo_limite)]
+
     # --- ZONA DE MATEMÁTICAS Y DECODIFICACIÓN ---
 
     def _get_one_hot(self, numbers):
@@ -170,37 +195,25 @@ class OraculoNeural:
 
     # --- FEATURE ENGINEERING ---
 
-    def _calcular_gaps(self, X_raw, current_idx):
+    def _calcular_gaps(self, X_raw, current_idx, recencias=None):
         """
         [IMP-FEAT-004] Vector de Gaps (Recencia)
         Crea un vector donde cada posición representa cuántos sorteos han pasado
         desde que ese número salió por última vez.
         Esta es la variable más predictiva en sistemas mecánicos (ley del retorno a la media).
+
+        `recencias` permite pasar la matriz precalculada con recencia.recencia()
+        sobre todo X_raw (una sola pasada) en lugar de recalcular por sorteo.
         """
         min_val = self.config['min_val']
         max_val = self.config['max']
-        size = max_val - min_val + 1
 
-        # Inicializamos con valor alto (nunca ha salido en la ventana analizada)
-        gaps = np.full(size, current_idx, dtype=np.float32)
+        if recencias is None:
+            presencia = matriz_presencia(X_raw[:current_idx], min_val, max_val)
+            recencias = recencia(presencia)
 
-        # Recorremos el historial hacia atrás buscando la última aparición de cada número
-        for sorteo_offset in range(current_idx):
-            idx = current_idx - 1 - sorteo_offset
-            if idx < 0:
-                break
-
-            draw = X_raw[idx]
-            for num in draw:
-                try:
-                    val = int(float(num))
-                    if min_val <= val <= max_val:
-                        num_idx = val - min_val
-                        # Solo actualizamos si aún no hemos encontrado este número
-                        if gaps[num_idx] == current_idx:
-                            gaps[num_idx] = sorteo_offset + 1  # +1 porque 0 significaría "salió en el último"
-                except (ValueError, TypeError):
-                    continue
+        # Si nunca salió, el gap es current_idx (valor alto)
+        gaps = recencias[current_idx].astype(np.float32)
 
         # Normalización: dividimos por el máximo gap posible para obtener valores entre 0 y 1
         max_gap = max(current_idx, 1)
@@ -321,104 +334,38 @@ class OraculoNeural:
         else:
             dias = np.zeros(len(df), dtype=int)
 
-        # Construir historial de apariciones por número
+        # Construir historial de apariciones por número (una sola pasada)
         X_all = []
         y_all = []
 
+        # Historial en memoria como una máscara uint64 por sorteo
+        presencia = a_presencia(mascaras(df[available].values), min_num, max_num)
+        ultimos = indices_ultima_aparicion(presencia)
+        frecuencias = {w: conteo_ventana(presencia, w) for w in (10, 50, 100)}
+        nums = np.arange(min_num, max_num + 1)
+
         lookback_min = 10  # Necesitamos al menos 10 sorteos de historia
 
         for i in range(lookback_min, len(df)):
-            # Números que salieron en este sorteo
-            sorteo_actual = set()
-            for col in available:
-                try:
-                    val = int(float(df.iloc[i][col]))
-                    sorteo_actual.add(val)
-                except:
-                    continue
-
-            # Sorteo anterior
-            sorteo_anterior = set()
-            for col in available:
-                try:
-                    val = int(float(df.iloc[i-1][col]))
-                    sorteo_anterior.add(val)
-                except:
-                    continue
+            # 1. Recencia: cuántos sorteos desde que salió por última vez
+            recencias = np.where(ultimos[i] >= 0, i - ultimos[i] - 1, i)
 
             # Para cada número posible (1-20), crear una fila
-            for num in range(min_num, max_num + 1):
-                features = []
-
-                # 1. Recencia: cuántos sorteos desde que salió por última vez
-                recencia = 0
-                for j in range(i-1, -1, -1):
-                    found = False
-                    for col in available:
-                        try:
-                            if int(float(df.iloc[j][col])) == num:
-                                found = True
-                                break
-                        except:
-                            continue
-                    if found:
-                        recencia = i - j - 1
-                        break
-                    recencia += 1
-                features.append(recencia / max(i, 1))  # Normalizado
-
-                # 2. Frecuencia en últimos 10 sorteos
-                freq_10 = 0
-                for j in range(max(0, i-10), i):
-                    for col in available:
-                        try:
-                            if int(float(df.iloc[j][col])) == num:
-                                freq_10 += 1
-                                break
-                        except:
-                            continue
-                features.append(freq_10 / 10)
-
-                # 3. Frecuencia en últimos 50 sorteos
-                freq_50 = 0
-                for j in range(max(0, i-50), i):
-                    for col in available:
-                        try:
-                            if int(float(df.iloc[j][col])) == num:
-                                freq_50 += 1
-                                break
-                        except:
-                            continue
-                features.append(freq_50 / 50)
-
-                # 4. Frecuencia en últimos 100 sorteos
-                freq_100 = 0
-                for j in range(max(0, i-100), i):
-                    for col in available:
-                        try:
-                            if int(float(df.iloc[j][col])) == num:
-                                freq_100 += 1
-                                break
-                        except:
-                            continue
-                features.append(freq_100 / 100)
-
-                # 5. ¿Salió en el sorteo anterior? (binario)
-                features.append(1 if num in sorteo_anterior else 0)
-
-                # 6. Día de la semana (normalizado)
-                features.append(dias[i] / 6)
-
-                # 7. Número normalizado (posición en el rango)
-                features.append((num - min_num) / (max_num - min_num))
-
-                # 8. Paridad del número
-                features.append(num % 2)
-
+            for k, num in enumerate(nums):
+                features = [
+                    recencias[k] / max(i, 1),                  # 1. Recencia (normalizada)
+                    frecuencias[10][i, k] / 10,                # 2. Frecuencia últimos 10
+                    frecuencias[50][i, k] / 50,                # 3. Frecuencia últimos 50
+                    frecuencias[100][i, k] / 100,              # 4. Frecuencia últimos 100
+                    1 if presencia[i - 1, k] else 0,           # 5. ¿Salió en el sorteo anterior?
+                    dias[i] / 6,                               # 6. Día de la semana
+                    (num - min_num) / (max_num - min_num),     # 7. Número normalizado
+                    num % 2                                    # 8. Paridad
+                ]
                 X_all.append(features)
 
                 # Target: ¿Salió este número en el sorteo actual?
-                y_all.append(1 if num in sorteo_actual else 0)
+                y_all.append(1 if presencia[i, k] else 0)
 
         return np.array(X_all), np.array(y_all)
 
@@ -480,8 +427,9 @@ class OraculoNeural:
         logger.info(f"   📊 Accuracy - Train: {train_acc:.3f}, Test: {test_acc:.3f}")
 
         # Guardar modelo
-        joblib.dump(self.model, self.model_file, compress=9)
-        logger.info(f"   Modelo RACHA binario guardado en {os.path.basename(self.model_file)}")
+        if self.persistir:
+            joblib.dump(self.model, self.model_file, compress=9)
+            logger.info(f"   Modelo RACHA binario guardado en {os.path.basename(self.model_file)}")
 
         # Marcar que este modelo usa el modo binario
         self._racha_binary_mode = True
@@ -512,53 +460,28 @@ class OraculoNeural:
         else:
             target_dow = datetime.now().weekday()
 
-        # Sorteo anterior
-        sorteo_anterior = set()
-        for col in available:
-            try:
-                val = int(float(df.iloc[last_idx][col]))
-                sorteo_anterior.add(val)
-            except:
-                continue
+        # Estado tras el último sorteo (fila n de las matrices de recencia)
+        presencia = a_presencia(mascaras(df[available].values), min_num, max_num)
+        n = len(df)
+        ultimos = indices_ultima_aparicion(presencia)[n]
+        recencias = np.where(ultimos >= 0, n - ultimos - 1, n)
+        frecuencias = {w: conteo_ventana(presencia, w)[n] for w in (10, 50, 100)}
 
         # Generar features para cada número
         predictions = []
 
-        for num in range(min_num, max_num + 1):
+        for k, num in enumerate(range(min_num, max_num + 1)):
             features = []
 
             # 1. Recencia
-            recencia = 0
-            for j in range(last_idx, -1, -1):
-                found = False
-                for col in available:
-                    try:
-                        if int(float(df.iloc[j][col])) == num:
-                            found = True
-                            break
-                    except:
-                        continue
-                if found:
-                    recencia = last_idx - j
-                    break
-                recencia += 1
-            features.append(recencia / max(last_idx + 1, 1))
+            features.append(recencias[k] / max(last_idx + 1, 1))
 
             # 2-4. Frecuencias
             for lookback in [10, 50, 100]:
-                freq = 0
-                for j in range(max(0, last_idx + 1 - lookback), last_idx + 1):
-                    for col in available:
-                        try:
-                            if int(float(df.iloc[j][col])) == num:
-                                freq += 1
-                                break
-                        except:
-                            continue
-                features.append(freq / lookback)
+                features.append(frecuencias[lookback][k] / lookback)
 
             # 5. ¿Salió en el último?
-            features.append(1 if num in sorteo_anterior else 0)
+            features.append(1 if presencia[last_idx, k] else 0)
 
             # 6. Día
             features.append(target_dow / 6)
@@ -660,6 +583,9 @@ class OraculoNeural:
             dias = np.zeros(len(df), dtype=int)
 
         X, y = [], []
+
+        # Recencia de todos los números en una sola pasada (fila i = antes del sorteo i)
+        recencias = recencia(matriz_presencia(X_raw, self.config['min_val'], self.config['max']))
         
         # 4. Construcción de Ventanas Deslizantes
         for i in range(self.window_size, len(df)):
@@ -675,7 +601,7 @@ class OraculoNeural:
             features.extend(heat_map)
 
             # [IMP-FEAT-004] Vector de Gaps (Recencia) - EL ESLABÓN PERDIDO
-            gaps = self._calcular_gaps(X_raw, i)
+            gaps = self._calcular_gaps(X_raw, i, recencias)
             features.extend(gaps)
 
             # [IMP-FEAT-006] Deltas Promedio (Velocidad)
@@ -707,13 +633,11 @@ class OraculoNeural:
         msg = f" (Sorteo límite: #{sorteo_limite})" if sorteo_limite else " (Toda la historia)"
         logger.info(f"ORÁCULO {self.version}: Iniciando entrenamiento para {self.game_id}{msg}")
 
-        if not os.path.exists(self.maestro_file):
+        if self.historial is None and not os.path.exists(self.maestro_file):
             logger.error(f"Archivo maestro no encontrado: {self.maestro_file}")
             return
 
-        df = pd.read_csv(self.maestro_file)
-        if sorteo_limite is not None and 'sorteo' in df.columns:
-            df = df[df['sorteo'] <= int(sorteo_limite)]
+        df = self._leer_maestro(sorteo_limite)
 
         if len(df) < 50:
             logger.warning(f"Datos insuficientes ({len(df)} filas). Mínimo 50.")
@@ -823,8 +747,9 @@ class OraculoNeural:
             logger.warning(f"   SOSPECHA: Test accuracy demasiado alta ({test_score:.3f}). Revisar data leakage.")
 
         # Guardado con alta compresión (ANTES de métricas para no perder el modelo)
-        joblib.dump(self.model, self.model_file, compress=9)
-        logger.info(f"Modelo {self.version} guardado en {os.path.basename(self.model_file)}")
+        if self.persistir:
+            joblib.dump(self.model, self.model_file, compress=9)
+            logger.info(f"Modelo {self.version} guardado en {os.path.basename(self.model_file)}")
 
         # --- MÉTRICAS ML EXTENDIDAS ---
         metrics = self._calcular_metricas_ml(X_train, y_train, X_test, y_test)
@@ -1066,11 +991,11 @@ class OraculoNeural:
 
         # [IMP-RACHA-001] RACHA usa estrategia especial de Clasificación Binaria
         if self.game_id == "RACHA" and getattr(self, '_racha_binary_mode', False):
-            df = pd.read_csv(self.maestro_file)
+            df = self._leer_maestro()
             return self._predecir_racha_binario(df)
 
         # Carga fresca para el input más reciente
-        df = pd.read_csv(self.maestro_file).sort_values('sorteo', ascending=True)
+        df = self._leer_maestro().sort_values('sorteo', ascending=True)
         n_balls = self.config['n_balls']
         input_cols = self._get_dynamic_cols(df, self.config['input_prefix'], n_balls)
         
@@ -0,0 +1,140 @@
+"""
+ORQUESTADOR LOTO3 - Entrenamiento concurrente de la familia LOTO3
+=================================================================
+Los modelos de LOTO3 son independientes entre si una vez construidos
+los features, pero se entrenaban uno detras de otro:
+
+- loto3_ultra: 3 franjas x 3 posiciones = 9 CalibratedClassifierCV(RF)
+- loto3_especialista: 2 RFPares (par inicial / par final)
+- loto3_tricore: 3 CerebroPosicional (uno por posicion)
+
+Cada componente expone sus ajustes pendientes como tareas
+(clave, estimador, X, y) sobre features ya calculados (una matriz y un
+scaler compartidos por las 3 posiciones de cada franja), y este modulo
+las ajusta en un pool de procesos con un presupuesto unico de CPU:
+workers = min(tareas, cpus) y los hilos restantes se reparten como
+n_jobs de cada estimador. El presupuesto lo fija quien llama: dentro del
+pool de bot_dreamer cada universo pasa solo su parte de las CPUs.
+
+El ahorro reportado es una estimacion (suma de los ajustes individuales
+menos el tiempo real), no una medicion contra una corrida secuencial.
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Hashable, List, Tuple
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+CPUS = os.cpu_count() or 1
+
+Tarea = Tuple[Hashable, object, object, object]
+
+
+def _fijar_hilos(estimador, hilos: int):
+    """n_jobs de un estimador (y de sus estimadores anidados) = hilos"""
+    claves = [k for k in estimador.get_params(deep=True) if k == 'n_jobs' or k.endswith('__n_jobs')]
+    if claves:
+        estimador.set_params(**{k: hilos for k in claves})
+    return estimador
+
+
+def _ajustar(clave, estimador, X, y, hilos):
+    inicio = time.perf_counter()
+    # Hilos, no procesos: ya estamos dentro de un worker del pool
+    with joblib.parallel_config(backend='threading', n_jobs=hilos):
+        _fijar_hilos(estimador, hilos).fit(X, y)
+    return clave, estimador, time.perf_counter() - inicio
+
+
+def ajustar_tareas(tareas: List[Tarea], cpus: int = CPUS) -> Tuple[Dict, Dict]:
+    """
+    Ajusta estimadores independientes en paralelo.
+
+    Args:
+        tareas: Lista de (clave, estimador sin ajustar, X, y)
+        cpus: Presupuesto total de CPU (workers x hilos por estimador). Por
+            defecto todas las CPUs; si ya se corre dentro de un pool, pasar
+            solo la parte de este proceso.
+
+    Returns:
+        (ajustados, metricas): clave -> estimador ajustado (las tareas que
+        fallan se registran y quedan fuera) y tiempos del entrenamiento.
+        'segundos_ahorrados' es estimado: cada ajuste se mide dentro de su
+        worker (con menos hilos y compitiendo por cache/memoria), asi que la
+        suma tiende a sobrestimar el secuencial real.
+    """
+    cpus = max(1, int(cpus))
+    workers = max(1, min(len(tareas), cpus))
+    hilos = max(1, cpus // workers)
+
+    ajustados, duraciones = {}, {}
+    inicio = time.perf_counter()
+
+    if workers == 1:
+        for clave, estimador, X, y in tareas:
+            try:
+                _, ajustados[clave], duraciones[clave] = _ajustar(clave, estimador, X, y, hilos)
+            except Exception as e:
+                logger.error(f"Fallo ajustando {clave}: {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = {pool.submit(_ajustar, clave, estimador, X, y, hilos): clave
+                       for clave, estimador, X, y in tareas}
+            for futuro in as_completed(futuros):
+                clave = futuros[futuro]
+                try:
+                    _, ajustados[clave], duraciones[clave] = futuro.result()
+                except Exception as e:
+                    logger.error(f"Fallo ajustando {clave}: {e}")
+
+    real = time.perf_counter() - inicio
+    suma = sum(duraciones.values())
+    metricas = {
+        'tareas': len(tareas),
+        'ajustadas': len(ajustados),
+        'workers': workers,
+        'hilos_por_tarea': hilos,
+        'segundos_reales': round(real, 2),
+        'segundos_suma_tareas': round(suma, 2),
+        'segundos_ahorrados': round(max(0.0, suma - real), 2),
+    }
+    logger.info(f"Entrenamiento paralelo: {len(ajustados)}/{len(tareas)} modelos en {real:.1f}s "
+                f"({workers} workers x {hilos} hilos; suma de ajustes {suma:.1f}s, "
+                f"ahorro estimado ~{metricas['segundos_ahorrados']:.1f}s)")
+    return ajustados, metricas
+
+
+def entrenar_familia_loto3(cpus: int = CPUS) -> Dict:
+    """
+    Entrena Ultra y Especialista en un solo pool (11 ajustes concurrentes)
+    y guarda sus modelos. Tri-Core no persiste modelos: entrena con el
+    mismo orquestador dentro de ejecutar_sistema_tricore.
+
+    Returns:
+        Metricas del entrenamiento (ver ajustar_tareas)
+    """
+    from loto3_ultra import Loto3UltraEnsemble
+    from loto3_especialista import Loto3Especialista
+
+    ultra = Loto3UltraEnsemble()
+    especialista = Loto3Especialista()
+
+    tareas = ultra.tareas_entrenamiento() + especialista.tareas_entrenamiento()
+    ajustados, metricas = ajustar_tareas(tareas, cpus=cpus)
+
+    ultra.completar_entrenamiento(ajustados)
+    especialista.completar_entrenamiento(ajustados)
+    return metricas
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    entrenar_familia_loto3()
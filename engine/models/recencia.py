@@ -0,0 +1,142 @@
+"""
+RECENCIA - Utilidades de "sorteos desde la ultima aparicion"
+============================================================
+Un solo lugar para el concepto de recencia/gap que antes estaba
+reimplementado con bucles anidados (O(n * ventana)) en:
+
+- loto3_especialista.RFPares._generar_features (recencia del par)
+- loto3_ultra.FeatureEngineer.generar_features_distancia
+- oraculo_neural._calcular_gaps
+- oraculo_neural._preparar_dataset_racha_binario / _predecir_racha_binario
+
+Todo se calcula en una sola pasada sobre un array de indices de ultima
+aparicion (np.maximum.accumulate), con tope opcional.
+
+Convencion: la fila i describe el estado ANTES de observar el sorteo i,
+por lo que las matrices tienen n+1 filas (la ultima es el estado tras
+el historial completo, util para inferencia).
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+
+def matriz_presencia(sorteos, min_val: int, max_val: int) -> np.ndarray:
+    """
+    Matriz booleana (n_sorteos x rango) con True si el numero salio en el sorteo.
+
+    Acepta listas de listas o arrays 2D con valores numericos o strings;
+    valores no convertibles o fuera de [min_val, max_val] se ignoran
+    (mismo criterio que el int(float(x)) con try/except original).
+    """
+    size = max_val - min_val + 1
+    if len(sorteos) == 0:
+        return np.zeros((0, size), dtype=bool)
+
+    valores = pd.DataFrame(list(sorteos)).apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    valores = np.trunc(valores)
+
+    filas, cols = np.nonzero(np.isfinite(valores))
+    nums = valores[filas, cols]
+    validos = (nums >= min_val) & (nums <= max_val)
+
+    presencia = np.zeros((valores.shape[0], size), dtype=bool)
+    presencia[filas[validos], nums[validos].astype(np.int64) - min_val] = True
+    return presencia
+
+
+def one_hot_serie(valores, n_valores: int) -> np.ndarray:
+    """Matriz de presencia (n x n_valores) para una serie de un solo valor por sorteo"""
+    return matriz_presencia(np.asarray(valores).reshape(-1, 1), 0, n_valores - 1)
+
+
+def indices_ultima_aparicion(presencia: np.ndarray) -> np.ndarray:
+    """
+    Indice de la ultima fila ESTRICTAMENTE anterior a i donde aparecio cada columna.
+
+    Returns:
+        Array (n+1 x k) de enteros; -1 si nunca aparecio antes de i.
+    """
+    presencia = np.asarray(presencia, dtype=bool)
+    n, k = presencia.shape
+    indices = np.full((n + 1, k), -1, dtype=np.int64)
+    if n:
+        marcados = np.where(presencia, np.arange(n)[:, None], -1)
+        indices[1:] = np.maximum.accumulate(marcados, axis=0)
+    return indices
+
+
+def recencia(presencia: np.ndarray, sin_aparicion: Optional[float] = None,
+             tope: Optional[float] = None) -> np.ndarray:
+    """
+    Sorteos transcurridos desde la ultima aparicion (gap = i - ultima).
+
+    Args:
+        presencia: Matriz booleana (n x k) de matriz_presencia/one_hot_serie
+        sin_aparicion: Valor si la columna nunca aparecio antes de i.
+                       None = i (cantidad de sorteos observados).
+        tope: Si se indica, gaps >= tope se reemplazan por tope.
+
+    Returns:
+        Array (n+1 x k). Fila i = estado antes del sorteo i.
+    """
+    ultimos = indices_ultima_aparicion(presencia)
+    filas = np.arange(ultimos.shape[0])[:, None]
+    gaps = filas - ultimos
+
+    nunca = ultimos < 0
+    if sin_aparicion is None:
+        gaps = np.where(nunca, filas, gaps)
+    else:
+        gaps = np.where(nunca, sin_aparicion, gaps)
+
+    if tope is not None:
+        gaps = np.minimum(gaps, tope)
+    return gaps
+
+
+def recencia_valor(valores, sin_aparicion: float = 100, tope: Optional[float] = None) -> np.ndarray:
+    """
+    Para cada posicion i, sorteos desde la aparicion previa del MISMO valor.
+
+    O(n log n) via ordenamiento estable, sin limite de alfabeto.
+    Valores NaN nunca coinciden entre si.
+    """
+    serie = pd.Series(np.asarray(valores).ravel())
+    n = len(serie)
+    resultado = np.full(n, sin_aparicion, dtype=float)
+    if n == 0:
+        return resultado
+
+    codigos = pd.factorize(serie)[0]  # NaN -> -1
+    orden = np.argsort(codigos, kind='stable')
+    ordenados = codigos[orden]
+
+    mismo = (ordenados[1:] == ordenados[:-1]) & (ordenados[1:] >= 0)
+    actuales = orden[1:][mismo]
+    previos = orden[:-1][mismo]
+    resultado[actuales] = actuales - previos
+
+    if tope is not None:
+        resultado = np.minimum(resultado, tope)
+    return resultado
+
+
+def conteo_ventana(presencia: np.ndarray, ventana: int) -> np.ndarray:
+    """
+    Apariciones de cada columna en las `ventana` filas anteriores a i.
+
+    Returns:
+        Array (n+1 x k). Fila i cuenta las filas [max(0, i-ventana), i).
+    """
+    presencia = np.asarray(presencia, dtype=np.int64)
+    n, k = presencia.shape
+    acumulado = np.zeros((n + 1, k), dtype=np.int64)
+    if n:
+        acumulado[1:] = np.cumsum(presencia, axis=0)
+    inicio = np.maximum(np.arange(n + 1) - ventana, 0)
+    return acumulado - acumulado[inicio]
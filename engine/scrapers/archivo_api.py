@@ -0,0 +1,166 @@
+"""
+ARCHIVO API - Respuestas crudas de polla.cl, comprimidas y append-only
+=====================================================================
+El scraper solo guardaba las filas ya parseadas: si un parser gana un
+campo nuevo (columnas JUBILAZO, montos de premios) la unica forma de
+rellenar el historico era volver a scrapear sorteo por sorteo.
+
+Cada respuesta JSON se agrega a un archivo gzip por (juego, bloque de
+sorteos), una linea JSON por respuesta y un miembro gzip por append:
+
+    data/archivo_api/LOTO3/000013.jsonl.gz   (sorteos 13000-13999)
+
+- Append-only: nunca se reescribe en caliente; si un sorteo se vuelve a
+  capturar, la ultima linea gana al leer
+- Un append truncado o corrupto (corte a mitad de escritura) solo pierde
+  su propio registro: la lectura salta al siguiente miembro gzip
+- Bloques de TAMANO_BLOQUE sorteos: cada corrida solo modifica el bloque
+  activo (commits pequenos del bot)
+- compactar() reescribe un juego deduplicado en un solo miembro por bloque
+
+El re-parseo completo (sin red) vive en tools/reparsear_archivo.py.
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import os
+import re
+import gzip
+import json
+import shutil
+import logging
+import tempfile
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(BASE_DIR, '..', '..', 'data'))
+ARCHIVO_DIR = os.path.join(DATA_DIR, 'archivo_api')
+
+TAMANO_BLOQUE = 1000
+_PATRON_BLOQUE = re.compile(r'^(\d+)\.jsonl\.gz$')
+_MAGIA_GZIP = b'\x1f\x8b\x08'
+
+
+def normalizar_juego(nombre: str) -> str:
+    """'LOTO 3' -> 'LOTO3' (mismas claves que el resto del motor)"""
+    return str(nombre).replace(" ", "").upper()
+
+
+def resultados_validos(respuesta: Optional[Dict]) -> bool:
+    """
+    True si la respuesta trae resultados utilizables (no vacios ni solo
+    ceros/nulos). La API usa 'number' como key de cada bola.
+    """
+    results = (respuesta or {}).get('results')
+    if not results:
+        return False
+    if isinstance(results, list):
+        return any(r and isinstance(r, dict) and r.get('number') is not None for r in results)
+    return True
+
+
+def leer_bloque(ruta: str) -> Dict[int, Dict]:
+    """
+    Registros de un bloque (sorteo -> registro, la ultima captura gana).
+    Tolera miembros truncados o corruptos: se descartan y se sigue leyendo.
+    """
+    registros = {}
+    with open(ruta, 'rb') as f:
+        datos = f.read()
+
+    # Miembro a miembro: un miembro incompleto solo descarta su propio append
+    while datos:
+        miembro = zlib.decompressobj(wbits=31)
+        try:
+            contenido = miembro.decompress(datos)
+            completo = miembro.eof
+        except zlib.error:
+            completo = False
+        if not completo:
+            # Saltar al siguiente miembro gzip (appends posteriores al corte)
+            siguiente = datos.find(_MAGIA_GZIP, 1)
+            logger.warning(f"Archivo {os.path.basename(ruta)}: miembro truncado o corrupto descartado")
+            if siguiente < 0:
+                break
+            datos = datos[siguiente:]
+            continue
+
+        for linea in contenido.decode('utf-8', errors='replace').splitlines():
+            try:
+                registro = json.loads(linea)
+                registros[int(registro['sorteo'])] = registro
+            except (ValueError, KeyError, TypeError):
+                continue
+        datos = miembro.unused_data
+    return registros
+
+
+class ArchivoRespuestas:
+    """Archivo comprimido append-only de respuestas crudas por (juego, sorteo)"""
+
+    def __init__(self, directorio: str = ARCHIVO_DIR):
+        self.directorio = directorio
+
+    def _dir_juego(self, juego: str) -> str:
+        return os.path.join(self.directorio, normalizar_juego(juego))
+
+    def ruta_bloque(self, juego: str, sorteo: int) -> str:
+        return os.path.join(self._dir_juego(juego), f"{int(sorteo) // TAMANO_BLOQUE:06d}.jsonl.gz")
+
+    def guardar(self, juego: str, sorteo: int, respuesta: Dict, capturado: Optional[str] = None):
+        """Agrega una respuesta cruda al bloque de su sorteo (un miembro gzip nuevo)"""
+        registro = {
+            'juego': normalizar_juego(juego),
+            'sorteo': int(sorteo),
+            'capturado': capturado or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'respuesta': respuesta,
+        }
+        ruta = self.ruta_bloque(juego, sorteo)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        linea = (json.dumps(registro, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+        with open(ruta, 'ab') as f:
+            f.write(gzip.compress(linea))
+
+    def bloques(self, juego: str) -> List[str]:
+        """Rutas de los bloques de un juego, en orden de sorteo"""
+        directorio = self._dir_juego(juego)
+        if not os.path.isdir(directorio):
+            return []
+        return [os.path.join(directorio, nombre) for nombre in sorted(os.listdir(directorio))
+                if _PATRON_BLOQUE.match(nombre)]
+
+    def leer(self, juego: str) -> Dict[int, Dict]:
+        """Todos los registros de un juego (sorteo -> registro)"""
+        registros = {}
+        for ruta in self.bloques(juego):
+            registros.update(leer_bloque(ruta))
+        return registros
+
+    def compactar(self, juego: str) -> int:
+        """
+        Reescribe cada bloque deduplicado (ultima captura por sorteo) en un
+        solo miembro gzip. Escritura atomica por bloque. Retorna registros.
+        """
+        total = 0
+        for ruta in self.bloques(juego):
+            registros = leer_bloque(ruta)
+            tmp_path = None
+            try:
+                with tempfile.NamedTemporaryFile(suffix='.jsonl.gz', dir=os.path.dirname(ruta),
+                                                 delete=False) as tmp_file:
+                    with gzip.open(tmp_file, 'wt', encoding='utf-8') as gz:
+                        for sorteo in sorted(registros):
+                            gz.write(json.dumps(registros[sorteo], ensure_ascii=False, separators=(',', ':')) + "\n")
+                    tmp_path = tmp_file.name
+                shutil.move(tmp_path, ruta)
+                total += len(registros)
+            except Exception as e:
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                logger.error(f"Error compactando {ruta}: {e}")
+        return total
@@ -2,7 +2,6 @@ import pandas as pd
 import os
 import time
 from datetime import datetime, timedelta
-import json
 import sys
 import csv
 
@@ -15,6 +14,8 @@ if current_dir not in sys.path:
 try:
     import juez_implacable
     import entrenador_cognitivo
+    from calendario_sorteos import fechas_sorteos
+    from genoma_store import GenomaStore, CHECKPOINT_CADA
     try:
         from oraculo_neural import OraculoNeural
     except ImportError:
@@ -45,35 +46,38 @@ def formato_hms(segundos):
 
 def obtener_ultimo_procesado(juego):
     """Busca en el genoma hasta qué sorteo ya hemos 'viajado'."""
-    if not os.path.exists(GENOMA_FILE):
-        return 0
-    try:
-        with open(GENOMA_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data.get("last_processed", {}).get(juego, 0)
-    except (json.JSONDecodeError, IOError):
-        return 0
+    return GenomaStore(GENOMA_FILE).checkpoint(juego)
 
 def actualizar_ultimo_procesado(juego, sorteo_id):
-    """Guarda en el genoma que ya procesamos este hito temporal."""
-    data = {}
-    if os.path.exists(GENOMA_FILE):
-        try:
-            with open(GENOMA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except (json.JSONDecodeError, IOError):
-            data = {}
+    """Guarda en el genoma que ya procesamos este hito temporal (escritura atómica parcial)."""
+    GenomaStore(GENOMA_FILE).actualizar({"last_processed": {juego: int(sorteo_id)}})
+
+def reconstruir_linea_tiempo(checkpoint_cada=CHECKPOINT_CADA):
+    """
+    Los hitos procesados se guardan cada `checkpoint_cada` sorteos (y al
+    terminar o fallar). Reprocesar un sorteo tras una caída es seguro: la
+    predicción previa del oráculo para ese sorteo se reemplaza.
+    """
+    print("⏳ INICIANDO RECONSTRUCCIÓN EXHAUSTIVA (MODO HOMOLOGACIÓN TOTAL)...")
 
-    if "last_processed" not in data:
-        data["last_processed"] = {}
-    data["last_processed"][juego] = int(sorteo_id)
+    with GenomaStore(GENOMA_FILE).checkpoints(cada=checkpoint_cada) as registro:
+        _reconstruir_juegos(registro)
 
-    with open(GENOMA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
+    print("\n✨ RECONSTRUCCIÓN FINALIZADA.")
 
-def reconstruir_linea_tiempo():
-    print("⏳ INICIANDO RECONSTRUCCIÓN EXHAUSTIVA (MODO HOMOLOGACIÓN TOTAL)...")
+    try:
+        try:
+            import comparar_modelos
+            comparar_modelos.generar_reporte_markdown()
+        except ImportError:
+            print("⚠️ No se encontró el script comparar_modelos en el path.")
+        print("📝 Generando reporte comparativo v3 vs v4...")
+        comparar_modelos.generar_reporte_markdown()
+        print("✅ Reporte 'COMPARATIVA_MODELOS.md' actualizado.")
+    except Exception as e:
+        print(f"⚠️ No se pudo generar el reporte: {e}")
 
+def _reconstruir_juegos(registro):
     for juego, archivo in JUEGOS.items():
         path = os.path.join(DATA_DIR, archivo)
         if not os.path.exists(path): continue
@@ -90,9 +94,11 @@ def reconstruir_linea_tiempo():
         # Ordenar cronológicamente
         df_real = df_real.sort_values('sorteo', ascending=True).reset_index(drop=True)
         todos_sorteos = df_real['sorteo'].unique()
+        # Fechas de todos los sorteos en una pasada (con relleno desde el calendario)
+        fechas_reales = fechas_sorteos(juego, df_real)
 
         # 2. Determinar punto de partida
-        ultimo_procesado = obtener_ultimo_procesado(juego)
+        ultimo_procesado = registro.ultimo(juego)
         nuevos = [s for s in todos_sorteos if s > ultimo_procesado]
 
         if not nuevos:
@@ -121,15 +127,11 @@ def reconstruir_linea_tiempo():
             print("═" * 70)
 
             # [A] CÁLCULO DE FECHA
-            try:
-                fila_actual = df_real[df_real['sorteo'] == sorteo_actual].iloc[0]
-                fecha_target_str = str(fila_actual['fecha'])
-                if 'T' in fecha_target_str:
-                    fecha_target_dt = datetime.strptime(fecha_target_str.split('.')[0], '%Y-%m-%d %H:%M:%S')
-                else:
-                    fecha_target_dt = datetime.strptime(fecha_target_str, '%Y-%m-%d %H:%M:%S')
+            fecha_target = fechas_reales.get(sorteo_actual)
+            if fecha_target is not None and not pd.isna(fecha_target):
+                fecha_target_dt = pd.Timestamp(fecha_target).to_pydatetime()
                 fecha_simulada = fecha_target_dt - timedelta(hours=1)
-            except: 
+            else:
                 fecha_target_dt = datetime.now(); fecha_simulada = datetime.now()
 
             # [B] JUEZ Y ENTRENADOR
@@ -200,8 +202,8 @@ def reconstruir_linea_tiempo():
                     except Exception as e:
                         print(f"⚠️ Err {v_name}: {e}", end=" ")
 
-            # [D] MARCAR HITO
-            actualizar_ultimo_procesado(juego, sorteo_actual)
+            # [D] MARCAR HITO (se escribe por lotes)
+            registro.marcar(juego, sorteo_actual)
 
             # --- ⏱️ CÁLCULOS DE TELEMETRÍA ---
             fin_iteracion = time.time()
@@ -215,19 +217,8 @@ def reconstruir_linea_tiempo():
 
             print(f"✅ [{tiempo_ciclo:.1f}s | T:{formato_hms(tiempo_transcurrido)} | Resta:{formato_hms(eta_segundos)}]")
 
-    print("\n✨ RECONSTRUCCIÓN FINALIZADA.")
-
-    try:
-        try:
-            import comparar_modelos
-            comparar_modelos.generar_reporte_markdown()
-        except ImportError:
-            print("⚠️ No se encontró el script comparar_modelos en el path.")
-        print("📝 Generando reporte comparativo v3 vs v4...")
-        comparar_modelos.generar_reporte_markdown()
-        print("✅ Reporte 'COMPARATIVA_MODELOS.md' actualizado.")
-    except Exception as e:
-        print(f"⚠️ No se pudo generar el reporte: {e}")
+        # Fin del juego: su último hito queda escrito
+        registro.flush()
 
 if __name__ == "__main__":
     reconstruir_linea_tiempo()
\ No newline at end of file
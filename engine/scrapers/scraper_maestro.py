@@ -3,7 +3,6 @@ import csv
 import os
 import json
 import requests
-import time
 import re
 import subprocess
 import sys
@@ -11,7 +10,6 @@ import importlib
 import logging
 import random
 import argparse
-import pytz
 import uuid
 from datetime import datetime, timedelta
 from http.cookies import SimpleCookie
@@ -67,6 +65,11 @@ os.makedirs(DATA_DIR, exist_ok=True)
 if MODELS_DIR not in sys.path:
     sys.path.append(MODELS_DIR)
 
+# --- ARCHIVO DE RESPUESTAS CRUDAS (para re-parsear sin red) ---
+from archivo_api import ArchivoRespuestas, normalizar_juego, resultados_validos
+from sync_jugadas import sincronizar_hoja
+from vigia_sorteos import VigiaSorteos, ahora_chile
+
 # --- IMPORTACIÓN DE PARSERS ---
 try:
     from loto_parser_v3 import parse_loto_rich
@@ -140,105 +143,16 @@ GAME_CONFIG = [
 # ==============================================================================
 
 def sincronizar_jugadas():
-    """Descarga jugadas manuales/externas desde Google Sheets y las fusiona sin duplicados."""
+    """
+    Descarga jugadas manuales/externas desde Google Sheets y las fusiona sin duplicados.
+    Condicional (ETag/Last-Modified) e incremental: ver sync_jugadas.py.
+    """
     print("\n☁️  Sincronizando jugadas desde la nube (Google Sheets)...")
     try:
-        # Timeout aumentado para conexiones inestables
-        response = requests.get(GOOGLE_SHEET_CSV_URL, timeout=30)
-        if response.status_code != 200:
-            logger.warning(f"Google Sheets respondió con código {response.status_code}. Saltando sincronización.")
-            print("   ⚠️ No se pudo conectar a Sheets. Saltando sincronización.")
-            return
-
-        # Validar que la respuesta contiene datos CSV válidos
-        content_type = response.headers.get('content-type', '')
-        if 'text/csv' not in content_type and 'text/plain' not in content_type:
-            logger.warning(f"Google Sheets devolvió tipo inesperado: {content_type}. El documento puede estar privado o eliminado.")
-            print("   ⚠️ El documento Google Sheets parece estar privado o no disponible.")
-            return
-
-        if len(response.text.strip()) < 10:
-            logger.warning("Google Sheets devolvió respuesta vacía o muy corta.")
-            print("   ⚠️ El documento Google Sheets parece vacío.")
-            return
-
-        # 1. Cargar huellas digitales existentes (Fecha + Números) para evitar duplicados
-        jugadas_existentes = set()
-        
-        if os.path.exists(JUGADAS_CSV):
-            with open(JUGADAS_CSV, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                next(reader, []) # Saltar header
-                for row in reader:
-                    if len(row) > 2:
-                        # Normalización agresiva para comparación
-                        fecha_clean = row[1].strip()
-                        nums_clean = row[2].replace(" ", "") 
-                        key = f"{fecha_clean}|{nums_clean}"
-                        jugadas_existentes.add(key)
-
-        filas_nube = list(csv.reader(response.text.splitlines()))
-        if not filas_nube: return
-
-        # Detectar inicio de datos (saltar headers de la sheet)
-        start_idx = 1 if len(filas_nube) > 0 and "fecha" in filas_nube[0][0].lower() else 0
-        
-        nuevas = 0
-        modos_append = 'a' if os.path.exists(JUGADAS_CSV) else 'w'
-        
-        # Estructura COMPLETA requerida
-        HEADERS_NUEVOS = ["id", "fecha_generacion", "numeros", "jugado_realmente", "estado", "sorteo_objetivo", "juego"]
-
-        with open(JUGADAS_CSV, modos_append, encoding='utf-8', newline='') as f:
-            # extrasaction='ignore' permite que si la sheet tiene columnas basura, no explote
-            writer = csv.DictWriter(f, fieldnames=HEADERS_NUEVOS, extrasaction='ignore')
-            if modos_append == 'w': writer.writeheader()
-
-            for i in range(start_idx, len(filas_nube)):
-                try:
-                    fila = filas_nube[i]
-                    if len(fila) < 3: continue
-                    
-                    # Formato Google Sheet: Fecha ISO, 1-2-3, SI/NO
-                    fecha_raw = fila[0].replace("T", " ").replace("Z", "").split(".")[0]
-                    nums_str = fila[1]
-                    jugado = fila[2]
-
-                    # Convertir a JSON array estandarizado
-                    try:
-                        lista_nums = [int(n) for n in nums_str.split('-')]
-                        nums_json = json.dumps(lista_nums)
-                    except (ValueError, AttributeError):
-                        # Números mal formateados, saltar fila
-                        continue
-
-                    # Check de duplicado
-                    key_check = f"{fecha_raw}|{nums_json.replace(' ', '')}"
-                    if key_check in jugadas_existentes: continue 
-                    
-                    # Crear fila estandarizada
-                    row_data = {
-                        "id": int(time.time()) + nuevas,
-                        "fecha_generacion": fecha_raw,
-                        "numeros": nums_json,
-                        "jugado_realmente": jugado,
-                        "estado": "PENDIENTE",
-                        "juego": "LOTO", # Asumimos Loto por defecto si viene de esta sheet
-                        "sorteo_objetivo": ""
-                    }
-                    writer.writerow(row_data)
-                    nuevas += 1
-                    print(f"   ✨ Nueva jugada importada: {fecha_raw}")
-                    
-                except Exception as e: 
-                    # Error puntual en una fila no detiene el proceso
-                    continue
-        
-        if nuevas > 0: print(f"   📥 {nuevas} jugadas nuevas agregadas.")
-        else: print("   ✅ Sincronización al día (0 duplicados).")
-
+        return sincronizar_hoja(GOOGLE_SHEET_CSV_URL, JUGADAS_CSV)
     except Exception as e:
         print(f"   ❌ Error crítico en sync nube: {e}")
+        return None
 
 def get_start_id(config):
     """Obtiene el último ID sorteado leyendo el CSV local."""
@@ -421,39 +335,42 @@ def obtener_token_scrapedo(session_id=None):
         raise
 
 
-async def _run_scraper_cloud_mode(games_to_scrape=None):
-    """
-    MODO NUBE: Ejecuta el scraping usando Scrape.do como proxy residencial.
-    Ahora usa Playwright + Proxy Server (Esencia rescatada del scraper funcional).
-    """
-    logger.info("☁️  INICIANDO SCRAPER MAESTRO (Modo Nube / Playwright Proxy)...")
-    
-    if not SCRAPEDO_TOKENS_LIST:
-        logger.error("❌ No hay tokens de Scrape.do configurados.")
-        return
-
+def configurar_proxy_scrapedo():
+    """Proxy residencial de Scrape.do para Playwright (token rotado + sesión fija)."""
     # Rotación de Token
     token = random.choice(SCRAPEDO_TOKENS_LIST)
-    
+
     # Generar Session ID para mantener IP (Stickiness)
     session_id = str(uuid.uuid4())[:8]
-    
+
     # Construir username con parámetros (token-session=ID-super=true)
     proxy_username = f"{token}-session={session_id}-super=true"
-    
+
     logger.info(f"🔑 API Key: ...{token[-6:]} | Session: {session_id}")
 
-    # Configuración del Proxy
-    proxy_config = {
+    return {
         "server": "http://proxy.scrape.do:8080",
         "username": proxy_username,
-        "password": "" 
+        "password": ""
     }
+
+
+async def _run_scraper_cloud_mode(games_to_scrape=None):
+    """
+    MODO NUBE: Ejecuta el scraping usando Scrape.do como proxy residencial.
+    Ahora usa Playwright + Proxy Server (Esencia rescatada del scraper funcional).
+    """
+    logger.info("☁️  INICIANDO SCRAPER MAESTRO (Modo Nube / Playwright Proxy)...")
     
+    if not SCRAPEDO_TOKENS_LIST:
+        logger.error("❌ No hay tokens de Scrape.do configurados.")
+        return set()
+
+    proxy_config = configurar_proxy_scrapedo()
+
     # Delegamos al motor interno (que ahora soporta proxy)
     # Esto también ejecutará el pipeline de IA al finalizar
-    await _run_scraper_internal(proxy_config=proxy_config, games_to_scrape=games_to_scrape)
-    return
+    return await _run_scraper_internal(proxy_config=proxy_config, games_to_scrape=games_to_scrape)
 
 
 def ejecutar_pipeline_ia():
@@ -524,9 +441,11 @@ def ejecutar_pipeline_ia():
 
 
 async def _run_scraper_internal(proxy_config=None, games_to_scrape=None):
+    """Scrapea los juegos pedidos y corre el pipeline IA. Retorna los juegos con sorteos nuevos."""
     mode_name = "Modo Nube/Proxy" if proxy_config else "Modo Manual/Local"
     logger.info(f"INICIANDO SCRAPER MAESTRO ({mode_name})...")
-    sincronizar_jugadas()
+    # La sync de jugadas corre en un hilo mientras se obtiene el token
+    sync_jugadas = asyncio.create_task(asyncio.to_thread(sincronizar_jugadas))
 
     async with async_playwright() as p:
         # Lanzamos navegador headless pero con stealth basics
@@ -550,7 +469,9 @@ async def _run_scraper_internal(proxy_config=None, games_to_scrape=None):
         except Exception as e:
             logger.error(f"Error fatal conectando a Polla.cl: {e}")
             await browser.close()
-            return
+            await sync_jugadas
+            return set()
+        await sync_jugadas
 
         # --- B. BUCLE DE JUEGOS ---
         # Filtrado de juegos
@@ -562,6 +483,7 @@ async def _run_scraper_internal(proxy_config=None, games_to_scrape=None):
                 target_games = GAME_CONFIG
 
         games_updated = set()
+        archivo = ArchivoRespuestas()
         for game in target_games:
             current_id = get_start_id(game)
             logger.info(f"{game['name']} (ID {game['id']}) | Buscando desde #{current_id}")
@@ -624,15 +546,19 @@ async def _run_scraper_internal(proxy_config=None, games_to_scrape=None):
 
                         # Validación 2: Verificar que results contenga datos válidos (no solo ceros)
                         # Esto evita entrenar modelos con datos corruptos
-                        if isinstance(results, list):
-                            # Verificar que al menos hay un resultado no vacío
-                            # La API usa 'number' (no 'value') como key para los números
-                            valid_results = [r for r in results if r and (isinstance(r, dict) and r.get('number') is not None)]
-                            if not valid_results:
-                                logger.error(f"Sorteo #{current_id}: 'results' contiene solo datos vacíos/ceros. NO se guardará para evitar contaminar entrenamiento.")
-                                current_id += 1
-                                consecutive_errors += 1
-                                continue
+                        if not resultados_validos(json_data):
+                            logger.error(f"Sorteo #{current_id}: 'results' contiene solo datos vacíos/ceros. NO se guardará para evitar contaminar entrenamiento.")
+                            current_id += 1
+                            consecutive_errors += 1
+                            continue
+
+                        # Respuesta cruda al archivo comprimido (solo sorteos publicados: un
+                        # sondeo sin resultados no pisa la captura real). Si un parser gana campos,
+                        # el histórico se reconstruye con tools/reparsear_archivo.py
+                        try:
+                            archivo.guardar(normalizar_juego(game['name']), current_id, json_data)
+                        except Exception as e:
+                            logger.warning(f"No se pudo archivar la respuesta #{current_id}: {e}")
 
                         # Validación 2: Parseo
                         try:
@@ -793,86 +719,141 @@ async def _run_scraper_internal(proxy_config=None, games_to_scrape=None):
 
         # Finalmente, subimos todo a la nube
         subir_cambios_a_github()
+        return games_updated
 
-def check_smart_schedule():
+class SondaResultados:
     """
-    Analiza la hora actual (Chile) y decide qué juegos deben scrapearse.
-    Retorna una lista de juegos ["LOTO", "RACHA"] o lista vacía [] si no toca nada.
-    Si retorna None, significa "Ejecutar Todo" (fallback manual).
+    Sondeo liviano para el modo vigía: una sesión Playwright (y un token)
+    abierta durante toda la vigilancia y un solo POST por juego al sorteo
+    pendiente (get_start_id). No escribe CSV, no sincroniza jugadas ni
+    toca GitHub: eso queda para ingerir_juegos cuando el sorteo ya está.
     """
-    if not USE_SCRAPEDO:
-        return None # Modo manual local: ejecutar todo siempre
-
-    # Zona horaria Chile (Maneja invierno/verano automático)
-    try:
-        tz_chile = pytz.timezone('America/Santiago')
-    except pytz.UnknownTimeZoneError:
-        tz_chile = pytz.timezone('Chile/Continental') # Fallback antiguo
-        
-    now = datetime.now(tz_chile)
-    weekday = now.weekday() # 0=Lunes, 6=Domingo
-    hour = now.hour
-    minute = now.minute
-    
-    logger.info(f"🕒 Hora Chile detectada: {now.strftime('%A %H:%M')}")
-
-    # Lógica de Horarios (Ventana de 55 minutos para asegurar captura)
-    # El CRON corre a las XX:05. Verificamos si estamos en la hora correcta.
-    
-    games_to_run = []
-
-    # 1. LOTO (Mar, Jue, Dom a las 22:00)
-    # Se sortea a las 21:00, info disponible ~22:00.
-    if weekday in [1, 3, 6] and hour == 22:
-        games_to_run.append("LOTO")
-
-    # 2. LOTO 3 (14:00, 18:00, 21:00) -> Scrapear a las 14, 18, 21
-    if hour in [14, 18, 21]:
-        games_to_run.append("LOTO 3")
-
-    # 3. LOTO 4 (14:00, 21:00) -> Scrapear a las 14, 21
-    if hour in [14, 21]:
-        games_to_run.append("LOTO 4")
-
-    # 4. RACHA (15:00, 22:00) -> Scrapear a las 15, 22
-    if hour in [15, 22]:
-        games_to_run.append("RACHA")
-        
-    # --- SAFETY NET (RED DE SEGURIDAD) ---
-    # A las 23:00 revisamos TODO por si algo falló durante el día
-    if hour == 23:
-        logger.info("🛡️  Ejecución Safety Net (23:00): Revisando todo.")
-        return None # Ejecuta todo
 
-    if not games_to_run:
-        logger.info("💤 No hay sorteos programados para esta hora. Ahorrando créditos.")
-        return [] # Lista vacía = No hacer nada
+    def __init__(self, proxy_config=None):
+        self.proxy_config = proxy_config
+        self.playwright = None
+        self.browser = None
+        self.page = None
+        self.token = None
+        self.token_timestamp = None
+
+    async def abrir(self):
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(headless=True, proxy=self.proxy_config)
+        context = await self.browser.new_context(user_agent=USER_AGENT_CLOUD, ignore_https_errors=True)
+        self.page = await context.new_page()
+        self.page.set_default_timeout(90000 if self.proxy_config else 30000)
+
+    async def cerrar(self):
+        try:
+            if self.browser:
+                await self.browser.close()
+            if self.playwright:
+                await self.playwright.stop()
+        except Exception as e:
+            logger.warning(f"Error cerrando sesión de sondeo: {e}")
+        self.playwright = self.browser = self.page = self.token = None
+
+    async def publicado(self, game):
+        """True si el sorteo pendiente del juego ya tiene resultados válidos."""
+        if self.page is None:
+            await self.abrir()
+        if self.token is None or datetime.now() - self.token_timestamp > timedelta(minutes=TOKEN_REFRESH_MINUTES):
+            self.token = await obtener_token_csrf(self.page)
+            self.token_timestamp = datetime.now()
+
+        draw_id = get_start_id(game)
+        response = await self.page.request.post(API_URL, data={
+            "gameId": game['id'], "drawId": draw_id, "csrfToken": self.token
+        }, headers={
+            "x-requested-with": "XMLHttpRequest",
+            "Origin": "https://www.polla.cl",
+            "Referer": BASE_URL
+        })
+        if response.status != 200:
+            logger.warning(f"Sondeo {game['name']} #{draw_id}: HTTP {response.status}")
+            return False
+        try:
+            return resultados_validos(await response.json())
+        except json.JSONDecodeError:
+            return False
+
+    async def __call__(self, juegos):
+        """Claves de los juegos (LOTO3, RACHA...) cuyo sorteo pendiente ya se publicó."""
+        listos = set()
+        for game in GAME_CONFIG:
+            clave = normalizar_juego(game['name'])
+            if clave not in juegos:
+                continue
+            try:
+                if await self.publicado(game):
+                    listos.add(clave)
+            except Exception as e:
+                # Sesión caída o token inválido: se reabre en el próximo sondeo
+                logger.warning(f"Sondeo {game['name']} falló: {e}")
+                await self.cerrar()
+        return listos
 
-    logger.info(f"🎯 Objetivos para esta hora: {games_to_run}")
-    return games_to_run
+async def ingerir_juegos(juegos):
+    """
+    Scrapea + pipeline IA de los juegos indicados (claves 'LOTO3', 'RACHA'...).
+    Retorna las claves de los juegos que trajeron sorteos nuevos.
+    """
+    nombres = [g['name'] for g in GAME_CONFIG if normalizar_juego(g['name']) in set(juegos)]
+    bloquear_sonador()
+    try:
+        if USE_SCRAPEDO:
+            actualizados = await _run_scraper_cloud_mode(games_to_scrape=nombres)
+        else:
+            actualizados = await _run_scraper_internal(games_to_scrape=nombres)
+    finally:
+        desbloquear_sonador()
+    return {normalizar_juego(n) for n in (actualizados or ())}
 
 async def run_scraper():
-    """Wrapper que maneja el bloqueo/desbloqueo de GitHub Actions."""
-    
-    # 1. Chequeo Inteligente (Solo en modo Nube)
-    targets = None
-    if USE_SCRAPEDO:
-        targets = check_smart_schedule()
-        if targets == []:
-            logger.info("⏭️  Salida anticipada (Smart Schedule). No hay sorteos en esta hora.")
-            return # No bloqueamos ni hacemos nada
-
-    # 2. Bloqueo y Ejecución
+    """Wrapper que maneja el bloqueo/desbloqueo de GitHub Actions (ejecuta todos los juegos)."""
     bloquear_sonador()
     try:
         # Selección de MODO (Local vs Nube)
         if USE_SCRAPEDO:
-            # targets ya fue calculado arriba
-            await _run_scraper_cloud_mode(games_to_scrape=targets)
+            await _run_scraper_cloud_mode()
         else:
             await _run_scraper_internal()
     finally:
         desbloquear_sonador()
 
+async def run_vigia(horas=None):
+    """
+    Modo vigía: puesta al día de todos los juegos y luego ingesta dirigida
+    por el calendario de sorteos (ver vigia_sorteos.py) durante `horas`.
+    """
+    hasta = ahora_chile() + timedelta(hours=horas) if horas else None
+    logger.info(f"👁️  MODO VIGÍA hasta {hasta:%Y-%m-%d %H:%M}" if hasta else "👁️  MODO VIGÍA (sin límite)")
+
+    # Puesta al día (lo que antes cubría la red de seguridad de las 23:00)
+    await run_scraper()
+
+    # Los reintentos solo sondean; la ingesta completa corre una vez por sorteo publicado
+    sonda = SondaResultados(configurar_proxy_scrapedo() if USE_SCRAPEDO and SCRAPEDO_TOKENS_LIST else None)
+    vigia = VigiaSorteos(ingerir_juegos, sondear=sonda)
+    try:
+        metricas = await vigia.ejecutar(hasta=hasta)
+    finally:
+        await sonda.cerrar()
+    latencias = [m['latencia_segundos'] for m in metricas if m['publicado']]
+    if latencias:
+        logger.info(f"📈 Latencia sorteo -> pipeline: media {sum(latencias) / len(latencias) / 60:.1f} min, "
+                    f"máx {max(latencias) / 60:.1f} min ({len(latencias)}/{len(metricas)} sorteos)")
+
 if __name__ == "__main__":
-    asyncio.run(run_scraper())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scraper Maestro de Polla.cl")
+    parser.add_argument("--vigia", action="store_true",
+                        help="Esperar cada sorteo programado e ingerirlo apenas se publique")
+    parser.add_argument("--horas", type=float, default=None,
+                        help="Duración del modo vigía (default: sin límite)")
+    args = parser.parse_args()
+
+    if args.vigia:
+        asyncio.run(run_vigia(horas=args.horas))
+    else:
+        asyncio.run(run_scraper())
\ No newline at end of file
@@ -0,0 +1,212 @@
+"""
+SYNC JUGADAS - Sincronizacion condicional e incremental desde Google Sheets
+==========================================================================
+Cada corrida del scraper empezaba descargando la hoja publicada completa,
+leyendo todo LOTO_JUGADAS.csv para armar las llaves de duplicado y
+comparando fila por fila, aunque la hoja no hubiera cambiado.
+
+- Peticion condicional (If-None-Match / If-Modified-Since): si la hoja
+  no cambio (304) no se descarga ni se toca nada
+- Marca de agua persistida (bytes procesados + sha256 de ese prefijo):
+  si la hoja solo crecio, se parsean unicamente las filas nuevas de la
+  cola, sin releer LOTO_JUGADAS.csv
+- Si el prefijo cambio (filas editadas o borradas) se vuelve a la
+  sincronizacion completa con deduplicacion contra el CSV local
+- El estado vive junto al CSV (LOTO_JUGADAS.sync.json) y se escribe de
+  forma atomica solo despues de agregar las filas
+
+scraper_maestro la ejecuta en un hilo, en paralelo a la obtencion del
+token de Polla.cl.
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import os
+import csv
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+from typing import Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_SEGUNDOS = 30
+
+# Estructura COMPLETA requerida
+HEADERS_JUGADAS = ["id", "fecha_generacion", "numeros", "jugado_realmente", "estado", "sorteo_objetivo", "juego"]
+
+
+def ruta_estado_por_defecto(ruta_jugadas: str) -> str:
+    """LOTO_JUGADAS.csv -> LOTO_JUGADAS.sync.json (mismo directorio)"""
+    return os.path.splitext(ruta_jugadas)[0] + ".sync.json"
+
+
+def cargar_estado(ruta_estado: str) -> Dict:
+    if not os.path.exists(ruta_estado):
+        return {}
+    try:
+        with open(ruta_estado, 'r', encoding='utf-8') as f:
+            estado = json.load(f)
+        return estado if isinstance(estado, dict) else {}
+    except (IOError, ValueError) as e:
+        logger.warning(f"Estado de sync ilegible ({e}). Se hará sincronización completa.")
+        return {}
+
+
+def guardar_estado(ruta_estado: str, estado: Dict):
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile('w', suffix='.json', dir=os.path.dirname(os.path.abspath(ruta_estado)),
+                                         delete=False, encoding='utf-8') as tmp_file:
+            json.dump(estado, tmp_file, indent=2)
+            tmp_path = tmp_file.name
+        shutil.move(tmp_path, ruta_estado)
+    except Exception as e:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        logger.warning(f"No se pudo guardar el estado de sync: {e}")
+
+
+def huella(texto: str) -> str:
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def clave_jugada(fecha: str, nums_json: str) -> str:
+    """Huella de duplicado (Fecha + Números), normalizada"""
+    return f"{fecha.strip()}|{nums_json.replace(' ', '')}"
+
+
+def cargar_claves_existentes(ruta_jugadas: str) -> set:
+    """Huellas de todas las jugadas ya presentes en el CSV local"""
+    claves = set()
+    if os.path.exists(ruta_jugadas):
+        with open(ruta_jugadas, 'r', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader, [])  # Saltar header
+            for row in reader:
+                if len(row) > 2:
+                    claves.add(clave_jugada(row[1], row[2]))
+    return claves
+
+
+def parsear_fila(fila) -> Optional[Dict]:
+    """
+    Fila de la hoja (Fecha ISO, 1-2-3, SI/NO) -> campos estandarizados,
+    o None si la fila no es una jugada valida.
+    """
+    if len(fila) < 3:
+        return None
+    fecha_raw = fila[0].replace("T", " ").replace("Z", "").split(".")[0]
+    try:
+        lista_nums = [int(n) for n in fila[1].split('-')]
+    except (ValueError, AttributeError):
+        # Números mal formateados, saltar fila
+        return None
+    return {"fecha_generacion": fecha_raw, "numeros": json.dumps(lista_nums), "jugado_realmente": fila[2]}
+
+
+def sincronizar_hoja(url: str, ruta_jugadas: str, ruta_estado: Optional[str] = None,
+                     timeout: float = TIMEOUT_SEGUNDOS) -> Optional[int]:
+    """
+    Fusiona las jugadas nuevas de la hoja publicada en `ruta_jugadas`.
+
+    Returns:
+        Cantidad de jugadas agregadas (0 si la hoja no cambió), o None si
+        no se pudo sincronizar.
+    """
+    ruta_estado = ruta_estado or ruta_estado_por_defecto(ruta_jugadas)
+    estado = cargar_estado(ruta_estado)
+
+    headers = {}
+    if estado.get('etag'):
+        headers['If-None-Match'] = estado['etag']
+    if estado.get('last_modified'):
+        headers['If-Modified-Since'] = estado['last_modified']
+
+    # Timeout aumentado para conexiones inestables
+    response = requests.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304:
+        print("   ✅ Hoja sin cambios (304). Sincronización omitida.")
+        return 0
+    if response.status_code != 200:
+        logger.warning(f"Google Sheets respondió con código {response.status_code}. Saltando sincronización.")
+        print("   ⚠️ No se pudo conectar a Sheets. Saltando sincronización.")
+        return None
+
+    # Validar que la respuesta contiene datos CSV válidos
+    content_type = response.headers.get('content-type', '')
+    if 'text/csv' not in content_type and 'text/plain' not in content_type:
+        logger.warning(f"Google Sheets devolvió tipo inesperado: {content_type}. El documento puede estar privado o eliminado.")
+        print("   ⚠️ El documento Google Sheets parece estar privado o no disponible.")
+        return None
+
+    texto = response.text
+    if len(texto.strip()) < 10:
+        logger.warning("Google Sheets devolvió respuesta vacía o muy corta.")
+        print("   ⚠️ El documento Google Sheets parece vacío.")
+        return None
+
+    # Marca de agua: si el prefijo ya procesado no cambió, solo la cola es nueva
+    procesado = int(estado.get('bytes', 0) or 0)
+    incremental = (0 < procesado <= len(texto) and os.path.exists(ruta_jugadas)
+                   and huella(texto[:procesado]) == estado.get('sha256'))
+
+    if incremental:
+        filas_nube = [f for f in csv.reader(texto[procesado:].splitlines()) if f]
+        claves = set()
+    else:
+        filas_nube = [f for f in csv.reader(texto.splitlines()) if f]
+        # Detectar inicio de datos (saltar headers de la sheet)
+        if filas_nube and filas_nube[0] and "fecha" in filas_nube[0][0].lower():
+            filas_nube = filas_nube[1:]
+        claves = cargar_claves_existentes(ruta_jugadas)
+
+    nuevas = 0
+    if filas_nube:
+        modo = 'a' if os.path.exists(ruta_jugadas) else 'w'
+        with open(ruta_jugadas, modo, encoding='utf-8', newline='') as f:
+            # extrasaction='ignore' permite que si la sheet tiene columnas basura, no explote
+            writer = csv.DictWriter(f, fieldnames=HEADERS_JUGADAS, extrasaction='ignore')
+            if modo == 'w':
+                writer.writeheader()
+
+            base_id = int(time.time())
+            for fila in filas_nube:
+                jugada = parsear_fila(fila)
+                if jugada is None:
+                    continue
+                clave = clave_jugada(jugada['fecha_generacion'], jugada['numeros'])
+                if clave in claves:
+                    continue
+                claves.add(clave)
+
+                writer.writerow({
+                    "id": base_id + nuevas,
+                    **jugada,
+                    "estado": "PENDIENTE",
+                    "juego": "LOTO",  # Asumimos Loto por defecto si viene de esta sheet
+                    "sorteo_objetivo": ""
+                })
+                nuevas += 1
+                print(f"   ✨ Nueva jugada importada: {jugada['fecha_generacion']}")
+
+    guardar_estado(ruta_estado, {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'bytes': len(texto),
+        'sha256': huella(texto),
+        'filas': int(estado.get('filas', 0) or 0) + len(filas_nube) if incremental else len(filas_nube),
+    })
+
+    modo_txt = "incremental" if incremental else "completa"
+    if nuevas > 0:
+        print(f"   📥 {nuevas} jugadas nuevas agregadas (sincronización {modo_txt}).")
+    else:
+        print(f"   ✅ Sincronización al día (0 duplicados, {modo_txt}).")
+    return nuevas
@@ -0,0 +1,181 @@
+"""
+VIGIA SORTEOS - Ingesta dirigida por el calendario de sorteos
+=============================================================
+Reemplaza el sondeo horario de check_smart_schedule (cron XX:05 + red
+de seguridad a las 23:00): un resultado publicado a las 21:10 esperaba
+hasta la siguiente ventana y la prediccion del proximo sorteo se
+atrasaba una hora o mas.
+
+- Duerme hasta el proximo sorteo programado (config.HORARIOS, con la
+  tabla semanal de calendario_sorteos) + MARGEN_PUBLICACION
+- Agrupa los juegos que sortean a la misma hora (LOTO3 y LOTO4 a las
+  14:00) en una sola ingesta
+- Sondeo liviano (callback `sondear`: un POST al endpoint de resultados
+  por juego pendiente) con backoff exponencial acotado (ESPERA_INICIAL x
+  FACTOR_BACKOFF, tope ESPERA_MAXIMA, limite TIEMPO_LIMITE) solo para
+  los juegos aun no publicados
+- Apenas el sondeo ve resultados validos se dispara una sola vez la
+  ingesta completa y el pipeline del juego (callback `ingerir`)
+- Metrica por sorteo: latencia sorteo -> pipeline terminado
+
+Las fechas se manejan como hora local de Chile sin zona (igual que
+calendario_sorteos).
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import os
+import sys
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# --- GESTIÓN DE RUTAS ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+ENGINE_DIR = os.path.normpath(os.path.join(current_dir, '..'))
+MODELS_DIR = os.path.join(ENGINE_DIR, 'models')
+for ruta in (ENGINE_DIR, MODELS_DIR):
+    if ruta not in sys.path:
+        sys.path.append(ruta)
+
+from config import HORARIOS
+from calendario_sorteos import TZ_CHILE, calendario
+
+logger = logging.getLogger(__name__)
+
+MARGEN_PUBLICACION = timedelta(minutes=5)  # Primer sondeo tras la hora del sorteo
+ESPERA_INICIAL = 60.0                      # Segundos antes del 2do sondeo
+FACTOR_BACKOFF = 2.0
+ESPERA_MAXIMA = 600.0                      # Tope entre sondeos
+TIEMPO_LIMITE = 1.5 * 3600                 # Se abandona el sorteo (el siguiente lo recupera)
+
+Ingerir = Callable[[List[str]], Awaitable[Iterable[str]]]
+Sondear = Callable[[List[str]], Awaitable[Iterable[str]]]
+
+
+def ahora_chile() -> datetime:
+    """Hora local de Chile sin zona"""
+    return datetime.now(TZ_CHILE).replace(tzinfo=None)
+
+
+def proximos_sorteos(ahora: datetime, juegos: Optional[Iterable[str]] = None) -> Tuple[datetime, List[str]]:
+    """
+    Proximo horario programado estrictamente posterior a `ahora` y los
+    juegos que sortean en ese horario.
+    """
+    juegos = list(juegos or HORARIOS)
+    proximos = {}
+    for juego in juegos:
+        cal = calendario(juego)
+        proximos[juego] = cal.fecha_slot(cal.slot_global(ahora, lado='right'))
+    instante = min(proximos.values())
+    return instante, [j for j in juegos if proximos[j] == instante]
+
+
+def esperas_backoff(inicial: float = ESPERA_INICIAL, maxima: float = ESPERA_MAXIMA,
+                    factor: float = FACTOR_BACKOFF, limite: float = TIEMPO_LIMITE) -> List[float]:
+    """Esperas entre sondeos: exponenciales, con tope por espera y suma <= limite"""
+    esperas, espera, total = [], float(inicial), 0.0
+    while espera > 0 and total + min(espera, maxima) <= limite:
+        esperas.append(min(espera, maxima))
+        total += esperas[-1]
+        espera *= factor
+    return esperas
+
+
+class VigiaSorteos:
+    """
+    Bucle de ingesta dirigido por eventos.
+
+    Args:
+        ingerir: Corrutina que recibe juegos (claves de HORARIOS), scrapea
+            y corre su pipeline; retorna los juegos con sorteo nuevo
+        sondear: Corrutina liviana que recibe juegos y retorna los que ya
+            publicaron el sorteo pendiente. Sin ella, cada reintento es
+            una ingesta completa
+        juegos: Juegos vigilados (default: todos los de HORARIOS)
+        margen: Espera tras la hora programada antes del primer sondeo
+        esperas: Esperas entre sondeos (default: esperas_backoff())
+        reloj / dormir: Inyectables para tests
+    """
+
+    def __init__(self, ingerir: Ingerir, juegos: Optional[Iterable[str]] = None,
+                 margen: timedelta = MARGEN_PUBLICACION, esperas: Optional[List[float]] = None,
+                 reloj: Callable[[], datetime] = ahora_chile,
+                 dormir: Callable[[float], Awaitable] = asyncio.sleep,
+                 sondear: Optional[Sondear] = None):
+        self.ingerir = ingerir
+        self.sondear = sondear
+        self.juegos = list(juegos or HORARIOS)
+        self.margen = margen
+        self.esperas = esperas_backoff() if esperas is None else list(esperas)
+        self.reloj = reloj
+        self.dormir = dormir
+        self.metricas: List[Dict] = []
+
+    async def atender(self, instante: datetime, juegos: List[str]) -> List[Dict]:
+        """
+        Sondea los juegos de un horario hasta que publiquen o se agote el
+        backoff. Con `sondear`, la ingesta solo corre para los juegos que el
+        sondeo ya vio publicados.
+        """
+        pendientes: Set[str] = set(juegos)
+        intentos = {j: 0 for j in juegos}
+        metricas = []
+
+        for espera in [None] + self.esperas:
+            if espera is not None:
+                logger.info(f"⏳ Sin resultado aún para {sorted(pendientes)}. Reintento en {espera:.0f}s")
+                await self.dormir(espera)
+            for j in pendientes:
+                intentos[j] += 1
+            try:
+                listos = pendientes if self.sondear is None else set(await self.sondear(sorted(pendientes))) & pendientes
+                publicados = set(await self.ingerir(sorted(listos))) & listos if listos else set()
+            except Exception as e:
+                logger.error(f"Error en ingesta de {sorted(pendientes)}: {e}")
+                publicados = set()
+
+            latencia = (self.reloj() - instante).total_seconds()
+            for j in sorted(publicados):
+                logger.info(f"🎯 {j} {instante:%Y-%m-%d %H:%M}: sorteo a pipeline en {latencia / 60:.1f} min "
+                            f"({intentos[j]} sondeos)")
+                metricas.append({'juego': j, 'programado': instante, 'publicado': True,
+                                 'intentos': intentos[j], 'latencia_segundos': round(latencia, 1)})
+            pendientes -= publicados
+            if not pendientes:
+                break
+
+        for j in sorted(pendientes):
+            logger.warning(f"⚠️ {j} {instante:%Y-%m-%d %H:%M}: sin resultado tras {intentos[j]} sondeos. "
+                           f"Se recuperará en el próximo sorteo.")
+            metricas.append({'juego': j, 'programado': instante, 'publicado': False,
+                             'intentos': intentos[j], 'latencia_segundos': None})
+
+        self.metricas.extend(metricas)
+        return metricas
+
+    async def ejecutar(self, hasta: Optional[datetime] = None) -> List[Dict]:
+        """
+        Atiende sorteos en orden hasta `hasta` (hora local naive; None = sin fin).
+
+        Returns:
+            Metricas por (juego, sorteo): publicado, intentos, latencia_segundos
+        """
+        cursor = self.reloj()
+        while True:
+            instante, juegos = proximos_sorteos(cursor, self.juegos)
+            if hasta is not None and instante > hasta:
+                break
+
+            espera = (instante + self.margen - self.reloj()).total_seconds()
+            if espera > 0:
+                logger.info(f"💤 Próximo sorteo: {juegos} a las {instante:%Y-%m-%d %H:%M}. "
+                            f"Primer sondeo en {espera / 60:.0f} min")
+                await self.dormir(espera)
+
+            await self.atender(instante, juegos)
+            cursor = instante
+        return self.metricas
@@ -7,6 +7,7 @@ import logging
 import tempfile
 import shutil
 import time
+import numpy as np
 
 # File locking: fcntl para Unix, msvcrt para Windows
 if sys.platform == 'win32':
@@ -30,12 +31,20 @@ DATA_DIR = os.path.normpath(os.path.join(BASE_DIR, '..', '..', 'data'))
 QUEUE_DIR = os.path.join(DATA_DIR, 'queue')
 CSV_FILE = os.path.join(DATA_DIR, "LOTO_SIMULACIONES.csv")
 LOCK_FILE = os.path.join(DATA_DIR, ".consolidar_cola.lock")
+CONSUMIDOR = "consolidar_cola"
+
+# Consolidación streaming: filas por bloque al copiar/compactar el CSV
+CHUNK_SIZE = 50_000
+COLS_ORDEN = ['id', 'fecha_generacion', 'juego', 'numeros', 'sorteo_objetivo',
+              'estado', 'aciertos', 'score_afinidad', 'hora_dia', 'algoritmo']
 
 # 2. Inyección de rutas para encontrar el módulo 'models'
 MODELS_DIR = os.path.normpath(os.path.join(BASE_DIR, '..', 'models'))
 if MODELS_DIR not in sys.path:
     sys.path.append(MODELS_DIR)
 
+from cola_predicciones import ColaPredicciones
+
 
 class FileLock:
     """
@@ -105,6 +114,236 @@ class FileLock:
         self.release()
         return False
 
+
+# ==============================================================================
+# ÍNDICE PERSISTENTE DE IDS
+# ==============================================================================
+def _rutas_indice(csv_file):
+    """Índice (array int64 ordenado) y metadata que lo ata a una versión del CSV"""
+    return csv_file + '.ids.npy', csv_file + '.ids.json'
+
+
+def _firma_csv(csv_file):
+    stat = os.stat(csv_file)
+    return {"bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _mover_atomico(escribir, destino, suffix):
+    """Escribe vía tempfile en el mismo directorio y reemplaza `destino`"""
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(mode='wb', suffix=suffix,
+                                         dir=os.path.dirname(destino), delete=False) as tmp_file:
+            escribir(tmp_file)
+            tmp_path = tmp_file.name
+        shutil.move(tmp_path, destino)
+    except Exception:
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        raise
+
+
+def _guardar_indice(csv_file, ids):
+    ruta_ids, ruta_meta = _rutas_indice(csv_file)
+    _mover_atomico(lambda f: np.save(f, ids), ruta_ids, '.npy')
+    meta = _firma_csv(csv_file)
+    meta["registros"] = int(len(ids))
+    _mover_atomico(lambda f: f.write(json.dumps(meta).encode('utf-8')), ruta_meta, '.json')
+
+
+def _leer_ids_csv(csv_file):
+    """Columna id completa (int64, en orden de archivo) leída por bloques"""
+    partes = []
+    for chunk in pd.read_csv(csv_file, usecols=['id'], chunksize=CHUNK_SIZE):
+        partes.append(pd.to_numeric(chunk['id'], errors='coerce').to_numpy(dtype=float))
+    if not partes:
+        return np.zeros(0, dtype=float)
+    return np.concatenate(partes)
+
+
+def cargar_indice_ids(csv_file):
+    """
+    Ids presentes en el CSV como array int64 ordenado y único.
+
+    Se reutiliza el índice en disco si el CSV no cambió desde que se escribió
+    (tamaño + mtime); si otro proceso (ej: el Juez) reescribió el CSV, se
+    reconstruye leyendo solo la columna id.
+    """
+    if not os.path.exists(csv_file):
+        return np.zeros(0, dtype=np.int64)
+
+    ruta_ids, ruta_meta = _rutas_indice(csv_file)
+    try:
+        with open(ruta_meta, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        firma = _firma_csv(csv_file)
+        if meta.get("bytes") == firma["bytes"] and meta.get("mtime_ns") == firma["mtime_ns"]:
+            return np.load(ruta_ids)
+    except (IOError, OSError, ValueError, json.JSONDecodeError):
+        pass
+
+    logger.info("Reconstruyendo índice de ids del CSV maestro...")
+    try:
+        ids = _leer_ids_csv(csv_file)
+    except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        logger.warning(f"No se pudo indexar el CSV maestro: {e}")
+        return np.zeros(0, dtype=np.int64)
+    ids = np.unique(ids[np.isfinite(ids)].astype(np.int64))
+    _guardar_indice(csv_file, ids)
+    return ids
+
+
+def _filtrar_nuevos(df_nuevos, indice):
+    """Deduplica los tickets entrantes (último gana) y descarta ids ya presentes"""
+    df_nuevos = df_nuevos.drop_duplicates(subset=['id'], keep='last')
+    ids = pd.to_numeric(df_nuevos['id'], errors='coerce').to_numpy(dtype=float)
+    validos = np.isfinite(ids)
+    presentes = np.zeros(len(ids), dtype=bool)
+    if indice.size:
+        candidatos = ids[validos].astype(np.int64)
+        pos = np.clip(np.searchsorted(indice, candidatos), 0, indice.size - 1)
+        presentes[validos] = indice[pos] == candidatos
+    return df_nuevos[~presentes], ids[validos & ~presentes].astype(np.int64)
+
+
+# ==============================================================================
+# ESCRITURA STREAMING
+# ==============================================================================
+def _anexar_filas(csv_file, df_nuevos, columnas):
+    """Append de filas al CSV; si falla, trunca al tamaño original"""
+    tamano = os.path.getsize(csv_file)
+    with open(csv_file, 'rb+') as f:
+        if tamano:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+        try:
+            f.seek(0, os.SEEK_END)
+            f.write(df_nuevos.reindex(columns=columnas).to_csv(index=False, header=False).encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        except Exception:
+            f.truncate(tamano)
+            raise
+
+
+def _reescribir_streaming(csv_file, columnas, df_nuevos=None, filtro=None):
+    """
+    Copia el CSV por bloques a un tempfile con `columnas` como cabecera
+    (faltantes de COLS_ORDEN = 0), opcionalmente filtrando filas y
+    agregando df_nuevos al final, y lo reemplaza atómicamente.
+
+    Args:
+        filtro: función (chunk) -> máscara booleana de filas a conservar;
+                recibe los bloques en orden de archivo
+    """
+    def escribir(tmp_file):
+        escrito_header = False
+        if os.path.exists(csv_file):
+            for chunk in pd.read_csv(csv_file, chunksize=CHUNK_SIZE):
+                for c in COLS_ORDEN:
+                    if c not in chunk.columns:
+                        chunk[c] = 0
+                if filtro is not None:
+                    chunk = chunk[filtro(chunk)]
+                tmp_file.write(chunk.reindex(columns=columnas).to_csv(
+                    index=False, header=not escrito_header).encode('utf-8'))
+                escrito_header = True
+        if df_nuevos is not None:
+            tmp_file.write(df_nuevos.reindex(columns=columnas).to_csv(
+                index=False, header=not escrito_header).encode('utf-8'))
+            escrito_header = True
+        if not escrito_header:
+            tmp_file.write(pd.DataFrame(columns=columnas).to_csv(index=False).encode('utf-8'))
+
+    _mover_atomico(escribir, csv_file, '.csv')
+
+
+def _columnas_csv(csv_file):
+    try:
+        return list(pd.read_csv(csv_file, nrows=0).columns)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, IOError):
+        return []
+
+
+def anexar_tickets(csv_file, nuevas_filas):
+    """
+    Consolida tickets al CSV sin cargarlo completo.
+
+    - Deduplica contra el índice persistente de ids (ids ya presentes se ignoran)
+    - Si las columnas del CSV cubren las de los tickets: append directo
+    - Si aparecen columnas nuevas: copia streaming con la cabecera extendida
+
+    Returns:
+        Cantidad de filas agregadas
+    """
+    df_nuevos = pd.DataFrame(nuevas_filas)
+    for c in COLS_ORDEN:
+        if c not in df_nuevos.columns:
+            df_nuevos[c] = 0
+
+    indice = cargar_indice_ids(csv_file)
+    df_nuevos, ids_nuevos = _filtrar_nuevos(df_nuevos, indice)
+    if df_nuevos.empty:
+        return 0
+
+    columnas = _columnas_csv(csv_file) if os.path.exists(csv_file) else []
+    faltantes = [c for c in df_nuevos.columns if c not in columnas]
+    if columnas and not faltantes:
+        _anexar_filas(csv_file, df_nuevos, columnas)
+    else:
+        _reescribir_streaming(csv_file, columnas + faltantes, df_nuevos=df_nuevos)
+
+    _guardar_indice(csv_file, np.union1d(indice, ids_nuevos))
+    return len(df_nuevos)
+
+
+def compactar(csv_file=None):
+    """
+    Pasada completa de compactación (comando separado, para ejecución programada).
+
+    Elimina ids duplicados conservando la última aparición (misma semántica
+    que el drop_duplicates histórico) copiando el CSV por bloques; en memoria
+    solo se mantiene la columna id.
+    """
+    csv_file = csv_file or CSV_FILE
+    if not os.path.exists(csv_file):
+        logger.info("No existe CSV maestro. Nada que compactar.")
+        return 0
+
+    lock = FileLock(LOCK_FILE, timeout=120)
+    if not lock.acquire():
+        logger.error("No se pudo adquirir lock. Otro proceso está consolidando.")
+        return 0
+
+    try:
+        ids = _leer_ids_csv(csv_file)
+        # Última aparición de cada id (filas con id inválido se conservan)
+        serie = pd.Series(ids)
+        conservar = ~serie.duplicated(keep='last').to_numpy() | ~np.isfinite(ids)
+        eliminadas = int((~conservar).sum())
+
+        if eliminadas:
+            # Los bloques llegan en orden: la máscara se consume secuencialmente
+            estado = {"inicio": 0}
+
+            def filtro_bloque(chunk):
+                inicio = estado["inicio"]
+                estado["inicio"] += len(chunk)
+                return conservar[inicio:inicio + len(chunk)]
+
+            _reescribir_streaming(csv_file, _columnas_csv(csv_file), filtro=filtro_bloque)
+
+        _guardar_indice(csv_file, np.unique(ids[np.isfinite(ids)].astype(np.int64)))
+        logger.info(f"Compactación finalizada. Duplicados eliminados: {eliminadas}")
+        return eliminadas
+    finally:
+        lock.release()
+
+
 def consolidar():
     """
     Consolida predicciones de la cola al CSV maestro.
@@ -119,21 +358,13 @@ def consolidar():
         return
 
     try:
-        # 3. Buscar archivos JSON en la cola
-        pattern = os.path.join(QUEUE_DIR, "prediccion_*.json")
-        ticket_files = glob.glob(pattern)
-
-        if not ticket_files:
-            logger.info("La cola está vacía. Nada que procesar.")
-            return
-
-        logger.info(f"Encontrados {len(ticket_files)} tickets nuevos.")
+        # 3. Leer tickets nuevos: segmentos append-only desde el offset del consumidor
+        cola = ColaPredicciones(QUEUE_DIR)
+        nuevas_filas, posicion = cola.leer_pendientes(CONSUMIDOR)
 
-        # 4. Leer todos los tickets de la carpeta /queue
-        nuevas_filas = []
+        # 4. Compatibilidad: tickets sueltos del formato anterior (prediccion_*.json)
         procesados = []
-
-        for tf in ticket_files:
+        for tf in glob.glob(os.path.join(QUEUE_DIR, "prediccion_*.json")):
             try:
                 with open(tf, 'r', encoding='utf-8') as f:
                     data = json.load(f)
@@ -145,59 +376,21 @@ def consolidar():
                 logger.error(f"Error leyendo {tf}: {e}")
 
         if not nuevas_filas:
+            logger.info("La cola está vacía. Nada que procesar.")
             return
 
-        # 5. Cargar CSV Maestro existente o crear uno nuevo
-        if os.path.exists(CSV_FILE):
-            try:
-                df_maestro = pd.read_csv(CSV_FILE)
-            except Exception as e:
-                logger.warning(f"Error leyendo CSV maestro: {e}. Creando nuevo.")
-                df_maestro = pd.DataFrame()
-        else:
-            df_maestro = pd.DataFrame()
-
-        # 6. Concatenar y asegurar que no haya duplicados por ID
-        df_nuevos = pd.DataFrame(nuevas_filas)
-
-        cols_orden = ['id', 'fecha_generacion', 'juego', 'numeros', 'sorteo_objetivo',
-                      'estado', 'aciertos', 'score_afinidad', 'hora_dia', 'algoritmo']
-
-        for c in cols_orden:
-            if c not in df_nuevos.columns:
-                df_nuevos[c] = 0
-            if c not in df_maestro.columns and not df_maestro.empty:
-                df_maestro[c] = 0
-
-        df_final = pd.concat([df_maestro, df_nuevos], ignore_index=True)
-        df_final.drop_duplicates(subset=['id'], keep='last', inplace=True)
-
-        # 7. AUDITORÍA v4: Guardar CSV con escritura atómica
-        tmp_path = None
+        logger.info(f"Encontrados {len(nuevas_filas)} tickets nuevos.")
+
+        # 5-7. Append streaming contra el índice persistente de ids
         try:
-            dir_name = os.path.dirname(CSV_FILE)
-            with tempfile.NamedTemporaryFile(
-                mode='w',
-                encoding='utf-8',
-                suffix='.csv',
-                dir=dir_name,
-                delete=False,
-                newline=''
-            ) as tmp_file:
-                df_final.to_csv(tmp_file, index=False)
-                tmp_path = tmp_file.name
-            shutil.move(tmp_path, CSV_FILE)
-            logger.info(f"CSV Actualizado. Total registros: {len(df_final)}")
+            agregadas = anexar_tickets(CSV_FILE, nuevas_filas)
+            logger.info(f"CSV Actualizado. Registros agregados: {agregadas}")
         except Exception as e:
             logger.error(f"Error guardando CSV: {e}")
-            if tmp_path and os.path.exists(tmp_path):
-                try:
-                    os.remove(tmp_path)
-                except OSError:
-                    pass
             return
 
-        # 8. Borrar archivos procesados de la cola
+        # 8. Avanzar el offset (los segmentos no se borran) y retirar tickets legacy
+        cola.confirmar(CONSUMIDOR, posicion)
         for tf in procesados:
             try:
                 os.remove(tf)
@@ -221,4 +414,7 @@ def consolidar():
         lock.release()
 
 if __name__ == "__main__":
-    consolidar()
\ No newline at end of file
+    if '--compactar' in sys.argv:
+        compactar()
+    else:
+        consolidar()
\ No newline at end of file
@@ -1,7 +1,11 @@
 import pandas as pd
+import numpy as np
 import os
 import sys
 import time
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
 # --- GESTIÓN DE RUTAS ---
@@ -26,13 +30,16 @@ MAESTROS = {
     "LOTO4": "LOTO4_MAESTRO.csv",
     "RACHA": "RACHA_MAESTRO.csv"
 }
+ALGORITMO = 'oraculo_neural_v3'
+# Procesos de réplica (los sorteos son independientes dado su corte de entrenamiento)
+WORKERS = max(1, (os.cpu_count() or 2) - 1)
 
 def encontrar_punto_partida(juego):
     """Busca la primera vez que el Oráculo Neural intentó predecir algo en la historia."""
     if not os.path.exists(SIMULACIONES_FILE): return None
     try:
         df = pd.read_csv(SIMULACIONES_FILE)
-        filtro = (df['juego'] == juego) & (df['algoritmo'] == 'oraculo_neural_v3')
+        filtro = (df['juego'] == juego) & (df['algoritmo'] == ALGORITMO)
         datos_neural = df[filtro]
         if datos_neural.empty: return None
         return int(datos_neural['sorteo_objetivo'].min())
@@ -40,22 +47,202 @@ def encontrar_punto_partida(juego):
 
 def guardar_prediccion(fila_dict):
     """Guarda la fila y ORDENA el CSV cronológicamente por ID."""
+    guardar_predicciones([fila_dict])
+
+def guardar_predicciones(filas, juego=None, reemplazar_sorteos=()):
+    """
+    Escritura única de la réplica: borra las predicciones previas del
+    oráculo para `reemplazar_sorteos`, agrega `filas`, ordena por ID y
+    reemplaza el CSV atómicamente.
+    """
     if os.path.exists(SIMULACIONES_FILE):
         df_final = pd.read_csv(SIMULACIONES_FILE)
-        # Concatenamos la nueva fila
-        df_final = pd.concat([df_final, pd.DataFrame([fila_dict])], ignore_index=True)
+        if juego is not None and len(reemplazar_sorteos):
+            filtro_borrar = (df_final['juego'] == juego) & \
+                            (df_final['sorteo_objetivo'].isin(list(reemplazar_sorteos))) & \
+                            (df_final['algoritmo'] == ALGORITMO)
+            df_final = df_final[~filtro_borrar]
+        # Concatenamos las filas nuevas
+        df_final = pd.concat([df_final, pd.DataFrame(filas)], ignore_index=True)
     else:
-        df_final = pd.DataFrame([fila_dict])
-    
+        df_final = pd.DataFrame(filas)
+
     # --- LA MAGIA DEL ORDENAMIENTO ---
     # Convertimos ID a numérico por si acaso y ordenamos
     df_final['id'] = pd.to_numeric(df_final['id'], errors='coerce')
-    df_final = df_final.sort_values(by='id', ascending=True)
+    df_final = df_final.sort_values(by='id', ascending=True, kind='stable')
     # ---------------------------------
 
-    df_final.to_csv(SIMULACIONES_FILE, index=False)
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', suffix='.csv', newline='',
+                                         dir=os.path.dirname(SIMULACIONES_FILE), delete=False) as tmp_file:
+            df_final.to_csv(tmp_file, index=False)
+            tmp_path = tmp_file.name
+        shutil.move(tmp_path, SIMULACIONES_FILE)
+    except Exception:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+# ----------------------------------------------------------------------
+# Historial compartido (memory-mapped, sin copia en los workers)
+# ----------------------------------------------------------------------
+def exportar_historial_compartido(df_maestro, directorio):
+    """
+    Vuelca el maestro a un .npy por columna (columnas numéricas con su dtype
+    original + fecha como datetime64[ns]) que los workers abren con mmap en
+    vez de re-parsear el CSV.
+
+    Returns:
+        Descriptor serializable para cargar_historial_compartido()
+    """
+    columnas = {}
+    for col in df_maestro.columns:
+        if col == 'fecha':
+            valores = pd.to_datetime(df_maestro['fecha'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+        elif pd.api.types.is_numeric_dtype(df_maestro[col]):
+            valores = df_maestro[col].to_numpy()
+        else:
+            continue
+        ruta = os.path.join(directorio, f'col_{len(columnas)}.npy')
+        np.save(ruta, valores)
+        columnas[col] = ruta
+    return {'columnas': columnas}
+
+def cargar_historial_compartido(descriptor):
+    """
+    DataFrame de solo lectura sobre los arrays mapeados en memoria (mismo
+    orden que el maestro). Sin copia: todos los workers leen las mismas
+    páginas del page cache; pandas copia una columna solo si alguien la
+    modifica (copy-on-write).
+    """
+    return pd.DataFrame({col: np.asarray(np.load(ruta, mmap_mode='r'))
+                         for col, ruta in descriptor['columnas'].items()}, copy=False)
+
+# ----------------------------------------------------------------------
+# Workers
+# ----------------------------------------------------------------------
+_ORACULO_WORKER = None
+
+def _inicializar_worker(juego, descriptor):
+    """Un oráculo por proceso sobre el historial compartido; no escribe el .pkl"""
+    global _ORACULO_WORKER
+    historial = cargar_historial_compartido(descriptor)
+    _ORACULO_WORKER = OraculoNeural(juego, historial=historial, persistir=False)
+
+def _reconstruir_sorteo(tarea):
+    """Entrena con corte en el sorteo objetivo y predice. Devuelve (sorteo, fila|None, error|None)."""
+    sorteo_target = tarea['sorteo']
+    try:
+        _ORACULO_WORKER.entrenar(sorteo_limite=sorteo_target)
+        prediccion = _ORACULO_WORKER.predecir(fecha_objetivo=tarea['fecha_target'])
+    except Exception as e:
+        return sorteo_target, None, str(e)
+    if not prediccion:
+        return sorteo_target, None, None
+    fecha_simulada = tarea['fecha_simulada']
+    return sorteo_target, {
+        'id': int(fecha_simulada.timestamp()),  # ID retroactivo: queda en su posición por fecha
+        'fecha_generacion': fecha_simulada.strftime('%Y-%m-%d %H:%M:%S'),
+        'juego': tarea['juego'],
+        'numeros': str(prediccion),
+        'sorteo_objetivo': sorteo_target,
+        'estado': 'PENDIENTE',
+        'aciertos': 0, 'score_afinidad': 0.0,
+        'hora_dia': fecha_simulada.hour,
+        'algoritmo': ALGORITMO
+    }, None
+
+def _tareas_replay(df_maestro, juego, sorteos):
+    """Fecha objetivo y fecha simulada (5 mins después del anterior) de cada sorteo"""
+    def parsear(valor):
+        try:
+            return datetime.strptime(valor, '%Y-%m-%d %H:%M:%S')
+        except (ValueError, TypeError):
+            return None  # Fecha mal formateada, usar default
+
+    posicion = {}
+    for idx, sorteo in enumerate(df_maestro['sorteo']):
+        posicion.setdefault(sorteo, idx)
+    fechas = df_maestro['fecha'].tolist() if 'fecha' in df_maestro.columns else [None] * len(df_maestro)
+
+    tareas = []
+    for sorteo_target in sorteos:
+        ahora = datetime.now()
+        fecha_target_dt, fecha_simulada = ahora, ahora
+        idx = posicion.get(sorteo_target)
+        if idx is not None:
+            fecha_target_dt = parsear(fechas[idx]) or fecha_target_dt
+            if idx > 0:
+                dt_anterior = parsear(fechas[idx - 1])
+                if dt_anterior is not None:
+                    fecha_simulada = dt_anterior + timedelta(minutes=5)
+            else:
+                fecha_simulada = fecha_target_dt - timedelta(days=2)
+        tareas.append({'juego': juego, 'sorteo': int(sorteo_target),
+                       'fecha_target': fecha_target_dt, 'fecha_simulada': fecha_simulada})
+    return tareas
+
+def replay_paralelo(juego, df_maestro, sorteos, workers=WORKERS):
+    """
+    Reconstruye `sorteos` en un pool de procesos que comparten el historial
+    por mmap. Los resultados se juntan en memoria (sin tocar el CSV).
+
+    Returns:
+        (filas, metricas) - filas ordenadas por sorteo
+    """
+    tareas = _tareas_replay(df_maestro, juego, sorteos)
+    total = len(tareas)
+    filas, errores, sin_prediccion = {}, 0, 0
+    inicio = time.time()
+    if total == 0:
+        return [], {'sorteos': 0, 'filas': 0, 'errores': 0, 'segundos': 0.0, 'sorteos_por_segundo': 0.0}
+
+    def registrar(i, sorteo, fila, error):
+        nonlocal errores, sin_prediccion
+        transcurrido = time.time() - inicio
+        ritmo = i / transcurrido if transcurrido > 0 else 0.0
+        eta = (total - i) / ritmo if ritmo > 0 else 0.0
+        if error:
+            errores += 1
+            estado = f"❌ Error: {error}"
+        elif fila is None:
+            sin_prediccion += 1
+            estado = "⚠️ Sin predicción."
+        else:
+            filas[sorteo] = fila
+            estado = f"✅ Pred: {fila['numeros']}"
+        print(f"[{i}/{total}] #{sorteo} {estado} | {ritmo:.2f} sorteos/s | ETA {timedelta(seconds=int(eta))}")
 
-def reparar_historia_inteligente(juego):
+    directorio = tempfile.mkdtemp(prefix='replay_')
+    try:
+        descriptor = exportar_historial_compartido(df_maestro, directorio)
+        workers = max(1, min(int(workers), total))
+        print(f"    ⚙️ {workers} workers | historial compartido: {len(df_maestro)} sorteos (mmap)")
+        if workers == 1:
+            _inicializar_worker(juego, descriptor)
+            for i, tarea in enumerate(tareas, 1):
+                registrar(i, *_reconstruir_sorteo(tarea))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker,
+                                     initargs=(juego, descriptor)) as pool:
+                # Los sorteos más tardíos entrenan con más historia: se envían primero
+                futuros = [pool.submit(_reconstruir_sorteo, t) for t in reversed(tareas)]
+                for i, futuro in enumerate(as_completed(futuros), 1):
+                    registrar(i, *futuro.result())
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    segundos = time.time() - inicio
+    metricas = {
+        'sorteos': total, 'filas': len(filas), 'errores': errores, 'sin_prediccion': sin_prediccion,
+        'segundos': round(segundos, 2),
+        'sorteos_por_segundo': round(total / segundos, 3) if segundos > 0 else 0.0,
+    }
+    return [filas[s] for s in sorted(filas)], metricas
+
+def reparar_historia_inteligente(juego, workers=WORKERS):
     print(f"\n🛠️  INICIANDO REPARACIÓN DE LÍNEA TEMPORAL: {juego}")
     
     sorteo_inicio = encontrar_punto_partida(juego)
@@ -69,71 +256,18 @@ def reparar_historia_inteligente(juego):
     df_maestro = pd.read_csv(archivo_maestro)
     df_maestro = df_maestro.sort_values('sorteo', ascending=True).reset_index(drop=True)
     
-    # === FASE 1: REPARAR EL PASADO ===
+    # === FASE 1: REPARAR EL PASADO (en paralelo, resultados en memoria) ===
     sorteos_a_reparar = sorted(df_maestro[df_maestro['sorteo'] >= sorteo_inicio]['sorteo'].unique())
     total = len(sorteos_a_reparar)
-    
-    oraculo = OraculoNeural(juego)
-    
+    filas = []
+
     if total > 0:
         print(f"    📅 Se reconstruirán {total} sorteos históricos.")
-        for i, sorteo_target in enumerate(sorteos_a_reparar):
-            progreso = f"[{i+1}/{total}]"
-            
-            # Cálculo de fecha simulada (5 mins después del anterior)
-            idx_list = df_maestro.index[df_maestro['sorteo'] == sorteo_target].tolist()
-            fecha_simulada = datetime.now()
-            fecha_target_dt = datetime.now()
-
-            if idx_list:
-                idx = idx_list[0]
-                try:
-                    fecha_target_dt = datetime.strptime(df_maestro.iloc[idx]['fecha'], '%Y-%m-%d %H:%M:%S')
-                except (ValueError, KeyError):
-                    pass  # Fecha mal formateada, usar default
-
-                if idx > 0:
-                    try:
-                        dt_anterior = datetime.strptime(df_maestro.iloc[idx-1]['fecha'], '%Y-%m-%d %H:%M:%S')
-                        fecha_simulada = dt_anterior + timedelta(minutes=5)
-                    except (ValueError, KeyError):
-                        pass  # Fecha mal formateada, usar default
-                else:
-                    fecha_simulada = fecha_target_dt - timedelta(days=2)
-
-            fecha_sim_str = fecha_simulada.strftime('%Y-%m-%d %H:%M:%S')
-            
-            # ID Retroactivo basado en la fecha simulada
-            id_retroactivo = int(fecha_simulada.timestamp())
-
-            # Borrar anterior
-            if os.path.exists(SIMULACIONES_FILE):
-                df_sim = pd.read_csv(SIMULACIONES_FILE)
-                filtro_borrar = (df_sim['juego'] == juego) & (df_sim['sorteo_objetivo'] == sorteo_target) & (df_sim['algoritmo'] == 'oraculo_neural_v3')
-                if not df_sim[filtro_borrar].empty:
-                    df_sim = df_sim[~filtro_borrar]
-                    df_sim.to_csv(SIMULACIONES_FILE, index=False)
-            
-            # Predecir
-            print(f"{progreso} ⏳ Reconstruyendo #{sorteo_target} (Fecha Sim: {fecha_sim_str})...", end=" ")
-            try:
-                oraculo.entrenar(sorteo_limite=sorteo_target)
-                prediccion = oraculo.predecir(fecha_objetivo=fecha_target_dt)
-                if prediccion:
-                    print(f"✅ Pred: {prediccion}")
-                    guardar_prediccion({
-                        'id': id_retroactivo, # Se guardará en su posición correcta por fecha
-                        'fecha_generacion': fecha_sim_str,
-                        'juego': juego,
-                        'numeros': str(prediccion),
-                        'sorteo_objetivo': sorteo_target,
-                        'estado': 'PENDIENTE', 
-                        'aciertos': 0, 'score_afinidad': 0.0,
-                        'hora_dia': fecha_simulada.hour,
-                        'algoritmo': 'oraculo_neural_v3'
-                    })
-                else: print("⚠️ Sin predicción.")
-            except Exception as e: print(f"❌ Error: {e}")
+        filas, metricas = replay_paralelo(juego, df_maestro, sorteos_a_reparar, workers=workers)
+        print(f"    📈 {metricas['filas']}/{metricas['sorteos']} predicciones en {metricas['segundos']}s "
+              f"({metricas['sorteos_por_segundo']} sorteos/s, {metricas['errores']} errores)")
+
+    reemplazar = list(sorteos_a_reparar)
 
     # === FASE 2: PREDECIR EL FUTURO ===
     print(f"\n🚀 PROYECTANDO EL PRÓXIMO SORTEO (FUTURO INMEDIATO)...")
@@ -157,22 +291,18 @@ def reparar_historia_inteligente(juego):
         print(f"    🎯 Objetivo: Sorteo #{sorteo_futuro}")
         print(f"    🕒 Momento de Simulación: {fecha_gen_str}")
 
-        # Limpieza preventiva
-        if os.path.exists(SIMULACIONES_FILE):
-            df_sim = pd.read_csv(SIMULACIONES_FILE)
-            filtro_borrar = (df_sim['juego'] == juego) & (df_sim['sorteo_objetivo'] == sorteo_futuro) & (df_sim['algoritmo'] == 'oraculo_neural_v3')
-            if not df_sim[filtro_borrar].empty:
-                df_sim = df_sim[~filtro_borrar]
-                df_sim.to_csv(SIMULACIONES_FILE, index=False)
+        # Limpieza preventiva (en la escritura final)
+        reemplazar.append(sorteo_futuro)
 
         print(f"    🧠 Entrenando con toda la historia disponible...")
         try:
+            oraculo = OraculoNeural(juego, historial=df_maestro)
             oraculo.entrenar(sorteo_limite=sorteo_futuro)
             prediccion_futura = oraculo.predecir(fecha_objetivo=datetime.now())
             
             if prediccion_futura:
                 print(f"    🔮 PREDICCIÓN PARA JUGAR AHORA (#{sorteo_futuro}): {prediccion_futura}")
-                guardar_prediccion({
+                filas.append({
                     'id': id_futuro,
                     'fecha_generacion': fecha_gen_str,
                     'juego': juego,
@@ -181,14 +311,18 @@ def reparar_historia_inteligente(juego):
                     'estado': 'PENDIENTE', 
                     'aciertos': 0, 'score_afinidad': 0.0,
                     'hora_dia': fecha_gen_futura.hour,
-                    'algoritmo': 'oraculo_neural_v3'
+                    'algoritmo': ALGORITMO
                 })
-                print("    ✅ Guardada y ordenada en el CSV.")
             else:
                 print("    ⚠️ El oráculo no habló.")
         except Exception as e:
             print(f"    ❌ Error en el futuro: {e}")
 
+    # === ESCRITURA ÚNICA: borrar anteriores + agregar + ordenar ===
+    if reemplazar:
+        guardar_predicciones(filas, juego=juego, reemplazar_sorteos=reemplazar)
+        print(f"    ✅ {len(filas)} predicciones guardadas y ordenadas en el CSV (una sola escritura).")
+
     print(f"\n✨ PROCESO TERMINADO.")
 
 if __name__ == "__main__":
@@ -0,0 +1,176 @@
+"""
+REPARSEAR ARCHIVO - Reconstruye un MAESTRO CSV desde el archivo de respuestas
+=============================================================================
+Re-parsea las respuestas crudas guardadas por el scraper
+(scrapers/archivo_api.py) con los parsers actuales, sin red: cuando un
+parser gana un campo nuevo, el historico se rellena en segundos en vez de
+volver a scrapear polla.cl sorteo por sorteo.
+
+- Un bloque del archivo por tarea en un pool de procesos (cada worker lee
+  y parsea su bloque; solo viajan las filas)
+- Mismas validaciones que el scraper (resultados vacios/solo ceros fuera)
+- Las filas re-parseadas reemplazan a las del CSV por sorteo; los sorteos
+  que no estan en el archivo (anteriores a el) se conservan tal cual
+- Header: el del CSV actual + columnas nuevas al final (como el scraper)
+- Escritura atomica (tempfile + move)
+
+Uso:
+    python engine/tools/reparsear_archivo.py LOTO3 [--workers 4]
+
+Autor: LotoAI System
+Fecha: 2026-10-19
+"""
+
+import os
+import sys
+import csv
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# --- GESTIÓN DE RUTAS ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+SCRAPERS_DIR = os.path.normpath(os.path.join(current_dir, '..', 'scrapers'))
+if SCRAPERS_DIR not in sys.path:
+    sys.path.append(SCRAPERS_DIR)
+
+from archivo_api import ArchivoRespuestas, leer_bloque, resultados_validos
+from loto_parser_v3 import parse_loto_rich
+from loto_parsers_mix import parse_loto3, parse_loto4, parse_racha
+
+# --- CONFIGURACIÓN ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, '..', '..', 'data')
+
+MAESTROS = {
+    "LOTO": "LOTO_HISTORIAL_MAESTRO.csv",
+    "LOTO3": "LOTO3_MAESTRO.csv",
+    "LOTO4": "LOTO4_MAESTRO.csv",
+    "RACHA": "RACHA_MAESTRO.csv"
+}
+PARSERS = {
+    "LOTO": parse_loto_rich,
+    "LOTO3": parse_loto3,
+    "LOTO4": parse_loto4,
+    "RACHA": parse_racha
+}
+WORKERS = max(1, os.cpu_count() or 1)
+
+
+def reparsear_bloque(juego, ruta):
+    """Parsea todas las respuestas validas de un bloque. Retorna (filas, invalidas)."""
+    parser = PARSERS[juego]
+    filas, invalidas = [], 0
+    for sorteo, registro in sorted(leer_bloque(ruta).items()):
+        respuesta = registro.get('respuesta')
+        if not resultados_validos(respuesta):
+            invalidas += 1
+            continue
+        try:
+            fila = parser(respuesta)
+        except Exception:
+            invalidas += 1
+            continue
+        if not fila or fila.get('sorteo') is None:
+            invalidas += 1
+            continue
+        filas.append(fila)
+    return filas, invalidas
+
+
+def _leer_maestro(ruta):
+    if not os.path.exists(ruta):
+        return [], []
+    with open(ruta, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        return list(reader.fieldnames or []), list(reader)
+
+
+def _clave_sorteo(valor):
+    try:
+        return int(float(valor))
+    except (ValueError, TypeError):
+        return None
+
+
+def reconstruir_maestro(juego, workers=WORKERS, archivo=None, ruta_csv=None):
+    """
+    Reconstruye el MAESTRO de `juego` desde el archivo de respuestas.
+
+    Returns:
+        Dict con metricas (bloques, filas re-parseadas, invalidas, total, segundos)
+    """
+    archivo = archivo or ArchivoRespuestas()
+    ruta_csv = ruta_csv or os.path.join(DATA_DIR, MAESTROS[juego])
+    inicio = time.time()
+
+    bloques = archivo.bloques(juego)
+    if not bloques:
+        print(f"⚠️ No hay respuestas archivadas para {juego}.")
+        return {'bloques': 0, 'filas': 0, 'invalidas': 0, 'total': 0, 'segundos': 0.0}
+
+    # 1. Re-parseo paralelo (un bloque por tarea)
+    filas, invalidas = [], 0
+    workers = max(1, min(workers, len(bloques)))
+    if workers == 1:
+        for ruta in bloques:
+            f, i = reparsear_bloque(juego, ruta)
+            filas.extend(f)
+            invalidas += i
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = [pool.submit(reparsear_bloque, juego, ruta) for ruta in bloques]
+            for futuro in as_completed(futuros):
+                f, i = futuro.result()
+                filas.extend(f)
+                invalidas += i
+
+    # 2. Fusión con el CSV actual (el archivo gana por sorteo)
+    headers, existentes = _leer_maestro(ruta_csv)
+    por_sorteo = {_clave_sorteo(fila.get('sorteo')): fila for fila in existentes}
+    por_sorteo.pop(None, None)
+    for fila in filas:
+        por_sorteo[_clave_sorteo(fila['sorteo'])] = fila
+        for k in fila:
+            if k not in headers:
+                headers.append(k)
+
+    # 3. Escritura atómica, ordenada por sorteo
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', dir=os.path.dirname(os.path.abspath(ruta_csv)),
+                                         delete=False, encoding='utf-8', newline='') as tmp_file:
+            writer = csv.DictWriter(tmp_file, fieldnames=headers, restval='', extrasaction='ignore')
+            writer.writeheader()
+            for sorteo in sorted(por_sorteo):
+                writer.writerow(por_sorteo[sorteo])
+            tmp_path = tmp_file.name
+        shutil.move(tmp_path, ruta_csv)
+    except Exception as e:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"❌ Error escribiendo {ruta_csv}: {e}")
+        raise
+
+    metricas = {
+        'bloques': len(bloques),
+        'filas': len(filas),
+        'invalidas': invalidas,
+        'total': len(por_sorteo),
+        'segundos': round(time.time() - inicio, 2),
+    }
+    print(f"✅ {juego}: {metricas['filas']} sorteos re-parseados desde {metricas['bloques']} bloques "
+          f"({invalidas} inválidos) -> {metricas['total']} filas en {metricas['segundos']}s")
+    return metricas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruye un MAESTRO CSV desde el archivo de respuestas crudas")
+    parser.add_argument("juegos", nargs="*", default=list(MAESTROS), choices=list(MAESTROS))
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    for juego in args.juegos:
+        reconstruir_maestro(juego, workers=args.workers)
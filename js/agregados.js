@@ -0,0 +1,42 @@
+// =========================================================
+// CARGA DE AGREGADOS PRECALCULADOS (exportador_agregados.py)
+// =========================================================
+// agregados/index.json se pide sin cache; cada producto lleva el hash de su
+// contenido en el nombre, por lo que el navegador/CDN puede cachearlo.
+let AGREGADOS_INDEX = null;
+
+async function cargarIndiceAgregados() {
+    if (!AGREGADOS_INDEX) {
+        const res = await fetch('agregados/index.json', { cache: 'no-store' });
+        if (!res.ok) throw new Error(`agregados/index.json: HTTP ${res.status}`);
+        AGREGADOS_INDEX = await res.json();
+    }
+    return AGREGADOS_INDEX;
+}
+
+// Devuelve {nombre: producto|null}; lanza error si no hay indice
+async function cargarAgregados(nombres) {
+    const indice = await cargarIndiceAgregados();
+    const pares = await Promise.all(nombres.map(async nombre => {
+        const info = indice.productos[nombre];
+        if (!info) return [nombre, null];
+        const res = await fetch('agregados/' + info.archivo);
+        return [nombre, res.ok ? await res.json() : null];
+    }));
+    return Object.fromEntries(pares);
+}
+
+// Columnas {valores, codigos} -> lista plana
+function decodificarColumna(columna) {
+    if (columna && !Array.isArray(columna)) return columna.codigos.map(c => columna.valores[c]);
+    return columna || [];
+}
+
+// Filas del historial -> objetos con valores de texto (igual que Papa.parse)
+function filasHistorial(producto) {
+    return producto.filas.map(fila => {
+        const row = {};
+        producto.columnas.forEach((col, i) => { row[col] = fila[i] === null ? '' : String(fila[i]); });
+        return row;
+    });
+}
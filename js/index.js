@@ -11,15 +11,49 @@ const PRIMOS_LOTO = new Set([2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]);
 function formatMoney(n) { return '$' + Number(n).toLocaleString('es-CL'); }
 
 // =========================================
-// 1. CARGA DE DATOS CSV
+// 1. CARGA DE DATOS (AGREGADOS O CSV)
 // =========================================
-try {
+let MECANICA = null;           // Heatmap posicion x numero precalculado
+let historialCompleto = true;  // false mientras solo este la ventana reciente
+
+function setHistory(rows) {
+  allData = rows;
+  const validData = allData.filter(row => row.sorteo && row.sorteo.trim() !== '');
+  sortedData = validData.slice().reverse();
+  return validData;
+}
+
+function onHistoryLoaded(rows) {
+  const validData = setHistory(rows);
+  const lastDraw = validData[validData.length - 1];
+
+  if(lastDraw) {
+     renderDashboard(lastDraw);
+     const searchInput = document.getElementById('search');
+     if(searchInput) searchInput.max = lastDraw.sorteo;
+  }
+
+  updateHistoryTable();
+
+  const statusText = document.getElementById('status-text');
+  if(statusText) statusText.style.display = 'none';
+}
+
+// El historial completo solo se descarga al buscar o filtrar ganadores
+async function ensureFullHistory() {
+  if (historialCompleto) return;
+  const agg = await cargarAgregados(['historial_loto']);
+  if (agg.historial_loto) {
+    setHistory(filasHistorial(agg.historial_loto));
+    historialCompleto = true;
+  }
+}
+
+function loadHistoryCsv() {
   Papa.parse('data/LOTO_HISTORIAL_MAESTRO.csv', {
     download: true, header: true, skipEmptyLines: true,
     complete: function(results) {
-      allData = results.data;
-
-      allData.forEach(row => {
+      results.data.forEach(row => {
           if(row.LOTO_n1 && row.LOTO_n6) {
               let nums = [
                   parseInt(row.LOTO_n1), parseInt(row.LOTO_n2), parseInt(row.LOTO_n3),
@@ -29,31 +63,88 @@ try {
               pastCombinations.add(nums.join('-'));
           }
       });
-
-      const validData = allData.filter(row => row.sorteo && row.sorteo.trim() !== '');
-      const lastDraw = validData[validData.length - 1];
-
-      if(lastDraw) {
-         renderDashboard(lastDraw);
-         const searchInput = document.getElementById('search');
-         if(searchInput) searchInput.max = lastDraw.sorteo;
-      }
-
-      sortedData = validData.slice().reverse();
-      updateHistoryTable();
-
-      const statusText = document.getElementById('status-text');
-      if(statusText) statusText.style.display = 'none';
+      onHistoryLoaded(results.data);
     }
   });
-} catch(e) {
-  console.error("Error inicial:", e);
-  document.getElementById('status-text').textContent = "Error al iniciar la carga de datos.";
+}
+
+async function loadData() {
+  try {
+    const agg = await cargarAgregados(['historial_loto_reciente', 'combinaciones_loto', 'mecanica_loto', 'estadisticas']);
+    if (agg.historial_loto_reciente && agg.combinaciones_loto) {
+      historialCompleto = !AGREGADOS_INDEX.productos.historial_loto;
+      pastCombinations = new Set(agg.combinaciones_loto);
+      MECANICA = agg.mecanica_loto;
+      onHistoryLoaded(filasHistorial(agg.historial_loto_reciente));
+      if (agg.estadisticas) renderRealMetricsFromStats(agg.estadisticas);
+      else loadRealMetrics();
+      return;
+    }
+  } catch (e) {
+    console.warn("Agregados no disponibles, leyendo CSV:", e);
+  }
+
+  try {
+    loadHistoryCsv();
+  } catch(e) {
+    console.error("Error inicial:", e);
+    document.getElementById('status-text').textContent = "Error al iniciar la carga de datos.";
+  }
+  loadRealMetrics();
 }
 
 // =========================================
 // 1.5 CARGA DE METRICAS REALES (SIMULACIONES)
 // =========================================
+function renderRealMetrics(totalPredictions, hitsHistogram) {
+    // hitsHistogram: {aciertos: cantidad} de predicciones AUDITADAS de LOTO
+    const entries = Object.entries(hitsHistogram).map(([k, v]) => [parseInt(k), v]).filter(([, v]) => v > 0);
+    const lotoCount = entries.reduce((a, [, v]) => a + v, 0);
+
+    if (lotoCount === 0) {
+        document.getElementById('total-predictions').textContent = '0';
+        document.getElementById('avg-loto-hits').textContent = 'N/A';
+        document.getElementById('best-loto-hits').textContent = 'N/A';
+        document.getElementById('success-rate').textContent = 'N/A';
+        return;
+    }
+
+    // Calcular metricas
+    const avgHits = entries.reduce((a, [k, v]) => a + k * v, 0) / lotoCount;
+    const maxHits = Math.max(...entries.map(([k]) => k));
+    const successCount = entries.filter(([k]) => k >= 3).reduce((a, [, v]) => a + v, 0);
+    const successRate = (successCount / lotoCount) * 100;
+
+    // Actualizar UI
+    document.getElementById('total-predictions').textContent = totalPredictions.toLocaleString();
+    document.getElementById('avg-loto-hits').textContent = avgHits.toFixed(2);
+    document.getElementById('best-loto-hits').textContent = maxHits + '/6';
+    document.getElementById('success-rate').textContent = successRate.toFixed(1) + '%';
+
+    // Color coding based on performance
+    const avgEl = document.getElementById('avg-loto-hits');
+    if (avgHits < 1.0) {
+        avgEl.classList.add('metric-bad');
+    } else if (avgHits < 2.0) {
+        avgEl.classList.add('metric-neutral');
+    } else {
+        avgEl.classList.add('metric-info');
+    }
+
+    console.log('Metricas reales cargadas:', {
+        total: totalPredictions,
+        lotoAuditados: lotoCount,
+        promedioAciertos: avgHits.toFixed(2),
+        maxAciertos: maxHits,
+        tasaExito: successRate.toFixed(1) + '%'
+    });
+}
+
+function renderRealMetricsFromStats(stats) {
+    const loto = stats.juegos['LOTO'];
+    renderRealMetrics(stats.total_auditados, loto ? loto.histograma_aciertos : {});
+}
+
 function loadRealMetrics() {
     Papa.parse('data/LOTO_SIMULACIONES.csv', {
         download: true, header: true, skipEmptyLines: true,
@@ -61,49 +152,15 @@ function loadRealMetrics() {
             const simData = results.data;
 
             // Filtrar solo predicciones AUDITADAS de LOTO
-            const auditedLoto = simData.filter(row =>
-                row.estado === 'AUDITADO' && row.juego === 'LOTO'
-            );
-
-            if (auditedLoto.length === 0) {
-                document.getElementById('total-predictions').textContent = '0';
-                document.getElementById('avg-loto-hits').textContent = 'N/A';
-                document.getElementById('best-loto-hits').textContent = 'N/A';
-                document.getElementById('success-rate').textContent = 'N/A';
-                return;
-            }
-
-            // Calcular metricas
-            const totalPredictions = simData.filter(r => r.estado === 'AUDITADO').length;
-            const lotoHits = auditedLoto.map(r => parseInt(r.aciertos) || 0);
-            const avgHits = lotoHits.reduce((a, b) => a + b, 0) / lotoHits.length;
-            const maxHits = Math.max(...lotoHits);
-            const successCount = lotoHits.filter(h => h >= 3).length;
-            const successRate = (successCount / lotoHits.length) * 100;
-
-            // Actualizar UI
-            document.getElementById('total-predictions').textContent = totalPredictions.toLocaleString();
-            document.getElementById('avg-loto-hits').textContent = avgHits.toFixed(2);
-            document.getElementById('best-loto-hits').textContent = maxHits + '/6';
-            document.getElementById('success-rate').textContent = successRate.toFixed(1) + '%';
-
-            // Color coding based on performance
-            const avgEl = document.getElementById('avg-loto-hits');
-            if (avgHits < 1.0) {
-                avgEl.classList.add('metric-bad');
-            } else if (avgHits < 2.0) {
-                avgEl.classList.add('metric-neutral');
-            } else {
-                avgEl.classList.add('metric-info');
-            }
-
-            console.log('Metricas reales cargadas:', {
-                total: totalPredictions,
-                lotoAuditados: auditedLoto.length,
-                promedioAciertos: avgHits.toFixed(2),
-                maxAciertos: maxHits,
-                tasaExito: successRate.toFixed(1) + '%'
+            const histogram = {};
+            simData.forEach(row => {
+                if (row.estado === 'AUDITADO' && row.juego === 'LOTO') {
+                    const hits = parseInt(row.aciertos) || 0;
+                    histogram[hits] = (histogram[hits] || 0) + 1;
+                }
             });
+            const totalPredictions = simData.filter(r => r.estado === 'AUDITADO').length;
+            renderRealMetrics(totalPredictions, histogram);
         },
         error: function(err) {
             console.warn('No se pudo cargar SIMULACIONES:', err);
@@ -116,8 +173,8 @@ function loadRealMetrics() {
     });
 }
 
-// Cargar metricas al iniciar
-loadRealMetrics();
+// Cargar datos al iniciar
+loadData();
 
 // =========================================
 // 2. LOGICA DEL GENERADOR CUANTICO (MODIFICADO CON PESO MECANICO)
@@ -443,9 +500,10 @@ function renderDashboard(row) {
 // =========================================
 // 4. TABLA DE HISTORIAL
 // =========================================
-function updateHistoryTable() {
+async function updateHistoryTable() {
   const checkbox = document.getElementById('filter-winners');
   const showWinnersOnly = checkbox ? checkbox.checked : false;
+  if (showWinnersOnly) await ensureFullHistory();
   let dataToRender = sortedData;
   if (showWinnersOnly) dataToRender = sortedData.filter(r => parseInt(r.LOTO_GANADORES) > 0);
   renderHistory(dataToRender.slice(0, 100));
@@ -469,7 +527,11 @@ function renderHistory(rows) {
 
 document.getElementById('search').addEventListener('change', (e) => loadDraw(e.target.value));
 document.getElementById('filter-winners').addEventListener('change', updateHistoryTable);
-window.loadDraw = (id) => { const row = allData.find(r => r.sorteo == id); if(row) { renderDashboard(row); document.getElementById('dashboard').scrollIntoView({behavior: 'smooth'}); } }
+window.loadDraw = async (id) => {
+  let row = allData.find(r => r.sorteo == id);
+  if (!row && !historialCompleto) { await ensureFullHistory(); row = allData.find(r => r.sorteo == id); }
+  if(row) { renderDashboard(row); document.getElementById('dashboard').scrollIntoView({behavior: 'smooth'}); }
+}
 
 // =========================================
 // 5. INICIALIZACION DEL TEMPORIZADOR
@@ -497,8 +559,14 @@ function getMechanicalWeight(number, targetPosition, historyData) {
     let count = 0;
     let totalDraws = 0;
 
+    // Heatmap precalculado (mecanica_loto) sobre las mismas 100 filas
+    if (MECANICA) {
+        count = MECANICA.conteos[targetPosition - 1][number - 1] || 0;
+        totalDraws = MECANICA.sorteos;
+    }
+
     // Analizamos los ultimos 100 sorteos para capturar la tendencia actual de la maquina
-    const recentData = historyData.slice(0, 100);
+    const recentData = MECANICA ? [] : historyData.slice(0, 100);
 
     recentData.forEach(row => {
         // Intentamos leer la posicion fisica (LOTO_pos1...pos6)
@@ -1,9 +1,29 @@
 const CONFIG_JUEGOS = ["LOTO", "LOTO3", "LOTO4", "RACHA"];
 
+// --- CARGA DEL DASHBOARD MATERIALIZADO ---
+// manifest.json indica por juego sus shards (mes) y el ultimo sorteo;
+// solo se descargan los shards que contienen el proximo sorteo.
+async function loadDashboardShards() {
+    const response = await fetch('dashboard/manifest.json', { cache: 'no-store' });
+    const manifest = await response.json();
+
+    const archivos = [];
+    Object.values(manifest.juegos || {}).forEach(info => {
+        Object.values(info.shards || {}).forEach(shard => {
+            if (shard.sorteo_max === info.ultimo_sorteo) archivos.push(shard.archivo);
+        });
+    });
+
+    const shards = await Promise.all(archivos.map(async archivo => {
+        const res = await fetch(`dashboard/${archivo}`, { cache: 'no-store' });
+        return res.ok ? res.json() : [];
+    }));
+    return shards.flat();
+}
+
 async function loadPredictions() {
     try {
-        const response = await fetch('dashboard_data.json');
-        const rawData = await response.json();
+        const rawData = await loadDashboardShards();
 
         CONFIG_JUEGOS.forEach(j => { document.getElementById(`grid-${j}`).innerHTML = ''; });
 
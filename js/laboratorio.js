@@ -80,6 +80,7 @@ let MASTERS_DATES = {};
 let MASTERS_PRIZES = {};
 let MASTERS_WINNERS = {};
 let MASTERS_COMODIN = {};
+let STATS = null; // Producto 'estadisticas' (null si se leyeron los CSV)
 
 let CURRENT_UNIVERSE = 'LOTO';
 let CURRENT_CHART_MODE = 'hour';
@@ -107,6 +108,15 @@ function hexToRgba(hex, alpha) {
 // 2. SISTEMA DE CARGA DE DATOS (DATA LOADER)
 // =========================================================
 async function loadAllData() {
+    try {
+        if (await loadFromAggregates()) {
+            applyFilters();
+            return;
+        }
+    } catch (e) {
+        console.warn("Agregados no disponibles, leyendo CSV:", e);
+    }
+
     try {
         const promises = Object.entries(DATA_SOURCES).map(([key, url]) =>
             fetch(url + '?t=' + Date.now()).then(res => res.ok ? res.text() : null).then(text => ({key, text}))
@@ -130,6 +140,71 @@ async function loadAllData() {
     }
 }
 
+// Carga desde agregados/ (productos precalculados, cacheables)
+async function loadFromAggregates() {
+    const masterKeys = Object.keys(DATA_SOURCES).filter(k => k !== 'SIMS' && k !== 'JUGADAS');
+    const agg = await cargarAgregados(['simulaciones', 'jugadas', 'estadisticas',
+                                       ...masterKeys.map(k => 'maestro_' + k.toLowerCase())]);
+    if (!agg.simulaciones) return false;
+
+    loadSimulationsProduct(agg.simulaciones);
+    RAW_PLAYS = agg.jugadas || [];
+    STATS = agg.estadisticas;
+    masterKeys.forEach(k => {
+        const producto = agg['maestro_' + k.toLowerCase()];
+        if (producto) loadMasterProduct(k, producto);
+    });
+    return true;
+}
+
+// Mismos mapas que processMaster() a partir del producto maestro_<juego>
+function loadMasterProduct(gameKey, p) {
+    const map = {}, dateMap = {}, prizeMap = {}, winnerMap = {}, comodinMap = {};
+    p.sorteos.forEach((sorteo, i) => {
+        map[sorteo] = p.numeros[i];
+        if (p.fechas) dateMap[sorteo] = p.fechas[i];
+        if (p.comodin) comodinMap[sorteo] = p.comodin[i];
+        prizeMap[sorteo] = {};
+        winnerMap[sorteo] = {};
+        for (const [key, col] of Object.entries(p.premios)) prizeMap[sorteo][key] = col[i];
+        for (const [key, col] of Object.entries(p.ganadores)) winnerMap[sorteo][key] = col[i];
+    });
+    MASTERS[gameKey] = map;
+    MASTERS_DATES[gameKey] = dateMap;
+    MASTERS_PRIZES[gameKey] = prizeMap;
+    MASTERS_WINNERS[gameKey] = winnerMap;
+    MASTERS_COMODIN[gameKey] = comodinMap;
+}
+
+// Mismos objetos que processSimulations() a partir del producto simulaciones
+function loadSimulationsProduct(p) {
+    if (!p.filas) { RAW_SIMULATIONS = []; return; }
+    const cols = {};
+    ['fecha', 'juego', 'objetivo', 'estado', 'algoritmo', 'fecha_lanzamiento', 'modalidad']
+        .forEach(c => { cols[c] = decodificarColumna(p[c]); });
+
+    RAW_SIMULATIONS = p.id.map((id, i) => {
+        const obj = {
+            id: id === null ? '' : String(id),
+            fechaStr: cols.fecha[i],
+            juego: cols.juego[i],
+            numeros: p.numeros[i],
+            objetivo: cols.objetivo[i],
+            estado: cols.estado[i],
+            aciertos: p.aciertos[i],
+            score: p.score[i],
+            hora: p.hora[i],
+            algoritmo: cols.algoritmo[i],
+            fechaLanzamiento: cols.fecha_lanzamiento[i],
+            modalidad: cols.modalidad[i]
+        };
+        obj.dateObj = new Date(obj.fechaStr.replace(' ', 'T'));
+        if (isNaN(obj.dateObj)) obj.dateObj = new Date();
+        if (obj.hora === null) obj.hora = obj.dateObj.getHours();
+        return obj;
+    }).reverse();
+}
+
 // Procesador de Archivos Maestros (Historial + Premios + Ganadores)
 function processMaster(gameKey, text) {
     const lines = text.trim().split('\n');
@@ -1582,8 +1657,17 @@ function getLinearRegression(dataPoints) {
 // GRAFICO EVOLUTIVO (CON TENDENCIAS Y PENDIENTES)
 // =========================================================
 
-function updateEvolutionChart() {
-    const ctx = document.getElementById('evolutionChart').getContext('2d');
+// Afinidad promedio por sorteo objetivo y categoria de algoritmo:
+// precalculada en 'estadisticas' o calculada desde RAW_SIMULATIONS
+function getEvolutionPoints() {
+    if (STATS) {
+        const evolucion = STATS.juegos[CURRENT_UNIVERSE] ? STATS.juegos[CURRENT_UNIVERSE].evolucion : {};
+        const result = {};
+        Object.entries(evolucion).forEach(([key, pts]) => {
+            result[key] = pts.map(([x, y]) => ({ x: x, y: y }));
+        });
+        return result;
+    }
 
     const dataByGame = RAW_SIMULATIONS.filter(row =>
         row.juego === CURRENT_UNIVERSE &&
@@ -1591,11 +1675,6 @@ function updateEvolutionChart() {
         row.score !== undefined && row.score !== ""
     );
 
-    if (dataByGame.length === 0) {
-        if (evolutionChartInstance) evolutionChartInstance.destroy();
-        return;
-    }
-
     const algosRaw = {};
     dataByGame.forEach(row => {
         // --- CAMBIO AQUI: Categorizacion explicita ---
@@ -1616,21 +1695,36 @@ function updateEvolutionChart() {
         algosRaw[algoKey][target].push(score);
     });
 
-    const algosProcessed = {};
+    const result = {};
     Object.keys(algosRaw).forEach(key => {
         const targets = Object.keys(algosRaw[key]).map(Number).sort((a,b) => a-b);
-        const points = targets.map(t => {
+        result[key] = targets.map(t => {
             const scores = algosRaw[key][t];
             const avg = scores.reduce((a,b) => a+b, 0) / scores.length;
             return { x: t, y: avg };
         });
+    });
+    return result;
+}
+
+function updateEvolutionChart() {
+    const ctx = document.getElementById('evolutionChart').getContext('2d');
+
+    const pointsByAlgo = getEvolutionPoints();
 
+    if (Object.keys(pointsByAlgo).length === 0) {
+        if (evolutionChartInstance) evolutionChartInstance.destroy();
+        return;
+    }
+
+    const algosProcessed = {};
+    Object.keys(pointsByAlgo).forEach(key => {
         let label = key.toUpperCase();
         const config = UNIVERSE_CONFIG[CURRENT_UNIVERSE] || UNIVERSE_CONFIG['LOTO'];
         const confAlgo = config.algos.find(a => a.key === key);
         if (confAlgo) label = confAlgo.label;
 
-        algosProcessed[key] = { label: label, points: points, color: confAlgo ? confAlgo.color : '#888' };
+        algosProcessed[key] = { label: label, points: pointsByAlgo[key], color: confAlgo ? confAlgo.color : '#888' };
     });
 
     // 3. Generar Datasets
@@ -0,0 +1,127 @@
+"""
+Tests for engine/scrapers/archivo_api.py and engine/tools/reparsear_archivo.py
+==============================================================================
+
+Tests the append-only compressed archive of raw polla.cl responses and the
+offline, process-pool rebuild of a MAESTRO CSV from it.
+"""
+
+import pytest
+import os
+import sys
+import csv
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'scrapers'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'tools'))
+
+
+def respuesta_loto3(sorteo, digitos, premios=True):
+    """Raw API payload in the shape parse_loto3 reads."""
+    ts = int(datetime(2026, 1, 1, 21, 0).timestamp() * 1000) + sorteo * 1000
+    data = {'drawNumber': sorteo, 'drawDate': ts,
+            'results': [{'number': d, 'order': i} for i, d in enumerate(digitos)]}
+    if premios:
+        data['prizes'] = [{'name': 'EXACTA', 'winners': 3, 'winningAmount': 400}]
+    return data
+
+
+@pytest.fixture
+def archivo(tmp_path):
+    from archivo_api import ArchivoRespuestas
+
+    return ArchivoRespuestas(str(tmp_path / 'archivo_api'))
+
+
+class TestArchivo:
+    """Append-only storage keyed by (game, draw)."""
+
+    def test_append_and_read_last_capture_wins(self, archivo):
+        archivo.guardar('LOTO 3', 12999, respuesta_loto3(12999, [1, 2, 3]))
+        archivo.guardar('LOTO3', 13000, respuesta_loto3(13000, [4, 5, 6]))
+        archivo.guardar('LOTO3', 13000, respuesta_loto3(13000, [7, 8, 9]))
+
+        assert [os.path.basename(r) for r in archivo.bloques('LOTO3')] == ['000012.jsonl.gz', '000013.jsonl.gz']
+        registros = archivo.leer('LOTO3')
+        assert sorted(registros) == [12999, 13000]
+        assert [r['number'] for r in registros[13000]['respuesta']['results']] == [7, 8, 9]
+
+    def test_truncated_tail_keeps_previous_records(self, archivo):
+        for sorteo in range(13000, 13005):
+            archivo.guardar('LOTO3', sorteo, respuesta_loto3(sorteo, [1, 1, 1]))
+        ruta = archivo.ruta_bloque('LOTO3', 13000)
+        with open(ruta, 'r+b') as f:
+            f.truncate(os.path.getsize(ruta) - 7)
+
+        assert sorted(archivo.leer('LOTO3')) == [13000, 13001, 13002, 13003]
+        # Appends after a crash are still readable past the damaged member
+        archivo.guardar('LOTO3', 13005, respuesta_loto3(13005, [2, 2, 2]))
+        assert sorted(archivo.leer('LOTO3')) == [13000, 13001, 13002, 13003, 13005]
+
+    def test_compact_deduplicates(self, archivo):
+        for _ in range(3):
+            archivo.guardar('RACHA', 3000, {'results': [{'number': 1}]})
+        ruta = archivo.ruta_bloque('RACHA', 3000)
+        tamaño = os.path.getsize(ruta)
+
+        assert archivo.compactar('RACHA') == 1
+        assert os.path.getsize(ruta) < tamaño
+        assert list(archivo.leer('RACHA')) == [3000]
+
+    def test_valid_results(self):
+        from archivo_api import resultados_validos
+
+        assert resultados_validos(respuesta_loto3(1, [0, 0, 0]))
+        assert not resultados_validos({'results': []})
+        assert not resultados_validos({'results': [{'number': None}, {}]})
+        assert not resultados_validos(None)
+
+
+class TestReparsear:
+    """Offline rebuild of a MAESTRO CSV from the archive."""
+
+    @pytest.mark.parametrize("workers", [1, 3])
+    def test_rebuild_matches_parser_and_keeps_older_rows(self, archivo, tmp_path, monkeypatch, workers):
+        import reparsear_archivo
+        from loto_parsers_mix import parse_loto3
+
+        # Existing master: one draw from before the archive, one to be replaced
+        ruta_csv = tmp_path / 'LOTO3_MAESTRO.csv'
+        with open(ruta_csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['sorteo', 'fecha', 'n1', 'n2', 'n3'])
+            writer.writeheader()
+            writer.writerow({'sorteo': 10, 'fecha': '2020-01-01 14:00:00', 'n1': 9, 'n2': 9, 'n3': 9})
+            writer.writerow({'sorteo': 12999, 'fecha': 'viejo', 'n1': 0, 'n2': 0, 'n3': 0})
+
+        sorteos = list(range(12990, 13020)) + list(range(14000, 14010))
+        for s in sorteos:
+            archivo.guardar('LOTO3', s, respuesta_loto3(s, [s % 10, (s // 10) % 10, 7]))
+        archivo.guardar('LOTO3', 13050, {'drawNumber': 13050, 'results': [{'number': None}]})
+
+        # No network access is needed
+        monkeypatch.setattr('socket.socket.connect', lambda *a: pytest.fail("network used"))
+        metricas = reparsear_archivo.reconstruir_maestro('LOTO3', workers=workers, archivo=archivo,
+                                                         ruta_csv=str(ruta_csv))
+
+        assert metricas['bloques'] == 3 and metricas['filas'] == len(sorteos) and metricas['invalidas'] == 1
+        with open(ruta_csv, encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            headers, filas = reader.fieldnames, list(reader)
+
+        assert headers[:5] == ['sorteo', 'fecha', 'n1', 'n2', 'n3']
+        assert 'EXACTA_MONTO' in headers
+        assert [int(f['sorteo']) for f in filas] == [10] + sorteos
+        assert filas[0]['n1'] == '9' and filas[0]['EXACTA_MONTO'] == ''
+
+        esperado = parse_loto3(respuesta_loto3(12999, [9, 9, 7]))
+        fila = next(f for f in filas if f['sorteo'] == '12999')
+        assert {k: fila[k] for k in esperado} == {k: str(v) for k, v in esperado.items()}
+
+    def test_no_archive_leaves_csv_untouched(self, archivo, tmp_path):
+        import reparsear_archivo
+
+        ruta_csv = tmp_path / 'RACHA_MAESTRO.csv'
+        ruta_csv.write_text("sorteo,n1\n1,2\n")
+        assert reparsear_archivo.reconstruir_maestro('RACHA', archivo=archivo, ruta_csv=str(ruta_csv))['filas'] == 0
+        assert ruta_csv.read_text() == "sorteo,n1\n1,2\n"
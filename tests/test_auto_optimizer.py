@@ -0,0 +1,191 @@
+"""
+Tests for engine/models/auto_optimizer.py
+=========================================
+
+Tests the rolling sufficient statistics, the CUSUM drift detector and the
+append-only optimizer history.
+"""
+
+import pytest
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+
+def filas(inicio, n, aciertos, juego='LOTO', estado='AUDITADO', semilla=0):
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        'id': np.arange(inicio, inicio + n),
+        'juego': juego,
+        'algoritmo': rng.choice(['alg_a', 'alg_b'], n),
+        'estado': estado,
+        'aciertos': aciertos if np.ndim(aciertos) else np.full(n, aciertos),
+        'score_afinidad': rng.uniform(0, 10, n).round(2),
+        'hora_dia': rng.integers(0, 24, n),
+    })
+
+
+@pytest.fixture
+def optimizador(tmp_path, monkeypatch):
+    import auto_optimizer
+
+    monkeypatch.setattr(auto_optimizer, 'SIMULACIONES_FILE', str(tmp_path / 'sims.csv'))
+    monkeypatch.setattr(auto_optimizer, 'GENOMA_FILE', str(tmp_path / 'genome.json'))
+    monkeypatch.setattr(auto_optimizer, 'OPTIMIZER_LOG', str(tmp_path / 'optimizer_history.json'))
+    monkeypatch.setattr(auto_optimizer, 'HISTORIAL_FILE', str(tmp_path / 'optimizer_history.jsonl'))
+    monkeypatch.setattr(auto_optimizer, 'ESTADO_FILE', str(tmp_path / 'state.json'))
+    monkeypatch.setattr(auto_optimizer, 'IDS_FILE', str(tmp_path / 'state.ids.npy'))
+    return auto_optimizer, tmp_path / 'sims.csv'
+
+
+class TestEstadisticos:
+    """Incremental statistics must equal a full recomputation."""
+
+    def test_incremental_matches_full_history(self, optimizador):
+        ao, csv = optimizador
+        rng = np.random.default_rng(1)
+        base = pd.concat([filas(1, 200, rng.integers(0, 5, 200)),
+                          filas(500, 30, 0, estado='PENDIENTE'),
+                          filas(1000, 150, rng.integers(0, 4, 150), juego='LOTO3', semilla=2)])
+        base.to_csv(csv, index=False)
+        ao.AutoOptimizer().ejecutar_ciclo_completo()
+
+        # Pending tickets get their verdict, new ones arrive (including a lower id)
+        base.loc[base['estado'] == 'PENDIENTE', ['estado', 'aciertos']] = ['AUDITADO', 3]
+        tarde = filas(300, 10, 2, semilla=5)
+        pd.concat([base, tarde]).to_csv(csv, index=False)
+        opt = ao.AutoOptimizer()
+        opt.ejecutar_ciclo_completo()
+
+        df = pd.read_csv(csv)
+        esperado = df.groupby(['juego', 'algoritmo'])['aciertos'].agg(['count', 'mean', 'std'])
+        stats = opt.estado['stats'].groupby(['juego', 'algoritmo'])[['n', 's', 's2']].sum()
+        np.testing.assert_array_equal(stats['n'], esperado['count'])
+        np.testing.assert_allclose(stats['s'] / stats['n'], esperado['mean'])
+        np.testing.assert_allclose(ao._desviacion(stats['n'], stats['s'], stats['s2']), esperado['std'])
+
+    def test_rerun_does_not_double_count(self, optimizador):
+        ao, csv = optimizador
+        filas(1, 120, 1).to_csv(csv, index=False)
+        ao.AutoOptimizer().ejecutar_ciclo_completo()
+        opt = ao.AutoOptimizer()
+        opt.ejecutar_ciclo_completo()
+        assert opt.estado['stats']['n'].sum() == 120
+
+    def test_rescored_verdicts_are_folded_in(self, optimizador):
+        ao, csv = optimizador
+        df = filas(1, 120, 1)
+        df.to_csv(csv, index=False)
+        ao.AutoOptimizer().ejecutar_ciclo_completo()
+
+        # The judge re-audits some tickets already counted
+        df.loc[:9, 'aciertos'] = 4
+        df.loc[5:14, 'score_afinidad'] += 1.5
+        df.to_csv(csv, index=False)
+        opt = ao.AutoOptimizer()
+        opt.ejecutar_ciclo_completo()
+
+        stats = opt.estado['stats'].set_index(ao.CLAVES).sort_index()
+        esperado = ao._estadisticos(df).set_index(ao.CLAVES).sort_index()
+        np.testing.assert_allclose(stats[ao.SUMAS].astype(float), esperado[ao.SUMAS].astype(float))
+        assert len(opt.contabilizados) == 120
+
+    def test_inconsistent_state_is_recomputed(self, optimizador):
+        ao, csv = optimizador
+        filas(1, 120, 1).to_csv(csv, index=False)
+        ao.AutoOptimizer().ejecutar_ciclo_completo()
+        np.save(ao.IDS_FILE, np.arange(5))  # ids out of sync with the stats
+
+        opt = ao.AutoOptimizer()
+        opt.ejecutar_ciclo_completo()
+        assert opt.estado['stats']['n'].sum() == 120
+
+    def test_health_metrics(self, optimizador):
+        ao, csv = optimizador
+        filas(1, 100, np.tile([0, 1, 3, 4], 25)).to_csv(csv, index=False)
+        ao.AutoOptimizer().ejecutar_ciclo_completo()
+
+        salud = ao.leer_historial('health_check')[-1]['metricas']['LOTO']
+        assert salud == {'promedio_aciertos': 2.0, 'max_aciertos': 4,
+                         'tasa_exito_3plus': 50.0, 'n_predicciones': 100}
+
+
+class TestDrift:
+    """Sequential CUSUM drift detection over new verdicts."""
+
+    def test_vectorized_cusum_matches_recursion(self):
+        from auto_optimizer import _cusum
+
+        z = np.random.default_rng(3).normal(0.2, 1, 300)
+        pos, neg = _cusum(z, 1.5, 0.7, k=0.5)
+
+        s_pos, s_neg, esperado_pos, esperado_neg = 1.5, 0.7, [], []
+        for x in z:
+            s_pos, s_neg = max(0.0, s_pos + x - 0.5), max(0.0, s_neg - x - 0.5)
+            esperado_pos.append(s_pos)
+            esperado_neg.append(s_neg)
+        np.testing.assert_allclose(pos, esperado_pos)
+        np.testing.assert_allclose(neg, esperado_neg)
+
+    def test_shift_in_new_verdicts_triggers_retraining(self, optimizador):
+        ao, csv = optimizador
+        estable = np.tile([0, 1, 2, 1], 50)
+        filas(1, 200, estable).to_csv(csv, index=False)
+        primero = ao.AutoOptimizer()
+        primero.ejecutar_ciclo_completo()
+        assert not [r for r in primero.recomendaciones if r['tipo'] == 'REENTRENAR']
+
+        pd.concat([filas(1, 200, estable), filas(201, 30, 4)]).to_csv(csv, index=False)
+        opt = ao.AutoOptimizer()
+        opt.ejecutar_ciclo_completo()
+
+        drift = [r for r in opt.recomendaciones if r['tipo'] == 'REENTRENAR']
+        assert [r['juego'] for r in drift] == ['LOTO']
+        assert drift[0]['metrica'] > ao.CUSUM_H
+        assert opt.estado['juegos']['LOTO'] == {'cusum_pos': 0.0, 'cusum_neg': 0.0}
+        assert ao.leer_historial('drift_alert')[-1]['juego'] == 'LOTO'
+
+
+class TestHistorial:
+    """Append-only history and migration of the legacy JSON file."""
+
+    def test_history_is_appended(self, optimizador):
+        ao, csv = optimizador
+        filas(1, 120, 1).to_csv(csv, index=False)
+        ao.AutoOptimizer().ejecutar_ciclo_completo()
+        with open(ao.HISTORIAL_FILE, 'rb') as f:
+            antes = f.read()
+
+        ao.AutoOptimizer().ejecutar_ciclo_completo()
+        with open(ao.HISTORIAL_FILE, 'rb') as f:
+            despues = f.read()
+        assert despues.startswith(antes) and len(despues) > len(antes)
+        assert len(ao.leer_historial('health_check')) == 2
+
+    def test_history_is_capped_per_event_type(self, optimizador, monkeypatch):
+        ao, csv = optimizador
+        monkeypatch.setattr(ao, 'LIMITES_HISTORIAL', {"optimization": 200, "drift_alert": 200, "health_check": 2})
+        filas(1, 120, 1).to_csv(csv, index=False)
+        for _ in range(5):
+            ao.AutoOptimizer().ejecutar_ciclo_completo()
+
+        # Compacted once past twice the limit, appended in between
+        assert len(ao.leer_historial('health_check')) == 2
+        ao.AutoOptimizer().ejecutar_ciclo_completo()
+        assert len(ao.leer_historial('health_check')) == 3
+
+    def test_legacy_history_is_migrated(self, optimizador):
+        ao, _ = optimizador
+        with open(ao.OPTIMIZER_LOG, 'w', encoding='utf-8') as f:
+            json.dump({"optimizations": [{"timestamp": "2026-01-02", "tipo": "PROMOVER"}],
+                       "drift_alerts": [{"timestamp": "2026-01-01", "juego": "LOTO", "z_score": 2.5}],
+                       "health_checks": []}, f)
+
+        eventos = ao.leer_historial()
+        assert [e['evento'] for e in eventos] == ['drift_alert', 'optimization']
+        assert ao.leer_historial('optimization', limite=1)[0]['tipo'] == 'PROMOVER'
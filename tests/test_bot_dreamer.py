@@ -0,0 +1,108 @@
+"""
+Tests for engine/models/bot_dreamer.py
+======================================
+
+Tests the per-game process pool of soñar(): merged single queue write and
+collision-free ID assignment across workers.
+"""
+
+import pytest
+import os
+import sys
+import types
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'tools'))
+
+
+def universo_ligero(game_id, config, ahora, genoma, meta_cerebro, cpus=None):
+    """Cheap stand-in for soñar_universo (no forense/oracle work)."""
+    reservados = [int(ahora.timestamp()) + 100 + k for k in range(5)] if game_id == 'LOTO3' else []
+    filas = [{'juego': game_id, 'numeros': [int(x) for x in np.random.randint(0, 1000, 3)],
+              'algoritmo': f'algo_{k}', 'hora_dia': ahora.hour,
+              'nota_especial': str(sorted(genoma.get('algo_ranking', {}))),
+              'reservados': reservados, 'cpus': cpus} for k in range(3)]
+    return filas, reservados
+
+
+@pytest.fixture
+def dreamer(temp_data_dir, sample_genome_json, monkeypatch):
+    import bot_dreamer
+
+    publicadas = []
+    consolidaciones = []
+
+    class ColaFalsa:
+        def __init__(self, directorio):
+            pass
+
+        def publicar(self, registros):
+            publicadas.append(registros)
+            return len(registros)
+
+    monkeypatch.setattr(bot_dreamer, 'DATA_DIR', str(temp_data_dir))
+    monkeypatch.setattr(bot_dreamer, 'FILE_GENOME', str(sample_genome_json))
+    monkeypatch.setattr(bot_dreamer, 'MetaLearner', None)
+    monkeypatch.setattr(bot_dreamer, 'soñar_universo', universo_ligero)
+    monkeypatch.setattr(bot_dreamer, 'especular_siguiente', lambda: consolidaciones.append('especulacion'))
+    monkeypatch.setitem(sys.modules, 'cola_predicciones', types.SimpleNamespace(ColaPredicciones=ColaFalsa))
+    monkeypatch.setitem(sys.modules, 'consolidar_laboratorio', types.SimpleNamespace(
+        ejecutar_consolidacion_hibrida=lambda: consolidaciones.append(1)))
+    return bot_dreamer, publicadas, consolidaciones
+
+
+class TestSoñarParalelo:
+    """Universes run in a process pool and are merged into one write."""
+
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_single_merged_write(self, dreamer, workers):
+        bot_dreamer, publicadas, consolidaciones = dreamer
+        bot_dreamer.soñar(workers=workers)
+
+        # The LOTO3 speculative table is rebuilt only after publish and consolidation
+        assert len(publicadas) == 1 and consolidaciones == [1, 'especulacion']
+        filas = publicadas[0]
+        assert [f['juego'] for f in filas] == [j for j in bot_dreamer.MULTIVERSO_CONFIG for _ in range(3)]
+        # The read-only genome reached every universe
+        assert {f['nota_especial'] for f in filas} == {str(['LOTO', 'LOTO3'])}
+
+        ids = [f['id'] for f in filas]
+        assert len(set(ids)) == len(ids)
+        assert ids == sorted(ids)
+
+    def test_ids_skip_those_reserved_by_loto3(self, dreamer):
+        bot_dreamer, publicadas, _ = dreamer
+        bot_dreamer.soñar(workers=4)
+
+        filas = publicadas[0]
+        reservados = [i for f in filas for i in f['reservados']]
+        assert reservados
+        assert min(f['id'] for f in filas) == max(reservados) + 1
+
+    def test_pooled_universes_split_the_cpu_budget(self, dreamer, monkeypatch):
+        bot_dreamer, publicadas, _ = dreamer
+        monkeypatch.setattr(bot_dreamer.os, 'cpu_count', lambda: 8)
+        bot_dreamer.soñar(workers=4)
+
+        # LOTO3 trains inside the pool: 2 CPUs each instead of all 8
+        assert {f['cpus'] for f in publicadas[0]} == {2}
+        assert bot_dreamer.cpus_por_universo(16) == 1
+
+    def test_workers_get_independent_random_streams(self, dreamer):
+        bot_dreamer, publicadas, _ = dreamer
+        bot_dreamer.soñar(workers=4)
+
+        por_juego = {}
+        for fila in publicadas[0]:
+            por_juego.setdefault(fila['juego'], []).append(tuple(fila['numeros']))
+        assert len({tuple(v) for v in por_juego.values()}) == len(por_juego)
+
+    def test_assign_ids(self):
+        from bot_dreamer import asignar_ids
+
+        filas = {'RACHA': [{'juego': 'RACHA'}], 'LOTO': [{'juego': 'LOTO'}, {'juego': 'LOTO'}]}
+        assert [f['id'] for f in asignar_ids(filas, 1000)] == [1000, 1001, 1002]
+        assert [f['juego'] for f in asignar_ids(filas, 1000)] == ['LOTO', 'LOTO', 'RACHA']
+        assert [f['id'] for f in asignar_ids(filas, 1000, [999, 1004])] == [1005, 1006, 1007]
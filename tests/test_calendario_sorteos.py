@@ -0,0 +1,168 @@
+"""
+Tests for engine/models/calendario_sorteos.py
+=============================================
+
+Tests the closed-form draw calendar against the slot-by-slot simulation
+it replaced, the CSV tail reader and the vectorized id -> date mapping.
+"""
+
+import pytest
+import os
+import sys
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+
+def legacy_proximo(reglas, cursor_id, cursor_tiempo, ahora):
+    """Simulation loop of the old bot_dreamer.calcular_proximo_sorteo_real (naive dates)"""
+    safety_break = 0
+    while cursor_tiempo <= ahora and safety_break < 1000:
+        safety_break += 1
+        encontrado = False
+        for dias_extra in [0, 1, 2, 3]:
+            check_date = cursor_tiempo.date() + timedelta(days=dias_extra)
+            if check_date.weekday() not in reglas['dias']:
+                continue
+            for hora in sorted(reglas['horas']):
+                candidato = datetime(check_date.year, check_date.month, check_date.day, hora)
+                if candidato > cursor_tiempo:
+                    cursor_tiempo = candidato
+                    cursor_id += 1
+                    encontrado = True
+                    break
+            if encontrado:
+                break
+    return cursor_id, cursor_tiempo
+
+
+def escribir_csv(path, filas):
+    pd.DataFrame(filas).to_csv(path, index=False)
+
+
+class TestCalendario:
+    """Closed-form arithmetic must match the simulation."""
+
+    @pytest.mark.parametrize("game_id", ["LOTO", "LOTO3", "LOTO4", "RACHA"])
+    def test_matches_legacy_simulation(self, game_id):
+        from calendario_sorteos import calendario, HORARIOS
+
+        cal = calendario(game_id)
+        rng = np.random.default_rng(4)
+        base = datetime(2025, 3, 1)
+        for _ in range(60):
+            # Anchors always sit on a scheduled slot, as in the CSVs
+            ancla = cal.fecha_slot(cal.slot_global(base + timedelta(hours=int(rng.integers(0, 2000)))) - 1)
+            ahora = ancla + timedelta(minutes=int(rng.integers(0, 20 * 24 * 60)))
+            assert cal.proximo_sorteo(100, ancla, ahora) == \
+                legacy_proximo(HORARIOS[game_id], 100, ancla, ahora)
+
+    def test_future_anchor_returned_unchanged(self):
+        from calendario_sorteos import calendario
+
+        ancla = datetime(2025, 5, 6, 21)
+        assert calendario('LOTO').proximo_sorteo(7, ancla, ancla - timedelta(hours=3)) == (7, ancla)
+
+    def test_anchor_recorded_with_offset_snaps_to_slot(self):
+        from calendario_sorteos import calendario
+
+        # Draw of 14:00 recorded as 13:00: the next draw is 18:00, not 14:00
+        cal = calendario('LOTO3')
+        assert cal.proximo_sorteo(50, datetime(2025, 1, 10, 13), datetime(2025, 1, 10, 15)) == \
+            (51, datetime(2025, 1, 10, 18))
+
+    def test_fechas_programadas_vectorized(self):
+        from calendario_sorteos import calendario
+
+        cal = calendario('LOTO')
+        ancla = datetime(2025, 1, 2, 21)  # Thursday
+        fechas = cal.fechas_programadas([10, 11, 12, 13, 9], [10], [ancla])
+
+        assert list(fechas.to_pydatetime()) == [
+            ancla, datetime(2025, 1, 5, 21), datetime(2025, 1, 7, 21),
+            datetime(2025, 1, 9, 21), datetime(2024, 12, 31, 21)
+        ]
+
+    def test_fechas_programadas_uses_nearest_previous_anchor(self):
+        from calendario_sorteos import calendario
+
+        cal = calendario('RACHA')
+        # Outage: draw 4 happens a day later than the schedule from draw 1 predicts
+        fechas = cal.fechas_programadas([2, 5], [1, 4],
+                                        [datetime(2025, 1, 1, 15), datetime(2025, 1, 3, 15)])
+        assert list(fechas.to_pydatetime()) == [datetime(2025, 1, 1, 22), datetime(2025, 1, 3, 22)]
+
+
+class TestCsvTail:
+    """Tail reading and the public next-draw helper."""
+
+    def test_reads_only_last_row(self, tmp_path, monkeypatch):
+        import calendario_sorteos as cs
+
+        monkeypatch.setattr(cs, 'BLOQUE_COLA', 16)
+        path = tmp_path / 'LOTO3_MAESTRO.csv'
+        filas = [{'sorteo': 1000 + i, 'fecha': f"2025-02-0{1 + i // 3} {[14, 18, 21][i % 3]}:00:00",
+                  'n1': i % 10, 'n2': 1, 'n3': 2} for i in range(9)]
+        escribir_csv(path, filas)
+
+        fila = cs.leer_ultima_fila(str(path))
+        assert fila['sorteo'] == '1008'
+        assert cs.leer_ancla(str(path)) == (1008, datetime(2025, 2, 3, 21))
+
+    def test_gap_filling_over_outage(self, tmp_path):
+        from calendario_sorteos import calcular_proximo_sorteo, TZ_CHILE
+
+        path = tmp_path / 'LOTO3_MAESTRO.csv'
+        escribir_csv(path, [{'sorteo': 500, 'fecha': '2025-02-01T21:00:00.000'}])
+
+        # Two full days without data: 6 draws missed, next one is the 7th
+        sorteo, fecha = calcular_proximo_sorteo('LOTO3', str(path), ahora=datetime(2025, 2, 3, 22))
+        assert sorteo == 507
+        assert fecha == TZ_CHILE.localize(datetime(2025, 2, 4, 14))
+
+    def test_missing_csv_falls_back_to_zero(self, tmp_path):
+        from calendario_sorteos import calcular_proximo_sorteo
+
+        sorteo, fecha = calcular_proximo_sorteo('LOTO4', str(tmp_path / 'nope.csv'),
+                                                ahora=datetime(2025, 2, 3, 10))
+        assert sorteo == 2  # yesterday 10:00 -> 14:00, 21:00, today 14:00
+        assert fecha.hour == 14
+
+    def test_fechas_sorteos_fills_invalid_dates(self):
+        from calendario_sorteos import fechas_sorteos
+
+        df = pd.DataFrame({'sorteo': [1, 2, 3],
+                           'fecha': ['2025-01-01 14:00:00', 'sin dato', '2025-01-01T21:00:00.000']})
+        fechas = fechas_sorteos('LOTO3', df)
+
+        assert fechas[2] == pd.Timestamp('2025-01-01 18:00:00')
+        assert fechas[3] == pd.Timestamp('2025-01-01 21:00:00')
+
+    def test_fechas_sorteos_keeps_iso_day_and_month(self):
+        from calendario_sorteos import fechas_sorteos, parsear_fecha
+
+        # ISO dates with day <= 12 must not be read day-first
+        valores = ['2016-01-03 21:00:00', '2016-01-05 21:00:00', '07-01-2016 21:00:00']
+        df = pd.DataFrame({'sorteo': [1, 2, 3], 'fecha': valores})
+        fechas = fechas_sorteos('LOTO', df)
+
+        assert fechas[1] == pd.Timestamp('2016-01-03 21:00:00')
+        assert fechas[2] == pd.Timestamp('2016-01-05 21:00:00')
+        assert fechas[3] == pd.Timestamp('2016-01-07 21:00:00')
+        assert [fechas[i] for i in [1, 2, 3]] == [pd.Timestamp(parsear_fecha(v)) for v in valores]
+
+    def test_fechas_sorteos_matches_parsear_fecha_on_loto_history(self):
+        from calendario_sorteos import fechas_sorteos, parsear_fecha
+
+        ruta = os.path.join(os.path.dirname(__file__), '..', 'data', 'LOTO_HISTORIAL_MAESTRO.csv')
+        if not os.path.exists(ruta):
+            pytest.skip("LOTO history not available")
+        df = pd.read_csv(ruta)
+        fechas = fechas_sorteos('LOTO', df)
+        esperadas = df.drop_duplicates('sorteo').set_index('sorteo')['fecha'].map(parsear_fecha)
+
+        validas = esperadas.notna()
+        assert (fechas[esperadas.index[validas]].to_numpy() == pd.to_datetime(esperadas[validas]).to_numpy()).all()
@@ -0,0 +1,225 @@
+"""
+Tests for engine/models/cola_predicciones.py
+============================================
+
+Tests the segmented append-only prediction queue and its use by
+consolidar_cola / consolidar_laboratorio.
+"""
+
+import pytest
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'tools'))
+
+
+def ticket(i, juego='LOTO'):
+    return {
+        'id': 5000 + i,
+        'fecha_generacion': '2024-01-15 10:00:00',
+        'juego': juego,
+        'numeros': [1, 5, 10, 15, 20, 25],
+        'sorteo_objetivo': 3900,
+        'estado': 'PENDIENTE',
+        'aciertos': 0,
+        'score_afinidad': 0.0,
+        'hora_dia': 10,
+        'algoritmo': 'test_consensus',
+    }
+
+
+class TestColaPredicciones:
+    """Producer/consumer behaviour of the segmented log."""
+
+    def test_publish_and_consume_only_new(self, temp_data_dir):
+        from cola_predicciones import ColaPredicciones
+
+        cola = ColaPredicciones(str(temp_data_dir / "queue"))
+        assert cola.publicar([ticket(i) for i in range(3)]) == 3
+
+        registros, posicion = cola.leer_pendientes('consumidor')
+        assert [r['id'] for r in registros] == [5000, 5001, 5002]
+
+        # Reading without confirming does not move the offset
+        assert len(cola.leer_pendientes('consumidor')[0]) == 3
+        cola.confirmar('consumidor', posicion)
+        assert cola.leer_pendientes('consumidor')[0] == []
+
+        cola.publicar([ticket(3)])
+        assert [r['id'] for r in cola.leer_pendientes('consumidor')[0]] == [5003]
+        # Independent consumers keep independent offsets
+        assert len(cola.leer_pendientes('otro')[0]) == 4
+
+    def test_single_file_per_run(self, temp_data_dir):
+        from cola_predicciones import ColaPredicciones
+
+        cola = ColaPredicciones(str(temp_data_dir / "queue"))
+        cola.publicar([ticket(i) for i in range(50)])
+        cola.publicar([ticket(i) for i in range(50, 60)])
+
+        assert cola.segmentos() == [1]
+        assert not any(n.startswith('prediccion_') for n in os.listdir(temp_data_dir / "queue"))
+
+    def test_rotation_writes_checksums(self, temp_data_dir):
+        from cola_predicciones import ColaPredicciones
+
+        cola = ColaPredicciones(str(temp_data_dir / "queue"), max_bytes_segmento=600, lote_fsync=2)
+        cola.publicar([ticket(i) for i in range(10)])
+
+        segmentos = cola.segmentos()
+        assert len(segmentos) > 1
+        manifiesto = cola.manifiesto()
+        assert set(manifiesto) == {str(n) for n in segmentos[:-1]}
+        for numero, info in manifiesto.items():
+            crc, total, lineas = cola._crc_archivo(cola._ruta_segmento(int(numero)))
+            assert (crc, total, lineas) == (info['crc32'], info['bytes'], info['registros'])
+
+        registros, _ = cola.leer_pendientes('c')
+        assert [r['id'] for r in registros] == [5000 + i for i in range(10)]
+
+    def test_torn_write_is_ignored_then_repaired(self, temp_data_dir):
+        from cola_predicciones import ColaPredicciones
+
+        cola = ColaPredicciones(str(temp_data_dir / "queue"))
+        cola.publicar([ticket(0)])
+        with open(cola._ruta_segmento(1), 'ab') as f:
+            f.write(b'{"id": 99, "incomp')
+
+        registros, posicion = cola.leer_pendientes('c')
+        assert [r['id'] for r in registros] == [5000]
+        cola.confirmar('c', posicion)
+
+        cola.publicar([ticket(1)])
+        assert [r['id'] for r in cola.leer_pendientes('c')[0]] == [5001]
+
+    def test_purge_only_fully_consumed_closed_segments(self, temp_data_dir):
+        from cola_predicciones import ColaPredicciones
+
+        cola = ColaPredicciones(str(temp_data_dir / "queue"), max_bytes_segmento=600)
+        cola.publicar([ticket(i) for i in range(10)])
+        antes = cola.segmentos()
+
+        _, posicion = cola.leer_pendientes('c')
+        cola.confirmar('c', posicion)
+        assert cola.purgar_consumidos() == len(antes) - 1
+        assert cola.segmentos() == antes[-1:]
+        assert cola.leer_pendientes('c')[0] == []
+
+
+class TestConsolidarCola:
+    """consolidar() merges queue segments and legacy ticket files."""
+
+    @pytest.fixture
+    def entorno(self, temp_data_dir, monkeypatch):
+        import consolidar_cola
+        import consolidar_laboratorio
+
+        queue_dir = str(temp_data_dir / "queue")
+        csv_file = str(temp_data_dir / "LOTO_SIMULACIONES.csv")
+        monkeypatch.setattr(consolidar_cola, 'QUEUE_DIR', queue_dir)
+        monkeypatch.setattr(consolidar_cola, 'CSV_FILE', csv_file)
+        monkeypatch.setattr(consolidar_cola, 'LOCK_FILE', str(temp_data_dir / ".lock"))
+        monkeypatch.setattr(consolidar_laboratorio, 'QUEUE_DIR', queue_dir)
+        monkeypatch.setattr(consolidar_laboratorio, 'CSV_FILE', csv_file)
+        monkeypatch.setattr(consolidar_laboratorio, 'DASHBOARD_DIR', str(temp_data_dir / "dashboard"))
+        monkeypatch.setattr(consolidar_laboratorio, 'AGREGADOS_DIR', str(temp_data_dir / "agregados"))
+        return consolidar_cola, temp_data_dir
+
+    def test_consolidates_segments_and_legacy_files(self, entorno, sample_queue_files):
+        from cola_predicciones import ColaPredicciones
+        consolidar_cola, data_dir = entorno
+
+        cola = ColaPredicciones(str(data_dir / "queue"))
+        cola.publicar([ticket(i) for i in range(4)])
+        consolidar_cola.consolidar()
+
+        df = pd.read_csv(data_dir / "LOTO_SIMULACIONES.csv")
+        assert sorted(df['id']) == [2000, 2001, 2002, 5000, 5001, 5002, 5003]
+        assert not any(f.exists() for f in sample_queue_files)
+        assert cola.segmentos() == [1]  # segments are kept, offsets move
+        assert cola.leer_pendientes(consolidar_cola.CONSUMIDOR)[0] == []
+
+        # Second run only sees what was published afterwards
+        cola.publicar([ticket(10)])
+        consolidar_cola.consolidar()
+        df = pd.read_csv(data_dir / "LOTO_SIMULACIONES.csv")
+        assert len(df) == 8
+
+    def test_dashboard_includes_unconsolidated_tickets(self, entorno):
+        from cola_predicciones import ColaPredicciones
+        from materializador_dashboard import MaterializadorDashboard
+        import consolidar_laboratorio
+        _, data_dir = entorno
+
+        ColaPredicciones(str(data_dir / "queue")).publicar([ticket(1), ticket(2)])
+        consolidar_laboratorio.ejecutar_consolidacion_hibrida()
+
+        dashboard = MaterializadorDashboard(str(data_dir / "dashboard"))
+        assert [p['id'] for p in dashboard.registros()] == [5001, 5002]
+
+
+class TestStreamingConsolidation:
+    """Append-mode consolidation against the persistent id index."""
+
+    def test_append_matches_full_rewrite(self, temp_data_dir):
+        import consolidar_cola
+
+        csv_file = str(temp_data_dir / "LOTO_SIMULACIONES.csv")
+        pd.DataFrame([ticket(i) for i in range(5)]).to_csv(csv_file, index=False)
+
+        nuevos = [ticket(i) for i in range(3, 8)] + [dict(ticket(7), score_afinidad=9.5)]
+        assert consolidar_cola.anexar_tickets(csv_file, nuevos) == 3
+
+        df = pd.read_csv(csv_file)
+        assert df['id'].tolist() == [5000 + i for i in range(8)]
+        assert df['score_afinidad'].iloc[-1] == 9.5  # last incoming duplicate wins
+        assert consolidar_cola.cargar_indice_ids(csv_file).tolist() == df['id'].tolist()
+
+    def test_index_rebuilt_after_external_rewrite(self, temp_data_dir):
+        import consolidar_cola
+
+        csv_file = str(temp_data_dir / "LOTO_SIMULACIONES.csv")
+        consolidar_cola.anexar_tickets(csv_file, [ticket(0)])
+
+        # Another process (the judge) rewrites the CSV with different rows
+        pd.DataFrame([ticket(i) for i in range(20, 23)]).to_csv(csv_file, index=False)
+        os.utime(csv_file, ns=(1, 1))
+
+        assert consolidar_cola.cargar_indice_ids(csv_file).tolist() == [5020, 5021, 5022]
+        assert consolidar_cola.anexar_tickets(csv_file, [ticket(20), ticket(0)]) == 1
+
+    def test_new_columns_trigger_streaming_copy(self, temp_data_dir, monkeypatch):
+        import consolidar_cola
+
+        monkeypatch.setattr(consolidar_cola, 'CHUNK_SIZE', 2)
+        csv_file = str(temp_data_dir / "LOTO_SIMULACIONES.csv")
+        pd.DataFrame([ticket(i) for i in range(5)]).to_csv(csv_file, index=False)
+
+        consolidar_cola.anexar_tickets(csv_file, [dict(ticket(9), nota_especial='ALTA')])
+
+        df = pd.read_csv(csv_file)
+        assert len(df) == 6
+        assert df.columns[-1] == 'nota_especial'
+        assert df['nota_especial'].isna().sum() == 5 and df['nota_especial'].iloc[-1] == 'ALTA'
+
+    def test_compaction_keeps_last_occurrence(self, temp_data_dir, monkeypatch):
+        import consolidar_cola
+
+        monkeypatch.setattr(consolidar_cola, 'CHUNK_SIZE', 3)
+        monkeypatch.setattr(consolidar_cola, 'LOCK_FILE', str(temp_data_dir / ".lock"))
+        csv_file = str(temp_data_dir / "LOTO_SIMULACIONES.csv")
+        filas = [ticket(i % 4) for i in range(10)]
+        for k, fila in enumerate(filas):
+            fila['aciertos'] = k
+        pd.DataFrame(filas).to_csv(csv_file, index=False)
+
+        assert consolidar_cola.compactar(csv_file) == 6
+
+        df = pd.read_csv(csv_file)
+        esperado = pd.DataFrame(filas).drop_duplicates(subset=['id'], keep='last')
+        assert df['id'].tolist() == esperado['id'].tolist()
+        assert df['aciertos'].tolist() == esperado['aciertos'].tolist()
+        assert consolidar_cola.cargar_indice_ids(csv_file).tolist() == [5000, 5001, 5002, 5003]
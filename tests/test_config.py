@@ -119,7 +119,7 @@ class TestPaths:
 
         expected_keys = [
             'LOTO_MAESTRO', 'LOTO3_MAESTRO', 'LOTO4_MAESTRO',
-            'RACHA_MAESTRO', 'SIMULACIONES', 'GENOMA', 'DASHBOARD'
+            'RACHA_MAESTRO', 'SIMULACIONES', 'GENOMA', 'DASHBOARD_DIR'
         ]
         for key in expected_keys:
             assert key in FILES, f"Missing file path: {key}"
@@ -256,3 +256,80 @@ class TestHourlyRanking:
         # Verify structure
         assert "21" in genome['algo_ranking_hourly']['LOTO']
         assert genome['algo_ranking_hourly']['LOTO']['21']['algo1'] == 55.0
+
+
+class TestVectorizedMorphology:
+    """Tests for the matrix-based morphology learner."""
+
+    def test_parsear_matriz_numeros_sorts_and_flags_invalid(self):
+        """Rows are parsed once, sorted, and invalid strings are flagged."""
+        from entrenador_cognitivo import parsear_matriz_numeros
+
+        serie = pd.Series(["[5, 1, 3]", "no es lista", "[10, 2]", None])
+        matriz, mascara, validos = parsear_matriz_numeros(serie)
+
+        assert validos.tolist() == [True, False, True, False]
+        assert matriz[0].tolist() == [1, 3, 5]
+        assert mascara.tolist() == [[True, True, True], [True, True, False]]
+        assert matriz[1, :2].tolist() == [2, 10]
+
+    def test_metrics_match_row_by_row_definition(self):
+        """Column metrics reproduce the original per-row formulas."""
+        from entrenador_cognitivo import (parsear_matriz_numeros,
+                                          calcular_metricas_morfologicas, PRIMOS_SET)
+
+        jugadas = [[1, 2, 3, 10, 20, 41], [4, 8, 15, 16, 23, 42], [7, 11, 13, 30, 31, 40]]
+        matriz, mascara, _ = parsear_matriz_numeros(pd.Series([str(j) for j in jugadas]))
+        metricas = calcular_metricas_morfologicas(matriz, mascara, "LOTO")
+
+        for i, nums in enumerate(jugadas):
+            assert metricas['sumas'][i] == sum(nums)
+            assert metricas['pares'][i] == len([n for n in nums if n % 2 == 0])
+            assert metricas['cons'][i] == sum(1 for k in range(len(nums)-1) if nums[k+1] == nums[k] + 1)
+            assert metricas['bajos'][i] == len([n for n in nums if n <= 21])
+            assert metricas['terms'][i] == len(set(n % 10 for n in nums))
+            assert metricas['primos'][i] == len([n for n in nums if n in PRIMOS_SET])
+            assert metricas['mult3'][i] == len([n for n in nums if n % 3 == 0])
+            assert metricas['deltas'][i] == pytest.approx(np.mean(np.diff(nums)))
+
+    def test_weighted_percentile_matches_replication(self):
+        """Weighted percentiles equal np.percentile over replicated samples."""
+        from entrenador_cognitivo import percentil_ponderado
+
+        rng = np.random.default_rng(0)
+        valores = rng.integers(20, 200, 300)
+        pesos = rng.integers(1, 7, 300)
+        replicado = np.repeat(valores, pesos)
+
+        for q in [0, 10, 25, 50, 75, 90, 100]:
+            assert percentil_ponderado(valores, pesos, [q])[0] == pytest.approx(np.percentile(replicado, q))
+
+    def test_analizar_adn_ganador_updates_morphology(self, temp_data_dir, monkeypatch):
+        """End-to-end run writes weighted morphology into the genome."""
+        import entrenador_cognitivo
+
+        sims = temp_data_dir / "LOTO_SIMULACIONES.csv"
+        pd.DataFrame({
+            'id': [1, 2, 3],
+            'juego': ['LOTO3'] * 3,
+            'numeros': ['[1, 2, 3]', '[4, 4, 9]', '[0, 5, 9]'],
+            'estado': ['AUDITADO'] * 3,
+            'aciertos': [0, 2, 0],
+            'score_afinidad': [10.0, 50.0, 20.0],
+            'hora_dia': [14, 18, 21],
+            'algoritmo': ['algo1'] * 3,
+        }).to_csv(sims, index=False)
+        genoma_path = temp_data_dir / "loto_genome.json"
+
+        monkeypatch.setattr('entrenador_cognitivo.SIMULACIONES_FILE', str(sims))
+        monkeypatch.setattr('entrenador_cognitivo.GENOMA_FILE', str(genoma_path))
+        monkeypatch.setitem(sys.modules, 'meta_learner', None)
+
+        entrenador_cognitivo.analizar_adn_ganador()
+
+        with open(genoma_path) as f:
+            morph = json.load(f)['morphology']['LOTO3']
+
+        # Sumas 6 (peso 1), 17 (peso 3), 14 (peso 1)
+        assert morph['ideal_even_count'] == pytest.approx(round((1 + 2 * 3 + 1) / 5, 2))
+        assert morph['ideal_avg_delta'] == pytest.approx(round((1 + 2.5 * 3 + 4.5) / 5, 2))
@@ -0,0 +1,79 @@
+"""
+Tests for engine/models/espacio_combinatorio.py
+===============================================
+
+Tests the enumerated LOTO4/RACHA spaces, their on-disk feature cache and
+the vectorized validation/scoring used by the dreamer's consensus.
+"""
+
+import pytest
+import os
+import sys
+import numpy as np
+from math import comb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+MORFOLOGIA = {'ideal_sum_range': [40, 55], 'ideal_even_count': 2, 'ideal_consecutivos': 0, 'ideal_primos': 1}
+
+
+@pytest.fixture
+def espacio(tmp_path):
+    from espacio_combinatorio import EspacioCombinatorio
+
+    return EspacioCombinatorio('LOTO4', ruta_cache=str(tmp_path / 'loto4.npz'))
+
+
+class TestEspacio:
+    """Enumeration and disk cache."""
+
+    def test_enumeration(self, espacio):
+        assert espacio.combinaciones.shape == (comb(23, 4), 4)
+        assert espacio.combinaciones.dtype == np.uint8
+        assert (np.diff(espacio.combinaciones.astype(int), axis=1) > 0).all()
+        assert len({m for m in espacio.rasgos['mascaras'].tolist()}) == len(espacio)
+        assert [bin(m).count('1') for m in espacio.rasgos['mascaras'][:50].tolist()] == [4] * 50
+
+    def test_cache_is_reused(self, espacio, monkeypatch):
+        import espacio_combinatorio
+
+        monkeypatch.setattr(espacio_combinatorio, 'generar_combinaciones',
+                            lambda *a: pytest.fail("cache was not used"))
+        recargado = espacio_combinatorio.EspacioCombinatorio('LOTO4', ruta_cache=espacio.ruta_cache)
+        np.testing.assert_array_equal(recargado.combinaciones, espacio.combinaciones)
+        for clave, valores in espacio.rasgos.items():
+            np.testing.assert_array_equal(recargado.rasgos[clave], valores)
+
+
+class TestConsenso:
+    """Vectorized validation and exact best against per-ticket loops."""
+
+    def test_deviation_matches_validar_cognitivamente(self, espacio):
+        from bot_dreamer import validar_cognitivamente
+
+        genoma = {'morphology': {'LOTO4': MORFOLOGIA}}
+        desviaciones = espacio.desviacion(MORFOLOGIA)
+        for i in np.random.default_rng(0).choice(len(espacio), 400, replace=False):
+            pasa, score, _ = validar_cognitivamente(espacio.numeros(i), genoma, 'LOTO4')
+            assert score == round(desviaciones[i], 2)
+            assert pasa == (desviaciones[i] < 20)
+
+    def test_best_valid_matches_brute_force(self, espacio):
+        rng = np.random.default_rng(1)
+        bolsa = {int(n): float(rng.uniform(0, 5)) for n in rng.choice(np.arange(1, 24), 12, replace=False)}
+        validas = espacio.desviacion(MORFOLOGIA) < 20
+
+        indice = espacio.mejor(espacio.score_consenso(bolsa), validas)
+        esperado = max((i for i in range(len(espacio)) if validas[i]),
+                       key=lambda i: sum(bolsa.get(n, 0) for n in espacio.numeros(i)))
+        assert sum(bolsa.get(n, 0) for n in espacio.numeros(indice)) == \
+            pytest.approx(sum(bolsa.get(n, 0) for n in espacio.numeros(esperado)))
+        assert espacio.mejor(espacio.score_consenso(bolsa), np.zeros(len(espacio), bool)) is None
+
+    def test_sampling_only_returns_valid_tickets(self, espacio):
+        bolsa = {n: 1.0 + n for n in range(1, 24)}
+        validas = espacio.desviacion(MORFOLOGIA) < 20
+        muestras = espacio.muestrear(bolsa, validas, k=200, rng=np.random.default_rng(2))
+        assert len(set(muestras.tolist())) == 200
+        assert validas[muestras].all()
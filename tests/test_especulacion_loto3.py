@@ -0,0 +1,195 @@
+"""
+Tests for engine/models/especulacion_loto3.py
+=============================================
+
+Tests the speculative next-draw table: on a hit the served candidates must
+be exactly what Loto3UltraEnsemble.predecir computes after the real result
+is appended; any deviation (edited history, extra draws, other slot,
+retrained models, uncovered outcome) must fall back with None.
+"""
+
+import pytest
+import os
+import sys
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+
+@pytest.fixture(scope='module')
+def base(tmp_path_factory):
+    """Consecutive LOTO3 history (>100 draws per slot) with trained models and a full table."""
+    import loto3_ultra
+    import especulacion_loto3
+    from calendario_sorteos import calendario
+
+    directorio = tmp_path_factory.mktemp('loto3')
+    ruta_csv = directorio / 'LOTO3_MAESTRO.csv'
+    ruta_modelos = directorio / 'modelos'
+    ruta_modelos.mkdir()
+
+    rng = np.random.default_rng(7)
+    sorteo, fecha = 20000, datetime(2026, 6, 1, 14)
+    filas = []
+    for _ in range(330):
+        n = rng.integers(0, 10, 3)
+        filas.append({'sorteo': sorteo, 'fecha': fecha.strftime('%Y-%m-%d %H:%M:%S'), 'hora': fecha.hour,
+                      'n1': n[0], 'n2': n[1], 'n3': n[2]})
+        sorteo, fecha = calendario('LOTO3').proximo_sorteo(sorteo, fecha, fecha)
+    pd.DataFrame(filas).to_csv(ruta_csv, index=False)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(loto3_ultra, 'RUTA_CSV', str(ruta_csv))
+        mp.setattr(loto3_ultra, 'RUTA_MODELOS', str(ruta_modelos))
+        ensemble = loto3_ultra.Loto3UltraEnsemble()
+        ensemble.entrenar()
+        tabla = especulacion_loto3.especular(ensemble)
+
+    return {'directorio': directorio, 'tabla': tabla, 'sorteo': sorteo, 'fecha': fecha}
+
+
+@pytest.fixture
+def entorno(base, tmp_path, monkeypatch):
+    """Fresh copy of the base CSV, models and table for each test."""
+    import loto3_ultra
+
+    shutil.copytree(base['directorio'], tmp_path, dirs_exist_ok=True)
+    monkeypatch.setattr(loto3_ultra, 'RUTA_CSV', str(tmp_path / 'LOTO3_MAESTRO.csv'))
+    monkeypatch.setattr(loto3_ultra, 'RUTA_MODELOS', str(tmp_path / 'modelos'))
+    # copytree keeps mtimes, so the table's model fingerprint still matches
+    return {**base, 'ruta_csv': tmp_path / 'LOTO3_MAESTRO.csv', 'ruta_modelos': tmp_path / 'modelos'}
+
+
+def agregar_sorteo(entorno, digitos, sorteo=None, fecha=None):
+    sorteo = entorno['sorteo'] if sorteo is None else sorteo
+    fecha = fecha or entorno['fecha']
+    with open(entorno['ruta_csv'], 'a') as f:
+        f.write(f"{sorteo},{fecha:%Y-%m-%d %H:%M:%S},{fecha.hour},{digitos[0]},{digitos[1]},{digitos[2]}\n")
+
+
+class TestConstruirTabla:
+    """Table covers the pending draw and is tied to the base CSV and models."""
+
+    def test_table_covers_all_outcomes_of_pending_draw(self, base):
+        tabla = base['tabla']
+        assert tabla['sorteo'] == base['sorteo'] and tabla['fecha'] == base['fecha']
+        assert len(tabla['candidatos']) == 1000
+        assert tabla['columnas_fijas'] == {'hora': base['fecha'].hour}
+        assert all(len(c) == 10 for c in tabla['candidatos'].values())
+
+    def test_incremental_row_mismatch_aborts(self, entorno, monkeypatch):
+        import loto3_ultra
+        import especulacion_loto3
+
+        # A wrong per-outcome feature must be caught by the FeatureEngineer controls
+        monkeypatch.setitem(especulacion_loto3.RASGOS, 'suma_digitos', especulacion_loto3.RASGOS['suma_digitos'] + 1)
+        assert especulacion_loto3.construir_tabla(loto3_ultra.Loto3UltraEnsemble()) is None
+
+    def test_up_to_date_table_is_not_rebuilt(self, entorno, monkeypatch):
+        import loto3_ultra
+        import especulacion_loto3
+
+        def prohibido(*args, **kwargs):
+            raise AssertionError("table rebuilt for unchanged CSV and models")
+        monkeypatch.setattr(especulacion_loto3, 'construir_tabla', prohibido)
+
+        assert especulacion_loto3.especular(loto3_ultra.Loto3UltraEnsemble()) is not None
+
+
+class TestServir:
+    """Hits equal the normal computation; everything else falls back."""
+
+    @pytest.mark.parametrize('digitos', [(4, 0, 7), (9, 9, 1)])
+    def test_hit_matches_normal_prediction(self, entorno, digitos):
+        import loto3_ultra
+        import especulacion_loto3
+
+        agregar_sorteo(entorno, digitos)
+        franja = entorno['tabla']['franja_objetivo']
+
+        servidas = especulacion_loto3.servir(loto3_ultra.Loto3UltraEnsemble(), franja)
+        normales = loto3_ultra.Loto3UltraEnsemble().predecir(franja=franja, n_candidatos=10)
+        assert servidas is not None
+        assert servidas == normales
+
+    def test_fewer_candidates_are_a_prefix(self, entorno):
+        import loto3_ultra
+        import especulacion_loto3
+
+        agregar_sorteo(entorno, (1, 2, 3))
+        franja = entorno['tabla']['franja_objetivo']
+        ensemble = loto3_ultra.Loto3UltraEnsemble()
+        assert especulacion_loto3.servir(ensemble, franja, n_candidatos=3) == \
+            especulacion_loto3.servir(ensemble, franja)[:3]
+
+    def test_uncovered_outcome_falls_back(self, entorno):
+        import loto3_ultra
+        import especulacion_loto3
+
+        tabla = especulacion_loto3.construir_tabla(loto3_ultra.Loto3UltraEnsemble(), cobertura=5)
+        especulacion_loto3.guardar_tabla(tabla)
+        cubierto = next(iter(tabla['candidatos']))
+        fuera = next(i for i in range(1000) if i not in tabla['candidatos'])
+
+        agregar_sorteo(entorno, especulacion_loto3._DIGITOS[fuera])
+        assert especulacion_loto3.servir(loto3_ultra.Loto3UltraEnsemble(), tabla['franja_objetivo']) is None
+
+        shutil.copy(entorno['directorio'] / 'LOTO3_MAESTRO.csv', entorno['ruta_csv'])
+        agregar_sorteo(entorno, especulacion_loto3._DIGITOS[cubierto])
+        assert especulacion_loto3.servir(loto3_ultra.Loto3UltraEnsemble(), tabla['franja_objetivo']) is not None
+
+    def test_wrong_slot_or_draw_falls_back(self, entorno):
+        import loto3_ultra
+        import especulacion_loto3
+
+        ensemble = loto3_ultra.Loto3UltraEnsemble()
+        franja = entorno['tabla']['franja_objetivo']
+        otra = next(f for f in ['DIA', 'TARDE', 'NOCHE'] if f != franja)
+
+        agregar_sorteo(entorno, (4, 0, 7), sorteo=entorno['sorteo'] + 1)
+        assert especulacion_loto3.servir(ensemble, franja) is None
+
+        shutil.copy(entorno['directorio'] / 'LOTO3_MAESTRO.csv', entorno['ruta_csv'])
+        agregar_sorteo(entorno, (4, 0, 7))
+        assert especulacion_loto3.servir(ensemble, otra) is None
+        assert especulacion_loto3.servir(ensemble, franja) is not None
+
+    def test_edited_history_or_extra_draws_fall_back(self, entorno):
+        import loto3_ultra
+        import especulacion_loto3
+
+        ensemble = loto3_ultra.Loto3UltraEnsemble()
+        franja = entorno['tabla']['franja_objetivo']
+
+        # No new draw yet
+        assert especulacion_loto3.servir(ensemble, franja) is None
+
+        # Two new draws
+        agregar_sorteo(entorno, (4, 0, 7))
+        agregar_sorteo(entorno, (1, 1, 1), sorteo=entorno['sorteo'] + 1)
+        assert especulacion_loto3.servir(ensemble, franja) is None
+
+        # Base history edited in place
+        texto = (entorno['directorio'] / 'LOTO3_MAESTRO.csv').read_text().splitlines()
+        campos = texto[5].split(',')
+        campos[-1] = str((int(campos[-1]) + 1) % 10)
+        texto[5] = ','.join(campos)
+        entorno['ruta_csv'].write_text('\n'.join(texto) + '\n')
+        agregar_sorteo(entorno, (4, 0, 7))
+        assert especulacion_loto3.servir(ensemble, franja) is None
+
+    def test_retrained_models_fall_back(self, entorno):
+        import loto3_ultra
+        import especulacion_loto3
+
+        agregar_sorteo(entorno, (4, 0, 7))
+        markov = entorno['ruta_modelos'] / 'markov.pkl'
+        os.utime(markov, ns=(markov.stat().st_atime_ns, markov.stat().st_mtime_ns + 10**9))
+
+        assert especulacion_loto3.servir(loto3_ultra.Loto3UltraEnsemble(),
+                                         entorno['tabla']['franja_objetivo']) is None
@@ -0,0 +1,141 @@
+"""
+Tests for engine/models/exportador_agregados.py
+===============================================
+
+Tests the precomputed front-end data products and their content-hashed
+publication in agregados/.
+"""
+
+import pytest
+import os
+import sys
+import json
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+
+def simulacion(i, juego='LOTO', objetivo=3850, estado='AUDITADO', aciertos=1, algoritmo='markov_chain_v1'):
+    return {
+        'id': 9000 + i,
+        'fecha_generacion': '2024-02-01 10:00:00',
+        'juego': juego,
+        'numeros': '[1, 5, 10, 15, 20, 25]',
+        'sorteo_objetivo': objetivo,
+        'estado': estado,
+        'aciertos': aciertos,
+        'score_afinidad': 10.0 * aciertos,
+        'hora_dia': 10,
+        'algoritmo': algoritmo,
+        'nota_especial': '',
+        'fecha_lanzamiento': '03/02/2024 21:00',
+        'modalidad': '',
+    }
+
+
+@pytest.fixture
+def datos(temp_data_dir, sample_loto_csv):
+    filas = [simulacion(0), simulacion(1, aciertos=3), simulacion(2, objetivo=3860, aciertos=0),
+             simulacion(3, estado='PENDIENTE', objetivo=3900),
+             simulacion(4, juego='LOTO3', objetivo=120, algoritmo='oraculo_neural_v4')]
+    pd.DataFrame(filas).to_csv(temp_data_dir / "LOTO_SIMULACIONES.csv", index=False)
+    return temp_data_dir
+
+
+class TestProductos:
+    """Product contents match what the browser used to derive from the CSVs."""
+
+    def test_simulations_round_trip(self, datos):
+        from exportador_agregados import generar_productos, _decodificar
+
+        sims = generar_productos(str(datos))['simulaciones']
+        assert sims['filas'] == 5
+        assert sims['id'] == [9000, 9001, 9002, 9003, 9004]
+        assert _decodificar(sims['juego']) == ['LOTO'] * 4 + ['LOTO3']
+        assert _decodificar(sims['objetivo']) == ['3850', '3850', '3860', '3900', '120']
+        assert sims['numeros'][0] == '[1, 5, 10, 15, 20, 25]'
+        assert sims['aciertos'] == [1, 3, 0, 1, 1]
+
+    def test_statistics(self, datos):
+        from exportador_agregados import generar_productos
+
+        stats = generar_productos(str(datos))['estadisticas']
+        assert stats['total_auditados'] == 4
+        loto = stats['juegos']['LOTO']
+        assert loto['histograma_aciertos'] == {'1': 1, '3': 1, '0': 1}
+        assert loto['algoritmos']['markov_chain_v1']['max_aciertos'] == 3
+        assert loto['evolucion']['markov'] == [[3850, 20.0], [3860, 0.0]]
+        assert list(stats['juegos']['LOTO3']['evolucion']) == ['oraculo_neural_v4']
+
+    def test_master_window_starts_at_first_referenced_draw(self, datos):
+        from exportador_agregados import generar_productos
+
+        maestro = generar_productos(str(datos))['maestro_loto']
+        assert maestro['sorteos'][0] == '3850'
+        assert maestro['sorteos'][-1] == '3899'
+
+        df = pd.read_csv(datos / "LOTO_HISTORIAL_MAESTRO.csv")
+        fila = df[df['sorteo'] == 3850].iloc[0]
+        assert maestro['numeros'][0] == [int(fila[f'LOTO_n{i}']) for i in range(1, 7)]
+        assert maestro['comodin'][0] == int(fila['LOTO_comodin'])
+        assert maestro['ganadores']['LOTO'][0] == 0  # column missing in the sample -> 0
+
+    def test_past_combinations_and_heatmap(self, datos):
+        from exportador_agregados import generar_productos
+
+        productos = generar_productos(str(datos))
+        df = pd.read_csv(datos / "LOTO_HISTORIAL_MAESTRO.csv")
+        esperadas = {'-'.join(str(n) for n in sorted(fila)) for fila in
+                     df[[f'LOTO_n{i}' for i in range(1, 7)]].itertuples(index=False)}
+        assert set(productos['combinaciones_loto']) == esperadas
+
+        mecanica = productos['mecanica_loto']
+        assert mecanica['sorteos'] == 100
+        assert all(sum(fila) == 100 for fila in mecanica['conteos'])
+        assert mecanica['conteos'][0][int(df['LOTO_n1'].iloc[0]) - 1] >= 1
+
+    def test_recent_history_window(self, datos):
+        from exportador_agregados import generar_productos
+
+        productos = generar_productos(str(datos))
+        reciente = productos['historial_loto_reciente']
+        assert reciente['total'] == 100  # sample has exactly 100 draws
+        assert reciente['columnas'][:2] == ['sorteo', 'fecha']
+        assert reciente['filas'][-1][0] == 3899
+
+
+class TestExportar:
+    """Content-hashed files and the index."""
+
+    def test_unchanged_data_keeps_file_names(self, datos, tmp_path):
+        from exportador_agregados import exportar
+
+        destino = str(tmp_path / "agregados")
+        primero = exportar(str(datos), destino)
+        mtimes = {n: os.stat(os.path.join(destino, p['archivo'])).st_mtime_ns
+                  for n, p in primero['productos'].items()}
+        segundo = exportar(str(datos), destino)
+
+        assert {n: p['archivo'] for n, p in segundo['productos'].items()} == \
+            {n: p['archivo'] for n, p in primero['productos'].items()}
+        assert all(os.stat(os.path.join(destino, p['archivo'])).st_mtime_ns == mtimes[n]
+                   for n, p in segundo['productos'].items())
+        with open(os.path.join(destino, 'index.json'), encoding='utf-8') as f:
+            assert json.load(f)['productos'] == segundo['productos']
+
+    def test_changed_data_new_hash_and_cleanup(self, datos, tmp_path):
+        from exportador_agregados import exportar
+
+        destino = str(tmp_path / "agregados")
+        csv_sims = datos / "LOTO_SIMULACIONES.csv"
+        archivos = []
+        for extra in range(3):
+            pd.DataFrame([simulacion(i) for i in range(extra + 1)]).to_csv(csv_sims, index=False)
+            archivos.append(exportar(str(datos), destino)['productos']['simulaciones']['archivo'])
+
+        assert len(set(archivos)) == 3
+        presentes = os.listdir(destino)
+        # Current and previous generation stay, older ones are removed
+        assert archivos[2] in presentes and archivos[1] in presentes
+        assert archivos[0] not in presentes
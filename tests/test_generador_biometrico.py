@@ -0,0 +1,193 @@
+"""
+Tests for engine/models/generador_biometrico.py
+===============================================
+
+Tests the vectorized/incremental biometrics generator against the
+original iterrows implementation and the compact/pretty output modes.
+"""
+
+import pytest
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+
+# ==============================================================================
+# Reference implementation (copied from the pre-refactor code)
+# ==============================================================================
+
+def legacy_procesar_juego(df, game_name, positions_dict, rangos):
+    min_num, max_num = rangos.get(game_name, (1, 41))
+    game_data = {"source_type": "MECHANICAL", "positions": {}}
+
+    sorted_pos = sorted(positions_dict.keys())
+    for pos in sorted_pos:
+        col = positions_dict[pos]
+
+        def safe_convert(x):
+            try:
+                val = int(float(x))
+                return val if val >= min_num else None
+            except (ValueError, TypeError):
+                return None
+        counts_raw = df[col].dropna().apply(safe_convert).dropna().value_counts().to_dict()
+
+        counts_smooth = {num: counts_raw.get(num, 0) + 1 for num in range(min_num, max_num + 1)}
+        total = sum(counts_smooth.values())
+        game_data["positions"][str(pos)] = {
+            "col_name": col,
+            "counts": {str(k): v for k, v in counts_smooth.items()},
+            "weights": {str(k): round(v / total, 6) for k, v in counts_smooth.items()},
+        }
+
+    if len(sorted_pos) > 1:
+        correlations = {"parity": {}, "ending": {}}
+        for i in range(len(sorted_pos) - 1):
+            c, n = positions_dict[sorted_pos[i]], positions_dict[sorted_pos[i + 1]]
+            clave = f"{sorted_pos[i]}->{sorted_pos[i + 1]}"
+            pairs = df[[c, n]].dropna()
+
+            parity = {"even_even": 0, "even_odd": 0, "odd_even": 0, "odd_odd": 0}
+            ending = {str(d): {str(k): 0 for k in range(10)} for d in range(10)}
+            for _, row in pairs.iterrows():
+                val_c, val_n = int(row[c]), int(row[n])
+                nombre = ("even" if val_c % 2 == 0 else "odd") + "_" + ("even" if val_n % 2 == 0 else "odd")
+                parity[nombre] += 1
+                ending[str(val_c % 10)][str(val_n % 10)] += 1
+
+            total_pairs = sum(parity.values())
+            if total_pairs > 0:
+                correlations["parity"][clave] = {k: round(v / total_pairs, 4) for k, v in parity.items()}
+            correlations["ending"][clave] = {}
+            for d, fila in ending.items():
+                total_starts = sum(fila.values())
+                if total_starts > 0:
+                    correlations["ending"][clave][d] = {
+                        k: round(v / total_starts, 4) for k, v in fila.items() if v > 0
+                    }
+        game_data["correlations"] = correlations
+    return game_data
+
+
+def sin_estado(game_data):
+    return {k: v for k, v in game_data.items() if k != "state"}
+
+
+@pytest.fixture
+def racha_df():
+    rng = np.random.default_rng(21)
+    filas = []
+    for sorteo in range(1, 121):
+        nums = sorted(rng.choice(np.arange(1, 21), 10, replace=False))
+        fila = {'sorteo': sorteo}
+        fila.update({f"n{k+1}": int(v) for k, v in enumerate(nums)})
+        filas.append(fila)
+    df = pd.DataFrame(filas).astype({'n3': float})
+    df.loc[5, 'n3'] = np.nan  # incomplete draw
+    return df
+
+
+@pytest.fixture
+def biometria_env(tmp_path, monkeypatch, racha_df):
+    import generador_biometrico as gb
+
+    loto = pd.DataFrame({
+        'sorteo': range(1, 41),
+        'LOTO_n1': np.arange(40) % 41 + 1,
+        'LOTO_n2': (np.arange(40) * 7) % 41 + 1,
+        'REVANCHA_n1': (np.arange(40) * 3) % 41 + 1,
+        'REVANCHA_n2': (np.arange(40) * 5) % 41 + 1,
+    })
+    loto.to_csv(tmp_path / 'LOTO_HISTORIAL_MAESTRO.csv', index=False)
+    racha_df.to_csv(tmp_path / 'RACHA_MAESTRO.csv', index=False)
+
+    monkeypatch.setattr(gb, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(gb, 'OUTPUT_FILE', str(tmp_path / 'loto_biometrics.json'))
+    return gb, tmp_path
+
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+class TestCalcularJuego:
+    """Per-game statistics must match the original implementation."""
+
+    def test_matches_legacy(self, racha_df):
+        from generador_biometrico import _calcular_juego, RANGOS_JUEGO
+
+        positions = {i: f"n{i}" for i in range(1, 11)}
+        resultado = _calcular_juego(racha_df, 'RACHA', positions)
+
+        assert sin_estado(resultado) == legacy_procesar_juego(racha_df, 'RACHA', positions, RANGOS_JUEGO)
+
+    def test_incremental_matches_full(self, racha_df):
+        from generador_biometrico import _calcular_juego
+
+        positions = {i: f"n{i}" for i in range(1, 11)}
+        parcial = _calcular_juego(racha_df.iloc[:80], 'RACHA', positions)
+        parcial = json.loads(json.dumps(parcial))  # as read back from disk
+
+        incremental = _calcular_juego(racha_df, 'RACHA', positions, parcial)
+        completo = _calcular_juego(racha_df, 'RACHA', positions)
+
+        assert incremental == completo
+
+    def test_rewritten_history_forces_full_recompute(self, racha_df):
+        from generador_biometrico import _calcular_juego
+
+        positions = {i: f"n{i}" for i in range(1, 11)}
+        parcial = json.loads(json.dumps(_calcular_juego(racha_df.iloc[:80], 'RACHA', positions)))
+
+        reescrito = racha_df.copy()
+        reescrito['sorteo'] = reescrito['sorteo'] + 1000
+        resultado = _calcular_juego(reescrito, 'RACHA', positions, parcial)
+
+        assert resultado == _calcular_juego(reescrito, 'RACHA', positions)
+
+
+class TestGenerarBiometria:
+    """End-to-end generation: parallel sub-games and output formats."""
+
+    def test_compact_output_by_default(self, biometria_env):
+        gb, tmp_path = biometria_env
+        gb.generar_biometria()
+
+        texto = (tmp_path / 'loto_biometrics.json').read_text(encoding='utf-8')
+        assert '\n' not in texto
+        data = json.loads(texto)
+        assert list(data['games'].keys()) == ['LOTO', 'REVANCHA', 'RACHA']
+        assert data['metadata']['total_sorteos_analizados'] == 160
+
+    def test_pretty_output_same_content(self, biometria_env):
+        gb, tmp_path = biometria_env
+        salida = tmp_path / 'loto_biometrics.json'
+
+        gb.generar_biometria(incremental=False)
+        compacto = json.loads(salida.read_text(encoding='utf-8'))
+        gb.generar_biometria(pretty=True, incremental=False)
+        texto = salida.read_text(encoding='utf-8')
+
+        assert '\n  "metadata"' in texto
+        assert json.loads(texto)['games'] == compacto['games']
+
+    def test_appended_draws_processed_incrementally(self, biometria_env, racha_df):
+        gb, tmp_path = biometria_env
+        salida = tmp_path / 'loto_biometrics.json'
+
+        racha_df.iloc[:100].to_csv(tmp_path / 'RACHA_MAESTRO.csv', index=False)
+        gb.generar_biometria()
+        racha_df.to_csv(tmp_path / 'RACHA_MAESTRO.csv', index=False)
+        gb.generar_biometria()
+        incremental = json.loads(salida.read_text(encoding='utf-8'))
+
+        gb.generar_biometria(incremental=False)
+        completo = json.loads(salida.read_text(encoding='utf-8'))
+
+        assert incremental['games'] == completo['games']
+        assert incremental['games']['RACHA']['state']['rows'] == len(racha_df)
@@ -0,0 +1,128 @@
+"""
+Tests for engine/models/genoma_store.py
+=======================================
+
+Tests cached reads, atomic partial updates and batched reconstruction
+checkpoints of the genome store.
+"""
+
+import pytest
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+
+def leer_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class TestGenomaStore:
+    """Reads, cache and partial updates."""
+
+    def test_missing_file_reads_empty(self, tmp_path):
+        from genoma_store import GenomaStore
+
+        store = GenomaStore(str(tmp_path / 'genome.json'))
+        assert store.leer() == {}
+        assert store.checkpoint('LOTO') == 0
+
+    def test_partial_update_keeps_other_sections(self, sample_genome_json):
+        from genoma_store import GenomaStore
+
+        antes = leer_json(sample_genome_json)
+        store = GenomaStore(str(sample_genome_json))
+        store.actualizar({"algo_ranking": {"LOTO": {"test_algo_v1": 70.0}}, "last_processed": {"LOTO": 3900}})
+
+        despues = leer_json(sample_genome_json)
+        assert despues["algo_ranking"]["LOTO"]["test_algo_v1"] == 70.0
+        assert despues["algo_ranking"]["LOTO"]["oraculo_neural_v3"] == antes["algo_ranking"]["LOTO"]["oraculo_neural_v3"]
+        assert despues["morphology"] == antes["morphology"]
+        assert store.checkpoint('LOTO') == 3900
+        assert store.ranking('LOTO')["test_algo_v1"] == 70.0
+        assert not [n for n in os.listdir(sample_genome_json.parent) if n.endswith('.json') and n != 'loto_genome.json']
+
+    def test_reads_are_cached_until_file_changes(self, sample_genome_json, monkeypatch):
+        import genoma_store
+
+        lecturas = []
+        json_load = json.load
+        monkeypatch.setattr(genoma_store.json, 'load', lambda f: lecturas.append(1) or json_load(f))
+        store = genoma_store.GenomaStore(str(sample_genome_json))
+
+        store.leer()
+        store.leer()
+        store.morfologia('LOTO')
+        assert len(lecturas) == 1
+
+        # The store's own writes refresh the cache without re-parsing
+        store.actualizar({"metadata": {"nota": "x"}})
+        assert store.leer()["metadata"]["nota"] == "x"
+        assert len(lecturas) == 1
+
+        # External writers are detected by mtime/size
+        data = leer_json(sample_genome_json)
+        data["metadata"]["nota"] = "externa"
+        with open(sample_genome_json, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        assert store.leer()["metadata"]["nota"] == "externa"
+
+    def test_returned_copies_do_not_leak_into_cache(self, sample_genome_json):
+        from genoma_store import GenomaStore
+
+        store = GenomaStore(str(sample_genome_json))
+        store.leer()["algo_ranking"]["LOTO"]["test_algo_v1"] = -1
+        assert store.leer()["algo_ranking"]["LOTO"]["test_algo_v1"] != -1
+
+    def test_corrupted_file_raises_on_read(self, tmp_path):
+        from genoma_store import GenomaStore
+
+        path = tmp_path / 'genome.json'
+        path.write_text("{invalid json")
+        with pytest.raises(json.JSONDecodeError):
+            GenomaStore(str(path)).leer()
+
+
+class TestCheckpoints:
+    """Batched reconstruction checkpoints."""
+
+    def test_checkpoints_flush_every_n(self, sample_genome_json):
+        from genoma_store import GenomaStore
+
+        store = GenomaStore(str(sample_genome_json))
+        with store.checkpoints(cada=3) as registro:
+            for sorteo in range(101, 106):
+                registro.marcar('LOTO3', sorteo)
+                if sorteo == 102:
+                    assert 'last_processed' not in leer_json(sample_genome_json)
+                assert registro.ultimo('LOTO3') == sorteo
+            assert leer_json(sample_genome_json)['last_processed']['LOTO3'] == 103
+        assert leer_json(sample_genome_json)['last_processed']['LOTO3'] == 105
+
+    def test_checkpoints_flushed_on_error(self, sample_genome_json):
+        from genoma_store import GenomaStore
+
+        store = GenomaStore(str(sample_genome_json))
+        with pytest.raises(RuntimeError):
+            with store.checkpoints(cada=100) as registro:
+                registro.marcar('RACHA', 7)
+                raise RuntimeError("caida")
+        assert store.checkpoint('RACHA') == 7
+
+    def test_trainer_save_does_not_drop_checkpoints(self, sample_genome_json, monkeypatch):
+        import entrenador_cognitivo
+        from genoma_store import GenomaStore
+
+        monkeypatch.setattr(entrenador_cognitivo, 'GENOMA_FILE', str(sample_genome_json))
+        store = GenomaStore(str(sample_genome_json))
+        genoma = entrenador_cognitivo.cargar_genoma()
+        store.actualizar({"last_processed": {"LOTO": 3950}})
+
+        # The trainer writes only the sections it learns
+        genoma["algo_ranking"]["LOTO"]["test_algo_v1"] = 99.0
+        store.actualizar({"algo_ranking": genoma["algo_ranking"], "metadata": genoma["metadata"]})
+        assert store.checkpoint('LOTO') == 3950
+        assert store.ranking('LOTO')["test_algo_v1"] == 99.0
@@ -79,6 +79,17 @@ class TestCalcularAfinidad:
         # 2/3 correct
         assert 40 <= score <= 80
 
+    def test_calcular_afinidad_loto3_residual_counts_repeated_digits(self):
+        """Out-of-position digit hits are a multiset intersection."""
+        from juez_implacable import calcular_afinidad
+
+        realidad = {"numeros": [3, 1, 1], "comodin": None}
+
+        # Middle digit in place (+3) and two shared digits {1, 1} (+2)
+        assert calcular_afinidad([1, 1, 2], realidad, "LOTO3") == 5.0
+        # Only one 5 in common despite three predicted
+        assert calcular_afinidad([5, 5, 5], {"numeros": [5, 0, 0], "comodin": None}, "LOTO3") == 4.0
+
     def test_calcular_afinidad_empty_prediction(self):
         """Test with empty prediction."""
         from juez_implacable import calcular_afinidad
@@ -143,6 +154,19 @@ class TestCargarMaestros:
             assert 'numeros' in first_value
             assert isinstance(first_value['numeros'], list)
 
+    def test_cargar_maestros_stores_bitmask(self, sample_loto_csv, temp_data_dir, monkeypatch):
+        """Each draw keeps its uint64-compatible bitmask for popcount hit counting."""
+        from juez_implacable import cargar_maestros, calcular_afinidad
+        from mascaras_sorteo import decodificar
+
+        monkeypatch.setattr('juez_implacable.DATA_DIR', str(temp_data_dir))
+
+        for sorteo in cargar_maestros()['LOTO'].values():
+            assert decodificar(sorteo['mascara']) == sorted(sorteo['numeros'])
+            sin_mascara = {k: v for k, v in sorteo.items() if k != 'mascara'}
+            pred = sorteo['numeros'][:4] + [40, 41]
+            assert calcular_afinidad(pred, sorteo, 'LOTO') == calcular_afinidad(pred, sin_mascara, 'LOTO')
+
 
 class TestAciertosCounting:
     """Tests for counting correct predictions."""
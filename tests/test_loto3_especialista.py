@@ -0,0 +1,107 @@
+"""
+Tests for engine/models/loto3_especialista.py
+=============================================
+
+Tests that the specialist derives pair/termination codes once as integer
+arrays and matches the original row-by-row history extraction.
+"""
+
+import pytest
+import os
+import sys
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+
+# ==============================================================================
+# Reference implementations (copied from the pre-refactor code)
+# ==============================================================================
+
+def legacy_frecuencias_pares(df, window=50):
+    freq_inicial, freq_final = Counter(), Counter()
+    for _, row in df.tail(window).iterrows():
+        n1, n2, n3 = int(row['n1']), int(row['n2']), int(row['n3'])
+        freq_inicial[f"{n1}{n2}"] += 1
+        freq_final[f"{n2}{n3}"] += 1
+    total_ini, total_fin = sum(freq_inicial.values()), sum(freq_final.values())
+    return ({f"{i:02d}": (freq_inicial.get(f"{i:02d}", 0) + 1) / (total_ini + 100) for i in range(100)},
+            {f"{i:02d}": (freq_final.get(f"{i:02d}", 0) + 1) / (total_fin + 100) for i in range(100)})
+
+
+def legacy_frecuencias_terminacion(df, franja, window=50):
+    freq = Counter(df[df['franja'] == franja].tail(window)['n3'].astype(int))
+    total = sum(freq.values())
+    return {i: (freq.get(i, 0) + 1) / (total + 10) for i in range(10)}
+
+
+@pytest.fixture
+def especialista():
+    from loto3_especialista import Loto3Especialista
+
+    rng = np.random.default_rng(0)
+    n = 600
+    df = pd.DataFrame({'sorteo': np.arange(n), 'franja': np.tile(['DIA', 'TARDE', 'NOCHE'], n // 3)})
+    for col in ['n1', 'n2', 'n3']:
+        df[col] = rng.integers(0, 10, n)
+
+    e = Loto3Especialista()
+    e.df = df
+    e.markov_pares.entrenar(df)
+    e.markov_terminacion.entrenar(df)
+    e.trained = True
+    return e
+
+
+class TestCodificacion:
+    """Integer codes and bincount windows."""
+
+    def test_codes(self, especialista):
+        from loto3_especialista import codificar_historial
+
+        codigos = codificar_historial(especialista.df)
+        df = especialista.df
+        assert codigos['par_inicial'].tolist() == [int(f"{a}{b}") for a, b in zip(df['n1'], df['n2'])]
+        assert codigos['par_final'].tolist() == [int(f"{b}{c}") for b, c in zip(df['n2'], df['n3'])]
+        assert codigos['terminacion'].tolist() == df['n3'].tolist()
+
+    def test_codes_cached_per_dataframe(self, especialista):
+        primero = especialista._codigos()
+        assert especialista._codigos() is primero
+        especialista.df = especialista.df.iloc[:-1]
+        assert len(especialista._codigos()['par_inicial']) == len(primero['par_inicial']) - 1
+
+    @pytest.mark.parametrize("window", [1, 50, 1000])
+    def test_frequencies_match_legacy(self, especialista, window):
+        ini, fin = especialista._calcular_frecuencias_pares(window)
+        legacy_ini, legacy_fin = legacy_frecuencias_pares(especialista.df, window)
+        assert ini.tolist() == list(legacy_ini.values())
+        assert fin.tolist() == list(legacy_fin.values())
+
+        for franja in ['DIA', 'TARDE', 'NOCHE', 'OTRA']:
+            assert especialista._calcular_frecuencias_terminacion(franja, window).tolist() == \
+                list(legacy_frecuencias_terminacion(especialista.df, franja, window).values())
+
+
+class TestPredecir:
+    """Prediction works on arrays only."""
+
+    def test_no_row_iteration(self, especialista, monkeypatch):
+        monkeypatch.setattr(pd.DataFrame, 'iterrows', lambda self: pytest.fail("iterrows used"))
+        resultado = especialista.predecir(franja='NOCHE', n_pares=100, n_terminaciones=10)
+
+        for clave in ['pares_inicial', 'pares_final']:
+            pares = resultado[clave]
+            assert sorted(p['par'] for p in pares) == [f"{i:02d}" for i in range(100)]
+            assert [p['score'] for p in pares] == sorted((p['score'] for p in pares), reverse=True)
+        assert sorted(t['digito'] for t in resultado['terminaciones']) == list(range(10))
+
+    def test_markov_uses_last_twenty_pairs(self, especialista):
+        resultado = especialista.predecir(franja='DIA', n_pares=1)
+        historia = [f"{a}{b}" for a, b in zip(especialista.df['n1'].tail(20), especialista.df['n2'].tail(20))]
+        probs = especialista.markov_pares.predecir_vector('inicial', historia) * 0.40 + \
+            especialista._calcular_frecuencias_pares()[0] * 0.25
+        assert resultado['pares_inicial'][0]['par'] == f"{int(np.argmax(probs)):02d}"
@@ -0,0 +1,89 @@
+"""
+Tests for engine/models/loto3_exacto.py
+=======================================
+
+Tests the exhaustive LOTO3 scoring tensor, top-K / temperature selection
+and the PAR/TERMINACION marginals against brute-force loops.
+"""
+
+import pytest
+import os
+import sys
+import itertools
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+COMBINACIONES = list(itertools.product(range(10), repeat=3))
+
+
+@pytest.fixture
+def matriz():
+    return np.random.default_rng(4).dirichlet(np.ones(10) * 0.7, size=3)
+
+
+def score_bruto(p, combo, patrones):
+    """Per-combination score as the sampling ensemble computed it."""
+    score = sum(p[i, d] for i, d in enumerate(combo)) / 3 * 100
+    score += 5 if 7 <= sum(combo) <= 20 else -5
+    ordenado = sorted(combo)
+    if len(set(combo)) < 3 and patrones.get('prob_repetido', 0) > 0.3:
+        score += 3
+    if ordenado == list(range(ordenado[0], ordenado[0] + 3)) and patrones.get('prob_escalera', 0) > 0.1:
+        score += 5
+    return score
+
+
+class TestTensorScore:
+    """The vectorized tensor equals the per-combination loop."""
+
+    @pytest.mark.parametrize("patrones", [{}, {'prob_repetido': 0.5, 'prob_escalera': 0.2}])
+    def test_matches_brute_force(self, matriz, patrones):
+        from loto3_exacto import tensor_score
+
+        score = tensor_score(matriz, patrones)
+        for combo in COMBINACIONES:
+            assert score[combo] == pytest.approx(score_bruto(matriz, combo, patrones))
+
+    def test_top_k_is_sorted_and_exact(self, matriz):
+        from loto3_exacto import tensor_score, top_k, combinacion
+
+        score = tensor_score(matriz)
+        esperado = sorted(COMBINACIONES, key=lambda c: (-score[c], c))[:15]
+        assert [tuple(combinacion(i)) for i in top_k(score, 15)] == esperado
+        assert len(top_k(score, 5000)) == 1000
+
+    def test_temperature_sampling(self, matriz):
+        from loto3_exacto import tensor_score, top_k, distribucion
+
+        score = tensor_score(matriz)
+        rng = np.random.default_rng(0)
+        # Near-zero temperature collapses onto the deterministic top-K
+        assert set(top_k(score, 10, temperatura=1e-6, rng=rng)) == set(top_k(score, 10))
+
+        muestras = np.array([top_k(score, 1, temperatura=4.0, rng=rng)[0] for _ in range(40000)])
+        frecuencia = np.bincount(muestras, minlength=1000) / len(muestras)
+        np.testing.assert_allclose(frecuencia, distribucion(score, 4.0).ravel(), atol=0.006)
+
+
+class TestMarginales:
+    """PAR_INICIAL / PAR_FINAL / TERMINACION as tensor reductions."""
+
+    def test_reductions_match_loops(self, matriz):
+        from loto3_exacto import tensor_probabilidad, marginales
+
+        tensor = tensor_probabilidad(matriz)
+        assert tensor.sum() == pytest.approx(1.0)
+        m = marginales(tensor)
+
+        par_inicial, par_final, terminacion = np.zeros(100), np.zeros(100), np.zeros(10)
+        for a, b, c in COMBINACIONES:
+            par_inicial[a * 10 + b] += tensor[a, b, c]
+            par_final[b * 10 + c] += tensor[a, b, c]
+            terminacion[c] += tensor[a, b, c]
+        np.testing.assert_allclose(m['par_inicial'], par_inicial)
+        np.testing.assert_allclose(m['par_final'], par_final)
+        np.testing.assert_allclose(m['terminacion'], terminacion)
+        # Independent positions: the terminacion marginal is the n3 row
+        np.testing.assert_allclose(m['terminacion'], matriz[2] / matriz[2].sum())
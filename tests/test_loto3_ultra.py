@@ -0,0 +1,107 @@
+"""
+Tests for engine/models/loto3_ultra.py
+======================================
+
+Tests that Loto3UltraEnsemble.predecir evaluates each component once per
+request and scores all 1000 outcomes exactly.
+"""
+
+import pytest
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+
+class FranjaContada:
+    """Trained-looking slot model that counts how often it is evaluated."""
+
+    def __init__(self, matriz):
+        self.trained = True
+        self.matriz = matriz
+        self.llamadas = 0
+
+    def predecir_matriz(self, features):
+        self.llamadas += 1
+        return self.matriz
+
+
+@pytest.fixture
+def ensemble(sample_loto3_csv):
+    from loto3_ultra import Loto3UltraEnsemble, FeatureEngineer
+
+    e = Loto3UltraEnsemble()
+    e.df_procesado = FeatureEngineer(pd.read_csv(sample_loto3_csv)).generar_todos_features()
+    e.markov.entrenar(e.df_procesado)
+    e.feature_cols = ['n1_lag1', 'n2_lag1', 'n3_lag1']
+    e.trained = True
+
+    matriz = np.zeros((3, 10))
+    matriz[:, [2, 5, 7, 9]] = [0.1, 0.2, 0.3, 0.4]
+    e.modelos_franja['NOCHE'] = FranjaContada(matriz)
+    return e
+
+
+class TestPredecir:
+    """Component vectors are computed once, candidates come from the exact top-K."""
+
+    @pytest.mark.parametrize("n_candidatos", [10, 200])
+    def test_model_work_independent_of_candidates(self, ensemble, monkeypatch, n_candidatos):
+        llamadas_markov = []
+        original = ensemble.markov.predecir_matriz
+        monkeypatch.setattr(ensemble.markov, 'predecir_matriz', lambda h: llamadas_markov.append(1) or original(h))
+
+        candidatos = ensemble.predecir(franja='NOCHE', n_candidatos=n_candidatos)
+
+        assert ensemble.modelos_franja['NOCHE'].llamadas == 1
+        assert len(llamadas_markov) == 1
+        assert 0 < len(candidatos) <= n_candidatos
+        assert len({tuple(c['numeros']) for c in candidatos}) == len(candidatos)
+        scores = [c['score'] for c in candidatos]
+        assert scores == sorted(scores, reverse=True)
+        for c in candidatos:
+            assert all(isinstance(d, int) and 0 <= d <= 9 for d in c['numeros'])
+            assert c['suma'] == sum(c['numeros'])
+
+    def test_top_candidates_are_exact(self, ensemble):
+        import loto3_exacto
+
+        candidatos = ensemble.predecir(franja='NOCHE', n_candidatos=1000)
+        assert len(candidatos) == 1000
+
+        # Brute force over every combination with the same ensemble matrix
+        _, vectores, patrones = ensemble._preparar_prediccion('NOCHE')
+        p = ensemble.matriz_ensemble(vectores)
+        mejor = max(((a, b, c) for a in range(10) for b in range(10) for c in range(10)),
+                    key=lambda t: (p[0, t[0]] + p[1, t[1]] + p[2, t[2]]) / 3 * 100
+                    + loto3_exacto.bonos_morfologicos(patrones)[t])
+        assert candidatos[0]['numeros'] == list(mejor)
+
+    def test_deterministic_without_temperature(self, ensemble):
+        primero = ensemble.predecir(franja='NOCHE', n_candidatos=10)
+        assert ensemble.predecir(franja='NOCHE', n_candidatos=10) == primero
+
+    def test_temperature_sampling_returns_distinct(self, ensemble):
+        candidatos = ensemble.predecir(franja='NOCHE', n_candidatos=20, temperatura=5.0)
+        assert len({tuple(c['numeros']) for c in candidatos}) == 20
+
+    def test_slot_confidence_uses_selected_digits(self, ensemble):
+        candidatos = ensemble.predecir(franja='NOCHE', n_candidatos=50)
+        matriz = ensemble.modelos_franja['NOCHE'].matriz
+        for c in candidatos:
+            assert c['confianza_franja'] == round(matriz[[0, 1, 2], c['numeros']].mean() * 100, 2)
+
+    def test_untrained_slot_model_falls_back_to_uniform(self, ensemble):
+        ensemble.modelos_franja['NOCHE'].trained = False
+        candidatos = ensemble.predecir(franja='NOCHE', n_candidatos=10)
+        assert {c['confianza_franja'] for c in candidatos} == {33.0}
+
+    def test_marginal_rankings(self, ensemble):
+        resultado = ensemble.predecir_marginales(franja='NOCHE', n_pares=100, n_terminaciones=10)
+        assert ensemble.modelos_franja['NOCHE'].llamadas == 1
+        assert sum(p['score'] for p in resultado['pares_inicial']) == pytest.approx(100, abs=0.1)
+        assert [t['digito'] for t in resultado['terminaciones']][0] == \
+            int(ensemble.matriz_ensemble(ensemble._preparar_prediccion('NOCHE')[1])[2].argmax())
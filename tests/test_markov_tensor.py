@@ -0,0 +1,189 @@
+"""
+Tests for engine/models/markov_tensor.py
+========================================
+
+Tests the shared array-backed Markov engine and its equivalence with the
+legacy defaultdict(Counter) implementations in the LOTO3 models.
+"""
+
+import pytest
+import os
+import sys
+from collections import defaultdict, Counter
+import pandas as pd
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+
+PESOS = {1: 0.20, 2: 0.35, 3: 0.45}
+
+
+def legacy_probs(secuencia, historia, n_estados, orden_max=3):
+    """Reference implementation using the old Counter-based transitions."""
+    transiciones = {orden: defaultdict(Counter) for orden in range(1, orden_max + 1)}
+    for orden in range(1, orden_max + 1):
+        for i in range(orden, len(secuencia)):
+            transiciones[orden][tuple(secuencia[i-orden:i])][secuencia[i]] += 1
+
+    combinado = defaultdict(float)
+    for orden in range(1, orden_max + 1):
+        if len(historia) >= orden:
+            trans = transiciones[orden].get(tuple(historia[-orden:]), Counter())
+            total = sum(trans.values())
+            if total > 0:
+                for s in range(n_estados):
+                    combinado[s] += (trans.get(s, 0) + 1) / (total + n_estados) * PESOS[orden]
+    total = sum(combinado.values())
+    if total > 0:
+        return np.array([combinado[s] / total for s in range(n_estados)])
+    return np.full(n_estados, 1.0 / n_estados)
+
+
+@pytest.fixture
+def loto3_df():
+    rng = np.random.default_rng(7)
+    n = 600
+    return pd.DataFrame({
+        'n1': rng.integers(0, 10, n),
+        'n2': rng.integers(0, 10, n),
+        'n3': rng.integers(0, 10, n),
+        'franja': rng.choice(['DIA', 'TARDE', 'NOCHE'], n),
+    })
+
+
+class TestMarkovTensor:
+    """Tests for the core tensor engine."""
+
+    def test_dense_and_sparse_layout(self):
+        from markov_tensor import MarkovTensor
+
+        digitos = MarkovTensor(10)
+        pares = MarkovTensor(100)
+
+        assert all(digitos.es_denso(o) for o in (1, 2, 3))
+        assert pares.es_denso(1)
+        assert not pares.es_denso(2)
+        assert not pares.es_denso(3)
+
+    @pytest.mark.parametrize("n_estados", [10, 100])
+    def test_probabilities_match_legacy(self, n_estados):
+        from markov_tensor import MarkovTensor
+
+        rng = np.random.default_rng(1)
+        secuencia = rng.integers(0, n_estados, 800).tolist()
+        tensor = MarkovTensor(n_estados).entrenar(secuencia)
+
+        for historia in [secuencia[-3:], secuencia[100:103], secuencia[-1:], []]:
+            np.testing.assert_allclose(
+                tensor.probabilidades(historia),
+                legacy_probs(secuencia, historia, n_estados),
+                rtol=1e-12
+            )
+
+    def test_incremental_update_matches_full_training(self):
+        from markov_tensor import MarkovTensor
+
+        rng = np.random.default_rng(3)
+        secuencia = rng.integers(0, 100, 300)
+
+        completo = MarkovTensor(100).entrenar(secuencia)
+        incremental = MarkovTensor(100).entrenar(secuencia[:200])
+        for valor in secuencia[200:]:
+            incremental.actualizar(valor)
+
+        for orden in (1, 2, 3):
+            assert completo.estados_observados(orden) == incremental.estados_observados(orden)
+        historia = secuencia[-3:].tolist()
+        np.testing.assert_allclose(completo.probabilidades(historia),
+                                   incremental.probabilidades(historia))
+        assert incremental.historia_reciente == historia
+
+    def test_backoff_uses_highest_order_with_evidence(self):
+        from markov_tensor import MarkovTensor
+
+        tensor = MarkovTensor(10).entrenar([1, 2, 3, 1, 2, 4])
+
+        # State (1, 2) seen twice at order 2; (9, 1, 2) never seen at order 3
+        probs = tensor.probabilidades([9, 1, 2], modo='backoff')
+        esperado = (tensor.conteos_estado(2, [1, 2]) + 1) / (2 + 10)
+        np.testing.assert_allclose(probs, esperado)
+
+    def test_unseen_history_returns_uniform(self):
+        from markov_tensor import MarkovTensor
+
+        tensor = MarkovTensor(10)
+        probs = tensor.probabilidades([5, 5, 5])
+        np.testing.assert_allclose(probs, np.full(10, 0.1))
+        assert tensor.mezcla_ordenes([5, 5, 5]).sum() == 0
+
+    def test_out_of_range_values_rejected(self):
+        from markov_tensor import MarkovTensor
+
+        with pytest.raises(ValueError):
+            MarkovTensor(10).entrenar([1, 2, 10])
+        with pytest.raises(ValueError):
+            MarkovTensor(10).actualizar(-1)
+
+    def test_batch_probabilities_shape(self):
+        from markov_tensor import MarkovTensor
+
+        tensor = MarkovTensor(10).entrenar(list(range(10)) * 5)
+        lote = tensor.probabilidades_lote([[1, 2], [3], []])
+        assert lote.shape == (3, 10)
+        np.testing.assert_allclose(lote.sum(axis=1), 1.0)
+
+
+class TestLoto3MarkovModels:
+    """Tests that the LOTO3 Markov models keep their public outputs."""
+
+    def test_markov_loto3_matches_legacy(self, loto3_df):
+        from loto3_ultra import MarkovLoto3
+
+        modelo = MarkovLoto3()
+        modelo.entrenar(loto3_df)
+
+        for pos in ['n1', 'n2', 'n3']:
+            secuencia = loto3_df[pos].tolist()
+            historia = secuencia[-5:]
+            probs = modelo.predecir_probabilidades(pos, historia)
+            assert list(probs.keys()) == list(range(10))
+            np.testing.assert_allclose(list(probs.values()),
+                                       legacy_probs(secuencia, historia, 10))
+
+    def test_markov_pares_matches_legacy(self, loto3_df):
+        from loto3_especialista import MarkovPares
+
+        modelo = MarkovPares()
+        modelo.entrenar(loto3_df)
+
+        pares = [f"{a}{b}" for a, b in zip(loto3_df['n1'], loto3_df['n2'])]
+        codigos = [int(p) for p in pares]
+        probs = modelo.predecir_probabilidades('inicial', pares[-3:])
+
+        assert list(probs.keys()) == [f"{i:02d}" for i in range(100)]
+        np.testing.assert_allclose(list(probs.values()),
+                                   legacy_probs(codigos, codigos[-3:], 100))
+
+    def test_markov_terminacion_distribution(self, loto3_df):
+        from loto3_especialista import MarkovTerminacion
+
+        modelo = MarkovTerminacion()
+        modelo.entrenar(loto3_df)
+
+        dia = loto3_df[loto3_df['franja'] == 'DIA']
+        probs = modelo.predecir_probabilidades('DIA', dia['n3'].tolist()[-3:], 4, 7)
+
+        assert list(probs.keys()) == list(range(10))
+        assert sum(probs.values()) == pytest.approx(1.0)
+        assert modelo.frecuencia_por_franja['DIA'].sum() == len(dia)
+        assert modelo.correlacion_n3_dado_n1.sum() == len(loto3_df)
+
+    def test_untrained_models_are_uniform(self):
+        from loto3_ultra import MarkovLoto3
+        from loto3_especialista import MarkovPares, MarkovTerminacion
+
+        assert MarkovLoto3().predecir_probabilidades('n1', [1, 2, 3]) == {i: 0.1 for i in range(10)}
+        assert set(MarkovPares().predecir_probabilidades('final', ['12']).values()) == {0.01}
+        assert set(MarkovTerminacion().predecir_probabilidades('DIA', [1]).values()) == {0.1}
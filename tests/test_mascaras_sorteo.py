@@ -0,0 +1,89 @@
+"""
+Tests for engine/models/mascaras_sorteo.py
+==========================================
+
+Tests the uint64 bitset draw representation against the set/list
+operations it replaces.
+"""
+
+import pytest
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+
+@pytest.fixture
+def sorteos():
+    rng = np.random.default_rng(0)
+    return np.array([np.sort(rng.choice(np.arange(1, 42), 6, replace=False)) for _ in range(300)])
+
+
+class TestMascaras:
+    """Mask construction and popcount hit counting."""
+
+    def test_scalar_and_vector_masks_agree(self, sorteos):
+        from mascaras_sorteo import a_mascara, mascaras, decodificar
+
+        vector = mascaras(sorteos)
+        assert vector.dtype == np.uint64
+        assert [int(m) for m in vector] == [a_mascara(s) for s in sorteos]
+        assert decodificar(vector[0]) == sorteos[0].tolist()
+
+    def test_invalid_values_ignored(self):
+        from mascaras_sorteo import a_mascara, mascaras
+
+        assert a_mascara([1, 'x', None, 70, -1, 3.0]) == 0b1010
+        assert int(mascaras([[1, np.nan, 3, 99]])[0]) == 0b1010
+
+    def test_hits_match_set_intersection(self, sorteos):
+        from mascaras_sorteo import a_mascara, mascaras, aciertos
+
+        pred, real = sorteos[:150], sorteos[150:]
+        esperado = [len(set(p) & set(r)) for p, r in zip(pred, real)]
+        assert aciertos(mascaras(pred), mascaras(real)).tolist() == esperado
+        assert [aciertos(a_mascara(p), a_mascara(r)) for p, r in zip(pred, real)] == esperado
+        # One prediction against the whole history
+        assert aciertos(mascaras(pred[:1]), mascaras(sorteos)).tolist() == \
+            [len(set(pred[0]) & set(s)) for s in sorteos]
+
+    def test_comodin_membership(self, sorteos):
+        from mascaras_sorteo import a_mascara, mascaras, contiene
+
+        assert contiene(a_mascara([4, 17, 41]), 41)
+        assert not contiene(a_mascara([4, 17, 41]), 5)
+        assert not contiene(a_mascara([4, 17]), None)
+        assert contiene(mascaras(sorteos), 7).tolist() == [7 in s for s in sorteos]
+
+    def test_presence_matrix_from_masks(self, sorteos):
+        from mascaras_sorteo import mascaras, a_presencia
+        from recencia import matriz_presencia
+
+        np.testing.assert_array_equal(a_presencia(mascaras(sorteos), 1, 41), matriz_presencia(sorteos, 1, 41))
+        assert a_presencia(mascaras(np.empty((0, 6))), 1, 41).shape == (0, 41)
+
+
+class TestLoto3:
+    """Positional digit arrays with repetitions."""
+
+    def test_digit_hits_respect_repetitions(self):
+        from mascaras_sorteo import aciertos_digitos
+
+        assert aciertos_digitos([1, 1, 2], [1, 3, 1]) == 2
+        assert aciertos_digitos([5, 5, 5], [5, 0, 0]) == 1
+
+        rng = np.random.default_rng(1)
+        pred = rng.integers(0, 10, (200, 3))
+        real = rng.integers(0, 10, (200, 3))
+
+        def legacy(p, r):
+            r_cp, n = list(r), 0
+            for d in p:
+                if d in r_cp:
+                    n += 1
+                    r_cp.remove(d)
+            return n
+
+        assert aciertos_digitos(pred, real).tolist() == [legacy(p, r) for p, r in zip(pred, real)]
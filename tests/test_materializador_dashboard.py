@@ -0,0 +1,117 @@
+"""
+Tests for engine/models/materializador_dashboard.py
+===================================================
+
+Tests delta application, verdict updates, retention and the full
+rebuild from LOTO_SIMULACIONES.csv.
+"""
+
+import pytest
+import os
+import sys
+import json
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+
+def ticket(i, juego='LOTO', mes='2025-03', sorteo=3900, estado='PENDIENTE'):
+    return {
+        'id': 7000 + i,
+        'fecha_generacion': f'{mes}-15 10:00:00',
+        'juego': juego,
+        'numeros': [1, 5, 10, 15, 20, 25],
+        'sorteo_objetivo': sorteo,
+        'estado': estado,
+        'aciertos': 0,
+        'score_afinidad': 0.0,
+    }
+
+
+@pytest.fixture
+def materializador(tmp_path):
+    from materializador_dashboard import MaterializadorDashboard
+    return MaterializadorDashboard(str(tmp_path / "dashboard"), retencion_meses=2)
+
+
+class TestAplicar:
+    """Deltas are upserted into per-game/month shards."""
+
+    def test_new_tickets_and_manifest(self, materializador):
+        assert materializador.aplicar([ticket(0), ticket(1, juego='LOTO3', sorteo=120),
+                                       ticket(2, estado='DESCARTADO')]) == 2
+
+        manifest = materializador.manifest()
+        assert set(manifest['juegos']) == {'LOTO', 'LOTO3'}
+        assert manifest['juegos']['LOTO3']['ultimo_sorteo'] == 120
+        assert manifest['juegos']['LOTO']['shards']['2025-03'] == \
+            {'archivo': 'LOTO/2025-03.json', 'registros': 1, 'sorteo_max': 3900}
+        assert [t['id'] for t in materializador.registros('LOTO')] == [7000]
+
+    def test_verdict_updates_existing_ticket(self, materializador):
+        materializador.aplicar([ticket(0), ticket(1)])
+        veredicto = dict(ticket(1), estado='AUDITADO', aciertos=3, score_afinidad=float('nan'))
+        materializador.aplicar([veredicto])
+
+        registros = {t['id']: t for t in materializador.registros()}
+        assert len(registros) == 2
+        assert registros[7001]['estado'] == 'AUDITADO' and registros[7001]['aciertos'] == 3
+        assert registros[7001]['score_afinidad'] is None  # NaN -> null
+
+    def test_only_affected_shards_rewritten(self, materializador):
+        materializador.aplicar([ticket(0, mes='2025-02'), ticket(1, mes='2025-03')])
+        shard_viejo = os.path.join(materializador.directorio, 'LOTO', '2025-02.json')
+        os.utime(shard_viejo, ns=(1, 1))
+
+        materializador.aplicar([ticket(2, mes='2025-03')])
+        assert os.stat(shard_viejo).st_mtime_ns == 1
+
+    def test_retention_prunes_old_months(self, materializador):
+        materializador.aplicar([ticket(0, mes='2025-01'), ticket(1, mes='2025-02')])
+        materializador.aplicar([ticket(2, mes='2025-03')])
+
+        shards = materializador.manifest()['juegos']['LOTO']['shards']
+        assert sorted(shards) == ['2025-02', '2025-03']
+        assert not os.path.exists(os.path.join(materializador.directorio, 'LOTO', '2025-01.json'))
+
+        # Late verdicts for pruned months do not bring shards back
+        materializador.aplicar([dict(ticket(0, mes='2025-01'), estado='AUDITADO')])
+        assert sorted(materializador.manifest()['juegos']['LOTO']['shards']) == ['2025-02', '2025-03']
+
+
+class TestReconstruir:
+    """Full rebuild from the simulations CSV."""
+
+    def test_rebuild_matches_deltas(self, tmp_path, materializador, monkeypatch):
+        import materializador_dashboard
+        from materializador_dashboard import MaterializadorDashboard
+
+        monkeypatch.setattr(materializador_dashboard, 'CHUNK_SIZE', 2)
+        filas = [ticket(i, mes=m, juego=j) for i, (m, j) in enumerate(
+            [('2025-01', 'LOTO'), ('2025-02', 'LOTO'), ('2025-03', 'LOTO'),
+             ('2025-03', 'RACHA'), ('2025-03', 'LOTO4')])]
+        filas.append(ticket(9, estado='DESCARTADO'))
+        csv_file = str(tmp_path / "LOTO_SIMULACIONES.csv")
+        pd.DataFrame(filas).to_csv(csv_file, index=False)
+
+        # Stale game from a previous manifest is removed
+        materializador.aplicar([ticket(20, juego='VIEJO')])
+        pendiente = ticket(30, juego='RACHA')
+        assert materializador.reconstruir(csv_file, extra=[pendiente]) == 5
+
+        assert set(materializador.manifest()['juegos']) == {'LOTO', 'RACHA', 'LOTO4'}
+        assert not os.path.exists(os.path.join(materializador.directorio, 'VIEJO'))
+
+        incremental = MaterializadorDashboard(str(tmp_path / "inc"), retencion_meses=2)
+        incremental.aplicar(filas + [pendiente])
+        # numeros stays as written in the CSV (string), as in the old dashboard
+        resumen = lambda d: sorted((t['id'], t['juego'], t['estado'], t['sorteo_objetivo']) for t in d.registros())
+        assert resumen(materializador) == resumen(incremental)
+
+    def test_shards_are_compact_json(self, materializador):
+        materializador.aplicar([ticket(0)])
+        with open(os.path.join(materializador.directorio, 'LOTO', '2025-03.json'), encoding='utf-8') as f:
+            contenido = f.read()
+        assert '\n' not in contenido
+        assert json.loads(contenido)[0]['id'] == 7000
@@ -0,0 +1,180 @@
+"""
+Tests for engine/models/meta_learner.py
+=======================================
+
+Tests the batch scoring API and the precomputed confidence table against
+the per-call predict() path they replaced.
+"""
+
+import pytest
+import os
+import sys
+import math
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+
+def legacy_confianza(ml, juego, algoritmo, hora, score_adn):
+    """Per-call scoring of the original predecir_confianza_real"""
+    j_id = ml.maps['juegos'].get(juego, -1)
+    a_id = ml.maps['algos'].get(algoritmo, -1)
+    if j_id == -1 or a_id == -1:
+        return 1.0
+    X = pd.DataFrame([[j_id, a_id, hora, score_adn]], columns=list(ml.model.feature_names_in_))
+    esperanza = ml.model.predict(X)[0]
+    max_juego = {'LOTO': 6, 'LOTO3': 3, 'LOTO4': 4, 'RACHA': 10}.get(juego, 6)
+    sigmoide = 1 / (1 + math.exp(-4.0 * (esperanza / max_juego - 0.3)))
+    return 0.5 + sigmoide * 2.5
+
+
+@pytest.fixture
+def meta(tmp_path, monkeypatch):
+    import meta_learner
+
+    monkeypatch.setattr(meta_learner, 'MODEL_FILE', str(tmp_path / 'model.pkl'))
+    monkeypatch.setattr(meta_learner, 'MAPS_FILE', str(tmp_path / 'maps.json'))
+    monkeypatch.setattr(meta_learner, 'SIMULACIONES_FILE', str(tmp_path / 'sims.csv'))
+
+    rng = np.random.default_rng(7)
+    n = 600
+    juegos = rng.choice(['LOTO', 'LOTO3', 'RACHA'], n)
+    pd.DataFrame({
+        'estado': 'AUDITADO',
+        'juego': juegos,
+        'algoritmo': rng.choice(['alg_a', 'alg_b', 'alg_c'], n),
+        'hora_dia': rng.integers(0, 24, n),
+        'score_afinidad': rng.integers(0, 40, n) / 2,
+        'aciertos': rng.integers(0, 4, n),
+    }).to_csv(tmp_path / 'sims.csv', index=False)
+
+    ml = meta_learner.MetaLearner()
+    ml.entrenar()
+    return ml
+
+
+class TestConfianza:
+    """Table lookups and batch scoring must match per-call predictions."""
+
+    def consultas(self, ml, n=300):
+        rng = np.random.default_rng(11)
+        umbrales = ml._umbrales_score()
+        salida = []
+        for i in range(n):
+            # Mix random scores with exact split thresholds (boundary cases)
+            score = float(umbrales[i % len(umbrales)]) if i % 3 == 0 else float(rng.uniform(-5, 60))
+            salida.append((str(rng.choice(['LOTO', 'LOTO3', 'RACHA'])),
+                           str(rng.choice(['alg_a', 'alg_b', 'alg_c'])),
+                           int(rng.integers(0, 24)), score))
+        return salida
+
+    def test_table_lookup_matches_predict(self, meta):
+        consultas = self.consultas(meta)
+        assert meta.tabla_confianza()["exacta"]
+        for consulta in consultas:
+            assert meta.predecir_confianza_real(*consulta) == pytest.approx(
+                legacy_confianza(meta, *consulta), abs=1e-12)
+
+    def test_batch_matches_predict(self, meta):
+        consultas = self.consultas(meta) + [('LOTO', 'desconocido', 10, 5.0)]
+        esperado = [legacy_confianza(meta, *c) for c in consultas]
+        np.testing.assert_allclose(meta.predecir_confianza_lote(consultas), esperado, atol=1e-12)
+
+    def test_grid_fallback_stays_in_range(self, meta, monkeypatch):
+        import meta_learner
+
+        monkeypatch.setattr(meta_learner, 'MAX_PUNTOS_SCORE', 8)
+        meta._tabla = None
+        assert not meta.tabla_confianza()["exacta"]
+        valor = meta.predecir_confianza_real('LOTO', 'alg_a', 10, 12.3)
+        assert 0.5 <= valor <= 3.0
+
+    def test_unknown_ids_and_odd_hours(self, meta):
+        assert meta.predecir_confianza_real('KINO', 'alg_a', 10, 5.0) == 1.0
+        assert meta.predecir_confianza_real('LOTO', 'nuevo', 10, 5.0) == 1.0
+        # Fractional hours are not in the table: direct predict
+        assert meta.predecir_confianza_real('LOTO', 'alg_b', 10.5, 5.0) == pytest.approx(
+            legacy_confianza(meta, 'LOTO', 'alg_b', 10.5, 5.0), abs=1e-12)
+
+    def test_retraining_invalidates_table(self, meta):
+        meta.tabla_confianza()
+        meta.entrenar(completo=True)
+        assert meta._tabla is None
+
+    def test_no_model_returns_neutral(self, tmp_path, monkeypatch):
+        import meta_learner
+
+        monkeypatch.setattr(meta_learner, 'MODEL_FILE', str(tmp_path / 'none.pkl'))
+        monkeypatch.setattr(meta_learner, 'MAPS_FILE', str(tmp_path / 'none.json'))
+        ml = meta_learner.MetaLearner()
+        assert ml.predecir_confianza_real('LOTO', 'alg_a', 10, 5.0) == 1.0
+        assert ml.predecir_confianza_lote([('LOTO', 'alg_a', 10, 5.0)]).tolist() == [1.0]
+
+
+def agregar_auditados(path, n, algoritmo='alg_a', semilla=3):
+    rng = np.random.default_rng(semilla)
+    nuevos = pd.DataFrame({
+        'estado': 'AUDITADO',
+        'juego': 'LOTO',
+        'algoritmo': algoritmo,
+        'hora_dia': rng.integers(0, 24, n),
+        'score_afinidad': rng.integers(0, 40, n) / 2,
+        'aciertos': rng.integers(0, 4, n),
+    })
+    pd.concat([pd.read_csv(path), nuevos]).to_csv(path, index=False)
+
+
+class TestEntrenamientoIncremental:
+    """Stable id maps, skip threshold and warm-started rolling forest."""
+
+    def test_skips_when_few_new_samples(self, meta, tmp_path):
+        import meta_learner
+
+        modelo = meta.model
+        agregar_auditados(tmp_path / 'sims.csv', meta_learner.MIN_NUEVAS_MUESTRAS - 1)
+        assert meta.entrenar() is False
+        assert meta.model is modelo
+        assert meta.maps['muestras_entrenadas'] == 600
+
+    def test_maps_append_new_algorithms(self, meta, tmp_path):
+        import meta_learner
+
+        anteriores = dict(meta.maps['algos'])
+        # A new algorithm that sorts/appears first must not renumber the others
+        df = pd.read_csv(tmp_path / 'sims.csv')
+        df.loc[0, 'algoritmo'] = 'aaa_nuevo'
+        df.to_csv(tmp_path / 'sims.csv', index=False)
+        agregar_auditados(tmp_path / 'sims.csv', meta_learner.MIN_NUEVAS_MUESTRAS)
+
+        assert meta.entrenar() is True
+        for nombre, indice in anteriores.items():
+            assert meta.maps['algos'][nombre] == indice
+        assert meta.maps['algos']['aaa_nuevo'] == max(anteriores.values()) + 1
+
+        recargado = meta_learner.MetaLearner()
+        assert recargado.maps == meta.maps
+
+    def test_warm_start_replaces_oldest_trees(self, meta, tmp_path):
+        import meta_learner
+
+        anteriores = [id(t) for t in meta.model.estimators_]
+        agregar_auditados(tmp_path / 'sims.csv', meta_learner.MIN_NUEVAS_MUESTRAS)
+        assert meta.entrenar() is True
+
+        actuales = [id(t) for t in meta.model.estimators_]
+        nuevos = meta_learner.ARBOLES_POR_ACTUALIZACION
+        assert len(actuales) == meta_learner.N_ARBOLES
+        assert actuales[:-nuevos] == anteriores[nuevos:]
+        assert not set(actuales[-nuevos:]) & set(anteriores)
+        assert meta._tabla is None
+        assert meta.model.predict(pd.DataFrame([[0, 0, 10, 5.0]], columns=meta_learner.FEATURES)).shape == (1,)
+
+    def test_window_limits_training_rows(self, meta, tmp_path, monkeypatch):
+        import meta_learner
+
+        monkeypatch.setattr(meta_learner, 'VENTANA_ENTRENAMIENTO', 350)
+        agregar_auditados(tmp_path / 'sims.csv', meta_learner.MIN_NUEVAS_MUESTRAS)
+        assert meta.entrenar(completo=True) is True
+        assert meta.model.estimators_[0].tree_.weighted_n_node_samples[0] == 350
@@ -0,0 +1,143 @@
+"""
+Tests for engine/models/orquestador_loto3.py
+============================================
+
+Tests the process-pool trainer of the LOTO3 family: same models as the
+sequential fits, a single CPU budget and per-component task hand-off.
+"""
+
+import pytest
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+
+@pytest.fixture
+def historial():
+    rng = np.random.default_rng(0)
+    n = 600
+    fechas = pd.date_range('2024-01-01', periods=n // 3, freq='D').repeat(3) + \
+        pd.to_timedelta(np.tile([14, 18, 21], n // 3), unit='h')
+    df = pd.DataFrame({'sorteo': np.arange(13000, 13000 + n), 'fecha': fechas})
+    for col in ['n1', 'n2', 'n3']:
+        df[col] = rng.integers(0, 10, n)
+    return df
+
+
+def tareas_pequeñas(n=3):
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(200, 5))
+    return [(('rf', k), RandomForestClassifier(n_estimators=20, random_state=k), X, (X[:, k] > 0).astype(int))
+            for k in range(n)]
+
+
+class TestAjustarTareas:
+    """Parallel fits must equal sequential ones under one CPU budget."""
+
+    def test_parallel_matches_sequential(self):
+        from orquestador_loto3 import ajustar_tareas
+
+        secuencial, m1 = ajustar_tareas(tareas_pequeñas(), cpus=1)
+        paralelo, m2 = ajustar_tareas(tareas_pequeñas(), cpus=3)
+
+        X = tareas_pequeñas()[0][2]
+        assert set(paralelo) == set(secuencial) == {('rf', k) for k in range(3)}
+        for clave in secuencial:
+            np.testing.assert_array_equal(paralelo[clave].predict_proba(X), secuencial[clave].predict_proba(X))
+        assert (m1['workers'], m2['workers']) == (1, 3)
+        assert m2['ajustadas'] == 3 and m2['segundos_ahorrados'] >= 0
+
+    def test_cpu_budget_split_between_workers_and_threads(self):
+        from orquestador_loto3 import ajustar_tareas
+        from sklearn.calibration import CalibratedClassifierCV
+
+        tareas = tareas_pequeñas(2)
+        tareas[1] = (tareas[1][0], CalibratedClassifierCV(tareas[1][1], cv=2), *tareas[1][2:])
+        ajustados, metricas = ajustar_tareas(tareas, cpus=4)
+
+        assert (metricas['workers'], metricas['hilos_por_tarea']) == (2, 2)
+        assert ajustados[('rf', 0)].n_jobs == 2
+        assert ajustados[('rf', 1)].get_params()['estimator__n_jobs'] == 2
+
+    def test_failed_task_is_left_out(self):
+        from orquestador_loto3 import ajustar_tareas
+        from sklearn.linear_model import LogisticRegression
+
+        tareas = tareas_pequeñas(2) + [('roto', LogisticRegression(), np.zeros((5, 2)), np.zeros(5))]
+        ajustados, metricas = ajustar_tareas(tareas, cpus=3)
+        assert 'roto' not in ajustados and metricas['ajustadas'] == 2
+
+
+class TestComponentes:
+    """LOTO3 components expose their fits as tasks and pick them back up."""
+
+    def test_franja_shares_one_scaler(self, historial):
+        from loto3_ultra import ModeloFranjaHoraria, FeatureEngineer
+
+        df = FeatureEngineer(historial).generar_todos_features()
+        modelo = ModeloFranjaHoraria('NOCHE', calibrar=False)
+        tareas = modelo.tareas_entrenamiento(df)
+
+        assert [t[0] for t in tareas] == [('franja', 'NOCHE', p) for p in ['n1', 'n2', 'n3']]
+        assert len({id(t[2]) for t in tareas}) == 1
+        assert len({id(s) for s in modelo.scalers.values()}) == 1
+
+        assert modelo.entrenar(df, cpus=3)
+        features = df[modelo.feature_cols].dropna().values[-1]
+        matriz = modelo.predecir_matriz(features)
+        assert matriz.shape == (3, 10)
+        np.testing.assert_allclose(matriz.sum(axis=1), 1.0)
+
+    def test_tricore_parallel_matches_sequential(self, historial):
+        from loto3_tricore import CerebroPosicional
+        from orquestador_loto3 import ajustar_tareas
+
+        secuenciales = [CerebroPosicional(i) for i in range(1, 4)]
+        for cerebro in secuenciales:
+            cerebro.entrenar(historial)
+
+        paralelos = [CerebroPosicional(i) for i in range(1, 4)]
+        ajustados, _ = ajustar_tareas([c.tarea_entrenamiento(historial) for c in paralelos], cpus=3)
+        for cerebro, referencia in zip(paralelos, secuenciales):
+            cerebro.completar_entrenamiento(ajustados[('tricore', cerebro.pos_id)])
+            np.testing.assert_array_equal(cerebro.predecir_vector(), referencia.predecir_vector())
+
+    def test_especialista_rf_pairs(self, historial):
+        from loto3_especialista import RFPares
+        from orquestador_loto3 import ajustar_tareas
+
+        pares = [RFPares('inicial'), RFPares('final')]
+        tareas = [t for rf in pares for t in rf.tareas_entrenamiento(historial)]
+        ajustados, _ = ajustar_tareas(tareas, cpus=2)
+
+        for rf in pares:
+            assert rf.completar_entrenamiento(ajustados)
+            assert rf.trained and rf._evaluacion is None
+        assert not RFPares('inicial').completar_entrenamiento(ajustados)
+
+    def test_components_train_within_the_caller_budget(self, monkeypatch):
+        import loto3_ultra
+        import loto3_especialista
+
+        presupuestos = []
+
+        def ajustar_tareas(tareas, cpus):
+            presupuestos.append(cpus)
+            return {}, {}
+
+        for modulo in (loto3_ultra, loto3_especialista):
+            monkeypatch.setattr(modulo, 'ajustar_tareas', ajustar_tareas)
+        for clase in (loto3_ultra.Loto3UltraEnsemble, loto3_especialista.Loto3Especialista):
+            monkeypatch.setattr(clase, 'tareas_entrenamiento', lambda self: [])
+            monkeypatch.setattr(clase, 'completar_entrenamiento', lambda self, ajustados: None)
+
+        loto3_ultra.Loto3UltraEnsemble(cpus=2).entrenar()
+        loto3_especialista.Loto3Especialista(cpus=3).entrenar()
+        loto3_especialista.Loto3Especialista(cpus=3).entrenar(cpus=1)
+        assert presupuestos == [2, 3, 1]
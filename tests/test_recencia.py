@@ -0,0 +1,227 @@
+"""
+Tests for engine/models/recencia.py
+===================================
+
+Tests the shared recency/gap helpers and their equivalence with the
+original nested-loop implementations they replaced.
+"""
+
+import pytest
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+
+
+# ==============================================================================
+# Reference implementations (copied from the pre-refactor code)
+# ==============================================================================
+
+def legacy_recencia_par(serie, window=100):
+    """RFPares._generar_features.calcular_recencia"""
+    recencias = []
+    for i in range(len(serie)):
+        if i < 1:
+            recencias.append(window)
+            continue
+        val = serie.iloc[i]
+        found = False
+        for j in range(1, min(i+1, window)):
+            if serie.iloc[i-j] == val:
+                recencias.append(j)
+                found = True
+                break
+        if not found:
+            recencias.append(window)
+    return recencias
+
+
+def legacy_distancias(valores, digito):
+    """FeatureEngineer.generar_features_distancia (one digit)"""
+    distances = []
+    last_seen = -1
+    for idx, val in enumerate(valores):
+        if last_seen == -1:
+            distances.append(100)
+        else:
+            distances.append(idx - last_seen)
+        if val == digito:
+            last_seen = idx
+    return distances
+
+
+def legacy_gaps(X_raw, current_idx, min_val, max_val):
+    """OraculoNeural._calcular_gaps"""
+    size = max_val - min_val + 1
+    gaps = np.full(size, current_idx, dtype=np.float32)
+    for sorteo_offset in range(current_idx):
+        idx = current_idx - 1 - sorteo_offset
+        for num in X_raw[idx]:
+            try:
+                val = int(float(num))
+                if min_val <= val <= max_val:
+                    num_idx = val - min_val
+                    if gaps[num_idx] == current_idx:
+                        gaps[num_idx] = sorteo_offset + 1
+            except (ValueError, TypeError):
+                continue
+    return (gaps / max(current_idx, 1)).tolist()
+
+
+def legacy_racha_recencia(sorteos, i, num):
+    """Recency feature of OraculoNeural._preparar_dataset_racha_binario"""
+    recencia = 0
+    for j in range(i-1, -1, -1):
+        if num in sorteos[j]:
+            return i - j - 1
+        recencia += 1
+    return recencia
+
+
+@pytest.fixture
+def racha_df():
+    rng = np.random.default_rng(11)
+    filas = []
+    for sorteo in range(1, 181):
+        nums = sorted(rng.choice(np.arange(1, 21), 10, replace=False))
+        fila = {'sorteo': sorteo, 'fecha': f"2025-01-{(sorteo % 28) + 1:02d}"}
+        fila.update({f"n{k+1}": int(v) for k, v in enumerate(nums)})
+        filas.append(fila)
+    return pd.DataFrame(filas)
+
+
+# ==============================================================================
+# Helpers
+# ==============================================================================
+
+class TestHelpers:
+    """Tests for the generic recency helpers."""
+
+    def test_matriz_presencia_ignores_invalid_values(self):
+        from recencia import matriz_presencia
+
+        presencia = matriz_presencia([[1, '3', None], ['x', 5.0, 99]], 1, 5)
+
+        assert presencia.shape == (2, 5)
+        assert presencia[0].tolist() == [True, False, True, False, False]
+        assert presencia[1].tolist() == [False, False, False, False, True]
+
+    def test_recencia_rows_describe_state_before_draw(self):
+        from recencia import one_hot_serie, recencia
+
+        presencia = one_hot_serie([0, 1, 0, 0], 2)
+        gaps = recencia(presencia)
+
+        assert gaps.shape == (5, 2)
+        assert gaps[:, 0].tolist() == [0, 1, 2, 1, 1]
+        assert gaps[:, 1].tolist() == [0, 1, 1, 2, 3]
+
+    def test_recencia_cap(self):
+        from recencia import one_hot_serie, recencia
+
+        gaps = recencia(one_hot_serie([1] + [0] * 10, 2), sin_aparicion=50, tope=5)
+        assert gaps[-1, 1] == 5
+        assert gaps[0, 1] == 5
+
+    def test_conteo_ventana(self):
+        from recencia import one_hot_serie, conteo_ventana
+
+        conteos = conteo_ventana(one_hot_serie([1, 1, 0, 1, 1], 2), 2)
+        assert conteos[:, 1].tolist() == [0, 1, 2, 1, 1, 2]
+
+    def test_recencia_valor_nan_never_matches(self):
+        from recencia import recencia_valor
+
+        resultado = recencia_valor([np.nan, 3, np.nan, 3], sin_aparicion=9)
+        assert resultado.tolist() == [9, 9, 9, 2]
+
+
+# ==============================================================================
+# Equivalence with the original call sites
+# ==============================================================================
+
+class TestEquivalence:
+    """The refactored call sites must reproduce the legacy outputs."""
+
+    def test_rf_pares_recencia(self):
+        from loto3_especialista import RFPares
+
+        rng = np.random.default_rng(5)
+        df = pd.DataFrame({
+            'n1': rng.integers(0, 10, 400),
+            'n2': rng.integers(0, 10, 400),
+            'n3': rng.integers(0, 10, 400),
+        })
+        features = RFPares('inicial')._generar_features(df)
+
+        esperado = legacy_recencia_par(df['n1'] * 10 + df['n2'])
+        assert features['par_recencia'].tolist() == esperado
+
+    def test_generar_features_distancia(self):
+        from loto3_ultra import FeatureEngineer
+
+        rng = np.random.default_rng(9)
+        df = pd.DataFrame({
+            'n1': rng.integers(0, 10, 150),
+            'n2': rng.integers(0, 10, 150),
+            'n3': rng.integers(0, 10, 150),
+        })
+        resultado = FeatureEngineer.generar_features_distancia(None, df)
+
+        for pos in ['n1', 'n2', 'n3']:
+            for digito in range(10):
+                assert resultado[f'{pos}_dist_{digito}'].tolist() == \
+                    legacy_distancias(df[pos].tolist(), digito)
+
+    def test_calcular_gaps(self, racha_df):
+        from oraculo_neural import OraculoNeural
+
+        oracle = OraculoNeural('RACHA', version='v3')
+        X_raw = racha_df[[f"n{k}" for k in range(1, 11)]].values
+
+        for current_idx in [0, 1, 7, 60, len(X_raw)]:
+            assert oracle._calcular_gaps(X_raw, current_idx) == \
+                legacy_gaps(X_raw, current_idx, 1, 20)
+
+    def test_racha_builder_recencia(self, racha_df):
+        from oraculo_neural import OraculoNeural
+
+        oracle = OraculoNeural('RACHA', version='v3')
+        X, y = oracle._preparar_dataset_racha_binario(racha_df)
+
+        sorteos = [set(fila) for fila in racha_df[[f"n{k}" for k in range(1, 11)]].values.tolist()]
+        fila = 0
+        for i in range(10, len(racha_df)):
+            for num in range(1, 21):
+                esperado = legacy_racha_recencia(sorteos, i, num) / max(i, 1)
+                assert X[fila][0] == pytest.approx(esperado)
+                assert X[fila][1] == pytest.approx(sum(num in sorteos[j] for j in range(max(0, i-10), i)) / 10)
+                assert y[fila] == (1 if num in sorteos[i] else 0)
+                fila += 1
+        assert fila == len(X)
+
+    def test_racha_predict_recencia(self, racha_df):
+        from oraculo_neural import OraculoNeural
+
+        class ModeloEspia:
+            def __init__(self):
+                self.filas = []
+
+            def predict_proba(self, X):
+                self.filas.append(X[0])
+                return np.array([[0.5, 0.5]])
+
+        oracle = OraculoNeural('RACHA', version='v3')
+        oracle.model = ModeloEspia()
+        oracle._predecir_racha_binario(racha_df)
+
+        sorteos = [set(fila) for fila in racha_df[[f"n{k}" for k in range(1, 11)]].values.tolist()]
+        n = len(sorteos)
+        for k, num in enumerate(range(1, 21)):
+            features = oracle.model.filas[k]
+            assert features[0] == pytest.approx(legacy_racha_recencia(sorteos, n, num) / n)
+            assert features[3] == pytest.approx(sum(num in s for s in sorteos[-100:]) / 100)
+            assert features[4] == (1 if num in sorteos[-1] else 0)
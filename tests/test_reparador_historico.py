@@ -0,0 +1,126 @@
+"""
+Tests for engine/tools/reparador_historico.py
+=============================================
+
+Tests the memory-mapped shared history, the process-pool replay and the
+single merged write of the rebuilt predictions.
+"""
+
+import pytest
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'tools'))
+
+
+class OraculoLigero:
+    """Deterministic stand-in for OraculoNeural (no GridSearch training)."""
+
+    def __init__(self, game_id, historial=None, persistir=True):
+        self.historial = historial
+        self.visto = None
+
+    def entrenar(self, sorteo_limite=None):
+        self.visto = self.historial[self.historial['sorteo'] <= sorteo_limite]
+
+    def predecir(self, fecha_objetivo=None):
+        ultima = self.visto.iloc[-1]
+        return [int(ultima['n1']), int(ultima['n2']), len(self.visto) % 10]
+
+
+@pytest.fixture
+def reparador(sample_loto3_csv, temp_data_dir, monkeypatch):
+    import reparador_historico
+
+    monkeypatch.setattr(reparador_historico, 'DATA_DIR', str(temp_data_dir))
+    monkeypatch.setattr(reparador_historico, 'SIMULACIONES_FILE', str(temp_data_dir / 'LOTO_SIMULACIONES.csv'))
+    monkeypatch.setattr(reparador_historico, 'OraculoNeural', OraculoLigero)
+    return reparador_historico, pd.read_csv(sample_loto3_csv)
+
+
+class TestHistorialCompartido:
+    """The memory-mapped history must round-trip what the oracle reads."""
+
+    def test_roundtrip(self, reparador, tmp_path):
+        rh, df = reparador
+        df['dia_semana'] = 'LUNES'  # text columns are not used by the oracle
+        descriptor = rh.exportar_historial_compartido(df, str(tmp_path))
+
+        cargado = rh.cargar_historial_compartido(descriptor)
+        assert list(cargado.columns) == ['sorteo', 'fecha', 'n1', 'n2', 'n3']
+        esperado = df.drop(columns='dia_semana').assign(fecha=pd.to_datetime(df['fecha']).astype('datetime64[ns]'))
+        pd.testing.assert_frame_equal(cargado, esperado, check_dtype=True)
+
+    def test_workers_read_the_mapped_pages_without_copying(self, reparador, tmp_path):
+        rh, df = reparador
+        descriptor = rh.exportar_historial_compartido(df, str(tmp_path))
+        cargado = rh.cargar_historial_compartido(descriptor)
+
+        for col, ruta in descriptor['columnas'].items():
+            base = cargado[col].to_numpy()
+            while not isinstance(base, np.memmap):
+                base = base.base
+            assert os.path.samefile(base.filename, ruta)
+
+    def test_oracle_slices_the_shared_history_without_copying(self, reparador, tmp_path):
+        rh, df = reparador
+        import oraculo_neural
+
+        cargado = rh.cargar_historial_compartido(rh.exportar_historial_compartido(df, str(tmp_path)))
+        oraculo = oraculo_neural.OraculoNeural('LOTO3', historial=cargado, persistir=False)
+        limite = int(df['sorteo'].iloc[40])
+
+        visto = oraculo._leer_maestro(limite)
+        assert visto['sorteo'].tolist() == df['sorteo'].iloc[:41].tolist()
+        assert np.shares_memory(visto['n1'].to_numpy(), cargado['n1'].to_numpy())
+        # Copy-on-write: a local edit never reaches the shared pages
+        visto.loc[visto.index[0], 'n1'] = 99
+        assert cargado['n1'].iloc[0] == df['n1'].iloc[0]
+
+
+class TestReplay:
+    """Parallel replay must equal the sequential one and write once."""
+
+    def test_parallel_matches_sequential(self, reparador):
+        rh, df = reparador
+        sorteos = df['sorteo'].tolist()[40:70]
+
+        secuencial, m1 = rh.replay_paralelo('LOTO3', df, sorteos, workers=1)
+        paralelo, m2 = rh.replay_paralelo('LOTO3', df, sorteos, workers=3)
+
+        assert paralelo == secuencial
+        assert [f['sorteo_objetivo'] for f in paralelo] == sorteos
+        # Each draw trained only on history up to itself
+        assert paralelo[0]['numeros'] == str([int(df['n1'].iloc[40]), int(df['n2'].iloc[40]), 41 % 10])
+        assert m2['filas'] == m2['sorteos'] == 30 and m2['errores'] == 0
+        assert m2['sorteos_por_segundo'] > 0
+
+    def test_merge_replaces_previous_oracle_rows(self, reparador, temp_data_dir, monkeypatch):
+        rh, df = reparador
+        sims = temp_data_dir / 'LOTO_SIMULACIONES.csv'
+        base = {'fecha_generacion': '2024-01-01 10:00:00', 'numeros': '[1, 2, 3]', 'estado': 'PENDIENTE',
+                'aciertos': 0, 'score_afinidad': 0.0, 'hora_dia': 10}
+        pd.DataFrame([
+            dict(base, id=10, juego='LOTO3', sorteo_objetivo=13090, algoritmo='oraculo_neural_v3'),
+            dict(base, id=20, juego='LOTO3', sorteo_objetivo=13095, algoritmo='otro_algo'),
+            dict(base, id=30, juego='LOTO', sorteo_objetivo=13095, algoritmo='oraculo_neural_v3'),
+            dict(base, id=40, juego='LOTO3', sorteo_objetivo=13095, algoritmo='oraculo_neural_v3'),
+        ]).to_csv(sims, index=False)
+
+        escrituras = []
+        original = rh.guardar_predicciones
+        monkeypatch.setattr(rh, 'guardar_predicciones', lambda *a, **k: escrituras.append(1) or original(*a, **k))
+        rh.reparar_historia_inteligente('LOTO3', workers=2)
+
+        resultado = pd.read_csv(sims)
+        assert len(escrituras) == 1
+        assert resultado['id'].is_monotonic_increasing
+        assert not resultado['id'].isin([10, 40]).any()
+        assert set(resultado['id']) >= {20, 30}
+
+        neural = resultado[(resultado['juego'] == 'LOTO3') & (resultado['algoritmo'] == 'oraculo_neural_v3')]
+        assert sorted(neural['sorteo_objetivo']) == list(range(13090, 13101))
@@ -0,0 +1,167 @@
+"""
+Tests for engine/scrapers/sync_jugadas.py
+=========================================
+
+Tests the conditional (ETag / Last-Modified) and incremental (row watermark)
+Google Sheets sync against a local HTTP stub.
+"""
+
+import pytest
+import os
+import sys
+import csv
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'scrapers'))
+
+HEADER = "Fecha,Numeros,Jugado"
+
+
+class HojaStub:
+    """Published-sheet stand-in: serves `texto` with an ETag and honours If-None-Match."""
+
+    def __init__(self, texto):
+        self.texto = texto
+        self.peticiones = []
+        hoja = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                etag = f'"{hash(hoja.texto) & 0xffffffff:x}"'
+                hoja.peticiones.append(dict(self.headers))
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                cuerpo = hoja.texto.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/csv; charset=utf-8')
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', 'Mon, 19 Oct 2026 12:00:00 GMT')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/pub?output=csv"
+        self.hilo = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.hilo.start()
+
+    def cerrar(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def hoja_csv(filas):
+    """Google exports rows with CRLF and no trailing newline."""
+    return "\r\n".join([HEADER] + filas)
+
+
+FILAS = [
+    "2026-01-01T10:00:00.000Z,1-2-3-4-5-6,SI",
+    "2026-01-02T10:00:00.000Z,7-8-9-10-11-12,NO",
+]
+
+
+@pytest.fixture
+def hoja():
+    stub = HojaStub(hoja_csv(FILAS))
+    yield stub
+    stub.cerrar()
+
+
+def leer_jugadas(ruta):
+    with open(ruta, 'r', encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+class TestSincronizarHoja:
+    """Conditional, watermark-based sync of the published sheet."""
+
+    def test_first_sync_imports_all_rows(self, hoja, tmp_path):
+        from sync_jugadas import sincronizar_hoja, HEADERS_JUGADAS
+
+        ruta = str(tmp_path / 'LOTO_JUGADAS.csv')
+        assert sincronizar_hoja(hoja.url, ruta) == 2
+
+        jugadas = leer_jugadas(ruta)
+        assert list(jugadas[0].keys()) == HEADERS_JUGADAS
+        assert [j['fecha_generacion'] for j in jugadas] == ['2026-01-01 10:00:00', '2026-01-02 10:00:00']
+        assert json.loads(jugadas[1]['numeros']) == [7, 8, 9, 10, 11, 12]
+        assert all(j['estado'] == 'PENDIENTE' and j['juego'] == 'LOTO' for j in jugadas)
+
+        estado = json.load(open(tmp_path / 'LOTO_JUGADAS.sync.json'))
+        assert estado['etag'] and estado['filas'] == 2
+
+    def test_unchanged_sheet_is_skipped_with_304(self, hoja, tmp_path):
+        from sync_jugadas import sincronizar_hoja
+
+        ruta = str(tmp_path / 'LOTO_JUGADAS.csv')
+        sincronizar_hoja(hoja.url, ruta)
+        antes = open(ruta, 'rb').read()
+
+        assert sincronizar_hoja(hoja.url, ruta) == 0
+        assert hoja.peticiones[-1].get('If-None-Match')
+        assert hoja.peticiones[-1].get('If-Modified-Since')
+        assert open(ruta, 'rb').read() == antes
+
+    def test_appended_rows_are_parsed_incrementally(self, hoja, tmp_path, monkeypatch):
+        import sync_jugadas
+
+        ruta = str(tmp_path / 'LOTO_JUGADAS.csv')
+        sync_jugadas.sincronizar_hoja(hoja.url, ruta)
+
+        # The tail path must not re-read the local CSV for duplicate keys
+        def prohibido(_):
+            raise AssertionError("full dedupe scan on incremental sync")
+        monkeypatch.setattr(sync_jugadas, 'cargar_claves_existentes', prohibido)
+
+        hoja.texto = hoja_csv(FILAS + ["2026-01-03T10:00:00.000Z,13-14-15-16-17-18,SI"])
+        assert sync_jugadas.sincronizar_hoja(hoja.url, ruta) == 1
+
+        jugadas = leer_jugadas(ruta)
+        assert len(jugadas) == 3
+        assert json.loads(jugadas[-1]['numeros']) == [13, 14, 15, 16, 17, 18]
+        assert json.load(open(tmp_path / 'LOTO_JUGADAS.sync.json'))['filas'] == 3
+
+    def test_edited_prefix_falls_back_to_full_dedupe(self, hoja, tmp_path):
+        from sync_jugadas import sincronizar_hoja
+
+        ruta = str(tmp_path / 'LOTO_JUGADAS.csv')
+        sincronizar_hoja(hoja.url, ruta)
+
+        # First row edited in place: watermark hash no longer matches
+        hoja.texto = hoja_csv(["2026-01-01T10:00:00.000Z,1-2-3-4-5-7,SI"] + FILAS[1:])
+        assert sincronizar_hoja(hoja.url, ruta) == 1
+        assert len(leer_jugadas(ruta)) == 3
+
+    def test_existing_csv_without_watermark_is_deduplicated(self, hoja, tmp_path):
+        from sync_jugadas import sincronizar_hoja
+
+        ruta = str(tmp_path / 'LOTO_JUGADAS.csv')
+        sincronizar_hoja(hoja.url, ruta)
+        os.remove(tmp_path / 'LOTO_JUGADAS.sync.json')
+
+        assert sincronizar_hoja(hoja.url, ruta) == 0
+        assert len(leer_jugadas(ruta)) == 2
+
+    def test_non_csv_response_is_ignored(self, tmp_path, monkeypatch):
+        import sync_jugadas
+
+        class Respuesta:
+            status_code = 200
+            headers = {'content-type': 'text/html'}
+            text = "<html>Sign in</html>" * 5
+
+        monkeypatch.setattr(sync_jugadas.requests, 'get', lambda *a, **k: Respuesta())
+        ruta = str(tmp_path / 'LOTO_JUGADAS.csv')
+
+        assert sync_jugadas.sincronizar_hoja('http://sheet', ruta) is None
+        assert not os.path.exists(ruta)
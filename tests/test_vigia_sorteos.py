@@ -0,0 +1,166 @@
+"""
+Tests for engine/scrapers/vigia_sorteos.py
+==========================================
+
+Tests the schedule-driven draw watcher: next-draw grouping from the shared
+calendar, bounded exponential backoff and per-draw latency metrics, using a
+fake clock so nothing actually sleeps.
+"""
+
+import pytest
+import os
+import sys
+import asyncio
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'models'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engine', 'scrapers'))
+
+# 2026-10-19 is a Monday (weekday 0)
+LUNES = datetime(2026, 10, 19)
+
+
+class RelojFalso:
+    """Fake clock: dormir() advances time instead of sleeping."""
+
+    def __init__(self, inicio):
+        self.ahora = inicio
+        self.dormido = []
+
+    def __call__(self):
+        return self.ahora
+
+    async def dormir(self, segundos):
+        self.dormido.append(segundos)
+        self.ahora += timedelta(seconds=segundos)
+
+
+class TestProximosSorteos:
+    """Next scheduled slot per game, grouped by time."""
+
+    def test_games_sharing_a_slot_are_grouped(self):
+        from vigia_sorteos import proximos_sorteos
+
+        instante, juegos = proximos_sorteos(LUNES.replace(hour=13, minute=10))
+        assert instante == LUNES.replace(hour=14)
+        assert sorted(juegos) == ['LOTO3', 'LOTO4']
+
+    def test_slot_is_strictly_after_now(self):
+        from vigia_sorteos import proximos_sorteos
+
+        instante, juegos = proximos_sorteos(LUNES.replace(hour=14))
+        assert (instante, juegos) == (LUNES.replace(hour=15), ['RACHA'])
+
+    def test_loto_only_on_its_weekdays(self):
+        from vigia_sorteos import proximos_sorteos
+
+        # Monday 22:30 -> LOTO's next draw is Tuesday 21:00
+        instante, juegos = proximos_sorteos(LUNES.replace(hour=22, minute=30), ['LOTO'])
+        assert instante == LUNES + timedelta(days=1, hours=21)
+
+
+class TestEsperasBackoff:
+    """Bounded exponential backoff between polls."""
+
+    def test_exponential_capped_and_bounded(self):
+        from vigia_sorteos import esperas_backoff
+
+        esperas = esperas_backoff(inicial=60, maxima=600, factor=2, limite=3600)
+        assert esperas[:5] == [60, 120, 240, 480, 600]
+        assert max(esperas) == 600
+        assert sum(esperas) <= 3600
+
+
+class TestVigiaSorteos:
+    """Event loop: sleep until the draw, poll until published, record latency."""
+
+    def test_polls_with_backoff_until_published(self):
+        from vigia_sorteos import VigiaSorteos
+
+        reloj = RelojFalso(LUNES.replace(hour=13))
+        llamadas = []
+
+        async def ingerir(juegos):
+            llamadas.append((reloj(), list(juegos)))
+            # LOTO4 appears on the 2nd poll, LOTO3 on the 3rd
+            return {1: [], 2: ['LOTO4'], 3: ['LOTO3']}[len(llamadas)]
+
+        vigia = VigiaSorteos(ingerir, juegos=['LOTO3', 'LOTO4'], margen=timedelta(minutes=5),
+                             esperas=[60, 120, 240], reloj=reloj, dormir=reloj.dormir)
+        metricas = asyncio.run(vigia.atender(LUNES.replace(hour=14), ['LOTO3', 'LOTO4']))
+
+        # Only still-pending games are polled again
+        assert [j for _, j in llamadas] == [['LOTO3', 'LOTO4'], ['LOTO3', 'LOTO4'], ['LOTO3']]
+        por_juego = {m['juego']: m for m in metricas}
+        assert por_juego['LOTO4']['intentos'] == 2 and por_juego['LOTO3']['intentos'] == 3
+        assert all(m['publicado'] for m in metricas)
+
+    def test_probe_retries_and_ingests_each_game_once(self):
+        from vigia_sorteos import VigiaSorteos
+
+        reloj = RelojFalso(LUNES.replace(hour=13))
+        sondeos, ingestas = [], []
+
+        async def sondear(juegos):
+            sondeos.append(list(juegos))
+            # LOTO4 appears on the 2nd probe, LOTO3 on the 4th
+            return {1: [], 2: ['LOTO4'], 3: [], 4: ['LOTO3']}[len(sondeos)]
+
+        async def ingerir(juegos):
+            ingestas.append(list(juegos))
+            return juegos
+
+        vigia = VigiaSorteos(ingerir, juegos=['LOTO3', 'LOTO4'], margen=timedelta(minutes=5),
+                             esperas=[60, 120, 240, 480], reloj=reloj, dormir=reloj.dormir, sondear=sondear)
+        metricas = asyncio.run(vigia.atender(LUNES.replace(hour=14), ['LOTO3', 'LOTO4']))
+
+        # Backoff retries only probe; the full ingest runs once per published game
+        assert sondeos == [['LOTO3', 'LOTO4'], ['LOTO3', 'LOTO4'], ['LOTO3'], ['LOTO3']]
+        assert ingestas == [['LOTO4'], ['LOTO3']]
+        por_juego = {m['juego']: m for m in metricas}
+        assert por_juego['LOTO4']['intentos'] == 2 and por_juego['LOTO3']['intentos'] == 4
+
+    def test_schedule_comes_from_config(self):
+        import config
+        import vigia_sorteos
+
+        assert vigia_sorteos.HORARIOS is config.HORARIOS
+
+    def test_run_sleeps_until_draw_and_measures_latency(self):
+        from vigia_sorteos import VigiaSorteos
+
+        reloj = RelojFalso(LUNES.replace(hour=13, minute=30))
+        llamadas = []
+
+        async def ingerir(juegos):
+            llamadas.append((reloj(), list(juegos)))
+            return juegos
+
+        vigia = VigiaSorteos(ingerir, margen=timedelta(minutes=5), esperas=[60],
+                             reloj=reloj, dormir=reloj.dormir)
+        metricas = asyncio.run(vigia.ejecutar(hasta=LUNES.replace(hour=18, minute=30)))
+
+        # 14:00 LOTO3+LOTO4, 15:00 RACHA, 18:00 LOTO3; each polled 5 min after the draw
+        assert [(t.strftime('%H:%M'), j) for t, j in llamadas] == [
+            ('14:05', ['LOTO3', 'LOTO4']), ('15:05', ['RACHA']), ('18:05', ['LOTO3'])]
+        assert all(m['latencia_segundos'] == 300 for m in metricas)
+        assert len(metricas) == 4
+
+    def test_gives_up_after_backoff_and_moves_on(self):
+        from vigia_sorteos import VigiaSorteos
+
+        reloj = RelojFalso(LUNES.replace(hour=14, minute=30))
+
+        async def ingerir(juegos):
+            if reloj().hour == 15:
+                raise RuntimeError("polla.cl caido")
+            return juegos
+
+        vigia = VigiaSorteos(ingerir, juegos=['RACHA'], margen=timedelta(minutes=5),
+                             esperas=[60, 120], reloj=reloj, dormir=reloj.dormir)
+        metricas = asyncio.run(vigia.ejecutar(hasta=LUNES.replace(hour=23)))
+
+        assert [(m['programado'].hour, m['publicado'], m['intentos']) for m in metricas] == [
+            (15, False, 3), (22, True, 1)]
+        assert metricas[0]['latencia_segundos'] is None